@@ -18,6 +18,7 @@ from ._pairednote import *
 from ._lineitem import *
 from ._receipt import *
 from ._decimal import *
+from ._money import *
 from ._transactioninfo import *
 from ._ledger import *
 from ._refund import *
@@ -1,6 +1,28 @@
 
 __all__ = ["Account"]
 
+# The number of times to retry updating the running balance of an
+# account before giving up
+_max_balance_retries = 50
+
+# The time after the end of a day or month before its balance rollup
+# is closed and saved. This allows for transactions that are still
+# being written when the period ends
+_rollup_delay_seconds = 3600
+
+# The time after a transaction before it is assumed that its recording
+# has failed (e.g. because of a crash), so that it can be replayed
+_pending_replay_seconds = 3600
+
+# The default number of transactions in each page of a statement
+_default_statement_page_size = 1000
+
+# The columns written for each transaction in an exported statement
+_statement_columns = ["datetime", "uid", "code", "value", "receipted_value"]
+
+# The extra columns written when the line items are included
+_line_item_columns = ["line_item_uid", "user_guid"]
+
 
 def _account_root():
     return "accounting/accounts"
@@ -26,6 +48,25 @@ def _get_last_month(datetime):
                               day=1, tzinfo=datetime.tzinfo)
 
 
+def _get_start_of_day(datetime):
+    """Return the datetime at the start of the day of 'datetime',
+       e.g. 5.42pm on March 21st would return midnight on March 21st
+    """
+    return datetime.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _get_next_month(datetime):
+    """Return the date at the start of the month after 'datetime', e.g.
+       _get_next_month(March 21st) will return April 1st
+    """
+    if datetime.month == 12:
+        return _get_start_of_day(datetime.replace(year=datetime.year + 1,
+                                                  month=1, day=1))
+    else:
+        return _get_start_of_day(datetime.replace(month=datetime.month + 1,
+                                                  day=1))
+
+
 def _get_hourly_datetime(datetime):
     """Return the datetime for the top of the hour of 'datetime',
        e.g. 5.42pm would return 5.00pm
@@ -123,29 +164,51 @@ def _get_datetime_from_key(key):
 
 
 def _sum_transactions(transactions):
-    """Internal function that sums all of the transactions identified
-    by the passed keys.  by the passed keys. This returns a tuple of
-    (balance, liability, receivable, spent)
+    """Internal function that sums all of the passed transactions,
+    which are either TransactionInfo objects or the keys that
+    encode them. This returns the resulting Balance
 
         Args:
-            keys (:obj:`list`): List of keys to parse
+            transactions (:obj:`list`): List of transactions or keys to sum
         Returns:
-            tuple (:obj:`Decimal`, Decimal, Decimal, Decimal): balance,
-            liability, receivable, spent_today
+            Balance: balance, liability, receivable of the transactions
 
     """
     from Acquire.Accounting import Balance as _Balance
-    from Acquire.Accounting import TransactionInfo as _TransactionInfo
+    return _Balance.sum_many(transactions)
+
+
+def _statement_entry(transaction, line_item=None):
+    """Internal function that returns the dictionary that represents
+    the passed transaction (and optionally its line item) in an
+    exported statement
+    """
+    from Acquire.ObjectStore import datetime_to_string \
+        as _datetime_to_string
+
+    receipted_value = transaction.receipted_value()
+
+    if receipted_value is not None:
+        receipted_value = str(receipted_value)
 
-    balance = _Balance()
+    entry = {"datetime": _datetime_to_string(transaction.datetime()),
+             "uid": transaction.uid(),
+             "code": transaction.code().value,
+             "value": str(transaction.original_value()),
+             "receipted_value": receipted_value}
 
-    for transaction in transactions:
-        if not isinstance(transaction, _TransactionInfo):
-            transaction = _TransactionInfo(transaction)
+    if line_item is not None:
+        authorisation = line_item.authorisation()
+
+        if authorisation is None:
+            user_guid = None
+        else:
+            user_guid = authorisation.user_guid()
 
-        balance = balance + transaction
+        entry["line_item_uid"] = line_item.uid()
+        entry["user_guid"] = user_guid
 
-    return balance
+    return entry
 
 
 class Account:
@@ -187,6 +250,7 @@ class Account:
         self._last_update = {}
         self._uid = None
         self._group_name = None
+        self._first_transaction = None
 
         if uid is not None:
             self._uid = str(uid)
@@ -294,6 +358,9 @@ class Account:
         # make sure that this is saved to the object store
         self._save_account(bucket)
 
+        # a new account starts with an empty running balance
+        self._rebuild_running_balance(bucket=bucket)
+
     def _get_transactions_between(self, start_datetime, end_datetime,
                                   bucket=None):
         """Return all of the object store keys for transactions in this
@@ -316,11 +383,6 @@ class Account:
         start_day = start_datetime.toordinal()
         end_day = end_datetime.toordinal()
 
-        if end_datetime.time() == _datetime.time():
-            # this ends on midnight of the first day - do not
-            # include this last day as nothing will match
-            end_day -= 1
-
         from Acquire.ObjectStore import string_to_datetime \
             as _string_to_datetime
         from Acquire.ObjectStore import date_to_string as _date_to_string
@@ -354,11 +416,11 @@ class Account:
 
             return transactions
 
-        # elif num_days < 300:  Try a better algorithm for weeks and months
-
         else:
             # likely more than years - easier to just scan all transactions
-            # on the account
+            # on the account. Balances over long ranges are summed from
+            # the daily and monthly rollups by '_get_total_between', so
+            # this is only needed to list the transactions themselves
             prefix = self._transactions_key()
 
             try:
@@ -377,6 +439,215 @@ class Account:
 
             return transactions
 
+    def _is_closed(self, end_datetime):
+        """Return whether or not the period that ended at 'end_datetime'
+           is closed, i.e. no more transactions can be recorded in it
+        """
+        import datetime as _datetime
+        delay = _datetime.timedelta(seconds=_rollup_delay_seconds)
+        return end_datetime + delay <= self._get_now()
+
+    def _get_daily_total(self, day, bucket=None):
+        """Return the total of the transactions on the passed day,
+           as a Balance. This matches the semantics of
+           '_get_total_between', i.e. the day runs from midnight at the
+           start of the day (exclusive) to midnight at the end of the
+           day (inclusive). This is saved as a daily rollup once the
+           day is closed, so that it is only ever summed once
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.Accounting import Balance as _Balance
+        import datetime as _datetime
+
+        bucket = self._get_account_bucket(bucket)
+        key = _get_key_from_day(start=self._daily_key(), datetime=day)
+
+        try:
+            data = _ObjectStore.get_object_from_json(bucket=bucket, key=key)
+        except:
+            data = None
+
+        if data is not None:
+            return _Balance.from_data(data)
+
+        # all of the transactions on this day share the same prefix,
+        # so can be summed directly from their keys. Transactions at
+        # exactly midnight belong to the day before, so are moved
+        # from the start of this day to the end
+        # (errors listing the keys are raised, so that a rollup is
+        # never saved from a failed listing)
+        from Acquire.ObjectStore import date_to_string as _date_to_string
+        prefix = "%s/%s" % (self._transactions_key(), _date_to_string(day))
+        end = day + _datetime.timedelta(days=1)
+
+        start_midnight = self._get_midnight_prefix(day)
+
+        keys = [key for key in _ObjectStore.get_all_object_names(
+                                                bucket=bucket, prefix=prefix)
+                if not key.startswith(start_midnight)]
+
+        keys += _ObjectStore.get_all_object_names(
+                                    bucket=bucket,
+                                    prefix=self._get_midnight_prefix(end))
+
+        total = _sum_transactions(keys)
+
+        if self._is_closed(end):
+            _ObjectStore.set_object_from_json(bucket=bucket, key=key,
+                                              data=total.to_data())
+
+        return total
+
+    def _get_midnight_prefix(self, day):
+        """Return the prefix of the keys of the transactions that are
+           at exactly midnight at the start of the passed day
+        """
+        from Acquire.ObjectStore import datetime_to_string \
+            as _datetime_to_string
+
+        return "%s/%s/" % (self._transactions_key(),
+                           _datetime_to_string(_get_start_of_day(day)))
+
+    def _get_monthly_total(self, month, bucket=None):
+        """Return the total of the transactions in the month that
+           starts at 'month', as a Balance. This is summed from the
+           daily rollups, and is saved as a monthly rollup once the
+           month is closed
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.Accounting import Balance as _Balance
+        import datetime as _datetime
+
+        bucket = self._get_account_bucket(bucket)
+        key = _get_key_from_month(start=self._monthly_key(), datetime=month)
+
+        try:
+            data = _ObjectStore.get_object_from_json(bucket=bucket, key=key)
+        except:
+            data = None
+
+        if data is not None:
+            return _Balance.from_data(data)
+
+        end = _get_next_month(month)
+        totals = []
+        day = month
+
+        while day < end:
+            totals.append(self._get_daily_total(day=day, bucket=bucket))
+            day += _datetime.timedelta(days=1)
+
+        total = _Balance.total(totals)
+
+        if self._is_closed(end):
+            _ObjectStore.set_object_from_json(bucket=bucket, key=key,
+                                              data=total.to_data())
+
+        return total
+
+    def _get_first_transaction_datetime(self, bucket=None):
+        """Return the datetime of the first transaction in this account,
+           or None if there have been no transactions. The keys are
+           listed in time order, so only the first key is read
+        """
+        if self._first_transaction is not None:
+            return self._first_transaction
+
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.Accounting import TransactionInfo as _TransactionInfo
+
+        bucket = self._get_account_bucket(bucket)
+
+        for key in _ObjectStore.iter_object_names(
+                                    bucket=bucket,
+                                    prefix="%s/" % self._transactions_key()):
+            self._first_transaction = _TransactionInfo.from_key(
+                                                        key).datetime()
+            break
+
+        return self._first_transaction
+
+    def _get_total_between(self, start_datetime, end_datetime, bucket=None):
+        """Return the total of all of the transactions in this account
+           between 'start_datetime' and 'end_datetime' (i.e.
+           start_datetime < transaction <= end_datetime), as a Balance.
+           Whole months and days in the range are summed using their
+           rollups, so only the transactions in the partial days at
+           either end of the range are listed
+        """
+        from Acquire.ObjectStore import datetime_to_datetime \
+            as _datetime_to_datetime
+        from Acquire.Accounting import Balance as _Balance
+        import datetime as _datetime
+
+        start_datetime = _datetime_to_datetime(start_datetime)
+        end_datetime = _datetime_to_datetime(end_datetime)
+
+        if end_datetime <= start_datetime:
+            return _Balance()
+
+        bucket = self._get_account_bucket(bucket)
+
+        one_day = _datetime.timedelta(days=1)
+
+        # there is nothing to sum before the first transaction. The day
+        # that contains it starts at the midnight before it, i.e. the
+        # day before if the first transaction is exactly at midnight
+        first_transaction = self._get_first_transaction_datetime(bucket)
+
+        if first_transaction is None or first_transaction > end_datetime:
+            return _Balance()
+        elif first_transaction > start_datetime:
+            first_day = _get_start_of_day(first_transaction)
+
+            if first_day == first_transaction:
+                first_day -= one_day
+
+            start_datetime = max(start_datetime, first_day)
+
+        first_day = _get_start_of_day(start_datetime)
+
+        if first_day < start_datetime:
+            first_day += one_day
+
+        last_day = _get_start_of_day(end_datetime)
+
+        if first_day >= last_day:
+            # there are no whole days in this range
+            return _sum_transactions(self._get_transactions_between(
+                                            start_datetime=start_datetime,
+                                            end_datetime=end_datetime,
+                                            bucket=bucket))
+
+        totals = []
+
+        if start_datetime < first_day:
+            totals.append(_sum_transactions(self._get_transactions_between(
+                                            start_datetime=start_datetime,
+                                            end_datetime=first_day,
+                                            bucket=bucket)))
+
+        day = first_day
+
+        while day < last_day:
+            next_month = _get_next_month(day)
+
+            if day.day == 1 and next_month <= last_day:
+                totals.append(self._get_monthly_total(month=day,
+                                                      bucket=bucket))
+                day = next_month
+            else:
+                totals.append(self._get_daily_total(day=day, bucket=bucket))
+                day += one_day
+
+        if last_day < end_datetime:
+            totals.append(_sum_transactions(self._get_transactions_between(
+                                            start_datetime=last_day,
+                                            end_datetime=end_datetime,
+                                            bucket=bucket)))
+
+        return _Balance.total(totals)
+
     def _get_balance_key(self, now=None):
         """Return the balance key for the passed time. This is the key
            into the object store of the object that holds the starting
@@ -451,23 +722,31 @@ class Account:
                 keys.sort()
                 return keys[-1]
 
-        # wow - no balance keys at all over the last 6 months. Look for
-        # *any* balance keys
+        # wow - no balance keys at all over the last 6 months. Walk back
+        # through the years and months that have any balance keys, so
+        # that only the keys of a single month have to be listed
         try:
-            keys = _ObjectStore.get_all_object_names(bucket=bucket,
-                                                     prefix=prefix)
+            years = _ObjectStore.list_prefixes(bucket=bucket,
+                                               prefix="%s/" % start,
+                                               delimiter="-")
         except:
-            keys = []
+            years = []
 
-        if len(keys) > 0:
-            keys.sort()
-            # can only return the latest key before 'now'
-            for i in range(len(keys)-1, 0, -1):
-                key = keys[i]
-                hourly_time = _get_hour_from_key(key)
+        for year in reversed(years):
+            months = _ObjectStore.list_prefixes(bucket=bucket, prefix=year,
+                                                delimiter="-")
 
-                if hourly_time < now:
-                    return key
+            for month in reversed(months):
+                keys = _ObjectStore.get_all_object_names(bucket=bucket,
+                                                         prefix=month)
+                keys.sort()
+
+                # can only return the latest key before 'now'
+                for key in reversed(keys):
+                    hourly_time = _get_hour_from_key(key)
+
+                    if hourly_time < now:
+                        return key
 
         # no balance keys at all! Set a balance key for the beginning of time
         from Acquire.ObjectStore import datetime_to_datetime \
@@ -523,11 +802,10 @@ class Account:
             last_balance = _Balance.from_data(data)
             last_balance_time = _get_hour_from_key(last_balance_key)
 
-            transactions = self._get_transactions_between(
+            total = self._get_total_between(
                                         start_datetime=last_balance_time,
-                                        end_datetime=hourly_now_time)
-
-            total = _sum_transactions(transactions)
+                                        end_datetime=hourly_now_time,
+                                        bucket=bucket)
 
             hourly_balance = last_balance + total
 
@@ -542,6 +820,324 @@ class Account:
 
         return hourly_balance
 
+    def _record_transaction(self, bucket, item_key, line_item):
+        """Record the passed line item at 'item_key' in the
+           transaction log of this account, and then apply the
+           transaction to the running balance of the account. The
+           transaction is added to the list of pending transactions
+           in the running balance before it is logged, and is removed
+           from this list when it is applied, so that a transaction
+           that was logged but not applied (e.g. because of a crash)
+           is replayed by '_replay_pending'
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        self._add_pending(item_key=item_key, bucket=bucket)
+
+        _ObjectStore.set_object_from_json(bucket=bucket, key=item_key,
+                                          data=line_item.to_data())
+
+        self._apply_to_running_balance(item_key=item_key, bucket=bucket)
+
+    def _update_running_balance(self, update, bucket):
+        """Internal function that atomically updates the running balance
+           record of this account. The function 'update' is passed the
+           current record and returns the new record (or None if there
+           is nothing to update). The update is re-applied if the record
+           is changed by someone else. This returns False if there is
+           no running balance record, else True
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import ObjectStoreError as _ObjectStoreError
+        from Acquire.ObjectStore import encode_document as _encode_document
+        from Acquire.ObjectStore import decode_document as _decode_document
+
+        key = self._running_balance_key()
+
+        for _ in range(0, _max_balance_retries):
+            try:
+                (data, etag) = _ObjectStore.get_object_with_etag(bucket, key)
+            except _ObjectStoreError:
+                return False
+
+            data = update(_decode_document(data))
+
+            if data is None:
+                return True
+
+            if _ObjectStore.set_object_if_match(
+                    bucket, key, _encode_document(data), etag) is not None:
+                return True
+
+        from Acquire.Accounting import AccountError
+        raise AccountError(
+            "Unable to update the running balance of account %s as it is "
+            "being changed too frequently. Repair it using "
+            "'repair_balance'" % str(self))
+
+    def _add_pending(self, item_key, bucket=None):
+        """Atomically add the transaction at 'item_key' to the list of
+           pending transactions in the running balance of this account.
+           This must be called before the transaction is logged. The
+           running balance is built from the transaction log if it
+           does not exist
+        """
+        bucket = self._get_account_bucket(bucket)
+
+        def _add(data):
+            data = dict(data)
+            data["pending"] = data.get("pending", []) + [item_key]
+            return data
+
+        if not self._update_running_balance(_add, bucket):
+            self._rebuild_running_balance(bucket=bucket)
+
+            if not self._update_running_balance(_add, bucket):
+                from Acquire.Accounting import AccountError
+                raise AccountError(
+                    "Unable to record a transaction in account %s as its "
+                    "running balance cannot be found" % str(self))
+
+    def _apply_to_running_balance(self, item_key, bucket=None,
+                                  is_logged=True):
+        """Atomically apply the pending transaction at 'item_key' to the
+           running balance of this account, incrementing its version,
+           and remove it from the list of pending transactions. Only
+           pending transactions are applied, so applying the same
+           transaction again (or one that was included when the running
+           balance was rebuilt) does nothing. If 'is_logged' is False
+           then the transaction was never logged, so is removed from
+           the list of pending transactions without being applied
+        """
+        from Acquire.Accounting import Balance as _Balance
+        from Acquire.Accounting import TransactionInfo as _TransactionInfo
+
+        bucket = self._get_account_bucket(bucket)
+        info = _TransactionInfo.from_key(item_key)
+
+        def _apply(data):
+            pending = data.get("pending", [])
+
+            if item_key not in pending:
+                # this transaction is already included
+                return None
+
+            pending = [k for k in pending if k != item_key]
+
+            if not is_logged:
+                return {"balance": data["balance"],
+                        "version": data["version"],
+                        "pending": pending}
+
+            balance = _Balance.from_data(data["balance"]) + info
+
+            return {"balance": balance.to_data(),
+                    "version": data["version"] + 1,
+                    "pending": pending}
+
+        self._update_running_balance(_apply, bucket)
+
+    def _replay_pending(self, bucket, pending):
+        """Replay the passed pending transactions in this account whose
+           recording did not complete (e.g. because of a crash), so
+           that the running balance is brought back in step with the
+           transaction log. Only transactions older than
+           '_pending_replay_seconds' are replayed, so transactions
+           that are still being recorded are left alone. This returns
+           whether or not any transactions were replayed
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import ObjectStoreError as _ObjectStoreError
+        from Acquire.Accounting import TransactionInfo as _TransactionInfo
+        import datetime as _datetime
+
+        delay = _datetime.timedelta(seconds=_pending_replay_seconds)
+        now = self._get_now()
+        replayed = False
+
+        for item_key in pending:
+            if _TransactionInfo.from_key(item_key).datetime() + delay > now:
+                continue
+
+            try:
+                _ObjectStore.get_object(bucket, item_key)
+                is_logged = True
+            except _ObjectStoreError:
+                is_logged = False
+
+            self._apply_to_running_balance(item_key=item_key, bucket=bucket,
+                                           is_logged=is_logged)
+            replayed = True
+
+        return replayed
+
+    def _get_ledger_keys(self, bucket):
+        """Return the keys of every transaction in the transaction
+           log of this account. Errors listing the log are raised,
+           so that a balance is never calculated from a partial log
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        return _ObjectStore.get_all_object_names(
+                                    bucket=bucket,
+                                    prefix="%s/" % self._transactions_key())
+
+    def _get_ledger_balance(self, bucket=None):
+        """Return the balance of this account summed from every
+           transaction in its transaction log, together with the
+           number of transactions
+        """
+        bucket = self._get_account_bucket(bucket)
+        keys = self._get_ledger_keys(bucket)
+
+        return (_sum_transactions(keys), len(keys))
+
+    def _rebuild_running_balance(self, bucket=None, force=False):
+        """Build the running balance of this account from its
+           transaction log, returning the running balance. Unless
+           'force' is True, an existing running balance is not replaced.
+           Pending transactions that are already in the log are
+           included in the rebuilt balance, so are no longer pending,
+           while those that have not yet been logged remain pending
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import ObjectStoreError as _ObjectStoreError
+        from Acquire.ObjectStore import encode_document as _encode_document
+        from Acquire.ObjectStore import decode_document as _decode_document
+        from Acquire.Accounting import Balance as _Balance
+
+        bucket = self._get_account_bucket(bucket)
+        key = self._running_balance_key()
+
+        for _ in range(0, _max_balance_retries):
+            try:
+                (current, etag) = _ObjectStore.get_object_with_etag(bucket,
+                                                                    key)
+                current = _decode_document(current)
+            except _ObjectStoreError:
+                current = None
+
+            if current is not None and not force:
+                return _Balance.from_data(current["balance"])
+
+            keys = self._get_ledger_keys(bucket)
+            balance = _sum_transactions(keys)
+
+            if current is None:
+                pending = []
+            else:
+                logged = set(keys)
+                pending = [k for k in current.get("pending", [])
+                           if k not in logged]
+
+            data = _encode_document({"balance": balance.to_data(),
+                                     "version": len(keys),
+                                     "pending": pending})
+
+            if current is None:
+                new_etag = _ObjectStore.set_object_if_absent(bucket, key,
+                                                             data)
+            else:
+                new_etag = _ObjectStore.set_object_if_match(bucket, key,
+                                                            data, etag)
+
+            if new_etag is not None:
+                return balance
+
+        from Acquire.Accounting import AccountError
+        raise AccountError(
+            "Unable to rebuild the running balance of account %s as it is "
+            "being changed too frequently" % str(self))
+
+    def _get_running_balance(self, bucket=None):
+        """Return the running balance of this account. This is normally
+           a single read of the materialised balance, which is built
+           from the transaction log if it does not exist. If the
+           balance lists pending transactions that are old enough
+           that their recording must have failed, then these are
+           replayed and the balance is read again
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import ObjectStoreError as _ObjectStoreError
+        from Acquire.Accounting import Balance as _Balance
+
+        bucket = self._get_account_bucket(bucket)
+        key = self._running_balance_key()
+
+        try:
+            data = _ObjectStore.get_object_from_json(bucket=bucket, key=key)
+        except _ObjectStoreError:
+            data = None
+
+        if data is None:
+            self._rebuild_running_balance(bucket=bucket)
+            data = _ObjectStore.get_object_from_json(bucket=bucket, key=key)
+
+        if self._replay_pending(bucket, data.get("pending", [])):
+            data = _ObjectStore.get_object_from_json(bucket=bucket, key=key)
+
+        return _Balance.from_data(data["balance"])
+
+    def reconcile_balance(self, bucket=None):
+        """Reconcile the running balance of this account against the
+           balance summed from every transaction in its transaction log.
+           This returns a dictionary containing the running balance and
+           its version, the ledger balance and number of transactions,
+           and whether or not these are consistent. Note that
+           transactions that are in progress can make a consistent
+           running balance appear inconsistent
+
+            Args:
+                bucket (dict, default=None): Bucket to load data from
+
+            Returns:
+                dict: Result of the reconciliation
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.Accounting import Balance as _Balance
+
+        bucket = self._get_account_bucket(bucket)
+
+        try:
+            data = _ObjectStore.get_object_from_json(
+                                    bucket=bucket,
+                                    key=self._running_balance_key())
+        except:
+            data = None
+
+        (ledger_balance, ntransactions) = self._get_ledger_balance(bucket)
+
+        if data is None:
+            running_balance = None
+            version = None
+        else:
+            running_balance = _Balance.from_data(data["balance"])
+            version = data["version"]
+
+        return {"running_balance": running_balance,
+                "version": version,
+                "ledger_balance": ledger_balance,
+                "ntransactions": ntransactions,
+                "is_consistent": (running_balance == ledger_balance and
+                                  version == ntransactions)}
+
+    def repair_balance(self, bucket=None):
+        """Repair the running balance of this account by rebuilding
+           it from the transaction log. This should be run if
+           'reconcile_balance' shows that the running balance is
+           inconsistent. This returns the repaired balance
+
+            Args:
+                bucket (dict, default=None): Bucket to load data from
+
+            Returns:
+                Balance: Repaired balance of the account
+        """
+        if self.is_null():
+            return None
+
+        return self._rebuild_running_balance(bucket=bucket, force=True)
+
     def balance(self, now=None, bucket=None):
         """Get the balance of the account at 'now' (defaults to actually now).
            This returns a Balance object for the balance, that includes
@@ -555,6 +1151,11 @@ class Account:
            where 'spent_today' is how much has been spent today (from midnight
            until now)
 
+           If 'now' is not passed then this is read from the running
+           balance of the account, which is updated by every transaction.
+           Otherwise the balance is calculated from the hourly balances
+           and the transactions since
+
            Args:
                 bucket (dict, default=None): Bucket to use for calculations
 
@@ -562,6 +1163,9 @@ class Account:
                 tuple (Decimal, Decimal, Decimal, Decimal): balance, liability,
                 receivable, spent_today
         """
+        if now is None:
+            return self._get_running_balance(bucket=bucket)
+
         now = self._get_now(now)
         bucket = self._get_account_bucket(bucket)
 
@@ -592,20 +1196,211 @@ class Account:
             last_update_time = _get_hourly_datetime(now)
             last_update_balance = hourly_balance
 
-        # next, get the transactions that have taken place since the last
-        # update and sum them to get the current balance
-        transactions = self._get_transactions_between(
+        # next, sum the transactions that have taken place since the last
+        # update to get the current balance
+        total = last_update_balance + self._get_total_between(
                                  start_datetime=last_update_time,
                                  end_datetime=now, bucket=bucket)
 
-        total = last_update_balance + _sum_transactions(transactions)
-
         self._last_update[hourly_key] = {"hourly_balance": hourly_balance,
                                          "last_update_time": now,
                                          "last_update_balance": total}
 
         return total
 
+    def iter_statement(self, start_datetime=None, end_datetime=None,
+                       page_token=None, page_size=None,
+                       include_line_items=False, max_workers=None,
+                       bucket=None):
+        """Iterate over the statement of the transactions in this account
+           between 'start_datetime' and 'end_datetime' (i.e.
+           start_datetime < transaction <= end_datetime, with no limit
+           if either is None), in time order. The transaction log is
+           listed lazily, so this yields the statement one page at a
+           time, as a tuple of the list of (TransactionInfo, LineItem)
+           pairs in the page and the token of the next page. The
+           LineItem is None unless 'include_line_items' is True, in
+           which case the line items of each page are loaded using at
+           most 'max_workers' simultaneous requests. The next page token
+           is None for the last page. Otherwise, passing it as
+           'page_token' (with the same start and end) resumes the
+           statement after this page
+
+           Args:
+                start_datetime (datetime, default=None): Start of statement
+                end_datetime (datetime, default=None): End of statement
+                page_token (str, default=None): Token of the page to start
+                from, as returned for a previous page
+                page_size (int, default=None): Number of transactions
+                in each page
+                include_line_items (bool, default=False): Whether or not
+                to load the line items of the transactions
+                max_workers (int, default=None): Maximum number of line
+                items to load simultaneously
+                bucket (dict, default=None): Bucket to read from
+           Returns:
+                generator: Yields (list, str) for each page
+        """
+        if self.is_null():
+            return
+
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import datetime_to_datetime \
+            as _datetime_to_datetime
+        from Acquire.ObjectStore import datetime_to_string \
+            as _datetime_to_string
+        from Acquire.Accounting import TransactionInfo as _TransactionInfo
+
+        if page_size is None:
+            page_size = _default_statement_page_size
+        else:
+            page_size = int(page_size)
+
+            if page_size < 1:
+                raise ValueError("The page size must be at least 1")
+
+        if start_datetime is not None:
+            start_datetime = _datetime_to_datetime(start_datetime)
+
+        if end_datetime is not None:
+            end_datetime = _datetime_to_datetime(end_datetime)
+
+        bucket = self._get_account_bucket(bucket)
+        prefix = "%s/" % self._transactions_key()
+
+        if page_token is not None:
+            start_after = "%s%s" % (prefix, page_token)
+        elif start_datetime is not None:
+            # transaction keys start with their datetime. Datetimes
+            # without microseconds sort after those with microseconds,
+            # so start from the beginning of the second
+            start_after = "%s%s" % (prefix, _datetime_to_string(
+                                    start_datetime.replace(microsecond=0)))
+        else:
+            start_after = None
+
+        def _load_page(keys):
+            transactions = [_TransactionInfo.from_key(key) for key in keys]
+
+            if not include_line_items:
+                return [(transaction, None) for transaction in transactions]
+
+            from Acquire.Accounting import LineItem as _LineItem
+
+            (objects, errors) = _ObjectStore.get_objects_from_json(
+                                    bucket=bucket, keys=keys,
+                                    max_workers=max_workers)
+
+            for key in keys:
+                if key in errors:
+                    raise errors[key]
+
+            return [(transaction, _LineItem.from_data(objects[key]))
+                    for (transaction, key) in zip(transactions, keys)]
+
+        keys = []
+        last_key = None
+
+        for key in _ObjectStore.iter_object_names(bucket=bucket,
+                                                  prefix=prefix,
+                                                  start_after=start_after,
+                                                  page_size=page_size):
+            datetime = _TransactionInfo.from_key(key).datetime()
+
+            if end_datetime is not None and \
+                    datetime.replace(microsecond=0) > end_datetime:
+                # the keys are only sorted by the second of their datetime
+                break
+
+            if start_datetime is not None and datetime <= start_datetime:
+                last_key = key
+                continue
+
+            if end_datetime is not None and datetime > end_datetime:
+                last_key = key
+                continue
+
+            if len(keys) == page_size:
+                # there is another transaction, so this page is complete
+                yield (_load_page(keys), last_key[len(prefix):])
+                keys = []
+
+            keys.append(key)
+            last_key = key
+
+        yield (_load_page(keys), None)
+
+    def write_statement(self, FILE, start_datetime=None, end_datetime=None,
+                        format="csv", include_line_items=False,
+                        max_workers=None, bucket=None):
+        """Write the statement of the transactions in this account between
+           'start_datetime' and 'end_datetime' to the passed open binary
+           file, in either "csv" or "jsonl" (JSON Lines) format. The
+           statement is written one page at a time, so even very large
+           statements are written in constant memory. This returns the
+           number of transactions written
+
+           Args:
+                FILE (file): Open binary file to write to
+                start_datetime (datetime, default=None): Start of statement
+                end_datetime (datetime, default=None): End of statement
+                format (str, default="csv"): Format, "csv" or "jsonl"
+                include_line_items (bool, default=False): Whether or not
+                to include the details of the line items
+                max_workers (int, default=None): Maximum number of line
+                items to load simultaneously
+                bucket (dict, default=None): Bucket to read from
+           Returns:
+                int: Number of transactions written
+        """
+        import io as _io
+
+        if format not in ["csv", "jsonl"]:
+            raise ValueError("Cannot write a statement in format '%s'. "
+                             "Supported formats are 'csv' and 'jsonl'"
+                             % format)
+
+        columns = list(_statement_columns)
+
+        if include_line_items:
+            columns += _line_item_columns
+
+        # the TextIOWrapper is detached at the end, so that FILE
+        # is not closed
+        text = _io.TextIOWrapper(FILE, encoding="utf-8", newline="")
+
+        if format == "csv":
+            import csv as _csv
+            writer = _csv.DictWriter(text, fieldnames=columns)
+            writer.writeheader()
+
+            def _write(entry):
+                writer.writerow(entry)
+        else:
+            import json as _json
+
+            def _write(entry):
+                text.write(_json.dumps(entry))
+                text.write("\n")
+
+        ntransactions = 0
+
+        for (entries, _) in self.iter_statement(
+                                start_datetime=start_datetime,
+                                end_datetime=end_datetime,
+                                include_line_items=include_line_items,
+                                max_workers=max_workers,
+                                bucket=bucket):
+            for (transaction, line_item) in entries:
+                _write(_statement_entry(transaction, line_item))
+
+            ntransactions += len(entries)
+
+        text.flush()
+        text.detach()
+
+        return ntransactions
+
     def name(self):
         """Return the name of this account
 
@@ -775,7 +1570,6 @@ class Account:
         # and a random string
         from Acquire.ObjectStore import datetime_to_string \
             as _datetime_to_string
-        from Acquire.ObjectStore import ObjectStore as _ObjectStore
         from Acquire.Accounting import LineItem as _LineItem
         from Acquire.ObjectStore import create_uuid as _create_uuid
 
@@ -786,7 +1580,8 @@ class Account:
         l = _LineItem(debit_note.uid(), refund.authorisation())
 
         bucket = self._get_account_bucket()
-        _ObjectStore.set_object_from_json(bucket, item_key, l.to_data())
+        self._record_transaction(bucket=bucket, item_key=item_key,
+                                 line_item=l)
 
         return (uid, now)
 
@@ -829,7 +1624,6 @@ class Account:
             # up from the date and  of the debit and a random string
             from Acquire.ObjectStore import datetime_to_string \
                 as _datetime_to_string
-            from Acquire.ObjectStore import ObjectStore as _ObjectStore
             from Acquire.Accounting import LineItem as _LineItem
             from Acquire.ObjectStore import create_uuid as _create_uuid
 
@@ -846,7 +1640,8 @@ class Account:
                 # we have not moved into the next hour
                 break
 
-        _ObjectStore.set_object_from_json(bucket, item_key, l.to_data())
+        self._record_transaction(bucket=bucket, item_key=item_key,
+                                 line_item=l)
 
         return (uid, now)
 
@@ -901,7 +1696,6 @@ class Account:
             # up from the isoformat datetime of the credit and a random string
             from Acquire.ObjectStore import datetime_to_string \
                 as _datetime_to_string
-            from Acquire.ObjectStore import ObjectStore as _ObjectStore
             from Acquire.Accounting import LineItem as _LineItem
             from Acquire.ObjectStore import create_uuid as _create_uuid
 
@@ -918,7 +1712,8 @@ class Account:
                 # we have not moved into another hour
                 break
 
-        _ObjectStore.set_object_from_json(bucket, item_key, l.to_data())
+        self._record_transaction(bucket=bucket, item_key=item_key,
+                                 line_item=l)
 
         return (uid, now)
 
@@ -962,7 +1757,6 @@ class Account:
             # up from the isoformat datetime of the debit and a random string
             from Acquire.ObjectStore import datetime_to_string \
                 as _datetime_to_string
-            from Acquire.ObjectStore import ObjectStore as _ObjectStore
             from Acquire.Accounting import LineItem as _LineItem
             from Acquire.ObjectStore import create_uuid as _create_uuid
 
@@ -979,7 +1773,8 @@ class Account:
                 # we are safely in the same hour
                 break
 
-        _ObjectStore.set_object_from_json(bucket, item_key, l.to_data())
+        self._record_transaction(bucket=bucket, item_key=item_key,
+                                 line_item=l)
 
         return (uid, now)
 
@@ -1030,7 +1825,6 @@ class Account:
             # up from the isoformat datetime of the credit and a random string
             from Acquire.ObjectStore import datetime_to_string \
                 as _datetime_to_string
-            from Acquire.ObjectStore import ObjectStore as _ObjectStore
             from Acquire.Accounting import LineItem as _LineItem
             from Acquire.ObjectStore import create_uuid as _create_uuid
 
@@ -1051,7 +1845,8 @@ class Account:
         # original transaction in the transaction record
         l = _LineItem(debit_note.uid(), debit_note.authorisation())
 
-        _ObjectStore.set_object_from_json(bucket, item_key, l.to_data())
+        self._record_transaction(bucket=bucket, item_key=item_key,
+                                 line_item=l)
 
         return (uid, now)
 
@@ -1131,7 +1926,6 @@ class Account:
             as _datetime_to_datetime
         from Acquire.ObjectStore import get_datetime_future \
             as _get_datetime_future
-        from Acquire.ObjectStore import ObjectStore as _ObjectStore
         from Acquire.Accounting import LineItem as _LineItem
 
         from Acquire.Accounting import TransactionInfo as _TransactionInfo
@@ -1193,8 +1987,8 @@ class Account:
                 # record the transaction
                 break
 
-        _ObjectStore.set_object_from_json(bucket=bucket, key=item_key,
-                                          data=line_item.to_data())
+        self._record_transaction(bucket=bucket, item_key=item_key,
+                                 line_item=line_item)
 
         balance = self.balance(bucket=bucket)
 
@@ -1213,8 +2007,8 @@ class Account:
             item_key = "%s/%s" % (self._transactions_key(),
                                   info.to_key())
 
-            _ObjectStore.set_object_from_json(bucket=bucket, key=item_key,
-                                              data=line_item.to_data())
+            self._record_transaction(bucket=bucket, item_key=item_key,
+                                     line_item=line_item)
 
             raise InsufficientFundsError(
                 "You cannot debit '%s' from account %s as there "
@@ -1312,6 +2106,33 @@ class Account:
         else:
             return "%s/balance" % self._key()
 
+    def _daily_key(self):
+        """Return the root key for the daily balance rollups for this
+           account in the object store
+        """
+        if self.is_null():
+            return None
+        else:
+            return "%s/daily" % self._key()
+
+    def _monthly_key(self):
+        """Return the root key for the monthly balance rollups for this
+           account in the object store
+        """
+        if self.is_null():
+            return None
+        else:
+            return "%s/monthly" % self._key()
+
+    def _running_balance_key(self):
+        """Return the key for the running balance of this account
+           in the object store
+        """
+        if self.is_null():
+            return None
+        else:
+            return "%s/running_balance" % self._key()
+
     def _load_account(self, bucket=None):
         """Load the current state of the account from the object store"""
         if self.is_null():
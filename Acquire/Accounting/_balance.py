@@ -1,10 +1,39 @@
 
+from ._money import Money as _Money
+from ._transactioninfo import TransactionInfo as _TransactionInfo
+from ._transactioninfo import TransactionCode as _TransactionCode
+
 __all__ = ["Balance"]
 
+# Balances that are calculated internally are created without
+# calling __init__
+_new_balance = object.__new__
+
+
+def _sum_fixed_point(values):
+    """Internal function that returns the exact sum of the passed array
+       of fixed-point integers as a Python integer. NumPy arrays are
+       summed in a single vectorised operation, unless the sum could
+       overflow a 64-bit integer
+    """
+    if len(values) == 0:
+        return 0
+
+    if hasattr(values, "dtype"):
+        largest = max(abs(int(values.min())), abs(int(values.max())))
+
+        if largest * len(values) < 2**63:
+            return int(values.sum())
+
+    return sum(values)
+
 
 class Balance:
     """Very simple class that holds the balance, liability and
-       recievable values for an account at a point in time
+       recievable values for an account at a point in time. The
+       values are held internally as Money, so that balances can
+       be added together exactly using integer arithmetic, but
+       are returned as Decimals
     """
     def __init__(self, balance=None, liability=None, receivable=None,
                  _is_safe=False):
@@ -17,37 +46,51 @@ class Balance:
             self._liability = liability
             self._receivable = receivable
         else:
-            from Acquire.ObjectStore import string_to_decimal \
-                as _string_to_decimal
+            self._balance = _Money(balance)
+            self._liability = _Money(liability)
+            self._receivable = _Money(receivable)
 
-            self._balance = _string_to_decimal(balance, default=0)
-            self._liability = _string_to_decimal(liability, default=0)
-            self._receivable = _string_to_decimal(receivable, default=0)
+    @staticmethod
+    def _from_micro(balance, liability, receivable):
+        """Internal function used to construct a Balance directly
+           from the passed values in micro-units
+        """
+        b = _new_balance(Balance)
+        b._balance = _Money.from_micro(balance)
+        b._liability = _Money.from_micro(liability)
+        b._receivable = _Money.from_micro(receivable)
+        return b
 
     def balance(self):
         """Return the balance"""
-        return self._balance
+        return self._balance.to_decimal()
 
     def liability(self):
         """Return the liability"""
-        return self._liability
+        return self._liability.to_decimal()
 
     def receivable(self):
         """Return the receivable"""
-        return self._receivable
+        return self._receivable.to_decimal()
+
+    def _available(self, overdraft_limit=None):
+        """Internal function that returns the available balance
+           as Money
+        """
+        available = self._balance - self._liability
 
-    def available(self, overdraft_limit=None):
-        """Return the available balance (balance - liability)"""
         if overdraft_limit is None:
-            return self.balance() - self.liability()
+            return available
         else:
-            from Acquire.Accounting import create_decimal as _create_decimal
-            overdraft_limit = _create_decimal(overdraft_limit)
-            return self.balance() - self.liability() + overdraft_limit
+            return available + overdraft_limit
+
+    def available(self, overdraft_limit=None):
+        """Return the available balance (balance - liability)"""
+        return self._available(overdraft_limit).to_decimal()
 
     def is_overdrawn(self, overdraft_limit=None):
         """Return whether or not this balance is overdrawn"""
-        return self.available(overdraft_limit=overdraft_limit) < 0
+        return self._available(overdraft_limit).micro() < 0
 
     def __str__(self):
         return "Balance(balance=%s, liability=%s, receivable=%s)" % \
@@ -73,33 +116,34 @@ class Balance:
                            receivable=self._receivable+other._receivable,
                            _is_safe=True)
 
-        from Acquire.Accounting import TransactionInfo as _TransactionInfo
         if type(other) is _TransactionInfo:
-            balance = self._balance
-            liability = self._liability
-            receivable = self._receivable
-
-            if other.is_credit():
-                balance += other.value()
-            elif other.is_debit():
-                balance -= other.value()
-            elif other.is_liability():
-                liability += other.value()
-            elif other.is_accounts_receivable():
-                receivable += other.value()
-            elif other.is_received_receipt():
-                balance -= other.receipted_value()
-                liability -= other.original_value()
-            elif other.is_sent_receipt():
-                balance += other.receipted_value()
-                receivable -= other.original_value()
-            elif other.is_received_refund():
-                balance += other.value()
-            elif other.is_sent_refund():
-                balance -= other.value()
-
-            return Balance(balance=balance, liability=liability,
-                           receivable=receivable, _is_safe=True)
+            balance = self._balance.micro()
+            liability = self._liability.micro()
+            receivable = self._receivable.micro()
+
+            value = other._get_value().micro()
+            code = other._code
+
+            if code is _TransactionCode.CREDIT:
+                balance += value
+            elif code is _TransactionCode.DEBIT:
+                balance -= value
+            elif code is _TransactionCode.CURRENT_LIABILITY:
+                liability += value
+            elif code is _TransactionCode.ACCOUNT_RECEIVABLE:
+                receivable += value
+            elif code is _TransactionCode.RECEIVED_RECEIPT:
+                balance -= value
+                liability -= other._value.micro()
+            elif code is _TransactionCode.SENT_RECEIPT:
+                balance += value
+                receivable -= other._value.micro()
+            elif code is _TransactionCode.RECEIVED_REFUND:
+                balance += value
+            elif code is _TransactionCode.SENT_REFUND:
+                balance -= value
+
+            return Balance._from_micro(balance, liability, receivable)
 
         from Acquire.Accounting import Transaction as _Transaction
         if type(other) is _Transaction:
@@ -108,16 +152,14 @@ class Balance:
                            receivable=self._receivable,
                            _is_safe=True)
 
-        from Acquire.Accounting import create_decimal as _create_decimal
-        value = _create_decimal(other)
-        return Balance(balance=self._balance+value,
+        return Balance(balance=self._balance+other,
                        liability=self._liability,
                        receivable=self._receivable,
                        _is_safe=True)
 
     def __sub__(self, other):
-        """Add balances together"""
-        if type(other) is type(Balance):
+        """Subtract balances"""
+        if type(other) is Balance:
             return Balance(balance=self._balance-other._balance,
                            liability=self._liability-other._liability,
                            receivable=self._receivable-other._receivable,
@@ -130,9 +172,7 @@ class Balance:
                            receivable=self._receivable,
                            _is_safe=True)
 
-        from Acquire.Accounting import create_decimal as _create_decimal
-        value = _create_decimal(other)
-        return Balance(balance=self._balance+value,
+        return Balance(balance=self._balance-other,
                        liability=self._liability,
                        receivable=self._receivable,
                        _is_safe=True)
@@ -140,21 +180,69 @@ class Balance:
     @staticmethod
     def total(balances):
         """Return the sum of the passed balances"""
-        from Acquire.Accounting import create_decimal as _create_decimal
-        balance = _create_decimal(0)
-        liability = _create_decimal(0)
-        receivable = _create_decimal(0)
+        balance = 0
+        liability = 0
+        receivable = 0
 
         for b in balances:
             if type(b) is not Balance:
                 raise TypeError("You can only sum Balance objects!")
 
-            balance += b._balance
-            liability += b._liability
-            receivable += b._receivable
+            balance += b._balance.micro()
+            liability += b._liability.micro()
+            receivable += b._receivable.micro()
+
+        return Balance._from_micro(balance, liability, receivable)
+
+    @staticmethod
+    def sum_many(transactions):
+        """Return the balance that results from summing all of the
+           passed transactions, which can be TransactionInfo objects
+           or the object store keys that encode them. The transactions
+           are parsed in a single batch into fixed-point arrays, which
+           are summed per transaction code, so this is much faster than
+           adding the transactions to a Balance one at a time
+        """
+
+        keys = []
+
+        for transaction in transactions:
+            if isinstance(transaction, _TransactionInfo):
+                keys.append(transaction.to_key())
+            else:
+                keys.append(transaction)
+
+        totals = {}
+
+        for (code, (values, receipted_values)) in \
+                _TransactionInfo.parse_keys(keys).items():
+            totals[code] = _sum_fixed_point(values)
 
-        return Balance(balance=balance, liability=liability,
-                       receivable=receivable, _is_safe=True)
+            if code in (_TransactionCode.SENT_RECEIPT,
+                        _TransactionCode.RECEIVED_RECEIPT):
+                totals[(code, "receipted")] = \
+                    _sum_fixed_point(receipted_values)
+
+        def _total(code, receipted=False):
+            if receipted:
+                code = (code, "receipted")
+
+            return totals.get(code, 0)
+
+        balance = _total(_TransactionCode.CREDIT) - \
+            _total(_TransactionCode.DEBIT) + \
+            _total(_TransactionCode.RECEIVED_REFUND) - \
+            _total(_TransactionCode.SENT_REFUND) + \
+            _total(_TransactionCode.SENT_RECEIPT, receipted=True) - \
+            _total(_TransactionCode.RECEIVED_RECEIPT, receipted=True)
+
+        liability = _total(_TransactionCode.CURRENT_LIABILITY) - \
+            _total(_TransactionCode.RECEIVED_RECEIPT)
+
+        receivable = _total(_TransactionCode.ACCOUNT_RECEIVABLE) - \
+            _total(_TransactionCode.SENT_RECEIPT)
+
+        return Balance._from_micro(balance, liability, receivable)
 
     def to_data(self):
         """Return this balance as a JSON-serialisable object"""
@@ -174,12 +262,6 @@ class Balance:
         if data is None or len(data) == 0:
             return Balance()
 
-        from Acquire.ObjectStore import string_to_decimal \
-            as _string_to_decimal
-
-        balance = _string_to_decimal(data["balance"])
-        liability = _string_to_decimal(data["liability"])
-        receivable = _string_to_decimal(data["receivable"])
-
-        return Balance(balance=balance, liability=liability,
-                       receivable=receivable, _is_safe=True)
+        return Balance(balance=data["balance"],
+                       liability=data["liability"],
+                       receivable=data["receivable"])
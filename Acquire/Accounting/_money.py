@@ -0,0 +1,284 @@
+from decimal import Decimal as _Decimal
+
+__all__ = ["Money"]
+
+# Money is held exactly as an integer number of micro-units (10^-6)
+_micro_scale = 1000000
+
+# The range of values supported by 'create_decimal', i.e.
+# -1 trillion < value < 1 quadrillion
+_min_value = -1000000000000
+_max_value = 1000000000000000
+
+# Money is created without calling __init__ when the value is
+# already known in micro-units
+_new_money = object.__new__
+
+
+def _create_micro(value):
+    """Internal function that converts the passed value via
+       'create_decimal', so that the value is rounded and range-checked
+       in exactly the same way as a Decimal, and returns the
+       value in micro-units
+    """
+    from Acquire.Accounting import create_decimal as _create_decimal
+    return int(_create_decimal(value).scaleb(6))
+
+
+# The largest number of micro-units that has at most 15 significant
+# digits, and so is guaranteed to round-trip through the float used
+# by 'create_decimal' unchanged
+_max_exact_micro = 10 ** 15
+
+
+def _parse_micro(value):
+    """Internal function that parses the passed string with exactly
+       six decimal places (e.g. "000100.005000") directly into
+       micro-units, returning None if this is not possible
+    """
+    if 7 < len(value) < 18 and value[-7] == ".":
+        try:
+            return int(value[0:-7] + value[-6:])
+        except ValueError:
+            pass
+
+    return None
+
+
+def _string_to_micro(value):
+    """Internal function that converts the passed string
+       (e.g. "000100.005000") to micro-units. Strings with exactly six
+       decimal places and at most 15 significant digits round-trip
+       through 'create_decimal' unchanged, so are parsed directly.
+       Longer strings are rounded by 'create_decimal'
+    """
+    micro = _parse_micro(value)
+
+    if micro is not None and -_max_exact_micro < micro < _max_exact_micro:
+        return micro
+
+    return _create_micro(value)
+
+
+def _to_micro(value):
+    """Internal function that converts the passed value (Money, int,
+       float, str, Decimal or None) to micro-units, rounding exactly
+       as 'create_decimal' would
+    """
+    if isinstance(value, Money):
+        return value._micro
+    elif isinstance(value, int):
+        if _min_value < value < _max_value:
+            return value * _micro_scale
+    elif isinstance(value, float):
+        # this is exactly the string that 'create_decimal' would use
+        micro = _parse_micro("%.6f" % value)
+
+        if micro is not None:
+            return micro
+    elif isinstance(value, str):
+        return _string_to_micro(value)
+    elif isinstance(value, _Decimal):
+        t = value.as_tuple()
+
+        if t.exponent == -6 and len(t.digits) <= 15:
+            return int(value.scaleb(6))
+    elif value is None:
+        return 0
+
+    return _create_micro(value)
+
+
+class Money:
+    """This class holds a monetary value exactly as an integer number
+       of micro-units (10^-6). It rounds values in the same way as
+       'create_decimal', and encodes to and decodes from the same
+       string formats, but adds and compares values using integer
+       arithmetic, which is much faster than using Decimals. Money
+       can be constructed from, and compared with, ints, floats,
+       strings and Decimals
+    """
+    __slots__ = ("_micro",)
+
+    def __init__(self, value=None):
+        """Construct from the passed value, which is rounded to 6 decimal
+           places. This is zero if no value is passed
+        """
+        self._micro = _to_micro(value)
+
+    @staticmethod
+    def from_micro(micro):
+        """Return Money that holds the passed number of micro-units
+
+           Args:
+                micro (int): Value in units of 10^-6
+           Returns:
+                Money: Money holding this value
+        """
+        m = _new_money(Money)
+        m._micro = micro
+        return m
+
+    def micro(self):
+        """Return the value as an integer number of micro-units (10^-6)"""
+        return self._micro
+
+    def to_decimal(self):
+        """Return this value as a Decimal. This is identical to the
+           Decimal that would be returned by 'create_decimal'
+
+           Returns:
+                Decimal: Value as a Decimal
+        """
+        return _Decimal(self._micro).scaleb(-6)
+
+    def encode(self):
+        """Encode this value into the fixed-width string used in
+           transaction keys, i.e. the same as "%013.6f"
+           (e.g. "000100.005000")
+
+           Returns:
+                str: Encoded value
+        """
+        (whole, fraction) = divmod(abs(self._micro), _micro_scale)
+
+        if self._micro < 0:
+            return "-%05d.%06d" % (whole, fraction)
+        else:
+            return "%06d.%06d" % (whole, fraction)
+
+    @staticmethod
+    def decode(value):
+        """Return the Money that was encoded into the passed string,
+           e.g. via 'encode' or str()
+
+           Args:
+                value (str): Encoded value
+           Returns:
+                Money: Decoded value
+        """
+        m = _new_money(Money)
+        m._micro = _string_to_micro(value)
+        return m
+
+    def __str__(self):
+        (whole, fraction) = divmod(abs(self._micro), _micro_scale)
+
+        if self._micro < 0:
+            return "-%d.%06d" % (whole, fraction)
+        else:
+            return "%d.%06d" % (whole, fraction)
+
+    def __repr__(self):
+        return "Money(%s)" % self.__str__()
+
+    def __hash__(self):
+        (whole, fraction) = divmod(self._micro, _micro_scale)
+
+        if fraction == 0:
+            return hash(whole)
+        else:
+            return hash(self.to_decimal())
+
+    def __bool__(self):
+        return self._micro != 0
+
+    def __float__(self):
+        return self._micro / _micro_scale
+
+    def __neg__(self):
+        return Money.from_micro(-self._micro)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return Money.from_micro(abs(self._micro))
+
+    def __add__(self, other):
+        m = _new_money(Money)
+
+        if type(other) is Money:
+            m._micro = self._micro + other._micro
+        else:
+            m._micro = self._micro + _to_micro(other)
+
+        return m
+
+    def __radd__(self, other):
+        return Money.from_micro(_to_micro(other) + self._micro)
+
+    def __sub__(self, other):
+        m = _new_money(Money)
+
+        if type(other) is Money:
+            m._micro = self._micro - other._micro
+        else:
+            m._micro = self._micro - _to_micro(other)
+
+        return m
+
+    def __rsub__(self, other):
+        return Money.from_micro(_to_micro(other) - self._micro)
+
+    def _compare_values(self, other):
+        """Return the pair of values used to compare this Money with
+           'other'. Comparisons with Decimals and floats are exact,
+           i.e. 'other' is not rounded to 6 decimal places
+        """
+        if isinstance(other, Money):
+            return (self._micro, other._micro)
+        elif isinstance(other, int):
+            return (self._micro, other * _micro_scale)
+        elif isinstance(other, (_Decimal, float)):
+            return (self.to_decimal(), other)
+        else:
+            return None
+
+    def __eq__(self, other):
+        values = self._compare_values(other)
+
+        if values is None:
+            return NotImplemented
+
+        return values[0] == values[1]
+
+    def __ne__(self, other):
+        values = self._compare_values(other)
+
+        if values is None:
+            return NotImplemented
+
+        return values[0] != values[1]
+
+    def __lt__(self, other):
+        values = self._compare_values(other)
+
+        if values is None:
+            return NotImplemented
+
+        return values[0] < values[1]
+
+    def __le__(self, other):
+        values = self._compare_values(other)
+
+        if values is None:
+            return NotImplemented
+
+        return values[0] <= values[1]
+
+    def __gt__(self, other):
+        values = self._compare_values(other)
+
+        if values is None:
+            return NotImplemented
+
+        return values[0] > values[1]
+
+    def __ge__(self, other):
+        values = self._compare_values(other)
+
+        if values is None:
+            return NotImplemented
+
+        return values[0] >= values[1]
@@ -1,8 +1,63 @@
 
 from enum import Enum as _Enum
+import re as _re
 
 __all__ = ["TransactionInfo", "TransactionCode"]
 
+# The regular expression used to parse a batch of transaction keys. This
+# matches the isoformat_datetime/UID/transactioncode at the end of the key
+_key_regex = _re.compile(r"\d{4}-\d\d-\d\dT[\d:.]+/[^/\n]+/([A-Z]{2})"
+                         r"(-?\d+(?:\.\d*)?)(?:T(-?\d+(?:\.\d*)?))?$",
+                         _re.MULTILINE)
+
+# Transaction values are held to 6 decimal places, so can be held
+# exactly as integers in units of 10^-6
+_fixed_point_scale = 1000000
+
+
+def _to_fixed_point(value):
+    """Internal function that converts the passed encoded value
+       (e.g. "000100.005000") into a fixed-point integer in units
+       of 10^-6
+    """
+    if len(value) > 7 and value[-7] == ".":
+        # the standard encoding has exactly six decimal places
+        return int(value.replace(".", ""))
+
+    negative = value.startswith("-")
+
+    if negative:
+        value = value[1:]
+
+    (whole, _, fraction) = value.partition(".")
+    value = int(whole) * _fixed_point_scale + int((fraction + "000000")[0:6])
+
+    if negative:
+        return -value
+    else:
+        return value
+
+
+def _to_fixed_point_array(values):
+    """Internal function that converts the passed list of fixed-point
+       integers into a NumPy int64 array if NumPy is available, or
+       an array('q') otherwise. Values that are too large for 64-bit
+       integers are left as a list of Python integers
+    """
+    from array import array as _array
+
+    try:
+        values = _array("q", values)
+    except OverflowError:
+        return values
+
+    try:
+        import numpy as _numpy
+    except ImportError:
+        return values
+
+    return _numpy.frombuffer(values, dtype=_numpy.int64)
+
 
 class TransactionCode(_Enum):
     CREDIT = "CR"
@@ -27,9 +82,9 @@ class TransactionInfo:
             import copy as _copy
             self.__dict__ = _copy.copy(t.__dict__)
         else:
-            from Acquire.Accounting import create_decimal as _create_decimal
-            self._value = _create_decimal(0)
-            self._receipted_value = _create_decimal(0)
+            from Acquire.Accounting import Money as _Money
+            self._value = _Money(0)
+            self._receipted_value = _Money(0)
             self._code = None
             self._datetime = None
             self._uid = None
@@ -62,12 +117,22 @@ class TransactionInfo:
         """Encode the passed code and value into a simple string that can
            be used as part of an object store key. If 'receipted_value' is
            passed, then encode the receipted value of the provisional
-           transaction too
+           transaction too. The values can be Money or anything that
+           can be converted to Money (e.g. Decimal)
         """
+        from Acquire.Accounting import Money as _Money
+
+        if not isinstance(value, _Money):
+            value = _Money(value)
+
         if receipted_value is None:
-            return "%2s%013.6f" % (code.value, value)
+            return "%2s%s" % (code.value, value.encode())
         else:
-            return "%2s%013.6fT%013.6f" % (code.value, value, receipted_value)
+            if not isinstance(receipted_value, _Money):
+                receipted_value = _Money(receipted_value)
+
+            return "%2s%sT%s" % (code.value, value.encode(),
+                                 receipted_value.encode())
 
     def rescind(self):
         """Return a TransactionInfo that corresponds to rescinding this
@@ -78,6 +143,7 @@ class TransactionInfo:
         t = TransactionInfo()
         t._uid = self._uid[-1::-1]
         t._value = self._value
+        t._receipted_value = self._receipted_value
         t._datetime = self._datetime
 
         if self._code is TransactionCode.DEBIT:
@@ -85,8 +151,10 @@ class TransactionInfo:
         elif self._code is TransactionCode.CREDIT:
             t._code = TransactionCode.DEBIT
         elif self._code is TransactionCode.CURRENT_LIABILITY:
+            t._code = self._code
             t._value = -(self._value)
         elif self._code is TransactionCode.ACCOUNT_RECEIVABLE:
+            t._code = self._code
             t._value = -(self._value)
         else:
             raise PermissionError(
@@ -97,11 +165,21 @@ class TransactionInfo:
     def value(self):
         """Return the value of the transaction. This will be the receipted
            value if this has been set"""
+        return self._get_value().to_decimal()
+
+    def _get_value(self):
+        """Internal function that returns the value of the transaction
+           as Money. This will be the receipted value if this has been set
+        """
         if self._receipted_value is not None:
             return self._receipted_value
         else:
             return self._value
 
+    def code(self):
+        """Return the TransactionCode of this transaction"""
+        return self._code
+
     def uid(self):
         """Return the UID of this transaction"""
         return self._uid
@@ -149,7 +227,7 @@ class TransactionInfo:
         """
         from Acquire.ObjectStore import string_to_datetime \
             as _string_to_datetime
-        from Acquire.Accounting import create_decimal as _create_decimal
+        from Acquire.Accounting import Money as _Money
 
         parts = key.split("/")
 
@@ -174,8 +252,8 @@ class TransactionInfo:
                    code == TransactionCode.RECEIVED_RECEIPT:
                     values = part[2:].split("T")
                     try:
-                        value = _create_decimal(values[0])
-                        receipted_value = _create_decimal(values[1])
+                        value = _Money.decode(values[0])
+                        receipted_value = _Money.decode(values[1])
                         t._code = code
                         t._value = value
                         t._receipted_value = receipted_value
@@ -183,7 +261,7 @@ class TransactionInfo:
                     except:
                         pass
 
-                value = _create_decimal(part[2:])
+                value = _Money.decode(part[2:])
 
                 t._code = code
                 t._value = value
@@ -196,6 +274,66 @@ class TransactionInfo:
         raise ValueError("Cannot extract transaction info from '%s'"
                          % (key))
 
+    @staticmethod
+    def parse_keys(keys):
+        """Parse all of the passed object store keys in a single batch.
+           This returns a dictionary that maps each TransactionCode
+           to a tuple of the values and receipted values of the
+           transactions with that code. These are fixed-point integer
+           arrays (in units of 10^-6), which are NumPy arrays if NumPy
+           is available, so that they can be summed efficiently. The
+           receipted value is the value for transactions that have
+           not been receipted
+
+           Args:
+                keys (list): Object store keys to parse
+           Returns:
+                dict: Values and receipted values, keyed by TransactionCode
+        """
+        codes = dict((code.value, code) for code in TransactionCode)
+        parsed = {}
+
+        keys = list(keys)
+
+        # match all of the keys in a single pass of the regex
+        matches = _key_regex.findall("\n".join(keys))
+
+        if len(matches) != len(keys):
+            for key in keys:
+                if _key_regex.search(key) is None:
+                    raise ValueError(
+                        "Cannot extract transaction info from '%s'" % key)
+
+        to_fixed_point = _to_fixed_point
+
+        for (code, value, receipted_value) in matches:
+            if code not in codes:
+                raise ValueError("Cannot extract transaction info as '%s' "
+                                 "is not a valid transaction code" % code)
+
+            try:
+                (values, receipted_values) = parsed[code]
+            except KeyError:
+                values = []
+                receipted_values = []
+                parsed[code] = (values, receipted_values)
+
+            value = to_fixed_point(value)
+            values.append(value)
+
+            if len(receipted_value) == 0:
+                receipted_values.append(value)
+            else:
+                receipted_values.append(to_fixed_point(receipted_value))
+
+        result = {}
+
+        for (code, (values, receipted_values)) in parsed.items():
+            result[codes[code]] = (_to_fixed_point_array(values),
+                                   _to_fixed_point_array(receipted_values))
+
+        return result
+
     def to_key(self):
         """Return this transaction encoded to a key"""
         from Acquire.ObjectStore import datetime_to_string \
@@ -217,11 +355,14 @@ class TransactionInfo:
            Returns:
                 Decimal: Receipted value of Transaction
         """
-        return self._receipted_value
+        if self._receipted_value is None:
+            return None
+        else:
+            return self._receipted_value.to_decimal()
 
     def original_value(self):
         """Return the original (pre-receipted) value of the transaction"""
-        return self._value
+        return self._value.to_decimal()
 
     def is_credit(self):
         """Return whether or not this is a credit
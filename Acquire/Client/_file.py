@@ -202,8 +202,9 @@ class File:
             filemeta = _FileMeta.from_data(response["filemeta"])
 
             # if this was a large file, then we will receive a OSPar back
-            # which must be used to upload the file
-            if not filehandle.is_localdata():
+            # which must be used to upload the file (unless the service
+            # already holds this data)
+            if "upload_par" in response:
                 par = _OSPar.from_data(response["upload_par"])
                 par.write(privkey).set_object_from_file(filehandle.local_filename())
                 par.close(privkey)
@@ -412,27 +412,15 @@ class Authorisation:
         authkey = "auth_once/%s" % self._uid
         now = _get_datetime_now_to_string()
 
-        try:
-            data = _ObjectStore.get_string_object(bucket=bucket, key=authkey)
-        except:
-            data = None
-
-        if data is not None:
+        # Record this to the object store to prevent anyone else
+        # from using this authorisation on this service. This is an
+        # atomic set-if-absent, so only the first use can succeed
+        if not _ObjectStore.set_object_if_absent(bucket=bucket, key=authkey,
+                                                 data=now.encode("utf-8")):
             raise PermissionError(
                 "Cannot auth_once the authorisation as it has been used "
                 "before on this service!")
 
-        # This is the first time this authorisation has been seen.
-        # Record this to the object store to prevent anyone else
-        # from using this authorisation on this service. There is a
-        # small race condition here, but this would be extremely
-        # challenging to exploit, and mitigating it would be a
-        # significant performance problem. Ideally the object store
-        # would have a "test_and_set" to enable us to set only if
-        # the previous value is None
-        _ObjectStore.set_string_object(bucket=bucket, key=authkey,
-                                       string_data=now)
-
         # Now validate that the signature of the UID is correct
         public_cert = self._get_user_public_cert(scope=scope,
                                                  permissions=permissions)
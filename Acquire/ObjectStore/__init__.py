@@ -11,8 +11,14 @@ from ._objstore import *
 from ._ospar import *
 from ._osparregistry import *
 from ._encoding import *
+from ._document_codec import *
 from ._function import *
 from ._mutex import *
+from ._pool import *
+from ._objstream import *
+from ._cachingobjstore import *
+from ._instrumentedobjstore import *
+from ._asyncobjstore import *
 from ._errors import *
 
 try:
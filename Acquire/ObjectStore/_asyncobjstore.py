@@ -0,0 +1,199 @@
+import threading as _threading
+
+__all__ = ["AsyncObjectStore"]
+
+# The maximum number of threads in the executor shared by all
+# AsyncObjectStore calls to backends that are not async-capable
+_max_workers = 32
+
+_executor = None
+_executor_lock = _threading.Lock()
+
+
+def _get_executor():
+    """Internal function that returns the executor shared by all
+       AsyncObjectStore calls that run the synchronous ObjectStore
+    """
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from concurrent.futures import ThreadPoolExecutor \
+                    as _ThreadPoolExecutor
+                _executor = _ThreadPoolExecutor(
+                                max_workers=_max_workers,
+                                thread_name_prefix="AsyncObjectStore")
+
+    return _executor
+
+
+async def _call(name, *args, **kwargs):
+    """Internal function that calls the object store function 'name'.
+       If the backend is async-capable (it has a coroutine function
+       called 'async_<name>') then this is awaited directly. Otherwise
+       the synchronous ObjectStore function is run in the shared
+       executor, so that the event loop is not blocked
+    """
+    from ._objstore import _objstore_backend, ObjectStore as _ObjectStore
+
+    native = getattr(_objstore_backend, "async_%s" % name, None)
+
+    if native is not None:
+        return await native(*args, **kwargs)
+
+    import asyncio as _asyncio
+    import functools as _functools
+
+    loop = _asyncio.get_running_loop()
+
+    return await loop.run_in_executor(
+                        _get_executor(),
+                        _functools.partial(getattr(_ObjectStore, name),
+                                           *args, **kwargs))
+
+
+class AsyncObjectStore:
+    """This is the asyncio version of ObjectStore. Each function is a
+       coroutine that mirrors the function of the same name in
+       ObjectStore, so that service functions can overlap their
+       object store requests, e.g.
+
+       (objects, errors) = await AsyncObjectStore.get_many(bucket, keys)
+
+       or use asyncio.gather over several calls. Backends that are
+       async-capable are awaited directly, while the requests to
+       all other backends are run in a shared thread pool
+    """
+    @staticmethod
+    async def get_object(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket"""
+        return await _call("get_object", bucket, key)
+
+    @staticmethod
+    async def get_string_object(bucket, key):
+        """Return the string in 'bucket' associated with 'key'"""
+        data = await AsyncObjectStore.get_object(bucket, key)
+        return data.decode("utf-8")
+
+    @staticmethod
+    async def get_object_from_json(bucket, key):
+        """Return an object constructed from json stored at 'key' in
+           the passed bucket
+        """
+        from ._document_codec import decode_document as _decode_document
+        return _decode_document(await AsyncObjectStore.get_object(bucket,
+                                                                  key))
+
+    @staticmethod
+    async def get_many(bucket, keys, max_concurrency=None):
+        """Return the binary data contained in each of the passed 'keys'
+           in the passed bucket, with at most 'max_concurrency' requests
+           in flight at once. This returns a pair of dictionaries - the
+           first maps each key to its data, while the second maps each
+           key that could not be read to the exception that was raised
+        """
+        import asyncio as _asyncio
+
+        keys = list(keys)
+
+        if max_concurrency is None:
+            max_concurrency = _max_workers
+
+        semaphore = _asyncio.Semaphore(max(1, int(max_concurrency)))
+
+        async def _get(key):
+            async with semaphore:
+                return await AsyncObjectStore.get_object(bucket, key)
+
+        results = await _asyncio.gather(*[_get(key) for key in keys],
+                                        return_exceptions=True)
+
+        objects = {}
+        errors = {}
+
+        for (key, result) in zip(keys, results):
+            if isinstance(result, Exception):
+                errors[key] = result
+            else:
+                objects[key] = result
+
+        return (objects, errors)
+
+    @staticmethod
+    async def get_many_from_json(bucket, keys, max_concurrency=None):
+        """Return the json-deserialised objects contained in each of the
+           passed 'keys' in the passed bucket. This returns a pair of
+           dictionaries, as for 'get_many'
+        """
+        from ._document_codec import decode_document as _decode_document
+
+        (objects, errors) = await AsyncObjectStore.get_many(
+                                        bucket, keys, max_concurrency)
+
+        for key in list(objects.keys()):
+            try:
+                objects[key] = _decode_document(objects[key])
+            except Exception as e:
+                errors[key] = e
+                del objects[key]
+
+        return (objects, errors)
+
+    @staticmethod
+    async def get_all_object_names(bucket, prefix=None,
+                                   without_prefix=False):
+        """Returns the names of all objects in the passed bucket"""
+        return await _call("get_all_object_names", bucket=bucket,
+                           prefix=prefix, without_prefix=without_prefix)
+
+    @staticmethod
+    async def list_prefixes(bucket, prefix=None, delimiter="/"):
+        """Return the sorted list of the common prefixes of the keys in
+           the passed bucket that start with 'prefix'
+        """
+        return await _call("list_prefixes", bucket=bucket, prefix=prefix,
+                           delimiter=delimiter)
+
+    @staticmethod
+    async def set_object(bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data'"""
+        await _call("set_object", bucket, key, data)
+
+    @staticmethod
+    async def set_string_object(bucket, key, string_data):
+        """Set the value of 'key' in 'bucket' to the string 'string_data'"""
+        await AsyncObjectStore.set_object(bucket, key,
+                                          string_data.encode("utf-8"))
+
+    @staticmethod
+    async def set_object_from_json(bucket, key, data):
+        """Set the value of 'key' in 'bucket' to equal to contents
+           of 'data', which has been encoded to json (or the current
+           document codec)"""
+        from ._document_codec import encode_document as _encode_document
+        await AsyncObjectStore.set_object(bucket, key,
+                                          _encode_document(data))
+
+    @staticmethod
+    async def delete_object(bucket, key):
+        """Removes the object at 'key'"""
+        await _call("delete_object", bucket, key)
+
+    @staticmethod
+    async def delete_objects(bucket, keys, max_workers=None):
+        """Remove the objects at all of the passed 'keys'. This returns
+           the number of objects deleted and the errors, keyed by key
+        """
+        return await _call("delete_objects", bucket=bucket, keys=list(keys),
+                           max_workers=max_workers)
+
+    @staticmethod
+    async def delete_prefix(bucket, prefix, max_workers=None):
+        """Remove all objects whose keys start with 'prefix'. This
+           returns the number of objects deleted and the errors,
+           keyed by key
+        """
+        return await _call("delete_prefix", bucket=bucket, prefix=prefix,
+                           max_workers=max_workers)
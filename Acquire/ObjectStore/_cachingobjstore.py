@@ -0,0 +1,417 @@
+import threading as _threading
+import time as _time
+from collections import OrderedDict as _OrderedDict
+
+__all__ = ["CachingObjectStore"]
+
+# The default maximum number of bytes of object data held in the cache
+_default_max_bytes = 64 * 1024 * 1024
+
+
+def _compile_rule(prefix):
+    """Internal function that compiles the passed key prefix into a
+       regular expression. Any '*' in the prefix matches any run of
+       characters within a single part of the key, e.g.
+       "accounting/accounts/*/txns/" matches the transactions
+       of all accounts
+    """
+    import re as _re
+
+    parts = [_re.escape(part) for part in prefix.split("*")]
+    return _re.compile("[^/]*".join(parts))
+
+
+class CachingObjectStore:
+    """This is a read-through cache that wraps any object store backend.
+       Pass an instance of this class to 'set_object_store_backend'
+       (or use 'use_caching_object_store') to cache the data read
+       from the wrapped backend in a byte-bounded LRU cache.
+
+       Only the objects whose keys match a cached prefix are cached.
+       Objects that match one of 'immutable_prefixes' are treated as
+       write-once, so are never expired, while objects that match a
+       prefix in 'ttls' are expired after the specified number of
+       seconds (the longest matching prefix wins). All other objects
+       are cached for 'default_ttl' seconds (by default they are not
+       cached). Any write or delete through this wrapper invalidates
+       the cached data for the affected keys. Note that writes made by
+       other processes are only seen once the cached data expires.
+
+       All other backend functions are passed straight through to
+       the wrapped backend
+
+       Args:
+            backend: The object store backend to wrap
+            max_bytes (int, default=None): Maximum size of the cache
+            ttls (dict, default=None): Cache lifetime (seconds) by prefix
+            immutable_prefixes (list, default=None): Write-once prefixes
+            default_ttl (float, default=0): Lifetime of other objects
+    """
+    def __init__(self, backend, max_bytes=None, ttls=None,
+                 immutable_prefixes=None, default_ttl=0):
+        if isinstance(backend, CachingObjectStore):
+            backend = backend._backend
+
+        if max_bytes is None:
+            max_bytes = _default_max_bytes
+
+        self._backend = backend
+        self._max_bytes = int(max_bytes)
+        self._default_ttl = default_ttl
+
+        self._rules = []
+
+        if ttls is not None:
+            for (prefix, ttl) in ttls.items():
+                self._rules.append((len(prefix), _compile_rule(prefix),
+                                    float(ttl)))
+
+        if immutable_prefixes is not None:
+            for prefix in immutable_prefixes:
+                self._rules.append((len(prefix), _compile_rule(prefix),
+                                    None))
+
+        # the longest (most specific) matching prefix wins
+        self._rules.sort(key=lambda rule: rule[0], reverse=True)
+
+        self._lock = _threading.Lock()
+        self._cache = _OrderedDict()
+        self._nbytes = 0
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0,
+                       "invalidations": 0}
+
+    def __getattr__(self, name):
+        """Pass all functions that are not cached to the wrapped backend.
+           The native coroutines of the backend are hidden, so that
+           AsyncObjectStore calls go through the cache
+        """
+        if name.startswith("async_"):
+            raise AttributeError(name)
+
+        return getattr(self._backend, name)
+
+    def __eq__(self, other):
+        if isinstance(other, CachingObjectStore):
+            return self is other
+        else:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return id(self)
+
+    def backend(self):
+        """Return the backend that is wrapped by this cache"""
+        return self._backend
+
+    def get_cache_stats(self):
+        """Return a dictionary of the statistics of this cache, namely
+           the number of hits, misses, evictions and invalidations,
+           plus the number of objects and bytes held in the cache
+
+           Returns:
+                dict: Cache statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["objects"] = len(self._cache)
+            stats["bytes"] = self._nbytes
+
+        total = stats["hits"] + stats["misses"]
+
+        if total > 0:
+            stats["hit_rate"] = float(stats["hits"]) / total
+        else:
+            stats["hit_rate"] = 0.0
+
+        return stats
+
+    def clear_cache(self):
+        """Remove all objects from the cache (the statistics are kept)"""
+        with self._lock:
+            self._cache.clear()
+            self._nbytes = 0
+            self._generation += 1
+
+    def _bucket_id(self, bucket):
+        """Internal function used to return a hashable identifier
+           for the passed bucket
+        """
+        if isinstance(bucket, str):
+            return bucket
+        else:
+            return self._backend.get_bucket_name(bucket)
+
+    def _get_ttl(self, key):
+        """Internal function that returns the lifetime (in seconds) of
+           cached data for 'key'. This returns None if the data never
+           expires, or 0 if the data should not be cached
+        """
+        for (_, rule, ttl) in self._rules:
+            if rule.match(key):
+                return ttl
+
+        return self._default_ttl
+
+    def _is_cacheable(self, key):
+        """Internal function that returns whether or not the data
+           for 'key' can be cached
+        """
+        ttl = self._get_ttl(key)
+        return ttl is None or ttl > 0
+
+    def _lookup(self, cache_key):
+        """Internal function that returns the cached data for 'cache_key',
+           or None if this is not in the cache (or has expired).
+           This must be called while holding self._lock
+        """
+        try:
+            (data, expires) = self._cache[cache_key]
+        except KeyError:
+            self._stats["misses"] += 1
+            return None
+
+        if expires is not None and expires < _time.monotonic():
+            self._remove(cache_key)
+            self._stats["misses"] += 1
+            return None
+
+        self._cache.move_to_end(cache_key)
+        self._stats["hits"] += 1
+        return data
+
+    def _remove(self, cache_key):
+        """Internal function that removes 'cache_key' from the cache.
+           This must be called while holding self._lock
+        """
+        try:
+            (data, _) = self._cache.pop(cache_key)
+            self._nbytes -= len(data)
+        except KeyError:
+            pass
+
+    def _store(self, cache_key, key, data, generation):
+        """Internal function used to add the data for 'key' that was
+           read from the wrapped backend to the cache. The data is not
+           added if the cache was invalidated since the read started
+           (its 'generation' has changed), as it may now be stale
+        """
+        if data is None:
+            return
+
+        ttl = self._get_ttl(key)
+        size = len(data)
+
+        # don't let a single object push everything else out
+        if size > self._max_bytes // 4:
+            return
+
+        if ttl is None:
+            expires = None
+        else:
+            expires = _time.monotonic() + ttl
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._remove(cache_key)
+            self._cache[cache_key] = (data, expires)
+            self._nbytes += size
+
+            while self._nbytes > self._max_bytes:
+                (_, (old, _)) = self._cache.popitem(last=False)
+                self._nbytes -= len(old)
+                self._stats["evictions"] += 1
+
+    def _invalidate(self, bucket, key=None, prefix=None):
+        """Internal function that removes the cached data for 'key', or
+           for all keys that start with 'prefix', in the passed bucket.
+           If neither are given then the whole bucket is invalidated
+        """
+        bucket_id = self._bucket_id(bucket)
+
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+            if key is not None:
+                self._remove((bucket_id, key))
+                return
+
+            if prefix is None:
+                prefix = ""
+
+            for cache_key in list(self._cache.keys()):
+                if cache_key[0] == bucket_id and \
+                        cache_key[1].startswith(prefix):
+                    self._remove(cache_key)
+
+    def get_object(self, bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, reading this from the cache if possible
+        """
+        if not self._is_cacheable(key):
+            return self._backend.get_object(bucket, key)
+
+        cache_key = (self._bucket_id(bucket), key)
+
+        with self._lock:
+            data = self._lookup(cache_key)
+            generation = self._generation
+
+        if data is not None:
+            return data
+
+        data = self._backend.get_object(bucket, key)
+        self._store(cache_key, key, data, generation)
+
+        return data
+
+    def get_objects(self, bucket, keys, max_workers=None):
+        """Return the binary data contained in each of the passed 'keys'
+           in the passed bucket. Only the keys that are not in the cache
+           are read from the wrapped backend
+        """
+        bucket_id = self._bucket_id(bucket)
+        objects = {}
+        missing = []
+
+        with self._lock:
+            generation = self._generation
+
+            for key in keys:
+                if not self._is_cacheable(key):
+                    missing.append(key)
+                    continue
+
+                data = self._lookup((bucket_id, key))
+
+                if data is None:
+                    missing.append(key)
+                else:
+                    objects[key] = data
+
+        if len(missing) == 0:
+            return (objects, {})
+
+        (fetched, errors) = self._backend.get_objects(bucket, missing,
+                                                      max_workers)
+
+        for (key, data) in fetched.items():
+            if self._is_cacheable(key):
+                self._store((bucket_id, key), key, data, generation)
+
+            objects[key] = data
+
+        return (objects, errors)
+
+    def open_object(self, bucket, key):
+        """Return a read-only, file-like ObjectStream over the binary
+           data contained in the key 'key' in the passed bucket. Cached
+           data is streamed from memory, while other objects are
+           streamed from the wrapped backend (and are not cached)
+        """
+        if not self._is_cacheable(key):
+            return self._backend.open_object(bucket, key)
+
+        cache_key = (self._bucket_id(bucket), key)
+
+        with self._lock:
+            data = self._lookup(cache_key)
+
+        if data is None:
+            return self._backend.open_object(bucket, key)
+
+        from Acquire.ObjectStore import ObjectStream as _ObjectStream
+        return _ObjectStream([data])
+
+    def take_object(self, bucket, key):
+        """Take (delete) the object from the object store, returning
+           the object
+        """
+        try:
+            return self._backend.take_object(bucket, key)
+        finally:
+            self._invalidate(bucket, key=key)
+
+    def set_object(self, bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data'"""
+        try:
+            self._backend.set_object(bucket, key, data)
+        finally:
+            self._invalidate(bucket, key=key)
+
+    def set_object_from_stream(self, bucket, key, stream, part_size=None,
+                               max_workers=None):
+        """Set the value of 'key' in 'bucket' to the binary data read
+           from the passed file-like 'stream'
+        """
+        try:
+            return self._backend.set_object_from_stream(
+                            bucket=bucket, key=key, stream=stream,
+                            part_size=part_size, max_workers=max_workers)
+        finally:
+            self._invalidate(bucket, key=key)
+
+    def set_object_if_absent(self, bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data' if there
+           is no object at this key
+        """
+        try:
+            return self._backend.set_object_if_absent(bucket, key, data)
+        finally:
+            self._invalidate(bucket, key=key)
+
+    def set_object_if_match(self, bucket, key, data, etag):
+        """Set the value of 'key' in 'bucket' to binary 'data' if the
+           object at this key still has the passed etag
+        """
+        try:
+            return self._backend.set_object_if_match(bucket, key,
+                                                     data, etag)
+        finally:
+            self._invalidate(bucket, key=key)
+
+    def delete_object(self, bucket, key):
+        """Removes the object at 'key'"""
+        try:
+            self._backend.delete_object(bucket, key)
+        finally:
+            self._invalidate(bucket, key=key)
+
+    def delete_objects(self, bucket, keys, max_workers=None):
+        """Remove the objects at all of the passed 'keys'"""
+        keys = list(keys)
+
+        try:
+            return self._backend.delete_objects(bucket=bucket, keys=keys,
+                                                max_workers=max_workers)
+        finally:
+            for key in keys:
+                self._invalidate(bucket, key=key)
+
+    def delete_prefix(self, bucket, prefix, max_workers=None):
+        """Remove all objects whose keys start with 'prefix'"""
+        try:
+            return self._backend.delete_prefix(bucket=bucket, prefix=prefix,
+                                               max_workers=max_workers)
+        finally:
+            self._invalidate(bucket, prefix=prefix)
+
+    def delete_all_objects(self, bucket, prefix=None):
+        """Deletes all objects (that start with 'prefix')"""
+        try:
+            self._backend.delete_all_objects(bucket, prefix)
+        finally:
+            self._invalidate(bucket, prefix=prefix)
+
+    def delete_bucket(self, bucket, force=False):
+        """Delete the passed bucket"""
+        try:
+            return self._backend.delete_bucket(bucket=bucket, force=force)
+        finally:
+            self._invalidate(bucket)
@@ -0,0 +1,214 @@
+import json as _json
+import os as _os
+
+__all__ = ["set_document_codec", "get_document_codec",
+           "encode_document", "decode_document", "migrate_documents"]
+
+# The header that marks a binary-encoded document. This can never
+# be the start of a (UTF-8) JSON document, so documents without
+# this header are decoded as JSON
+_magic = b"\x89ACQ"
+
+# The version of the header format
+_version = 1
+
+# The codec identifiers written into the header
+_codec_ids = {"msgpack": 1, "msgpack+zstd": 2}
+_codec_names = {1: "msgpack", 2: "msgpack+zstd"}
+
+# The documents that are smaller than this are not compressed, as
+# the compression framing would make them larger
+_min_compress_size = 256
+
+_document_codec = None
+
+
+def _get_zstd():
+    """Internal function that returns the zstandard module, raising
+       an ImportError if this is not installed
+    """
+    try:
+        import zstandard as _zstd
+        return _zstd
+    except ImportError:
+        raise ImportError(
+            "Cannot import zstandard. Please install zstandard, e.g. "
+            "via 'pip install zstandard' so that documents can be "
+            "compressed using the 'msgpack+zstd' codec")
+
+
+def set_document_codec(codec):
+    """Set the codec used by ObjectStore to encode the documents that
+       are written by 'set_object_from_json'. This is "json" (the
+       default), "msgpack", or "msgpack+zstd" (which compresses the
+       larger documents). Documents are always decoded according to
+       their header, so documents written with any codec (including
+       all existing JSON documents) can still be read. Only switch
+       codec once all services can read the new format
+    """
+    global _document_codec
+
+    if codec is None:
+        codec = "json"
+
+    codec = str(codec).lower()
+
+    if codec != "json" and codec not in _codec_ids:
+        from Acquire.ObjectStore import ObjectStoreError
+        raise ObjectStoreError(
+            "Unknown document codec '%s'. Available codecs are %s" %
+            (codec, ["json"] + list(_codec_ids.keys())))
+
+    if codec == "msgpack+zstd":
+        _get_zstd()
+
+    _document_codec = codec
+
+
+def get_document_codec():
+    """Return the codec used to encode documents. Unless set using
+       'set_document_codec', this is read from the
+       OBJSTORE_DOCUMENT_CODEC environment variable (default "json")
+    """
+    if _document_codec is None:
+        set_document_codec(_os.getenv("OBJSTORE_DOCUMENT_CODEC", "json"))
+
+    return _document_codec
+
+
+def encode_document(data, codec=None):
+    """Encode the passed json-serialisable 'data' into bytes using
+       the passed codec (or the current codec if this is None). Note
+       that, as for json, all keys of dictionaries should be strings.
+       Documents that msgpack cannot encode (e.g. very large
+       integers) are encoded as json
+    """
+    if codec is None:
+        codec = get_document_codec()
+
+    if codec == "json":
+        return _json.dumps(data).encode("utf-8")
+
+    import msgpack as _msgpack
+
+    try:
+        packed = _msgpack.packb(data, use_bin_type=True)
+    except (TypeError, OverflowError, ValueError):
+        return _json.dumps(data).encode("utf-8")
+
+    codec_id = _codec_ids["msgpack"]
+
+    if codec == "msgpack+zstd" and len(packed) >= _min_compress_size:
+        compressed = _get_zstd().ZstdCompressor().compress(packed)
+
+        if len(compressed) < len(packed):
+            packed = compressed
+            codec_id = _codec_ids["msgpack+zstd"]
+
+    return _magic + bytes([_version, codec_id]) + packed
+
+
+def decode_document(data):
+    """Decode and return the document in the passed bytes, which were
+       encoded by 'encode_document' with any codec, or are json
+    """
+    if isinstance(data, str):
+        return _json.loads(data)
+
+    if not data.startswith(_magic):
+        return _json.loads(data.decode("utf-8"))
+
+    from Acquire.ObjectStore import ObjectStoreError
+
+    header_size = len(_magic) + 2
+
+    if len(data) < header_size or data[len(_magic)] != _version:
+        raise ObjectStoreError("Cannot decode a document with an "
+                               "unsupported header")
+
+    codec = _codec_names.get(data[len(_magic) + 1])
+    packed = data[header_size:]
+
+    if codec == "msgpack+zstd":
+        packed = _get_zstd().ZstdDecompressor().decompress(packed)
+    elif codec != "msgpack":
+        raise ObjectStoreError("Cannot decode a document with the "
+                               "unknown codec %d" % data[len(_magic) + 1])
+
+    import msgpack as _msgpack
+    return _msgpack.unpackb(packed, raw=False, strict_map_key=False)
+
+
+def migrate_documents(bucket, prefix, codec=None, dry_run=False):
+    """Re-encode all of the documents in 'bucket' whose keys start with
+       'prefix' using the passed codec (or the current codec). The
+       prefix must be given explicitly (e.g. the root key of the
+       metadata of a service), so that file data and other objects
+       in the bucket are never rewritten by mistake. Objects
+       that are not documents are skipped, and each document is
+       rewritten using a conditional write, so that any document that
+       is updated during the migration is left unchanged. If 'dry_run'
+       is True then nothing is written. This returns a dictionary
+       with the number of documents that were converted, skipped,
+       changed during migration or failed, plus the total size of the
+       converted documents before and after migration
+    """
+    from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+    if prefix is None or len(str(prefix)) == 0:
+        from Acquire.ObjectStore import ObjectStoreError
+        raise ObjectStoreError(
+            "You must pass the prefix of the documents to migrate, e.g. "
+            "the root key of the metadata of a service")
+
+    if codec is None:
+        codec = get_document_codec()
+
+    result = {"converted": 0, "skipped": 0, "changed": 0, "errors": 0,
+              "bytes_before": 0, "bytes_after": 0}
+
+    for key in _ObjectStore.iter_object_names(bucket=bucket, prefix=prefix):
+        try:
+            (data, etag) = _ObjectStore.get_object_with_etag(bucket, key)
+        except Exception:
+            result["errors"] += 1
+            continue
+
+        if codec == "json" and not data.startswith(_magic):
+            # this is already json (or not a document)
+            result["skipped"] += 1
+            continue
+
+        try:
+            document = decode_document(data)
+        except Exception:
+            document = None
+
+        # only dictionaries and lists are documents - anything else
+        # could be a plain string (or binary data) that just happens
+        # to be valid json
+        if not isinstance(document, (dict, list)):
+            result["skipped"] += 1
+            continue
+
+        encoded = encode_document(document, codec=codec)
+
+        if encoded == data:
+            result["skipped"] += 1
+            continue
+
+        if not dry_run:
+            try:
+                if _ObjectStore.set_object_if_match(bucket, key, encoded,
+                                                    etag) is None:
+                    result["changed"] += 1
+                    continue
+            except Exception:
+                result["errors"] += 1
+                continue
+
+        result["converted"] += 1
+        result["bytes_before"] += len(data)
+        result["bytes_after"] += len(encoded)
+
+    return result
@@ -8,6 +8,20 @@ import copy as _copy
 
 __all__ = ["GCP_ObjectStore"]
 
+# The maximum number of object names returned by each list request
+_default_page_size = 1000
+
+# The size of the chunks streamed from the object store
+_chunk_size = 1024 * 1024
+
+# The default size of the parts of a resumable upload. Parts must
+# be a multiple of 256 KB
+_default_part_size = 16 * 1024 * 1024
+_part_multiple = 256 * 1024
+
+# The maximum number of deletes sent in each batch request
+_batch_size = 100
+
 
 def _sanitise_bucket_name(bucket_name, unique_prefix):
     """This function sanitises the passed bucket name. It will always
@@ -58,6 +72,15 @@ def _clean_key(key):
 
     return key
 
+
+def _is_precondition_failure(e):
+    """Internal function that returns whether the passed exception
+       was raised because the precondition of a conditional request
+       failed (412 Precondition Failed)
+    """
+    return getattr(e, "code", None) == 412
+
+
 def _get_driver_details_from_par(par):
     """Internal function used to get the GCP driver details from the
        passed OSPar (pre-authenticated request)
@@ -405,28 +428,103 @@ class GCP_ObjectStore:
                 from Acquire.ObjectStore import ObjectStoreError
                 raise ObjectStoreError("No data at key '%s'" % key)
 
-        data = response
+        if not is_chunked:
+            return response
+
+        parts = [response]
 
-        if is_chunked:
-            # keep going through to find more chunks
+        # keep going through to find more chunks
+        next_chunk = 1
+
+        while True:
+            next_chunk += 1
+
+            try:
+                blob = bucket["bucket"].blob("%s/%s" % (key, next_chunk))
+                response = blob.download_as_string()
+            except:
+                response = None
+                break
+
+            parts.append(response)
+
+        # join allocates the full buffer once and copies each part
+        # into it, rather than re-copying the data for every chunk
+        return b"".join(parts)
+
+    @staticmethod
+    def open_object(bucket, key):
+        """Return a read-only, file-like stream over the binary data
+           contained in the key 'key' in the passed bucket. The data
+           is streamed from GCP as it is read, so objects of any size
+           can be read using bounded memory
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+           Returns:
+                ObjectStream: Stream over the binary data
+        """
+        from Acquire.ObjectStore import ObjectStream as _ObjectStream
+
+        key = _clean_key(key)
+
+        def _get_blob(key):
+            try:
+                return bucket["bucket"].get_blob(key)
+            except:
+                return None
+
+        blob = _get_blob(key)
+        is_chunked = False
+
+        if blob is None:
+            blob = _get_blob("%s/1" % key)
+            is_chunked = True
+
+            if blob is None:
+                from Acquire.ObjectStore import ObjectStoreError
+                raise ObjectStoreError("No data at key '%s'" % key)
+
+        def _chunks(blob):
             next_chunk = 1
 
-            while True:
+            while blob is not None:
+                with blob.open("rb") as reader:
+                    while True:
+                        chunk = reader.read(_chunk_size)
+
+                        if not chunk:
+                            break
+
+                        yield chunk
+
+                if not is_chunked:
+                    return
+
                 next_chunk += 1
+                blob = _get_blob("%s/%d" % (key, next_chunk))
 
-                try:
-                    blob = bucket["bucket"].blob("%s/%s" % (key, next_chunk))
-                    response = blob.download_as_string()
-                except:
-                    response = None
-                    break
+        return _ObjectStream(_chunks(blob))
 
-                if not data:
-                    data = response
-                else:
-                    data += response
+    @staticmethod
+    def get_objects(bucket, keys, max_workers=None):
+        """Return the binary data contained in each of the passed 'keys'
+           in the passed bucket, fetching the objects concurrently using
+           a pool of at most 'max_workers' threads
 
-        return data
+           Args:
+                bucket (dict): Bucket containing data
+                keys (list): Keys for data in bucket
+                max_workers (int, default=None): Maximum number of threads
+           Returns:
+                tuple (dict, dict): Data and errors, keyed by key
+        """
+        from Acquire.ObjectStore import run_in_pool as _run_in_pool
+
+        return _run_in_pool(
+                    lambda key: GCP_ObjectStore.get_object(bucket, key),
+                    keys, max_workers=max_workers)
 
     @staticmethod
     def take_object(bucket, key):
@@ -451,51 +549,94 @@ class GCP_ObjectStore:
         return data
 
     @staticmethod
-    def get_all_object_names(bucket, prefix=None, without_prefix=False):
-        """Returns the names of all objects in the passed bucket
+    def iter_object_names(bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket,
+           in lexicographical order. Names are listed lazily one page
+           at a time, so the full listing is never held in memory
+           and iteration can be stopped early
 
            Args:
                 bucket (dict): Bucket containing data
-                prefix (str): Prefix for data
-                without_prefix (str): Whether or not to include the prefix
-                                      in the object name
+                prefix (str, default=None): Prefix for data
+                start_after (str, default=None): Only list keys that
+                come after this key
+                page_size (int, default=None): Number of names per request
+                without_prefix (bool, default=False): Whether or not to
+                remove the prefix from the object names
            Returns:
-                list: List of all objects in bucket
-
+                generator: Names of the objects in the bucket
         """
+        from Acquire.ObjectStore._objstore import _clean_object_name
+
         if prefix is not None:
             prefix = _clean_key(prefix)
 
-        blobs = bucket["bucket"].list_blobs(prefix=prefix)
+        if start_after is not None:
+            start_after = _clean_key(start_after)
+
+        if page_size is None:
+            page_size = _default_page_size
 
-        names = []
+        prefix_len = 0
 
-        if without_prefix:
+        if without_prefix and prefix is not None:
             prefix_len = len(prefix)
 
+        # start_offset is inclusive, so skip the start_after key itself
+        blobs = bucket["bucket"].list_blobs(prefix=prefix,
+                                            start_offset=start_after,
+                                            page_size=int(page_size))
+
         for obj in blobs:
-            if prefix:
-                if obj.name.startswith(prefix):
-                    name = obj.name
-            else:
-                name = obj.name
+            if start_after is not None and obj.name <= start_after:
+                continue
+
+            name = _clean_object_name(obj.name, prefix, prefix_len)
+
+            if name:
+                yield name
+
+    @staticmethod
+    def list_prefixes(bucket, prefix=None, delimiter="/"):
+        """Return the sorted list of the common prefixes of the keys in
+           the passed bucket that start with 'prefix', using the
+           native delimiter support of GCS
+
+           Args:
+                bucket (dict): Bucket containing data
+                prefix (str, default=None): Prefix for data
+                delimiter (str, default="/"): Delimiter of the hierarchy
+           Returns:
+                list: Common prefixes, each ending with the delimiter
+        """
+        blobs = bucket["bucket"].list_blobs(prefix=prefix,
+                                            delimiter=delimiter,
+                                            page_size=_default_page_size)
 
-            while name.endswith("/"):
-                name = name[0:-1]
+        prefixes = set()
 
-            while name.startswith("/"):
-                name = name[1:]
+        for page in blobs.pages:
+            prefixes.update(page.prefixes)
 
-            if without_prefix:
-                name = name[prefix_len:]
+        return sorted(prefixes)
 
-                while name.startswith("/"):
-                    name = name[1:]
+    @staticmethod
+    def get_all_object_names(bucket, prefix=None, without_prefix=False):
+        """Returns the names of all objects in the passed bucket
 
-            if len(name) > 0:
-                names.append(name)
+           Args:
+                bucket (dict): Bucket containing data
+                prefix (str): Prefix for data
+                without_prefix (str): Whether or not to include the prefix
+                                      in the object name
+           Returns:
+                list: List of all objects in bucket
 
-        return names
+        """
+        return list(GCP_ObjectStore.iter_object_names(
+                                bucket=bucket, prefix=prefix,
+                                without_prefix=without_prefix))
 
     @staticmethod
     def set_object(bucket, key, data):
@@ -520,21 +661,219 @@ class GCP_ObjectStore:
         blob = bucket["bucket"].blob(key)
         blob.upload_from_string(data)
 
+    @staticmethod
+    def get_object_with_etag(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with the etag of this version of
+           the object. GCS identifies each version of an object by its
+           generation number, so this is used as the etag. Only objects
+           that were written in a single part can be read in this way
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+           Returns:
+                tuple (bytes, str): Binary data and etag
+
+        """
+        from Acquire.ObjectStore import ObjectStoreError
+
+        key = _clean_key(key)
+
+        # the object may be replaced between reading the metadata and
+        # the data, so the download is pinned to the generation
+        for _ in range(0, 5):
+            blob = bucket["bucket"].get_blob(key)
+
+            if blob is None:
+                raise ObjectStoreError("No object at key '%s'" % key)
+
+            try:
+                data = blob.download_as_bytes(
+                                if_generation_match=blob.generation)
+            except Exception as e:
+                if _is_precondition_failure(e):
+                    continue
+                raise ObjectStoreError(
+                    "Unable to read the object '%s': %s" % (key, str(e)))
+
+            return (data, str(blob.generation))
+
+        raise ObjectStoreError(
+            "Unable to read a consistent version of the object '%s'" % key)
+
+    @staticmethod
+    def set_object_if_absent(bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data' if there
+           is no object at this key. This uses an 'ifGenerationMatch=0'
+           precondition, so is performed atomically by the object store
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+                data (bytes): Binary data to store in bucket
+           Returns:
+                str: Etag of the new object, or None if it was not set
+        """
+        return GCP_ObjectStore.set_object_if_match(bucket, key, data, "0")
+
+    @staticmethod
+    def set_object_if_match(bucket, key, data, etag):
+        """Set the value of 'key' in 'bucket' to binary 'data' if the
+           object at this key still has the passed etag (generation
+           number). This uses an 'ifGenerationMatch' precondition,
+           so is performed atomically by the object store
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+                data (bytes): Binary data to store in bucket
+                etag (str): Etag returned by 'get_object_with_etag'
+           Returns:
+                str: Etag of the new object, or None if it was not set
+        """
+        if data is None:
+            data = b'0'
+
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        key = _clean_key(key)
+
+        blob = bucket["bucket"].blob(key)
+
+        try:
+            blob.upload_from_string(data, if_generation_match=int(etag))
+        except Exception as e:
+            if _is_precondition_failure(e):
+                return None
+            raise
+
+        return str(blob.generation)
+
+    @staticmethod
+    def set_object_from_stream(bucket, key, stream, part_size=None,
+                               max_workers=None):
+        """Set the value of 'key' in 'bucket' to the binary data read
+           from the passed file-like 'stream'. This uses a GCS resumable
+           upload that sends the data in parts of 'part_size' bytes,
+           with each part retried individually on transient failure,
+           and the MD5 checksum of the whole object verified by GCS.
+           The parts of a resumable upload must be sent in order, so
+           'max_workers' is accepted only for compatibility with the
+           other backends
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+                stream (file): File-like object to read the data from
+                part_size (int, default=None): Size of each part (bytes)
+                max_workers (int, default=None): Unused
+           Returns:
+                tuple (int, str): Size and MD5 checksum of the object
+        """
+        if part_size is None:
+            part_size = _default_part_size
+
+        # GCS requires that the part size is a multiple of 256 KB
+        part_size = max(int(part_size) // _part_multiple, 1) * _part_multiple
+
+        key = _clean_key(key)
+
+        blob = bucket["bucket"].blob(key, chunk_size=part_size)
+
+        try:
+            blob.upload_from_file(stream, checksum="md5")
+        except Exception as e:
+            from Acquire.ObjectStore import ObjectStoreError
+            raise ObjectStoreError(
+                "Unable to upload the object '%s': %s" % (key, str(e)))
+
+        import binascii as _binascii
+        import base64 as _base64
+        md5sum = _binascii.hexlify(
+                    _base64.b64decode(blob.md5_hash)).decode("utf-8")
+
+        return (int(blob.size), md5sum)
+
     @staticmethod
     def delete_all_objects(bucket, prefix=None):
-        """Deletes all objects...
+        """Deletes all objects (that start with 'prefix')
 
            Args:
                 bucket (dict): Bucket containing data
-                prefix (str, default=None): Prefix for data,
-                currently unused
+                prefix (str, default=None): Prefix for data
             Returns:
                 None
         """
-        blobs = bucket["bucket"].list_blobs()
+        GCP_ObjectStore.delete_prefix(bucket, prefix)
+
+    @staticmethod
+    def delete_objects(bucket, keys, max_workers=None):
+        """Remove the objects at all of the passed 'keys'. The deletes
+           are sent in batch requests of up to 100 objects. If a batch
+           fails (e.g. because one of its objects is missing) then its
+           objects are deleted one by one, so that the failures can be
+           identified. As some of the batch may already have been
+           deleted, objects that are missing when they are deleted one
+           by one are counted as deleted
+
+           Args:
+                bucket (dict): Bucket containing data
+                keys (list): Keys for data
+                max_workers (int, default=None): Unused, as the
+                deletes are batched
+           Returns:
+                tuple (int, dict): Number of objects deleted and
+                errors, keyed by key
+        """
+        keys = list(keys)
+        ndeleted = 0
+        errors = {}
+
+        for i in range(0, len(keys), _batch_size):
+            batch = keys[i:i + _batch_size]
+
+            try:
+                with bucket["client"].batch():
+                    for key in batch:
+                        bucket["bucket"].blob(_clean_key(key)).delete()
+
+                ndeleted += len(batch)
+                continue
+            except Exception:
+                pass
+
+            for key in batch:
+                try:
+                    bucket["bucket"].blob(_clean_key(key)).delete()
+                    ndeleted += 1
+                except Exception as e:
+                    if getattr(e, "code", None) == 404:
+                        # this was deleted by the batch, or was missing
+                        ndeleted += 1
+                    else:
+                        errors[key] = e
+
+        return (ndeleted, errors)
+
+    @staticmethod
+    def delete_prefix(bucket, prefix, max_workers=None):
+        """Remove all objects whose keys start with 'prefix'
+
+           Args:
+                bucket (dict): Bucket containing data
+                prefix (str): Prefix of the keys to delete
+                max_workers (int, default=None): Unused
+           Returns:
+                tuple (int, dict): Number of objects deleted and
+                errors, keyed by key
+        """
+        from Acquire.ObjectStore._objstore import _delete_prefix_in_batches
 
-        for blob in blobs:
-            blob.delete()
+        return _delete_prefix_in_batches(GCP_ObjectStore.iter_object_names,
+                                         GCP_ObjectStore.delete_objects,
+                                         bucket, prefix, max_workers)
 
     @staticmethod
     def delete_object(bucket, key):
@@ -546,6 +885,8 @@ class GCP_ObjectStore:
            Returns:
                 None
         """
+        key = _clean_key(key)
+
         try:
             bucket["bucket"].blob(key).delete()
 
@@ -555,7 +896,9 @@ class GCP_ObjectStore:
     @staticmethod
     def get_size_and_checksum(bucket, key):
         """Return the object size (in bytes) and MD5 checksum of the
-           object in the passed bucket at the specified key
+           object in the passed bucket at the specified key. These are
+           read from the blob metadata, so the data is only downloaded
+           if the blob has no MD5 hash (e.g. composite objects)
 
            Args:
                 bucket (dict): Bucket containing data
@@ -573,6 +916,13 @@ class GCP_ObjectStore:
         except:
             from Acquire.ObjectStore import ObjectStoreError
             raise ObjectStoreError("No data at key '%s'" % key)
+
+        if checksum is None:
+            from Acquire.ObjectStore._objstore import \
+                _get_streamed_size_and_checksum
+            return _get_streamed_size_and_checksum(
+                        GCP_ObjectStore.open_object(bucket, key))
+
         # the checksum is a base64 encoded Content-MD5 header
         # described as standard part of HTTP RFC 2616. Need to
         # convert this back to a hexdigest
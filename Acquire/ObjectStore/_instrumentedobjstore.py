@@ -0,0 +1,431 @@
+import threading as _threading
+import time as _time
+
+__all__ = ["InstrumentedObjectStore"]
+
+# The upper bounds (in seconds) of the buckets of the latency histograms.
+# The last bucket holds all requests that took longer than this
+_latency_buckets = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                    0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# The default key-prefix families under which requests are counted.
+# Keys that don't match any of these are counted under their first
+# part (or "other" if the key has no parts)
+_default_families = ["mutexes/", "accounting/", "auth_once/",
+                     "identity/", "compute/", "registry/", "_trusted/",
+                     "worksheet/", "storage/file/", "storage/drive/",
+                     "storage/drives/", "storage/subdrives/",
+                     "storage/version/", "storage/par/",
+                     "storage/uploader/", "storage/downloader/"]
+
+# The bucket-level functions that are timed (all other functions that
+# are not explicitly instrumented are passed straight through)
+_bucket_operations = ["create_bucket", "get_bucket", "is_bucket_empty",
+                      "delete_bucket", "create_par", "close_par"]
+
+# Per-thread summary of the requests made while handling a
+# service request (see _start_request_stats)
+_request_stats = _threading.local()
+
+
+def _new_stats():
+    """Internal function that returns a new, empty set of statistics"""
+    return {"count": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0,
+            "seconds": 0.0, "histogram": [0] * (len(_latency_buckets) + 1)}
+
+
+def _start_request_stats():
+    """Internal function called at the start of handling a service
+       request to start summarising the object store requests made
+       by this thread
+    """
+    _request_stats.store = None
+    _request_stats.summary = {"count": 0, "bytes_in": 0, "bytes_out": 0,
+                              "seconds": 0.0, "operations": {},
+                              "families": {}}
+
+
+def _end_request_stats():
+    """Internal function called at the end of handling a service
+       request. This returns the summary of the object store requests
+       made by this thread since '_start_request_stats', or None if
+       no requests were instrumented
+    """
+    summary = getattr(_request_stats, "summary", None)
+    store = getattr(_request_stats, "store", None)
+    _request_stats.summary = None
+    _request_stats.store = None
+
+    if summary is None or summary["count"] == 0:
+        return None
+
+    summary["seconds"] = round(summary["seconds"], 6)
+
+    if store is not None:
+        store._export(summary)
+
+    return summary
+
+
+class InstrumentedObjectStore:
+    """This wraps any object store backend and records the number
+       of requests, the bytes read (out of) and written (in to) the
+       object store, and a histogram of the latency of the requests,
+       both per operation and per key-prefix family (e.g. "mutexes/"
+       or "accounting/"). Pass an instance of this class to
+       'set_object_store_backend' (or use
+       'use_instrumented_object_store') to record every request
+       made through the ObjectStore.
+
+       The totals can be scraped by an exporter using 'get_stats'.
+       In addition, a summary of the requests made while handling
+       each service request is attached to the response by
+       'end_profile', and is passed to every exporter added
+       using 'add_exporter'
+
+       Args:
+            backend: The object store backend to wrap
+            families (list, default=None): Key prefixes to count under
+    """
+    def __init__(self, backend, families=None):
+        if families is None:
+            families = _default_families
+
+        self._backend = backend
+
+        # the longest (most specific) matching prefix wins
+        self._families = sorted(families, key=lambda f: len(f),
+                                reverse=True)
+
+        self._lock = _threading.Lock()
+        self._operations = {}
+        self._family_stats = {}
+        self._exporters = []
+
+    def __getattr__(self, name):
+        """Pass all functions that are not instrumented to the
+           wrapped backend, timing the bucket-level functions. The
+           native coroutines of the backend are hidden, so that
+           AsyncObjectStore calls are recorded
+        """
+        if name.startswith("async_"):
+            raise AttributeError(name)
+
+        function = getattr(self._backend, name)
+
+        if name not in _bucket_operations:
+            return function
+
+        def _timed(*args, **kwargs):
+            return self._call(name, None, function, *args, **kwargs)
+
+        return _timed
+
+    def __eq__(self, other):
+        if isinstance(other, InstrumentedObjectStore):
+            return self is other
+        else:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return id(self)
+
+    def backend(self):
+        """Return the backend that is wrapped by this instrumentation"""
+        return self._backend
+
+    def get_family(self, key):
+        """Return the key-prefix family under which requests for 'key'
+           (or for keys that start with 'key') are counted
+        """
+        if key is None:
+            return "other"
+
+        for family in self._families:
+            if key.startswith(family):
+                return family
+
+        i = key.find("/")
+
+        if i > 0:
+            return key[0:i + 1]
+        else:
+            return "other"
+
+    def get_stats(self, reset=False):
+        """Return the statistics of all of the requests made through
+           this wrapper. This is a dictionary with "operations" and
+           "families", which each map to the count, number of errors,
+           bytes in and out, total seconds and latency histogram of
+           the requests for each operation or key-prefix family.
+           The upper bounds of the histogram buckets are in
+           "histogram_buckets". If 'reset' is True then the
+           statistics are reset after being read
+
+           Returns:
+                dict: Request statistics
+        """
+        import copy as _copy
+
+        with self._lock:
+            stats = {"operations": _copy.deepcopy(self._operations),
+                     "families": _copy.deepcopy(self._family_stats),
+                     "histogram_buckets": list(_latency_buckets)}
+
+            if reset:
+                self._operations = {}
+                self._family_stats = {}
+
+        return stats
+
+    def add_exporter(self, exporter):
+        """Add an exporter that will be called with the summary of the
+           object store requests made while handling each service
+           request (i.e. the summary attached by 'end_profile')
+        """
+        with self._lock:
+            self._exporters.append(exporter)
+
+    def _export(self, summary):
+        """Internal function that passes the summary of a service
+           request to all of the exporters
+        """
+        with self._lock:
+            exporters = list(self._exporters)
+
+        for exporter in exporters:
+            try:
+                exporter(summary)
+            except Exception as e:
+                # an exporter must never break the service request
+                print("Object store exporter failed: %s" % str(e))
+
+    def _record(self, operation, family, seconds, bytes_in, bytes_out,
+                error):
+        """Internal function used to record a single request"""
+        import bisect as _bisect
+        bucket = _bisect.bisect_left(_latency_buckets, seconds)
+
+        with self._lock:
+            for (stats, name) in [(self._operations, operation),
+                                  (self._family_stats, family)]:
+                try:
+                    s = stats[name]
+                except KeyError:
+                    s = _new_stats()
+                    stats[name] = s
+
+                s["count"] += 1
+                s["bytes_in"] += bytes_in
+                s["bytes_out"] += bytes_out
+                s["seconds"] += seconds
+                s["histogram"][bucket] += 1
+
+                if error:
+                    s["errors"] += 1
+
+        summary = getattr(_request_stats, "summary", None)
+
+        if summary is not None:
+            _request_stats.store = self
+            summary["count"] += 1
+            summary["bytes_in"] += bytes_in
+            summary["bytes_out"] += bytes_out
+            summary["seconds"] += seconds
+
+            for (counts, name) in [(summary["operations"], operation),
+                                   (summary["families"], family)]:
+                counts[name] = counts.get(name, 0) + 1
+
+    def _call(self, operation, key, function, *args, bytes_in=0,
+              bytes_out=None, **kwargs):
+        """Internal function used to call 'function', recording this
+           as a request for 'operation' on 'key'. The number of bytes
+           read is found by calling 'bytes_out' on the result
+        """
+        start = _time.monotonic()
+        result = None
+        error = True
+
+        try:
+            result = function(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            nbytes = 0
+
+            if bytes_out is not None and not error:
+                nbytes = bytes_out(result)
+
+            self._record(operation, self.get_family(key),
+                         _time.monotonic() - start,
+                         bytes_in, nbytes, error)
+
+    def _iter(self, operation, prefix, iterator):
+        """Internal function used to record the time spent listing
+           the names returned by 'iterator'
+        """
+        start = _time.monotonic()
+        error = True
+
+        try:
+            for name in iterator:
+                yield name
+
+            error = False
+        except GeneratorExit:
+            error = False
+            raise
+        finally:
+            self._record(operation, self.get_family(prefix),
+                         _time.monotonic() - start, 0, 0, error)
+
+    def get_object(self, bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket"""
+        return self._call("get_object", key, self._backend.get_object,
+                          bucket, key, bytes_out=len)
+
+    def get_objects(self, bucket, keys, max_workers=None):
+        """Return the binary data contained in each of the passed 'keys'
+           in the passed bucket"""
+        keys = list(keys)
+
+        if len(keys) == 0:
+            key = None
+        else:
+            key = keys[0]
+
+        return self._call(
+            "get_objects", key, self._backend.get_objects,
+            bucket, keys, max_workers,
+            bytes_out=lambda r: sum(len(d) for d in r[0].values()))
+
+    def open_object(self, bucket, key):
+        """Return a read-only, file-like stream over the binary data
+           contained in the key 'key' in the passed bucket
+        """
+        return self._call("open_object", key, self._backend.open_object,
+                          bucket, key)
+
+    def take_object(self, bucket, key):
+        """Take (delete) the object from the object store, returning
+           the object
+        """
+        return self._call("take_object", key, self._backend.take_object,
+                          bucket, key, bytes_out=len)
+
+    def iter_object_names(self, bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket"""
+        return self._iter("iter_object_names", prefix,
+                          self._backend.iter_object_names(
+                                bucket=bucket, prefix=prefix,
+                                start_after=start_after,
+                                page_size=page_size,
+                                without_prefix=without_prefix))
+
+    def list_prefixes(self, bucket, prefix=None, delimiter="/"):
+        """Return the sorted list of the common prefixes of the keys in
+           the passed bucket that start with 'prefix'
+        """
+        return self._call("list_prefixes", prefix,
+                          self._backend.list_prefixes,
+                          bucket=bucket, prefix=prefix, delimiter=delimiter)
+
+    def get_all_object_names(self, bucket, prefix=None, without_prefix=False):
+        """Returns the names of all objects in the passed bucket"""
+        return self._call("get_all_object_names", prefix,
+                          self._backend.get_all_object_names,
+                          bucket=bucket, prefix=prefix,
+                          without_prefix=without_prefix)
+
+    def set_object(self, bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data'"""
+        return self._call("set_object", key, self._backend.set_object,
+                          bucket, key, data, bytes_in=len(data or b""))
+
+    def set_object_from_stream(self, bucket, key, stream, part_size=None,
+                               max_workers=None):
+        """Set the value of 'key' in 'bucket' to the binary data read
+           from the passed file-like 'stream'
+        """
+        start = _time.monotonic()
+        size = 0
+        error = True
+
+        try:
+            result = self._backend.set_object_from_stream(
+                            bucket=bucket, key=key, stream=stream,
+                            part_size=part_size, max_workers=max_workers)
+            size = result[0]
+            error = False
+            return result
+        finally:
+            self._record("set_object_from_stream", self.get_family(key),
+                         _time.monotonic() - start, size, 0, error)
+
+    def get_object_with_etag(self, bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with its etag
+        """
+        return self._call("get_object_with_etag", key,
+                          self._backend.get_object_with_etag,
+                          bucket, key, bytes_out=lambda r: len(r[0]))
+
+    def set_object_if_absent(self, bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data' if there
+           is no object at this key
+        """
+        return self._call("set_object_if_absent", key,
+                          self._backend.set_object_if_absent,
+                          bucket, key, data, bytes_in=len(data or b""))
+
+    def set_object_if_match(self, bucket, key, data, etag):
+        """Set the value of 'key' in 'bucket' to binary 'data' if the
+           object at this key still has the passed etag
+        """
+        return self._call("set_object_if_match", key,
+                          self._backend.set_object_if_match,
+                          bucket, key, data, etag,
+                          bytes_in=len(data or b""))
+
+    def delete_object(self, bucket, key):
+        """Removes the object at 'key'"""
+        return self._call("delete_object", key,
+                          self._backend.delete_object, bucket, key)
+
+    def delete_objects(self, bucket, keys, max_workers=None):
+        """Remove the objects at all of the passed 'keys'"""
+        keys = list(keys)
+
+        if len(keys) == 0:
+            key = None
+        else:
+            key = keys[0]
+
+        return self._call("delete_objects", key,
+                          self._backend.delete_objects,
+                          bucket=bucket, keys=keys, max_workers=max_workers)
+
+    def delete_prefix(self, bucket, prefix, max_workers=None):
+        """Remove all objects whose keys start with 'prefix'"""
+        return self._call("delete_prefix", prefix,
+                          self._backend.delete_prefix,
+                          bucket=bucket, prefix=prefix,
+                          max_workers=max_workers)
+
+    def delete_all_objects(self, bucket, prefix=None):
+        """Deletes all objects (that start with 'prefix')"""
+        return self._call("delete_all_objects", prefix,
+                          self._backend.delete_all_objects, bucket, prefix)
+
+    def get_size_and_checksum(self, bucket, key):
+        """Return the object size (in bytes) and checksum of the
+           object in the passed bucket at the specified key
+        """
+        return self._call("get_size_and_checksum", key,
+                          self._backend.get_size_and_checksum, bucket, key)
@@ -0,0 +1,606 @@
+import bisect as _bisect
+import random as _random
+import threading as _threading
+import time as _time
+import uuid as _uuid
+
+__all__ = ["Memory_ObjectStore"]
+
+# The number of names returned per (simulated) listing request
+_default_page_size = 1000
+
+# The default part size for (simulated) multipart uploads
+_default_part_size = 16 * 1024 * 1024
+
+
+def _get_setting(setting, operation):
+    """Internal function that returns the value of 'setting' for the
+       passed operation. A setting is either a single value that applies
+       to all operations, or a dictionary of values keyed by operation
+       name, with the "default" key used for all other operations
+    """
+    if isinstance(setting, dict):
+        return setting.get(operation, setting.get("default", None))
+    else:
+        return setting
+
+
+class Memory_ObjectStore:
+    """This is an object store that holds all objects in memory and
+       which simulates the behaviour of a cloud object store. Every
+       request can be given a latency, data transfers are limited to a
+       bandwidth, and requests can be made to fail randomly, either by
+       being throttled (429) or with a server error (500). This is
+       used to benchmark and regression-test service flows offline,
+       with numbers that carry over to a real cloud object store.
+
+       Each of 'latency', 'bandwidth', 'throttle_rate' and 'error_rate'
+       is either a single value for all operations, or a dictionary of
+       values keyed by operation (e.g. "get_object", "set_object",
+       "list", "delete_object") with "default" used for the rest.
+       A latency is a number of seconds, a (min, max) tuple for a
+       uniform distribution, or a function that is passed a
+       random.Random and returns the number of seconds (see
+       'lognormal'). Use this as a backend, e.g.
+
+       set_object_store_backend(Memory_ObjectStore(latency=0.02))
+
+       Args:
+            latency (default=None): Latency of each request
+            bandwidth (float, default=None): Bytes per second
+            throttle_rate (float, default=None): Probability of a 429
+            error_rate (float, default=None): Probability of a 500
+            seed (int, default=None): Seed for the random number generator
+            realtime (bool, default=True): Whether or not to actually
+            sleep, or only to add up the simulated time
+    """
+    def __init__(self, latency=None, bandwidth=None, throttle_rate=None,
+                 error_rate=None, seed=None, realtime=True):
+        self._latency = latency
+        self._bandwidth = bandwidth
+        self._throttle_rate = throttle_rate
+        self._error_rate = error_rate
+        self._realtime = realtime
+
+        self._random = _random.Random(seed)
+        self._lock = _threading.RLock()
+
+        # bucket name => {key: (data, etag, md5)}, plus the sorted keys
+        self._buckets = {}
+        self._keys = {}
+
+        self._stats = {"requests": {}, "throttled": 0, "errors": 0,
+                       "bytes_in": 0, "bytes_out": 0,
+                       "simulated_seconds": 0.0}
+
+    @staticmethod
+    def lognormal(median, sigma=0.5):
+        """Return a latency function that draws from a lognormal
+           distribution with the passed median (in seconds). This
+           gives the long tail of latencies seen from a cloud
+           object store
+
+           Args:
+                median (float): Median latency in seconds
+                sigma (float, default=0.5): Shape of the distribution
+           Returns:
+                function: Latency function
+        """
+        import math as _math
+        mu = _math.log(median)
+        return lambda random: random.lognormvariate(mu, sigma)
+
+    def get_stats(self):
+        """Return a dictionary containing the number of requests made
+           for each operation, the number of throttled and failed
+           requests, the number of bytes transferred, and the total
+           simulated time spent waiting for the object store
+
+           Returns:
+                dict: Statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["requests"] = dict(stats["requests"])
+
+        return stats
+
+    def _simulate(self, operation, nbytes=0, outgoing=False):
+        """Internal function that simulates a single request for
+           'operation', transferring 'nbytes'. This returns the delay
+           (latency plus transfer time) of the request, and the
+           status of the error to raise (or None if it succeeded)
+        """
+        with self._lock:
+            random = self._random.random()
+
+            latency = _get_setting(self._latency, operation)
+
+            if latency is None:
+                delay = 0.0
+            elif callable(latency):
+                delay = float(latency(self._random))
+            elif isinstance(latency, tuple):
+                delay = self._random.uniform(latency[0], latency[1])
+            else:
+                delay = float(latency)
+
+            bandwidth = _get_setting(self._bandwidth, operation)
+
+            if bandwidth and nbytes > 0:
+                delay += float(nbytes) / bandwidth
+
+            throttle_rate = _get_setting(self._throttle_rate, operation) or 0
+            error_rate = _get_setting(self._error_rate, operation) or 0
+
+            requests = self._stats["requests"]
+            requests[operation] = requests.get(operation, 0) + 1
+            self._stats["simulated_seconds"] += delay
+
+            status = None
+
+            if random < throttle_rate:
+                status = 429
+                self._stats["throttled"] += 1
+            elif random < throttle_rate + error_rate:
+                status = 500
+                self._stats["errors"] += 1
+            elif outgoing:
+                self._stats["bytes_out"] += nbytes
+            else:
+                self._stats["bytes_in"] += nbytes
+
+        return (delay, status)
+
+    def _raise_error(self, operation, status):
+        """Internal function that raises the error with 'status'
+           returned by '_simulate' for 'operation'
+        """
+        if status is not None:
+            from Acquire.ObjectStore import ObjectStoreError
+
+            if status == 429:
+                e = ObjectStoreError("Too many requests (429) for "
+                                     "'%s'" % operation)
+            else:
+                e = ObjectStoreError("Internal server error (500) for "
+                                     "'%s'" % operation)
+
+            e.status = status
+            raise e
+
+    def _request(self, operation, nbytes=0, outgoing=False):
+        """Internal function that simulates a single request for
+           'operation', transferring 'nbytes'. This waits for the
+           latency (plus transfer time) of the request, and may then
+           raise an error if the request is throttled or fails
+        """
+        (delay, status) = self._simulate(operation, nbytes, outgoing)
+
+        if self._realtime and delay > 0:
+            _time.sleep(delay)
+
+        self._raise_error(operation, status)
+
+    async def _async_request(self, operation, nbytes=0, outgoing=False):
+        """Internal function that simulates a single request, as
+           '_request', without blocking the event loop
+        """
+        import asyncio as _asyncio
+
+        (delay, status) = self._simulate(operation, nbytes, outgoing)
+
+        if self._realtime and delay > 0:
+            await _asyncio.sleep(delay)
+
+        self._raise_error(operation, status)
+
+    def _get_objects(self, bucket):
+        """Internal function that returns the objects in the passed
+           bucket. This must be called while holding self._lock
+        """
+        try:
+            return self._buckets[bucket["bucket_name"]]
+        except KeyError:
+            from Acquire.ObjectStore import ObjectStoreError
+            raise ObjectStoreError("There is no bucket called '%s'"
+                                   % bucket["bucket_name"])
+
+    def _get(self, bucket, key):
+        """Internal function that returns the (data, etag, md5) of the
+           object at 'key' in the passed bucket
+        """
+        with self._lock:
+            try:
+                return self._get_objects(bucket)[key]
+            except KeyError:
+                from Acquire.ObjectStore import ObjectStoreError
+                raise ObjectStoreError("No object at key '%s'" % key)
+
+    def _set(self, bucket, key, data):
+        """Internal function that sets the object at 'key' in the passed
+           bucket. This must be called while holding self._lock.
+           This returns the etag of the new object. The MD5 checksum
+           is calculated here, as for the object metadata in a cloud
+           store, so that it doesn't need to be recalculated
+        """
+        from hashlib import md5 as _md5
+
+        objects = self._get_objects(bucket)
+        keys = self._keys[bucket["bucket_name"]]
+
+        if key not in objects:
+            _bisect.insort(keys, key)
+
+        etag = _uuid.uuid4().hex
+        objects[key] = (bytes(data), etag, _md5(data).hexdigest())
+
+        return etag
+
+    def _delete(self, bucket, key):
+        """Internal function that deletes the object at 'key' in the
+           passed bucket. This must be called while holding self._lock
+        """
+        objects = self._get_objects(bucket)
+        keys = self._keys[bucket["bucket_name"]]
+
+        if key in objects:
+            del objects[key]
+            del keys[_bisect.bisect_left(keys, key)]
+
+    def create_bucket(self, bucket, bucket_name):
+        """Create and return a new bucket in the object store called
+           'bucket_name'. This will raise an
+           ObjectStoreError if this bucket already exists
+        """
+        bucket_name = str(bucket_name)
+        self._request("create_bucket")
+
+        with self._lock:
+            if bucket_name in self._buckets:
+                from Acquire.ObjectStore import ObjectStoreError
+                raise ObjectStoreError(
+                    "CANNOT CREATE NEW BUCKET '%s': EXISTS!" % bucket_name)
+
+            self._buckets[bucket_name] = {}
+            self._keys[bucket_name] = []
+
+        return {"bucket_name": bucket_name}
+
+    def get_bucket(self, bucket, bucket_name, create_if_needed=True):
+        """Find and return a new bucket in the object store called
+           'bucket_name'. If 'create_if_needed' is True
+           then the bucket will be created if it doesn't exist. Otherwise,
+           if the bucket does not exist then an exception will be raised.
+        """
+        bucket_name = str(bucket_name)
+        self._request("get_bucket")
+
+        with self._lock:
+            if bucket_name not in self._buckets:
+                if create_if_needed:
+                    self._buckets[bucket_name] = {}
+                    self._keys[bucket_name] = []
+                else:
+                    from Acquire.ObjectStore import ObjectStoreError
+                    raise ObjectStoreError(
+                        "There is no bucket available called '%s'"
+                        % (bucket_name))
+
+        return {"bucket_name": bucket_name}
+
+    def get_bucket_name(self, bucket):
+        """Return the name of the passed bucket"""
+        return bucket["bucket_name"]
+
+    def is_bucket_empty(self, bucket):
+        """Return whether or not the passed bucket is empty"""
+        self._request("list")
+
+        with self._lock:
+            return len(self._get_objects(bucket)) == 0
+
+    def delete_bucket(self, bucket, force=False):
+        """Delete the passed bucket. This should be used with caution.
+           Normally you can only delete a bucket if it is empty. If
+           'force' is True then it will remove all objects/pars from
+           the bucket first, and then delete the bucket. This
+           can cause a LOSS OF DATA!
+        """
+        if not self.is_bucket_empty(bucket):
+            if force:
+                self.delete_all_objects(bucket)
+            else:
+                raise PermissionError(
+                    "You cannot delete the bucket %s as it is not empty" %
+                    self.get_bucket_name(bucket))
+
+        self._request("delete_bucket")
+
+        with self._lock:
+            self._buckets.pop(bucket["bucket_name"], None)
+            self._keys.pop(bucket["bucket_name"], None)
+
+    def create_par(self, bucket, encrypt_key, key=None, readable=True,
+                   writeable=False, duration=3600, cleanup_function=None):
+        """PARs cannot be created for objects held in memory, as they
+           would not be reachable from another process
+        """
+        from Acquire.Client import PARError
+        raise PARError("The memory object store does not support PARs")
+
+    def close_par(self, par=None, par_uid=None, url_checksum=None):
+        """PARs cannot be created for objects held in memory"""
+        from Acquire.Client import PARError
+        raise PARError("The memory object store does not support PARs")
+
+    def get_object(self, bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket"""
+        (data, _, _) = self._get(bucket, key)
+        self._request("get_object", len(data), outgoing=True)
+        return data
+
+    async def async_get_object(self, bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket. This is the coroutine used by AsyncObjectStore
+        """
+        (data, _, _) = self._get(bucket, key)
+        await self._async_request("get_object", len(data), outgoing=True)
+        return data
+
+    def open_object(self, bucket, key):
+        """Return a read-only, file-like stream over the binary data
+           contained in the key 'key' in the passed bucket
+        """
+        from Acquire.ObjectStore import ObjectStream as _ObjectStream
+        return _ObjectStream([self.get_object(bucket, key)])
+
+    def get_objects(self, bucket, keys, max_workers=None):
+        """Return the binary data contained in each of the passed 'keys'
+           in the passed bucket. The requests are made concurrently,
+           so their latencies overlap as they would for a cloud store
+        """
+        from Acquire.ObjectStore import run_in_pool as _run_in_pool
+
+        return _run_in_pool(lambda key: self.get_object(bucket, key),
+                            keys, max_workers=max_workers)
+
+    def take_object(self, bucket, key):
+        """Take (delete) the object from the object store, returning
+           the object
+        """
+        data = self.get_object(bucket, key)
+        self.delete_object(bucket, key)
+        return data
+
+    def iter_object_names(self, bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket,
+           in lexicographical order. The names are listed 'page_size'
+           at a time, with each page costing one (simulated) request
+        """
+        if prefix is None:
+            prefix = ""
+
+        if page_size is None:
+            page_size = _default_page_size
+
+        prefix_len = 0
+
+        if without_prefix:
+            prefix_len = len(prefix)
+
+        if start_after is None or start_after < prefix:
+            start_after = prefix
+            inclusive = True
+        else:
+            inclusive = False
+
+        while True:
+            self._request("list")
+
+            with self._lock:
+                keys = self._keys.get(bucket["bucket_name"], [])
+
+                if inclusive:
+                    i = _bisect.bisect_left(keys, start_after)
+                else:
+                    i = _bisect.bisect_right(keys, start_after)
+
+                page = keys[i:i + page_size]
+
+            for name in page:
+                if not name.startswith(prefix):
+                    return
+
+                if without_prefix:
+                    name = name[prefix_len:]
+                    while name.startswith("/"):
+                        name = name[1:]
+
+                if len(name) > 0:
+                    yield name
+
+            if len(page) < page_size:
+                return
+
+            start_after = page[-1]
+            inclusive = False
+
+    def list_prefixes(self, bucket, prefix=None, delimiter="/"):
+        """Return the sorted list of the common prefixes of the keys in
+           the passed bucket that start with 'prefix'
+        """
+        from Acquire.ObjectStore._objstore import _seek_common_prefixes
+        return _seek_common_prefixes(self.iter_object_names, bucket,
+                                     prefix, delimiter)
+
+    def get_all_object_names(self, bucket, prefix=None, without_prefix=False):
+        """Returns the names of all objects in the passed bucket"""
+        return list(self.iter_object_names(bucket=bucket, prefix=prefix,
+                                           without_prefix=without_prefix))
+
+    def set_object(self, bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data'"""
+        if data is None:
+            data = b""
+
+        self._request("set_object", len(data))
+
+        with self._lock:
+            self._set(bucket, key, data)
+
+    async def async_set_object(self, bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data'. This is
+           the coroutine used by AsyncObjectStore
+        """
+        if data is None:
+            data = b""
+
+        await self._async_request("set_object", len(data))
+
+        with self._lock:
+            self._set(bucket, key, data)
+
+    def set_object_from_stream(self, bucket, key, stream, part_size=None,
+                               max_workers=None):
+        """Set the value of 'key' in 'bucket' to the binary data read
+           from the passed file-like 'stream'. This simulates a
+           multipart upload, with each part of 'part_size' bytes
+           uploaded as a separate request, up to 'max_workers' at
+           a time. This returns the size and MD5 checksum of the object
+        """
+        from hashlib import md5 as _md5
+        from Acquire.ObjectStore import run_in_pool as _run_in_pool
+
+        if part_size is None:
+            part_size = _default_part_size
+
+        parts = list(iter(lambda: stream.read(part_size), b""))
+
+        if len(parts) <= 1:
+            self._request("set_object", sum(len(part) for part in parts))
+        else:
+            (_, errors) = _run_in_pool(
+                        lambda i: self._request("upload_part",
+                                                len(parts[i])),
+                        range(0, len(parts)), max_workers=max_workers)
+
+            if len(errors) > 0:
+                from Acquire.ObjectStore import ObjectStoreError
+                raise ObjectStoreError(
+                    "Unable to upload the object '%s': %s" %
+                    (key, list(errors.values())[0]))
+
+        data = b"".join(parts)
+
+        with self._lock:
+            self._set(bucket, key, data)
+
+        return (len(data), _md5(data).hexdigest())
+
+    def get_object_with_etag(self, bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with its etag
+        """
+        (data, etag, _) = self._get(bucket, key)
+        self._request("get_object", len(data), outgoing=True)
+        return (data, etag)
+
+    def set_object_if_absent(self, bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data' if there
+           is no object at this key. Returns the etag of the new object,
+           or None if the object was not set
+        """
+        if data is None:
+            data = b""
+
+        self._request("set_object", len(data))
+
+        with self._lock:
+            if key in self._get_objects(bucket):
+                return None
+
+            return self._set(bucket, key, data)
+
+    def set_object_if_match(self, bucket, key, data, etag):
+        """Set the value of 'key' in 'bucket' to binary 'data' if the
+           object at this key still has the passed etag. Returns the
+           etag of the new object, or None if the object was not set
+        """
+        if data is None:
+            data = b""
+
+        self._request("set_object", len(data))
+
+        with self._lock:
+            try:
+                (_, current, _) = self._get_objects(bucket)[key]
+            except KeyError:
+                return None
+
+            if current != etag:
+                return None
+
+            return self._set(bucket, key, data)
+
+    def delete_all_objects(self, bucket, prefix=None):
+        """Deletes all objects (that start with 'prefix')"""
+        self.delete_prefix(bucket, prefix)
+
+    def delete_objects(self, bucket, keys, max_workers=None):
+        """Remove the objects at all of the passed 'keys'. The deletes
+           are made concurrently, as for a cloud store. This returns
+           the number of objects deleted and the errors, keyed by key
+        """
+        from Acquire.ObjectStore import run_in_pool as _run_in_pool
+
+        def _delete(key):
+            self._request("delete_object")
+
+            with self._lock:
+                existed = key in self._get_objects(bucket)
+                self._delete(bucket, key)
+
+            return existed
+
+        (results, errors) = _run_in_pool(_delete, keys,
+                                         max_workers=max_workers)
+
+        return (list(results.values()).count(True), errors)
+
+    def delete_prefix(self, bucket, prefix, max_workers=None):
+        """Remove all objects whose keys start with 'prefix'. This
+           returns the number of objects deleted and the errors,
+           keyed by key
+        """
+        from Acquire.ObjectStore._objstore import _delete_prefix_in_batches
+        return _delete_prefix_in_batches(self.iter_object_names,
+                                         self.delete_objects,
+                                         bucket, prefix, max_workers)
+
+    def delete_object(self, bucket, key):
+        """Removes the object at 'key'"""
+        self._request("delete_object")
+
+        with self._lock:
+            self._delete(bucket, key)
+
+    async def async_delete_object(self, bucket, key):
+        """Removes the object at 'key'. This is the coroutine used by
+           AsyncObjectStore
+        """
+        await self._async_request("delete_object")
+
+        with self._lock:
+            self._delete(bucket, key)
+
+    def get_size_and_checksum(self, bucket, key):
+        """Return the object size (in bytes) and checksum of the
+           object in the passed bucket at the specified key
+        """
+        (data, _, md5) = self._get(bucket, key)
+        self._request("head_object")
+
+        return (len(data), md5)
@@ -2,9 +2,86 @@
 import uuid
 import datetime as _datetime
 import time as _time
+import threading as _threading
 
 __all__ = ["Mutex"]
 
+# The implementations of the mutex. "poll" is the original implementation
+# that polls the object store, while "cas" is a lease lock built on the
+# conditional writes (compare-and-swap) of the object store
+_impls = ["poll", "cas"]
+_default_impl = "poll"
+
+# The range of the (jittered, exponential) backoff used by the "cas"
+# implementation while waiting for another holder to release the lock
+_min_backoff = 0.01
+_max_backoff = 0.5
+
+
+def _make_lockstring(secret, token, end_lease):
+    """Internal function used to create the lockstring written by the
+       "cas" implementation. The end of the lease is always the last
+       field, so this can still be read by the "poll" implementation
+    """
+    from Acquire.ObjectStore import datetime_to_string \
+        as _datetime_to_string
+
+    return "%s{}%d{}%s" % (secret, token, _datetime_to_string(end_lease))
+
+
+def _parse_lockstring(lockstring):
+    """Internal function that returns the fencing token and the end
+       of the lease from the passed lockstring (as read from the
+       object store). Lockstrings written by the "poll" implementation
+       have a fencing token of 0. The end of the lease is None if
+       there is no lockstring, or if it cannot be parsed (e.g. it is
+       corrupted), in which case the lease is treated as expired
+    """
+    from Acquire.ObjectStore import string_to_datetime \
+        as _string_to_datetime
+
+    if lockstring is None:
+        return (0, None)
+
+    try:
+        parts = lockstring.decode("utf-8").split("{}")
+    except Exception:
+        return (0, None)
+
+    try:
+        token = int(parts[1]) if len(parts) == 3 else 0
+    except ValueError:
+        token = 0
+
+    try:
+        end_lease = _string_to_datetime(parts[-1])
+    except Exception:
+        end_lease = None
+
+    return (token, end_lease)
+
+
+def _renew_lease_loop(mutex_ref, stop_event, interval):
+    """Internal function run on a background thread that renews the
+       lease on the mutex referenced by the weak reference 'mutex_ref'
+       every 'interval' seconds, until 'stop_event' is set, the mutex
+       is garbage collected, or the lease is lost
+    """
+    while not stop_event.wait(interval):
+        mutex = mutex_ref()
+
+        if mutex is None:
+            return
+
+        try:
+            if not mutex._renew_lease():
+                return
+        except Exception:
+            # a transient error - try again while the lease is valid
+            pass
+
+        mutex = None
+
 
 class Mutex:
     """This class implements a mutex that sits in the object store.
@@ -13,7 +90,8 @@ class Mutex:
        not, then another thread must hold the mutex, and we have
        to wait...
     """
-    def __init__(self, key=None, timeout=10, lease_time=10, bucket=None):
+    def __init__(self, key=None, timeout=10, lease_time=10, bucket=None,
+                 impl=None, auto_renew=False):
         """Create the mutex. The immediately tries to lock the mutex
            for key 'key' and will block until a lock is successfully
            obtained (or until 'timeout' seconds has been reached, and an
@@ -23,7 +101,24 @@ class Mutex:
            'lease_time' seconds. After this time the mutex will be
            automatically unlocked and made available to lock by
            others. You can renew the lease by re-locking the mutex.
+
+           The 'impl' selects the implementation. The default, "poll",
+           polls the object store until the mutex can be taken. The
+           "cas" implementation uses the conditional writes of the
+           object store, so takes an uncontended mutex in one or two
+           round trips, waits using jittered exponential backoff, and
+           provides a fencing token (see 'fencing_token'). All users
+           of a key should use the same implementation. If
+           'auto_renew' is True then the "cas" implementation renews
+           the lease on a background thread while the mutex is held
         """
+        if impl is None:
+            impl = _default_impl
+
+        if impl not in _impls:
+            raise ValueError("Unknown Mutex implementation '%s'. Available "
+                             "implementations are %s" % (impl, _impls))
+
         if key is None:
             key = "mutexes/none"
         else:
@@ -39,6 +134,13 @@ class Mutex:
         self._key = key
         self._secret = str(uuid.uuid4())
         self._is_locked = 0
+        self._impl = impl
+        self._auto_renew = auto_renew
+        self._etag = None
+        self._token = None
+        self._lease_time = None
+        self._renewal = None
+        self._state_lock = _threading.Lock()
         self.lock(timeout, lease_time)
 
     def __del__(self):
@@ -90,6 +192,21 @@ class Mutex:
         else:
             return 0
 
+    def fencing_token(self):
+        """Return the fencing token of the "cas" implementation. This
+           increases every time that the mutex is taken, so can be
+           passed with any write made while holding the mutex so that
+           writes from a holder whose lease has expired can be rejected.
+           This is None if the mutex is not held
+
+           Returns:
+                int: Fencing token
+        """
+        if self.is_locked():
+            return self._token
+        else:
+            return None
+
     def expired(self):
         """Return whether or not this lock has expired
 
@@ -120,6 +237,10 @@ class Mutex:
         if self._is_locked == 0:
             return
 
+        if self._impl == "cas":
+            self._fully_unlock_cas()
+            return
+
         from Acquire.ObjectStore import ObjectStore as _ObjectStore
         from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
 
@@ -186,6 +307,10 @@ class Mutex:
         else:
             lease_time = float(lease_time)
 
+        if self._impl == "cas":
+            self._lock_cas(timeout, lease_time)
+            return
+
         from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
         from Acquire.ObjectStore import datetime_to_string \
             as _datetime_to_string
@@ -280,3 +405,195 @@ class Mutex:
         from Acquire.ObjectStore import MutexTimeoutError
         raise MutexTimeoutError("Cannot acquire a mutex lock on the "
                                 "key '%s'" % self._key)
+
+    def _lock_cas(self, timeout, lease_time):
+        """Internal function that locks the mutex using the "cas"
+           implementation. The current lockstring is read, and, if it
+           is absent or its lease has expired, is replaced with our
+           lockstring using a conditional write. This is one or two
+           round trips if the mutex is not contended
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import ObjectStoreError
+        from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
+        import random as _random
+
+        if self.is_locked():
+            # renew the lease, taking the mutex again from scratch if
+            # the lease has been lost
+            if self._renew_lease(lease_time):
+                self._is_locked += 1
+                return
+
+        self._stop_renewal()
+        self._is_locked = 0
+
+        now = _get_datetime_now()
+        endtime = now + _datetime.timedelta(seconds=timeout)
+        backoff = _min_backoff
+
+        while True:
+            try:
+                (holder, etag) = _ObjectStore.get_object_with_etag(
+                                                    self._bucket, self._key)
+            except ObjectStoreError:
+                (holder, etag) = (None, None)
+
+            (token, end_lease) = _parse_lockstring(holder)
+
+            if end_lease is None or end_lease < now:
+                # no-one holds this mutex (or the lockstring is corrupted)
+                # - try to take it, which only succeeds if no-one else
+                # has taken it since we looked
+                end_lease = now + _datetime.timedelta(seconds=lease_time)
+                token += 1
+                lockstring = _make_lockstring(self._secret, token, end_lease)
+                data = lockstring.encode("utf-8")
+
+                if etag is None:
+                    etag = _ObjectStore.set_object_if_absent(
+                                            self._bucket, self._key, data)
+                else:
+                    etag = _ObjectStore.set_object_if_match(
+                                            self._bucket, self._key, data,
+                                            etag)
+
+                if etag is not None:
+                    self._etag = etag
+                    self._token = token
+                    self._end_lease = end_lease
+                    self._lockstring = lockstring
+                    self._lease_time = lease_time
+                    self._is_locked = 1
+                    self._start_renewal()
+                    return
+
+                # someone else took the mutex first - look again
+                wait = 0
+            else:
+                # wait until the lease may have ended, up to a
+                # randomised, increasing backoff
+                wait = min(_random.uniform(0, backoff),
+                           (end_lease - now).total_seconds())
+                backoff = min(2 * backoff, _max_backoff)
+
+            if now + _datetime.timedelta(seconds=wait) >= endtime:
+                break
+
+            if wait > 0:
+                _time.sleep(wait)
+
+            now = _get_datetime_now()
+
+        from Acquire.ObjectStore import MutexTimeoutError
+        raise MutexTimeoutError("Cannot acquire a mutex lock on the "
+                                "key '%s'" % self._key)
+
+    def _renew_lease(self, lease_time=None):
+        """Internal function that renews the lease on the "cas"
+           implementation of the mutex, using a conditional write so that
+           the lease is only renewed if we still hold the mutex. Returns
+           whether or not the lease was renewed
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
+
+        with self._state_lock:
+            if self._is_locked == 0:
+                return False
+
+            if lease_time is None:
+                lease_time = self._lease_time
+
+            now = _get_datetime_now()
+
+            if self._end_lease < now:
+                return False
+
+            end_lease = now + _datetime.timedelta(seconds=lease_time)
+            lockstring = _make_lockstring(self._secret, self._token,
+                                          end_lease)
+
+            etag = _ObjectStore.set_object_if_match(
+                                self._bucket, self._key,
+                                lockstring.encode("utf-8"), self._etag)
+
+            if etag is None:
+                # someone else has taken the mutex - expire the lease
+                self._end_lease = now
+                return False
+
+            self._etag = etag
+            self._end_lease = end_lease
+            self._lockstring = lockstring
+            self._lease_time = lease_time
+
+            return True
+
+    def _start_renewal(self):
+        """Internal function that starts the background thread that
+           renews the lease of the "cas" implementation
+        """
+        if not self._auto_renew:
+            return
+
+        import weakref as _weakref
+
+        stop_event = _threading.Event()
+        thread = _threading.Thread(
+                        target=_renew_lease_loop,
+                        args=(_weakref.ref(self), stop_event,
+                              max(self._lease_time / 3.0, 0.01)),
+                        daemon=True)
+
+        self._renewal = (thread, stop_event)
+        thread.start()
+
+    def _stop_renewal(self):
+        """Internal function that stops the background thread that
+           renews the lease of the "cas" implementation
+        """
+        if self._renewal is None:
+            return
+
+        (thread, stop_event) = self._renewal
+        self._renewal = None
+        stop_event.set()
+
+        if thread is not _threading.current_thread():
+            thread.join()
+
+    def _fully_unlock_cas(self):
+        """Internal function that fully unlocks the "cas" implementation
+           of the mutex. Rather than deleting the key, this writes an
+           expired lease, so that the fencing token continues to increase
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
+
+        self._stop_renewal()
+
+        with self._state_lock:
+            now = _get_datetime_now()
+            lockstring = _make_lockstring("", self._token, now)
+
+            try:
+                # this only succeeds if we still hold the mutex
+                _ObjectStore.set_object_if_match(self._bucket, self._key,
+                                                 lockstring.encode("utf-8"),
+                                                 self._etag)
+            except Exception:
+                pass
+
+            end_lease = self._end_lease
+
+            self._lockstring = None
+            self._etag = None
+            self._token = None
+            self._end_lease = None
+            self._is_locked = 0
+
+        if end_lease < now:
+            from Acquire.ObjectStore import MutexTimeoutError
+            raise MutexTimeoutError("The lease on this mutex expired before "
+                                    "this mutex was unlocked!")
@@ -8,10 +8,133 @@ import os as _os
 __all__ = ["ObjectStore", "set_object_store_backend",
            "use_testing_object_store_backend",
            "use_oci_object_store_backend",
-           "use_gcp_object_store_backend"]
+           "use_gcp_object_store_backend",
+           "use_sqlite_object_store_backend",
+           "use_memory_object_store_backend",
+           "use_caching_object_store",
+           "use_instrumented_object_store"]
 
 _objstore_backend = None
 
+# The number of names that are listed before they are deleted
+# by '_delete_prefix_in_batches'
+_delete_batch_size = 1000
+
+
+def _seek_common_prefixes(iter_object_names, bucket, prefix, delimiter):
+    """Internal function used by backends that do not natively support
+       delimited listings to find the common prefixes of the keys
+       that start with 'prefix'. Rather than listing every key, this
+       lists from just after each common prefix that is found, so
+       the listing seeks from one child "directory" to the next
+    """
+    if prefix is None:
+        prefix = ""
+
+    # this sorts after every key that starts with a common prefix
+    last_char = chr(0x10FFFF)
+
+    prefixes = []
+    start_after = None
+
+    while True:
+        found = False
+
+        for name in iter_object_names(bucket=bucket, prefix=prefix,
+                                      start_after=start_after):
+            if not name.startswith(prefix):
+                continue
+
+            i = name.find(delimiter, len(prefix))
+
+            if i != -1:
+                common = name[0:i + len(delimiter)]
+                prefixes.append(common)
+                start_after = common + last_char
+                found = True
+                break
+
+        if not found:
+            return prefixes
+
+
+def _clean_object_name(name, prefix=None, prefix_len=0):
+    """Internal function used to clean an object name returned by a
+       listing, removing leading and trailing slashes and (if
+       'prefix_len' is greater than zero) the prefix. This returns
+       None if the name does not match 'prefix'
+
+       Args:
+            name (str): Object name to clean
+            prefix (str, default=None): Prefix that the name must match
+            prefix_len (int, default=0): Number of characters to remove
+       Returns:
+            str: Cleaned name
+    """
+    if prefix and not name.startswith(prefix):
+        return None
+
+    while name.endswith("/"):
+        name = name[0:-1]
+
+    while name.startswith("/"):
+        name = name[1:]
+
+    if prefix_len > 0:
+        name = name[prefix_len:]
+
+        while name.startswith("/"):
+            name = name[1:]
+
+    return name
+
+
+def _get_streamed_size_and_checksum(stream):
+    """Internal function used to calculate the size and MD5 checksum
+       of the data in the passed ObjectStream, reading the data in
+       chunks so that it is never all held in memory. This is used by
+       backends for objects that have no MD5 in their metadata
+    """
+    from hashlib import md5 as _md5
+    md5 = _md5()
+    size = 0
+
+    with stream:
+        for chunk in stream.chunks():
+            md5.update(chunk)
+            size += len(chunk)
+
+    return (size, md5.hexdigest())
+
+
+def _delete_prefix_in_batches(iter_object_names, delete_objects, bucket,
+                              prefix, max_workers=None):
+    """Internal function used by backends to delete all of the objects
+       whose keys start with 'prefix'. The names are listed and deleted
+       a batch at a time, so that the names of all of the objects
+       never need to be held in memory. This returns the number
+       of objects deleted and the errors, keyed by key
+    """
+    ndeleted = 0
+    errors = {}
+    batch = []
+
+    for name in iter_object_names(bucket=bucket, prefix=prefix):
+        batch.append(name)
+
+        if len(batch) >= _delete_batch_size:
+            (n, e) = delete_objects(bucket, batch, max_workers)
+            ndeleted += n
+            errors.update(e)
+            batch = []
+
+    if len(batch) > 0:
+        (n, e) = delete_objects(bucket, batch, max_workers)
+        ndeleted += n
+        errors.update(e)
+
+    return (ndeleted, errors)
+
 
 def use_testing_object_store_backend(backend):
     from ._testing_objstore import Testing_ObjectStore as _Testing_ObjectStore
@@ -37,6 +160,92 @@ def use_gcp_object_store_backend():
     set_object_store_backend(_GCP_ObjectStore)
 
 
+def use_sqlite_object_store_backend(path, bucket_name="objstore"):
+    """Use the local sqlite object store backend, with all objects held
+       in the sqlite database at 'path' (or in 'objstore.sqlite' in
+       this directory if 'path' is a directory). This returns the
+       bucket called 'bucket_name' in this database
+    """
+    from ._sqlite_objstore import SQLite_ObjectStore as _SQLite_ObjectStore
+    from ._sqlite_objstore import _make_bucket
+    set_object_store_backend(_SQLite_ObjectStore)
+
+    if _os.path.isdir(path):
+        path = _os.path.join(path, "objstore.sqlite")
+
+    path = _os.path.abspath(path)
+
+    return _SQLite_ObjectStore.get_bucket(_make_bucket(path, bucket_name),
+                                          bucket_name)
+
+
+def use_memory_object_store_backend(backend=None, bucket_name="objstore"):
+    """Use the in-memory object store backend, e.g. to benchmark service
+       flows offline. Pass in a Memory_ObjectStore in 'backend' to
+       control the simulated latency, bandwidth and errors (and to read
+       back its statistics). This returns the bucket called
+       'bucket_name' in this object store
+    """
+    from ._memory_objstore import Memory_ObjectStore as _Memory_ObjectStore
+
+    if backend is None:
+        backend = _Memory_ObjectStore()
+
+    set_object_store_backend(backend)
+
+    return backend.get_bucket(None, bucket_name)
+
+
+def use_caching_object_store(max_bytes=None, ttls=None,
+                             immutable_prefixes=None, default_ttl=0):
+    """Wrap the current object store backend in a CachingObjectStore,
+       so that objects under the passed prefixes are cached in memory
+       (see CachingObjectStore for the meaning of the arguments).
+       This returns the CachingObjectStore, e.g. so that you can
+       call 'get_cache_stats'
+    """
+    from ._cachingobjstore import CachingObjectStore as _CachingObjectStore
+
+    if _objstore_backend is None:
+        from Acquire.ObjectStore import ObjectStoreError
+        raise ObjectStoreError("You must set the object store backend "
+                               "before it can be cached")
+
+    cache = _CachingObjectStore(backend=_objstore_backend,
+                                max_bytes=max_bytes, ttls=ttls,
+                                immutable_prefixes=immutable_prefixes,
+                                default_ttl=default_ttl)
+
+    set_object_store_backend(cache)
+
+    return cache
+
+
+def use_instrumented_object_store(families=None):
+    """Wrap the current object store backend in an
+       InstrumentedObjectStore, so that the number, size and latency
+       of all object store requests are recorded per operation and
+       per key-prefix family (by default the standard families such
+       as "mutexes/" and "accounting/"). This returns the
+       InstrumentedObjectStore, e.g. so that you can call 'get_stats'
+       or 'add_exporter'
+    """
+    from ._instrumentedobjstore import \
+        InstrumentedObjectStore as _InstrumentedObjectStore
+
+    if _objstore_backend is None:
+        from Acquire.ObjectStore import ObjectStoreError
+        raise ObjectStoreError("You must set the object store backend "
+                               "before it can be instrumented")
+
+    instrumented = _InstrumentedObjectStore(backend=_objstore_backend,
+                                            families=families)
+
+    set_object_store_backend(instrumented)
+
+    return instrumented
+
+
 class ObjectStore:
     @staticmethod
     def create_bucket(bucket, bucket_name):
@@ -118,14 +327,58 @@ class ObjectStore:
            passed bucket"""
         return _objstore_backend.get_object(bucket, key)
 
+    @staticmethod
+    def get_objects(bucket, keys, max_workers=None):
+        """Return the binary data contained in each of the passed 'keys'
+           in the passed bucket. The objects are fetched concurrently,
+           using at most 'max_workers' simultaneous requests. This
+           returns a pair of dictionaries - the first maps each key
+           that was read to its data, while the second maps each key
+           that could not be read to the exception that was raised
+        """
+        return _objstore_backend.get_objects(bucket, keys, max_workers)
+
+    @staticmethod
+    def get_objects_from_json(bucket, keys, max_workers=None):
+        """Return the json-deserialised objects contained in each of the
+           passed 'keys' in the passed bucket. This returns a pair of
+           dictionaries - the first maps each key to its object, while
+           the second maps each key that could not be read or decoded
+           to the exception that was raised
+        """
+        from ._document_codec import decode_document as _decode_document
+
+        (objects, errors) = ObjectStore.get_objects(bucket, keys,
+                                                    max_workers)
+
+        for key in list(objects.keys()):
+            try:
+                objects[key] = _decode_document(objects[key])
+            except Exception as e:
+                errors[key] = e
+                del objects[key]
+
+        return (objects, errors)
+
+    @staticmethod
+    def open_object(bucket, key):
+        """Return a read-only, file-like ObjectStream over the binary
+           data contained in the key 'key' in the passed bucket. The
+           data is streamed from the object store as it is read, so
+           this should be used to read large objects in bounded memory.
+           Remember to close the stream (or use it in a 'with' block)
+        """
+        return _objstore_backend.open_object(bucket, key)
+
     @staticmethod
     def get_object_as_file(bucket, key, filename):
         """Get the object contained in the key 'key' in the passed 'bucket'
-           and writing this to the file called 'filename'"""
-        data = ObjectStore.get_object(bucket, key)
-
-        with open(filename, "wb") as FILE:
-            FILE.write(data)
+           and writing this to the file called 'filename'. The object
+           is streamed directly to disk, so is never held in memory"""
+        with ObjectStore.open_object(bucket, key) as stream:
+            with open(filename, "wb") as FILE:
+                for chunk in stream.chunks():
+                    FILE.write(chunk)
 
     @staticmethod
     def get_string_object(bucket, key):
@@ -139,8 +392,8 @@ class ObjectStore:
            the passed bucket. This returns None if there is no data
            at this key
         """
-        data = ObjectStore.get_string_object(bucket, key)
-        return _json.loads(data)
+        from ._document_codec import decode_document as _decode_document
+        return _decode_document(ObjectStore.get_object(bucket, key))
 
     @staticmethod
     def take_object(bucket, key):
@@ -173,23 +426,54 @@ class ObjectStore:
         """Take (delete) the object from the object store, returning
            the json-deserialised object
         """
-        data = ObjectStore.take_string_object(bucket, key)
-        return _json.loads(data)
+        from ._document_codec import decode_document as _decode_document
+        return _decode_document(ObjectStore.take_object(bucket, key))
+
+    @staticmethod
+    def iter_object_names(bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket
+           (optionally only those that start with 'prefix'), in
+           lexicographical order. If 'start_after' is passed then only
+           the names of objects whose keys come after this key are
+           returned. The names are listed lazily, 'page_size' at a
+           time, so large prefixes are listed completely in constant
+           memory, and iteration can be stopped at any time
+        """
+        return _objstore_backend.iter_object_names(
+                    bucket=bucket, prefix=prefix, start_after=start_after,
+                    page_size=page_size, without_prefix=without_prefix)
+
+    @staticmethod
+    def list_prefixes(bucket, prefix=None, delimiter="/"):
+        """Return the sorted list of the common prefixes ("directories")
+           of the keys in the passed bucket that start with 'prefix',
+           i.e. the full key up to and including the first 'delimiter'
+           after 'prefix'. Keys that have no delimiter after 'prefix'
+           are not included. This uses the native delimiter support of
+           the object store, so only lists the next level of the
+           hierarchy, rather than every object below 'prefix'
+        """
+        return _objstore_backend.list_prefixes(bucket=bucket, prefix=prefix,
+                                               delimiter=delimiter)
 
     @staticmethod
     def get_all_object_names(bucket, prefix=None, without_prefix=False):
         """Returns the names of all objects in the passed bucket"""
-        return _objstore_backend.get_all_object_names(bucket, prefix,
-                                                      without_prefix)
+        return list(ObjectStore.iter_object_names(
+                                    bucket=bucket, prefix=prefix,
+                                    without_prefix=without_prefix))
 
     @staticmethod
     def get_all_objects(bucket, prefix=None):
         """Return all of the objects in the passed bucket"""
-        objects = {}
         names = ObjectStore.get_all_object_names(bucket, prefix)
 
+        (objects, errors) = ObjectStore.get_objects(bucket, names)
+
         for name in names:
-            objects[name] = ObjectStore.get_object(bucket, name)
+            if name in errors:
+                raise errors[name]
 
         return objects
 
@@ -198,14 +482,15 @@ class ObjectStore:
         """Return all of the objects in the passed bucket as
            json-deserialised objects
         """
+        from ._document_codec import decode_document as _decode_document
+
         objects = ObjectStore.get_all_objects(bucket, prefix)
 
         names = list(objects.keys())
 
         for name in names:
             try:
-                s = objects[name].decode("utf-8")
-                objects[name] = _json.loads(s)
+                objects[name] = _decode_document(objects[name])
             except:
                 del objects[name]
 
@@ -235,9 +520,57 @@ class ObjectStore:
     @staticmethod
     def set_object_from_file(bucket, key, filename):
         """Set the value of 'key' in 'bucket' to equal the contents
-           of the file located by 'filename'"""
-        ObjectStore.set_object(bucket, key,
-                               open(filename, 'rb').read())
+           of the file located by 'filename'. The file is streamed
+           to the object store, so is never fully held in memory.
+           This returns the size and MD5 checksum of the object"""
+        with open(filename, "rb") as FILE:
+            return ObjectStore.set_object_from_stream(bucket, key, FILE)
+
+    @staticmethod
+    def set_object_from_stream(bucket, key, stream, part_size=None,
+                               max_workers=None):
+        """Set the value of 'key' in 'bucket' to the binary data read
+           from the passed file-like 'stream'. Large data is uploaded
+           in parts of 'part_size' bytes (using multipart or resumable
+           uploads where the backend supports them), with up to
+           'max_workers' parts uploaded in parallel. Each part is
+           checksummed and retried on failure, and the object is
+           only committed once all parts have been uploaded.
+           This returns the size and MD5 checksum of the object
+        """
+        return _objstore_backend.set_object_from_stream(
+                    bucket=bucket, key=key, stream=stream,
+                    part_size=part_size, max_workers=max_workers)
+
+    @staticmethod
+    def get_object_with_etag(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with the etag that identifies this
+           version of the object. The etag can be passed to
+           'set_object_if_match' to perform a compare-and-swap
+        """
+        return _objstore_backend.get_object_with_etag(bucket, key)
+
+    @staticmethod
+    def set_object_if_absent(bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data' if (and
+           only if) there is no object at this key. This is performed
+           atomically by the object store. This returns the etag of
+           the new object, or None if the object was not set
+        """
+        return _objstore_backend.set_object_if_absent(bucket, key, data)
+
+    @staticmethod
+    def set_object_if_match(bucket, key, data, etag):
+        """Set the value of 'key' in 'bucket' to binary 'data' if (and
+           only if) the object at this key is still the version
+           identified by 'etag' (as returned by 'get_object_with_etag').
+           This is performed atomically by the object store. This
+           returns the etag of the new object, or None if the object
+           was not set
+        """
+        return _objstore_backend.set_object_if_match(bucket, key,
+                                                     data, etag)
 
     @staticmethod
     def set_ins_object_from_json(bucket, key, data):
@@ -248,25 +581,24 @@ class ObjectStore:
            (either the set object or the value that was previously
            set
         """
-        from Acquire.ObjectStore import Mutex as _Mutex
-        m = _Mutex(bucket=bucket, key=key)
-
-        try:
-            old_data = ObjectStore.get_object_from_json(bucket, key)
-        except:
-            old_data = None
-
-        if old_data is not None:
-            m.unlock()
-            return old_data
-        else:
+        from Acquire.ObjectStore import ObjectStoreError
+        from ._document_codec import encode_document as _encode_document
+
+        encoded = _encode_document(data)
+
+        # the object could be deleted between a failed set and the
+        # following get, so try a few times
+        for _ in range(0, 5):
+            if ObjectStore.set_object_if_absent(bucket, key, encoded):
+                return data
+
             try:
-                ObjectStore.set_object_from_json(bucket, key, data)
-            except:
-                m.unlock()
-                raise
+                return ObjectStore.get_object_from_json(bucket, key)
+            except ObjectStoreError:
+                pass
 
-            return data
+        raise ObjectStoreError(
+            "Unable to set or get the object at key '%s'" % key)
 
     @staticmethod
     def set_ins_string_object(bucket, key, string_data):
@@ -276,25 +608,23 @@ class ObjectStore:
            key after the operation (either the set string, or the value
            that was previously set)
         """
-        from Acquire.ObjectStore import Mutex as _Mutex
-        m = _Mutex(bucket=bucket, key=key)
-
-        try:
-            val = ObjectStore.get_string_object(bucket, key)
-        except:
-            val = None
-
-        if val is not None:
-            m.unlock()
-            return val
-        else:
+        from Acquire.ObjectStore import ObjectStoreError
+
+        data = string_data.encode("utf-8")
+
+        # the object could be deleted between a failed set and the
+        # following get, so try a few times
+        for _ in range(0, 5):
+            if ObjectStore.set_object_if_absent(bucket, key, data):
+                return string_data
+
             try:
-                ObjectStore.set_string_object(bucket, key, string_data)
-            except:
-                m.unlock()
-                raise
+                return ObjectStore.get_string_object(bucket, key)
+            except ObjectStoreError:
+                pass
 
-            return string_data
+        raise ObjectStoreError(
+            "Unable to set or get the object at key '%s'" % key)
 
     @staticmethod
     def set_string_object(bucket, key, string_data):
@@ -305,8 +635,10 @@ class ObjectStore:
     @staticmethod
     def set_object_from_json(bucket, key, data):
         """Set the value of 'key' in 'bucket' to equal to contents
-           of 'data', which has been encoded to json"""
-        ObjectStore.set_string_object(bucket, key, _json.dumps(data))
+           of 'data', which has been encoded to json (or the current
+           document codec - see 'set_document_codec')"""
+        from ._document_codec import encode_document as _encode_document
+        ObjectStore.set_object(bucket, key, _encode_document(data))
 
     @staticmethod
     def delete_all_objects(bucket, prefix=None):
@@ -318,6 +650,26 @@ class ObjectStore:
         """Removes the object at 'key'"""
         _objstore_backend.delete_object(bucket, key)
 
+    @staticmethod
+    def delete_objects(bucket, keys, max_workers=None):
+        """Remove the objects at all of the passed 'keys' in the passed
+           bucket, using batched or concurrent requests where the
+           backend supports them. This returns the number of objects
+           that were deleted, and a dictionary of the errors, keyed
+           by key. Keys that have no object are not errors
+        """
+        return _objstore_backend.delete_objects(bucket=bucket, keys=keys,
+                                                max_workers=max_workers)
+
+    @staticmethod
+    def delete_prefix(bucket, prefix, max_workers=None):
+        """Remove all objects whose keys start with 'prefix' from the
+           passed bucket. This returns the number of objects that were
+           deleted, and a dictionary of the errors, keyed by key
+        """
+        return _objstore_backend.delete_prefix(bucket=bucket, prefix=prefix,
+                                               max_workers=max_workers)
+
     @staticmethod
     def clear_all_except(bucket, keys):
         """Removes all objects from the passed 'bucket' except those
@@ -325,16 +677,20 @@ class ObjectStore:
         """
         names = ObjectStore.get_all_object_names(bucket)
 
+        remove = []
+
         for name in names:
-            remove = True
+            keep = False
 
             for key in keys:
                 if name.startswith(key):
-                    remove = False
+                    keep = True
                     break
 
-            if remove:
-                ObjectStore.delete_object(bucket, key)
+            if not keep:
+                remove.append(name)
+
+        ObjectStore.delete_objects(bucket, remove)
 
     @staticmethod
     def get_size_and_checksum(bucket, key):
@@ -344,6 +700,22 @@ class ObjectStore:
         return _objstore_backend.get_size_and_checksum(bucket, key)
 
 
+def _unwrap_backend(backend):
+    """Internal function that returns the backend that is wrapped by
+       the passed cache or instrumentation (or the backend itself if
+       it is not wrapped)
+    """
+    from ._cachingobjstore import CachingObjectStore as _CachingObjectStore
+    from ._instrumentedobjstore import \
+        InstrumentedObjectStore as _InstrumentedObjectStore
+
+    while isinstance(backend, (_CachingObjectStore,
+                               _InstrumentedObjectStore)):
+        backend = backend.backend()
+
+    return backend
+
+
 def set_object_store_backend(backend):
     """Set the backend that is used to actually connect to
        the object store. This can only be set once in the program!
@@ -353,6 +725,16 @@ def set_object_store_backend(backend):
     if backend == _objstore_backend:
         return
 
+    # the current backend can be wrapped in (or replaced by) a cache or
+    # instrumentation of itself, as this doesn't change where the
+    # data is stored
+    if _objstore_backend is not None and \
+            _unwrap_backend(backend) == _unwrap_backend(_objstore_backend):
+        if _unwrap_backend(backend) != backend:
+            _objstore_backend = backend
+
+        return
+
     if _objstore_backend is not None:
         from Acquire.ObjectStore import ObjectStoreError
         raise ObjectStoreError("You cannot change the object store "
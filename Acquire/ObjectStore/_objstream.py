@@ -0,0 +1,106 @@
+import io as _io
+
+__all__ = ["ObjectStream"]
+
+
+class ObjectStream(_io.RawIOBase):
+    """This class provides a read-only, file-like stream over the data
+       of an object in the object store. The data is pulled lazily
+       from an iterator of binary chunks (e.g. the chunks of an HTTP
+       response, or the 'key/N' parts of a chunked object), so that
+       an object of any size can be read using bounded memory.
+
+       Use this as a normal binary file, e.g. 'stream.read(n)', or
+       iterate over 'stream.chunks()' to receive the data as
+       memoryviews without any additional copying
+
+       Args:
+            chunks (iterator): Iterator over the binary chunks of data
+            close_function (function, default=None): Function called
+            when the stream is closed, e.g. to release a connection
+    """
+    def __init__(self, chunks=None, close_function=None):
+        super().__init__()
+
+        if chunks is None:
+            chunks = []
+
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+        self._close_function = close_function
+
+    def readable(self):
+        """Return whether or not this stream is readable (it always is)"""
+        return True
+
+    def _next_chunk(self):
+        """Internal function used to pull the next non-empty chunk
+           from the iterator. Returns False if there is no more data
+        """
+        while len(self._buffer) == 0:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                return False
+
+            self._buffer = memoryview(chunk).cast("B")
+
+        return True
+
+    def readinto(self, b):
+        """Read data from the stream into the passed writeable buffer,
+           returning the number of bytes read (0 at the end of stream)
+
+           Args:
+                b (bytearray): Buffer to fill
+           Returns:
+                int: Number of bytes read
+        """
+        if self.closed:
+            raise ValueError("Cannot read from a closed ObjectStream")
+
+        if not self._next_chunk():
+            return 0
+
+        target = memoryview(b).cast("B")
+        n = min(len(target), len(self._buffer))
+        target[0:n] = self._buffer[0:n]
+        self._buffer = self._buffer[n:]
+
+        return n
+
+    def chunks(self):
+        """Iterate over the remaining data in this stream as memoryviews.
+           These are views of the chunks as they were received, so no
+           data is copied
+
+           Returns:
+                generator: memoryviews of the remaining data
+        """
+        if self.closed:
+            raise ValueError("Cannot read from a closed ObjectStream")
+
+        while self._next_chunk():
+            chunk = self._buffer
+            self._buffer = memoryview(b"")
+            yield chunk
+
+    def close(self):
+        """Close this stream, releasing any underlying resources"""
+        if self.closed:
+            return
+
+        self._buffer = memoryview(b"")
+
+        try:
+            self._chunks.close()
+        except AttributeError:
+            pass
+
+        if self._close_function is not None:
+            close_function = self._close_function
+            self._close_function = None
+            close_function()
+
+        super().close()
+
@@ -9,6 +9,18 @@ import uuid as _uuid
 
 __all__ = ["OCI_ObjectStore"]
 
+# The maximum number of object names returned by each list request
+_default_page_size = 1000
+
+# The size of the chunks streamed from the object store
+_chunk_size = 1024 * 1024
+
+# The default and minimum sizes of the parts of a multipart upload,
+# and the default number of parts that are uploaded in parallel
+_default_part_size = 16 * 1024 * 1024
+_min_part_size = 10 * 1024 * 1024
+_default_upload_workers = 4
+
 
 def _sanitise_bucket_name(bucket_name):
     """This function sanitises the passed bucket name. It will always
@@ -53,6 +65,125 @@ def _clean_key(key):
     return key
 
 
+def _get_object_responses(bucket, key):
+    """Internal function that returns a generator over the OCI responses
+       that hold the data for the object at 'key'. Large objects may
+       be stored in chunks, at 'key/1', 'key/2' etc. The first object
+       is requested immediately, so that this raises an ObjectStoreError
+       if there is no data at this key
+
+       Args:
+            bucket (dict): Bucket containing data
+            key (str): Cleaned key for data in bucket
+       Returns:
+            generator: The responses containing the data
+    """
+    client = bucket["client"]
+
+    try:
+        response = client.get_object(bucket["namespace"],
+                                     bucket["bucket_name"], key)
+        is_chunked = False
+    except:
+        try:
+            response = client.get_object(bucket["namespace"],
+                                         bucket["bucket_name"],
+                                         "%s/1" % key)
+            is_chunked = True
+        except:
+            from Acquire.ObjectStore import ObjectStoreError
+            raise ObjectStoreError("No data at key '%s'" % key)
+
+    def _responses(response):
+        yield response
+
+        if not is_chunked:
+            return
+
+        # keep going through to find more chunks
+        next_chunk = 1
+
+        while True:
+            next_chunk += 1
+
+            try:
+                response = client.get_object(bucket["namespace"],
+                                             bucket["bucket_name"],
+                                             "%s/%d" % (key, next_chunk))
+            except:
+                return
+
+            yield response
+
+    return _responses(response)
+
+
+def _read_part(stream, part_size):
+    """Internal function used to read up to 'part_size' bytes from the
+       passed stream. This keeps reading until either 'part_size'
+       bytes have been read or the end of the stream is reached
+
+       Args:
+            stream (file): Stream to read from
+            part_size (int): Number of bytes to read
+       Returns:
+            bytes: The data read
+    """
+    parts = []
+    remaining = part_size
+
+    while remaining > 0:
+        data = stream.read(remaining)
+
+        if not data:
+            break
+
+        parts.append(data)
+        remaining -= len(data)
+
+    if len(parts) == 1:
+        return parts[0]
+    else:
+        return b"".join(parts)
+
+
+def _retry(function, retries=3, delay=0.5):
+    """Internal function used to call 'function', retrying up to
+       'retries' more times (with exponential backoff) if it raises
+       an exception. This is used to recover from transient
+       failures when uploading parts of an object
+
+       Args:
+            function (function): Function to call
+            retries (int, default=3): Maximum number of retries
+            delay (float, default=0.5): Delay before the first retry
+       Returns:
+            object: The value returned by the function
+    """
+    import time as _time
+
+    attempt = 0
+
+    while True:
+        try:
+            return function()
+        except Exception:
+            if attempt >= retries:
+                raise
+
+            _time.sleep(delay * (2 ** attempt))
+            attempt += 1
+
+
+def _is_precondition_failure(e):
+    """Internal function that returns whether the passed exception
+       was raised because the precondition of a conditional request
+       failed (412), or because the object to be matched does
+       not exist (404)
+    """
+    return getattr(e, "status", None) in (404, 412)
+
+
 def _get_object_url_for_region(region, uri):
     """Internal function used to get the full URL to the passed PAR URI
        for the specified region. This has the format;
@@ -531,62 +662,73 @@ class OCI_ObjectStore:
                 bytes: Binary data
 
         """
-
         key = _clean_key(key)
 
-        try:
-            response = bucket["client"].get_object(bucket["namespace"],
-                                                   bucket["bucket_name"],
-                                                   key)
-            is_chunked = False
-        except:
-            try:
-                response = bucket["client"].get_object(bucket["namespace"],
-                                                       bucket["bucket_name"],
-                                                       "%s/1" % key)
-                is_chunked = True
-            except:
-                is_chunked = False
-                pass
+        parts = []
 
-            # Raise the original error
-            if not is_chunked:
-                from Acquire.ObjectStore import ObjectStoreError
-                raise ObjectStoreError("No data at key '%s'" % key)
+        for response in _get_object_responses(bucket, key):
+            for chunk in response.data.raw.stream(_chunk_size,
+                                                  decode_content=False):
+                parts.append(chunk)
 
-        data = None
+        if len(parts) == 1:
+            return parts[0]
 
-        for chunk in response.data.raw.stream(1024 * 1024,
-                                              decode_content=False):
-            if not data:
-                data = chunk
-            else:
-                data += chunk
+        # join allocates the full buffer once and copies each part
+        # into it, rather than re-copying the data for every chunk
+        return b"".join(parts)
+
+    @staticmethod
+    def open_object(bucket, key):
+        """Return a read-only, file-like stream over the binary data
+           contained in the key 'key' in the passed bucket. The data
+           is streamed from OCI as it is read, so objects of any size
+           can be read using bounded memory
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+           Returns:
+                ObjectStream: Stream over the binary data
+        """
+        from Acquire.ObjectStore import ObjectStream as _ObjectStream
 
-        if is_chunked:
-            # keep going through to find more chunks
-            next_chunk = 1
+        key = _clean_key(key)
 
-            while True:
-                next_chunk += 1
+        responses = _get_object_responses(bucket, key)
 
+        def _chunks():
+            for response in responses:
                 try:
-                    response = bucket["client"].get_object(
-                                        bucket["namespace"],
-                                        bucket["bucket_name"],
-                                        "%s/%d" % (key, next_chunk))
-                except:
-                    response = None
-                    break
-
-                for chunk in response.data.raw.stream(1024 * 1024,
-                                                      decode_content=False):
-                    if not data:
-                        data = chunk
-                    else:
-                        data += chunk
+                    for chunk in response.data.raw.stream(
+                                        _chunk_size, decode_content=False):
+                        yield chunk
+                finally:
+                    try:
+                        response.data.close()
+                    except:
+                        pass
 
-        return data
+        return _ObjectStream(_chunks())
+
+    @staticmethod
+    def get_objects(bucket, keys, max_workers=None):
+        """Return the binary data contained in each of the passed 'keys'
+           in the passed bucket, fetching the objects concurrently using
+           a pool of at most 'max_workers' threads
+
+           Args:
+                bucket (dict): Bucket containing data
+                keys (list): Keys for data in bucket
+                max_workers (int, default=None): Maximum number of threads
+           Returns:
+                tuple (dict, dict): Data and errors, keyed by key
+        """
+        from Acquire.ObjectStore import run_in_pool as _run_in_pool
+
+        return _run_in_pool(
+                    lambda key: OCI_ObjectStore.get_object(bucket, key),
+                    keys, max_workers=max_workers)
 
     @staticmethod
     def take_object(bucket, key):
@@ -611,51 +753,123 @@ class OCI_ObjectStore:
         return data
 
     @staticmethod
-    def get_all_object_names(bucket, prefix=None, without_prefix=False):
-        """Returns the names of all objects in the passed bucket
+    def iter_object_names(bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket,
+           in lexicographical order. Names are listed lazily one page
+           at a time, following the continuation token returned by
+           OCI, so the full listing is never held in memory and
+           iteration can be stopped early
 
            Args:
                 bucket (dict): Bucket containing data
-                prefix (str): Prefix for data
+                prefix (str, default=None): Prefix for data
+                start_after (str, default=None): Only list keys that
+                come after this key
+                page_size (int, default=None): Number of names per request
+                without_prefix (bool, default=False): Whether or not to
+                remove the prefix from the object names
            Returns:
-                list: List of all objects in bucket
-
+                generator: Names of the objects in the bucket
         """
+        from Acquire.ObjectStore._objstore import _clean_object_name
+
         if prefix is not None:
             prefix = _clean_key(prefix)
 
-        objects = bucket["client"].list_objects(bucket["namespace"],
-                                                bucket["bucket_name"],
-                                                prefix=prefix).data
+        if start_after is not None:
+            start_after = _clean_key(start_after)
 
-        names = []
+        if page_size is None:
+            page_size = _default_page_size
 
-        if without_prefix:
+        prefix_len = 0
+
+        if without_prefix and prefix is not None:
             prefix_len = len(prefix)
 
-        for obj in objects.objects:
-            if prefix:
-                if obj.name.startswith(prefix):
-                    name = obj.name
-            else:
-                name = obj.name
+        client = bucket["client"]
+        next_start = None
+
+        while True:
+            kwargs = {"prefix": prefix, "limit": int(page_size)}
+
+            if next_start is not None:
+                kwargs["start"] = next_start
+            elif start_after is not None:
+                kwargs["start_after"] = start_after
+
+            objects = client.list_objects(bucket["namespace"],
+                                          bucket["bucket_name"],
+                                          **kwargs).data
+
+            for obj in objects.objects:
+                name = _clean_object_name(obj.name, prefix, prefix_len)
+
+                if name:
+                    yield name
+
+            next_start = objects.next_start_with
 
-            while name.endswith("/"):
-                name = name[0:-1]
+            if next_start is None:
+                return
 
-            while name.startswith("/"):
-                name = name[1:]
+    @staticmethod
+    def list_prefixes(bucket, prefix=None, delimiter="/"):
+        """Return the sorted list of the common prefixes of the keys in
+           the passed bucket that start with 'prefix'. OCI only supports
+           '/' as a delimiter, so other delimiters are emulated by
+           listing from one common prefix to the next
+
+           Args:
+                bucket (dict): Bucket containing data
+                prefix (str, default=None): Prefix for data
+                delimiter (str, default="/"): Delimiter of the hierarchy
+           Returns:
+                list: Common prefixes, each ending with the delimiter
+        """
+        if delimiter != "/":
+            from Acquire.ObjectStore._objstore import _seek_common_prefixes
+            return _seek_common_prefixes(OCI_ObjectStore.iter_object_names,
+                                         bucket, prefix, delimiter)
+
+        client = bucket["client"]
+        prefixes = set()
+        next_start = None
 
-            if without_prefix:
-                name = name[prefix_len:]
+        while True:
+            kwargs = {"prefix": prefix, "delimiter": delimiter,
+                      "limit": _default_page_size}
 
-                while name.startswith("/"):
-                    name = name[1:]
+            if next_start is not None:
+                kwargs["start"] = next_start
 
-            if len(name) > 0:
-                names.append(name)
+            objects = client.list_objects(bucket["namespace"],
+                                          bucket["bucket_name"],
+                                          **kwargs).data
 
-        return names
+            if objects.prefixes:
+                prefixes.update(objects.prefixes)
+
+            next_start = objects.next_start_with
+
+            if next_start is None:
+                return sorted(prefixes)
+
+    @staticmethod
+    def get_all_object_names(bucket, prefix=None, without_prefix=False):
+        """Returns the names of all objects in the passed bucket
+
+           Args:
+                bucket (dict): Bucket containing data
+                prefix (str): Prefix for data
+           Returns:
+                list: List of all objects in bucket
+
+        """
+        return list(OCI_ObjectStore.iter_object_names(
+                                bucket=bucket, prefix=prefix,
+                                without_prefix=without_prefix))
 
     @staticmethod
     def set_object(bucket, key, data):
@@ -679,22 +893,303 @@ class OCI_ObjectStore:
                                     bucket["bucket_name"],
                                     key, f)
 
+    @staticmethod
+    def get_object_with_etag(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with the etag of this version of
+           the object. Only objects that were written in a single
+           part can be read in this way
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+           Returns:
+                tuple (bytes, str): Binary data and etag
+
+        """
+        key = _clean_key(key)
+
+        try:
+            response = bucket["client"].get_object(bucket["namespace"],
+                                                   bucket["bucket_name"],
+                                                   key)
+        except Exception as e:
+            from Acquire.ObjectStore import ObjectStoreError
+            raise ObjectStoreError("No object at key '%s': %s" % (key, e))
+
+        data = b"".join(response.data.raw.stream(_chunk_size,
+                                                 decode_content=False))
+
+        return (data, response.headers["etag"])
+
+    @staticmethod
+    def set_object_if_absent(bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data' if there
+           is no object at this key. This uses an 'if-none-match: *'
+           precondition, so is performed atomically by the object store
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+                data (bytes): Binary data to store in bucket
+           Returns:
+                str: Etag of the new object, or None if it was not set
+        """
+        if data is None:
+            data = b'0'
+
+        key = _clean_key(key)
+
+        try:
+            response = bucket["client"].put_object(bucket["namespace"],
+                                                   bucket["bucket_name"],
+                                                   key, _io.BytesIO(data),
+                                                   if_none_match="*")
+        except Exception as e:
+            if _is_precondition_failure(e):
+                return None
+            raise
+
+        return response.headers["etag"]
+
+    @staticmethod
+    def set_object_if_match(bucket, key, data, etag):
+        """Set the value of 'key' in 'bucket' to binary 'data' if the
+           object at this key still has the passed etag. This uses an
+           'if-match' precondition, so is performed atomically by
+           the object store
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+                data (bytes): Binary data to store in bucket
+                etag (str): Etag returned by 'get_object_with_etag'
+           Returns:
+                str: Etag of the new object, or None if it was not set
+        """
+        if data is None:
+            data = b'0'
+
+        key = _clean_key(key)
+
+        try:
+            response = bucket["client"].put_object(bucket["namespace"],
+                                                   bucket["bucket_name"],
+                                                   key, _io.BytesIO(data),
+                                                   if_match=etag)
+        except Exception as e:
+            if _is_precondition_failure(e):
+                return None
+            raise
+
+        return response.headers["etag"]
+
+    @staticmethod
+    def set_object_from_stream(bucket, key, stream, part_size=None,
+                               max_workers=None):
+        """Set the value of 'key' in 'bucket' to the binary data read
+           from the passed file-like 'stream'. Data that fits into a
+           single part is uploaded with a single request. Larger data
+           is uploaded using an OCI multipart upload, with up to
+           'max_workers' parts of 'part_size' bytes uploaded in
+           parallel. Each part is checksummed (and verified by OCI)
+           and retried individually on failure, and the upload is
+           only committed once every part has been uploaded
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+                stream (file): File-like object to read the data from
+                part_size (int, default=None): Size of each part (bytes)
+                max_workers (int, default=None): Maximum number of
+                parts to upload in parallel
+           Returns:
+                tuple (int, str): Size and MD5 checksum of the object
+        """
+        import hashlib as _hashlib
+
+        if part_size is None:
+            part_size = _default_part_size
+        else:
+            part_size = max(int(part_size), _min_part_size)
+
+        if max_workers is None:
+            max_workers = _default_upload_workers
+        else:
+            max_workers = max(int(max_workers), 1)
+
+        key = _clean_key(key)
+        client = bucket["client"]
+
+        md5 = _hashlib.md5()
+        data = _read_part(stream, part_size)
+        md5.update(data)
+
+        if len(data) < part_size:
+            # this is small enough to upload in one request
+            _retry(lambda: client.put_object(bucket["namespace"],
+                                             bucket["bucket_name"],
+                                             key, _io.BytesIO(data)))
+            return (len(data), md5.hexdigest())
+
+        try:
+            from oci.object_storage.models import \
+                CreateMultipartUploadDetails as _CreateMultipartUploadDetails
+            from oci.object_storage.models import \
+                CommitMultipartUploadDetails as _CommitMultipartUploadDetails
+            from oci.object_storage.models import \
+                CommitMultipartUploadPartDetails as \
+                _CommitMultipartUploadPartDetails
+        except:
+            raise ImportError(
+                "Cannot import OCI. Please install OCI, e.g. via "
+                "'pip install oci' so that you can connect to the "
+                "Oracle Cloud Infrastructure")
+
+        request = _CreateMultipartUploadDetails()
+        request.object = key
+
+        upload_id = client.create_multipart_upload(
+                                bucket["namespace"], bucket["bucket_name"],
+                                request).data.upload_id
+
+        def _upload_part(part_num, data):
+            import base64 as _base64
+            checksum = _base64.b64encode(
+                            _hashlib.md5(data).digest()).decode("utf-8")
+
+            response = _retry(lambda: client.upload_part(
+                                bucket["namespace"], bucket["bucket_name"],
+                                key, upload_id, part_num,
+                                _io.BytesIO(data), content_md5=checksum))
+
+            return response.headers["etag"]
+
+        from concurrent.futures import ThreadPoolExecutor \
+            as _ThreadPoolExecutor
+        from concurrent.futures import wait as _wait
+        from concurrent.futures import FIRST_COMPLETED as _FIRST_COMPLETED
+
+        size = 0
+        futures = {}
+
+        try:
+            with _ThreadPoolExecutor(max_workers=max_workers) as pool:
+                pending = set()
+                part_num = 0
+
+                while len(data) > 0:
+                    part_num += 1
+                    size += len(data)
+
+                    future = pool.submit(_upload_part, part_num, data)
+                    futures[part_num] = future
+                    pending.add(future)
+
+                    # bound the number of parts held in memory
+                    while len(pending) >= max_workers:
+                        (done, pending) = _wait(pending,
+                                                return_when=_FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+
+                    if len(data) < part_size:
+                        break
+
+                    data = _read_part(stream, part_size)
+                    md5.update(data)
+
+                parts = []
+
+                for part_num in sorted(futures.keys()):
+                    part = _CommitMultipartUploadPartDetails()
+                    part.part_num = part_num
+                    part.etag = futures[part_num].result()
+                    parts.append(part)
+
+            request = _CommitMultipartUploadDetails()
+            request.parts_to_commit = parts
+
+            _retry(lambda: client.commit_multipart_upload(
+                                bucket["namespace"], bucket["bucket_name"],
+                                key, upload_id, request))
+        except Exception as e:
+            try:
+                client.abort_multipart_upload(bucket["namespace"],
+                                              bucket["bucket_name"],
+                                              key, upload_id)
+            except:
+                pass
+
+            from Acquire.ObjectStore import ObjectStoreError
+            raise ObjectStoreError(
+                "Unable to upload the object '%s' in multiple parts: %s" %
+                (key, str(e)))
+
+        return (size, md5.hexdigest())
+
     @staticmethod
     def delete_all_objects(bucket, prefix=None):
-        """Deletes all objects...
+        """Deletes all objects (that start with 'prefix')
 
            Args:
                 bucket (dict): Bucket containing data
-                prefix (str, default=None): Prefix for data,
-                currently unused
+                prefix (str, default=None): Prefix for data
             Returns:
                 None
         """
+        OCI_ObjectStore.delete_prefix(bucket, prefix)
 
-        for obj in OCI_ObjectStore.get_all_object_names(bucket):
-            bucket["client"].delete_object(bucket["namespace"],
-                                           bucket["bucket_name"],
-                                           obj)
+    @staticmethod
+    def delete_objects(bucket, keys, max_workers=None):
+        """Remove the objects at all of the passed 'keys', deleting the
+           objects concurrently using a pool of at most 'max_workers'
+           threads (OCI has no batch delete)
+
+           Args:
+                bucket (dict): Bucket containing data
+                keys (list): Keys for data
+                max_workers (int, default=None): Maximum number of threads
+           Returns:
+                tuple (int, dict): Number of objects deleted and
+                errors, keyed by key
+        """
+        from Acquire.ObjectStore import run_in_pool as _run_in_pool
+
+        def _delete(key):
+            try:
+                bucket["client"].delete_object(bucket["namespace"],
+                                               bucket["bucket_name"],
+                                               _clean_key(key))
+                return True
+            except Exception as e:
+                if getattr(e, "status", None) == 404:
+                    return False
+                else:
+                    raise
+
+        (results, errors) = _run_in_pool(_delete, keys,
+                                         max_workers=max_workers)
+
+        return (list(results.values()).count(True), errors)
+
+    @staticmethod
+    def delete_prefix(bucket, prefix, max_workers=None):
+        """Remove all objects whose keys start with 'prefix'
+
+           Args:
+                bucket (dict): Bucket containing data
+                prefix (str): Prefix of the keys to delete
+                max_workers (int, default=None): Maximum number of threads
+           Returns:
+                tuple (int, dict): Number of objects deleted and
+                errors, keyed by key
+        """
+        from Acquire.ObjectStore._objstore import _delete_prefix_in_batches
+
+        return _delete_prefix_in_batches(OCI_ObjectStore.iter_object_names,
+                                         OCI_ObjectStore.delete_objects,
+                                         bucket, prefix, max_workers)
 
     @staticmethod
     def delete_object(bucket, key):
@@ -717,7 +1212,9 @@ class OCI_ObjectStore:
     @staticmethod
     def get_size_and_checksum(bucket, key):
         """Return the object size (in bytes) and MD5 checksum of the
-           object in the passed bucket at the specified key
+           object in the passed bucket at the specified key. These are
+           read from the object metadata (via a HEAD request), so the
+           data is only downloaded if the object has no MD5 checksum
 
            Args:
                 bucket (dict): Bucket containing data
@@ -729,15 +1226,27 @@ class OCI_ObjectStore:
         key = _clean_key(key)
 
         try:
-            response = bucket["client"].get_object(bucket["namespace"],
-                                                   bucket["bucket_name"],
-                                                   key)
+            response = bucket["client"].head_object(bucket["namespace"],
+                                                    bucket["bucket_name"],
+                                                    key)
         except:
             from Acquire.ObjectStore import ObjectStoreError
             raise ObjectStoreError("No data at key '%s'" % key)
 
         content_length = response.headers["Content-Length"]
-        checksum = response.headers["Content-MD5"]
+        checksum = response.headers.get("Content-MD5", None)
+
+        if checksum is None:
+            checksum = response.headers.get("opc-content-md5", None)
+
+        if checksum is None:
+            # objects created via a multipart upload only have the
+            # MD5 of their parts (opc-multipart-md5), so we have to
+            # calculate the checksum by streaming the data
+            from Acquire.ObjectStore._objstore import \
+                _get_streamed_size_and_checksum
+            return _get_streamed_size_and_checksum(
+                        OCI_ObjectStore.open_object(bucket, key))
 
         # the checksum is a base64 encoded Content-MD5 header
         # described as standard part of HTTP RFC 2616. Need to
@@ -6,6 +6,23 @@ import os as _os
 __all__ = ["OSPar", "BucketReader", "BucketWriter",
            "ObjectReader", "ObjectWriter"]
 
+# The default number of ranges of an object that are downloaded in
+# parallel by 'get_object_as_file'
+_default_parallelism = 8
+
+# The size of each range that is downloaded
+_default_range_size = 8 * 1024 * 1024
+
+# The number of times a range is retried before the download fails
+_range_retries = 3
+
+# The default number of objects that are transferred in parallel by
+# the bulk operations of BucketReader and BucketWriter
+_default_bulk_parallelism = 16
+
+# The number of times an object is retried before a bulk transfer fails
+_object_retries = 3
+
 
 class OSPar:
     """This class holds the result of a pre-authenticated request
@@ -561,6 +578,18 @@ def _url_to_filepath(url):
     return url[7:]
 
 
+def _is_local(url):
+    """Internal function that returns whether the passed url refers
+       to a local (testing or sqlite) object store
+
+       Args:
+            url (str): URL to check
+       Returns:
+            bool: True if the URL is local, else False
+    """
+    return url.startswith("file://") or url.startswith("sqlite://")
+
+
 def _read_local(url):
     """Internal function used to read data from the local testing object
        store
@@ -570,15 +599,21 @@ def _read_local(url):
        Returns:
             bytes: Data read from file
     """
+    if url.startswith("sqlite://"):
+        from ._sqlite_objstore import _read_par_url
+        return _read_par_url(url)
+
     with open("%s._data" % _url_to_filepath(url), "rb") as FILE:
         return FILE.read()
 
 
-def _read_remote(url):
-    """Internal function used to read data from a remote URL
+def _read_remote(url, session=None):
+    """Internal function used to read data from a remote URL, optionally
+       using the passed (pooled) requests session
 
        Args:
             url (str): Remote URL from which to read data
+            session (Session, default=None): Session to use
        Returns:
             str: HTTP request content
 
@@ -587,8 +622,11 @@ def _read_remote(url):
     response = None
 
     try:
-        from Acquire.Stubs import requests as _requests
-        response = _requests.get(url)
+        if session is None:
+            from Acquire.Stubs import requests as _requests
+            session = _requests
+
+        response = session.get(url)
         status_code = response.status_code
     except Exception as e:
         from Acquire.Client import PARReadError
@@ -607,6 +645,249 @@ def _read_remote(url):
     return output
 
 
+def _retry(function, retries):
+    """Internal function that calls 'function()', retrying up to
+       'retries' times (with exponential backoff) if it raises an
+       exception. This returns the result of the function
+
+       Args:
+            function (function): Function to call
+            retries (int): Number of times to retry
+       Returns:
+            object: Result of the function
+    """
+    import time as _time
+
+    for attempt in range(0, retries + 1):
+        try:
+            return function()
+        except Exception:
+            if attempt == retries:
+                raise
+
+            _time.sleep(0.1 * (2 ** attempt))
+
+
+def _create_http_session(parallelism):
+    """Internal function that returns a new requests session that keeps
+       open 'parallelism' connections, so that it can be shared by the
+       threads of a bulk transfer
+
+       Args:
+            parallelism (int): Number of connections to keep open
+       Returns:
+            Session: New requests session
+    """
+    from Acquire.Stubs import requests as _requests
+    from Acquire.Service._client_pool import _tune_session
+
+    session = _requests.Session()
+    _tune_session(session, pool_maxsize=parallelism)
+
+    return session
+
+
+def _transfer_all(function, items, parallelism, progress):
+    """Internal function used by the bulk operations to call
+       'function(item)' for every item, using a pool of 'parallelism'
+       threads. Each item is retried if it fails. If 'progress'
+       is passed then this is called as 'progress(ndone, ntotal)'
+       as each item is finished. This returns the results and
+       errors, keyed by item
+
+       Args:
+            function (function): Function to call for each item
+            items (list): Items to transfer
+            parallelism (int): Number of parallel transfers
+            progress (function): Progress callback, or None
+       Returns:
+            tuple (dict, dict): Results and errors, keyed by item
+    """
+    import threading as _threading
+    from Acquire.ObjectStore import run_in_pool as _run_in_pool
+
+    items = list(items)
+    ntotal = len(items)
+    ndone = [0]
+    lock = _threading.Lock()
+
+    def _transfer(item):
+        try:
+            return _retry(lambda: function(item), _object_retries)
+        finally:
+            if progress is not None:
+                with lock:
+                    ndone[0] += 1
+                    progress(ndone[0], ntotal)
+
+    return _run_in_pool(_transfer, items, max_workers=parallelism)
+
+
+def _read_local_to_file(url, filename):
+    """Internal function used to copy the data from the local testing
+       object store to the file called 'filename'
+
+       Args:
+            url (str): URL from which to read data
+            filename (str): Name of the file to write
+       Returns:
+            None
+    """
+    if url.startswith("sqlite://"):
+        with open(filename, "wb") as FILE:
+            FILE.write(_read_local(url))
+    else:
+        import shutil as _shutil
+        _shutil.copyfile("%s._data" % _url_to_filepath(url), filename)
+
+
+def _get_remote_size(url):
+    """Internal function that uses a HEAD request to get the size of
+       the object at the passed remote URL. This returns None if the
+       size is not known, or if the server does not support
+       ranged requests
+
+       Args:
+            url (str): Remote URL of the object
+       Returns:
+            int: Size of the object in bytes, or None
+    """
+    try:
+        from Acquire.Stubs import requests as _requests
+        response = _requests.head(url)
+
+        if response.status_code != 200:
+            return None
+
+        if response.headers.get("Accept-Ranges", "none").lower() != "bytes":
+            return None
+
+        return int(response.headers["Content-Length"])
+    except Exception:
+        return None
+
+
+def _read_remote_range(url, start, end):
+    """Internal function used to read the bytes from 'start' to 'end'
+       (inclusive) of the object at the passed remote URL
+
+       Args:
+            url (str): Remote URL from which to read data
+            start (int): Index of the first byte to read
+            end (int): Index of the last byte to read
+       Returns:
+            bytes: Data read from the URL
+    """
+    from Acquire.Stubs import requests as _requests
+
+    response = _requests.get(url, headers={"Range": "bytes=%d-%d" %
+                                           (start, end)})
+
+    if response.status_code != 206:
+        from Acquire.Client import PARReadError
+        raise PARReadError(
+            "Failed to read bytes %d-%d from the OSPar URL. HTTP status "
+            "code = %s" % (start, end, response.status_code))
+
+    data = response.content
+
+    if len(data) != end - start + 1:
+        from Acquire.Client import PARReadError
+        raise PARReadError(
+            "Failed to read bytes %d-%d from the OSPar URL. Only "
+            "received %d bytes" % (start, end, len(data)))
+
+    return data
+
+
+def _read_remote_to_file(url, filename, parallelism=None, range_size=None):
+    """Internal function used to download the object at the passed
+       remote URL to the file called 'filename'. If the size of the
+       object is known, then the object is downloaded as ranges of
+       'range_size' bytes, with up to 'parallelism' ranges downloaded
+       at once. Each range is written directly into its place in the
+       preallocated file, and is retried if the download fails
+
+       Args:
+            url (str): Remote URL from which to read data
+            filename (str): Name of the file to write
+            parallelism (int, default=None): Number of parallel ranges
+            range_size (int, default=None): Size of each range in bytes
+       Returns:
+            None
+    """
+    if parallelism is None:
+        parallelism = _default_parallelism
+
+    if range_size is None:
+        range_size = _default_range_size
+
+    parallelism = int(parallelism)
+    range_size = max(1, int(range_size))
+
+    size = None
+
+    if parallelism > 1:
+        size = _get_remote_size(url)
+
+    if size is None or size <= range_size:
+        # stream the object to the file in a single request
+        from Acquire.Stubs import requests as _requests
+
+        try:
+            response = _requests.get(url, stream=True)
+        except Exception as e:
+            from Acquire.Client import PARReadError
+            raise PARReadError(
+                "Cannot read the remote OSPar URL '%s' because of a "
+                "possible nework issue: %s" % (url, str(e)))
+
+        if response.status_code != 200:
+            from Acquire.Client import PARReadError
+            raise PARReadError(
+                "Failed to read data from the OSPar URL. HTTP status "
+                "code = %s" % response.status_code)
+
+        with open(filename, "wb") as FILE:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                FILE.write(chunk)
+
+        return
+
+    from Acquire.ObjectStore import run_in_pool as _run_in_pool
+
+    ranges = [(start, min(start + range_size, size) - 1)
+              for start in range(0, size, range_size)]
+
+    with open(filename, "wb") as FILE:
+        FILE.truncate(size)
+        fd = FILE.fileno()
+
+        def _download(r):
+            (start, end) = r
+
+            data = _retry(lambda: _read_remote_range(url, start, end),
+                          _range_retries)
+
+            if hasattr(_os, "pwrite"):
+                _os.pwrite(fd, data, start)
+            else:
+                with open(filename, "r+b") as RANGE_FILE:
+                    RANGE_FILE.seek(start)
+                    RANGE_FILE.write(data)
+
+        (_, errors) = _run_in_pool(_download, ranges,
+                                   max_workers=parallelism)
+
+    if len(errors) > 0:
+        (start, end) = min(errors.keys())
+        from Acquire.Client import PARReadError
+        raise PARReadError(
+            "Failed to download bytes %d-%d (and %d other ranges) from "
+            "the OSPar URL: %s" % (start, end, len(errors) - 1,
+                                   errors[(start, end)]))
+
+
 def _list_local(url):
     """Internal function to list all of the objects keys below 'url'
 
@@ -615,12 +896,20 @@ def _list_local(url):
        Returns:
             list: List of object keys
     """
+    if url.startswith("sqlite://"):
+        from ._sqlite_objstore import _list_par_url
+        return _list_par_url(url)
+
     local_dir = _url_to_filepath(url)
 
     keys = []
 
     for dirpath, _, filenames in _os.walk(local_dir):
         local_path = dirpath[len(local_dir):]
+
+        while local_path.startswith("/"):
+            local_path = local_path[1:]
+
         has_local_path = (len(local_path) > 0)
 
         for filename in filenames:
@@ -653,36 +942,66 @@ def _write_local(url, data):
 
        Args:
             url (str): URL to write data to
-            data (bytes): Data to write
+            data (bytes or file): Data to write, or an open binary
+            file from which the data will be streamed
        Returns:
             None
     """
+    if url.startswith("sqlite://"):
+        from ._sqlite_objstore import _write_par_url
+        return _write_par_url(url, data)
+
+    from hashlib import md5 as _md5
+    from ._testing_objstore import _write_checksum
+
     filename = "%s._data" % _url_to_filepath(url)
 
+    def _write(FILE):
+        md5 = _md5()
+
+        if hasattr(data, "read"):
+            for chunk in iter(lambda: data.read(1024 * 1024), b""):
+                md5.update(chunk)
+                FILE.write(chunk)
+        else:
+            md5.update(data)
+            FILE.write(data)
+
+        FILE.flush()
+        return md5.hexdigest()
+
     try:
         with open(filename, 'wb') as FILE:
-            FILE.write(data)
-            FILE.flush()
+            md5 = _write(FILE)
     except:
         directory = "/".join(filename.split("/")[0:-1])
         _os.makedirs(directory, exist_ok=True)
         with open(filename, 'wb') as FILE:
-            FILE.write(data)
-            FILE.flush()
+            md5 = _write(FILE)
 
+    # record the checksum, so that uploads can be validated
+    # without re-reading the data
+    _write_checksum(filename, md5)
 
-def _write_remote(url, data):
-    """Internal function used to write data to the passed remote URL
+
+def _write_remote(url, data, session=None):
+    """Internal function used to write data to the passed remote URL.
+       If 'data' is an open file then it is streamed to the URL,
+       rather than being read into memory
 
        Args:
             url (str): Remote URL to write data to
-            data (bytes): Data to write
+            data (bytes or file): Data to write
+            session (Session, default=None): Session to use
        Returns:
             None
     """
     try:
-        from Acquire.Stubs import requests as _requests
-        response = _requests.put(url, data=data)
+        if session is None:
+            from Acquire.Stubs import requests as _requests
+            session = _requests
+
+        response = session.put(url, data=data)
         status_code = response.status_code
     except Exception as e:
         from Acquire.Client import PARWriteError
@@ -709,11 +1028,30 @@ def _join_bucket_and_prefix(url, prefix):
             str: URL and prefix processed concatenated
     """
     if prefix is None:
-        return url
+        return (url, "")
 
     parts = prefix.split("/")
 
-    return ("%s/%s" % (url, "/".join(parts[0:-2])), parts[-1])
+    return ("%s/%s" % (url, "/".join(parts[0:-1])), parts[-1])
+
+
+def _join_bucket_and_key(url, key):
+    """Return the URL of the object with passed key in the bucket
+       at the passed URL
+
+       Args:
+            url (str): URL of the bucket
+            key (str): Key of the object
+       Returns:
+            str: URL of the object
+    """
+    while key.startswith("/"):
+        key = key[1:]
+
+    if url.endswith("/"):
+        return "%s%s" % (url, key)
+    else:
+        return "%s/%s" % (url, key)
 
 
 class BucketReader:
@@ -745,6 +1083,8 @@ class BucketReader:
         else:
             self._par = None
 
+        self._session = None
+
     def get_object(self, key):
         """Return the binary data contained in the key 'key' in the
            passed bucket
@@ -758,34 +1098,76 @@ class BucketReader:
             from Acquire.Client import PARError
             raise PARError("You cannot read data from an empty OSPar")
 
-        while key.startswith("/"):
-            key = key[1:]
+        url = _join_bucket_and_key(self._url, key)
 
-        url = self._url
-
-        if url.endswith("/"):
-            url = "%s%s" % (url, key)
-        else:
-            url = "%s/%s" % (url, key)
-
-        if url.startswith("file://"):
+        if _is_local(url):
             return _read_local(url)
         else:
-            return _read_remote(url)
+            return _read_remote(url, session=self._session)
+
+    def get_objects(self, keys, parallelism=None, progress=None):
+        """Return the binary data contained in all of the passed
+           'keys' in the bucket. The objects are read concurrently,
+           using up to 'parallelism' requests over a shared pool of
+           connections, and each object is retried if it fails. If
+           'progress' is passed then this is called as
+           progress(ndone, ntotal) as each object is read
 
-    def get_object_as_file(self, key, filename):
+           Args:
+                keys (list): Keys of the objects to read
+                parallelism (int, default=None): Number of parallel reads
+                progress (function, default=None): Progress callback
+           Returns:
+                dict: Data of each object, keyed by key
+        """
+        if self._par is None:
+            from Acquire.Client import PARError
+            raise PARError("You cannot read data from an empty OSPar")
+
+        if parallelism is None:
+            parallelism = _default_bulk_parallelism
+
+        if self._session is None and not _is_local(self._url):
+            self._session = _create_http_session(parallelism)
+
+        (objects, errors) = _transfer_all(self.get_object, keys,
+                                          parallelism, progress)
+
+        if len(errors) > 0:
+            key = sorted(errors.keys())[0]
+            from Acquire.Client import PARReadError
+            raise PARReadError(
+                "Failed to read the object '%s' (and %d other objects) "
+                "from the OSPar: %s" % (key, len(errors) - 1, errors[key]))
+
+        return objects
+
+    def get_object_as_file(self, key, filename, parallelism=None,
+                           range_size=None):
         """Get the object contained in the key 'key' in the passed 'bucket'
-           and writing this to the file called 'filename'
+           and writing this to the file called 'filename'. Large
+           objects are downloaded as 'parallelism' concurrent ranged
+           requests, each of 'range_size' bytes
 
            Args:
                 key (str): Key to access data in bucket
+                filename (str): Name of the file to write
+                parallelism (int, default=None): Number of parallel ranges
+                range_size (int, default=None): Size of each range in bytes
            Returns:
                 None
         """
-        objdata = self.get_object(key)
+        if self._par is None:
+            from Acquire.Client import PARError
+            raise PARError("You cannot read data from an empty OSPar")
 
-        with open(filename, "wb") as FILE:
-            FILE.write(objdata)
+        url = _join_bucket_and_key(self._url, key)
+
+        if _is_local(url):
+            _read_local_to_file(url, filename)
+        else:
+            _read_remote_to_file(url, filename, parallelism=parallelism,
+                                 range_size=range_size)
 
     def get_string_object(self, key):
         """Return the string in 'bucket' associated with 'key'
@@ -809,14 +1191,14 @@ class BucketReader:
            the passed bucket. This raises an exception if there is no
            data or the OSPar has expired
         """
-        data = self.get_string_object(key)
-        return _json.loads(data)
+        from Acquire.ObjectStore import decode_document as _decode_document
+        return _decode_document(self.get_object(key))
 
     def get_all_object_names(self, prefix=None):
         """Returns the names of all objects in the passed bucket"""
         (url, part) = _join_bucket_and_prefix(self._url, prefix)
 
-        if url.startswith("file://"):
+        if _is_local(url):
             objnames = _list_local(url)
         else:
             objnames = _list_remote(url)
@@ -826,6 +1208,8 @@ class BucketReader:
         matches = []
 
         if len(part) > 0:
+            part = "%s/" % part
+
             for objname in objnames:
                 if objname.startswith(part):
                     objname = objname[len(part):]
@@ -839,25 +1223,33 @@ class BucketReader:
 
         return matches
 
-    def get_all_objects(self, prefix=None):
-        """Return all of the objects in the passed bucket"""
+    def get_all_objects(self, prefix=None, parallelism=None, progress=None):
+        """Return all of the objects in the passed bucket (optionally
+           only those below 'prefix'), keyed by their name relative to
+           'prefix'. The objects are read concurrently, using up to
+           'parallelism' requests. If 'progress' is passed then this
+           is called as progress(ndone, ntotal) as each object is read
+        """
         names = self.get_all_object_names(prefix)
 
-        objects = {}
-
         if prefix:
-            for name in names:
-                objects[name] = self.get_object(
-                                    "%s/%s" % (prefix, name))
+            while prefix.endswith("/"):
+                prefix = prefix[0:-1]
+
+            keys = dict(("%s/%s" % (prefix, name), name) for name in names)
         else:
-            for name in names:
-                objects[name] = self.get_object(name)
+            keys = dict((name, name) for name in names)
 
-        return objects
+        objects = self.get_objects(list(keys.keys()),
+                                   parallelism=parallelism,
+                                   progress=progress)
 
-    def get_all_strings(self, prefix=None):
+        return dict((keys[key], data) for (key, data) in objects.items())
+
+    def get_all_strings(self, prefix=None, parallelism=None, progress=None):
         """Return all of the strings in the passed bucket"""
-        objects = self.get_all_objects(prefix)
+        objects = self.get_all_objects(prefix, parallelism=parallelism,
+                                       progress=progress)
 
         names = list(objects.keys())
 
@@ -895,33 +1287,58 @@ class BucketWriter:
         else:
             self._par = None
 
+        self._session = None
+
     def set_object(self, key, data):
         """Set the value of 'key' in 'bucket' to binary 'data'"""
         if self._par is None:
             from Acquire.Client import PARError
             raise PARError("You cannot write data to an empty OSPar")
 
-        while key.startswith("/"):
-            key = key[1:]
-
-        url = self._url
-
-        if url.endswith("/"):
-            url = "%s%s" % (url, key)
-        else:
-            url = "%s/%s" % (url, key)
+        url = _join_bucket_and_key(self._url, key)
 
-        if url.startswith("file://"):
+        if _is_local(url):
             return _write_local(url, data)
         else:
-            return _write_remote(url, data)
+            return _write_remote(url, data, session=self._session)
+
+    def set_objects(self, objects, parallelism=None, progress=None):
+        """Set the values of all of the keys in the passed dictionary
+           'objects' to their binary data. The objects are written
+           concurrently, using up to 'parallelism' requests over a
+           shared pool of connections, and each object is retried
+           if it fails. If 'progress' is passed then this is called
+           as progress(ndone, ntotal) as each object is written
+        """
+        if self._par is None:
+            from Acquire.Client import PARError
+            raise PARError("You cannot write data to an empty OSPar")
+
+        if parallelism is None:
+            parallelism = _default_bulk_parallelism
+
+        if self._session is None and not _is_local(self._url):
+            self._session = _create_http_session(parallelism)
+
+        def _write(key):
+            self.set_object(key, objects[key])
+
+        (_, errors) = _transfer_all(_write, objects.keys(),
+                                    parallelism, progress)
+
+        if len(errors) > 0:
+            key = sorted(errors.keys())[0]
+            from Acquire.Client import PARWriteError
+            raise PARWriteError(
+                "Failed to write the object '%s' (and %d other objects) "
+                "to the OSPar: %s" % (key, len(errors) - 1, errors[key]))
 
     def set_object_from_file(self, key, filename):
         """Set the value of 'key' in 'bucket' to equal the contents
-           of the file located by 'filename'"""
+           of the file located by 'filename'. The file is streamed
+           to the bucket rather than being read into memory"""
         with open(filename, "rb") as FILE:
-            data = FILE.read()
-            self.set_object(key, data)
+            self.set_object(key, FILE)
 
     def set_string_object(self, key, string_data):
         """Set the value of 'key' in 'bucket' to the string 'string_data'"""
@@ -963,18 +1380,28 @@ class ObjectReader:
 
         url = self._url
 
-        if url.startswith("file://"):
+        if _is_local(url):
             return _read_local(url)
         else:
             return _read_remote(url)
 
-    def get_object_as_file(self, filename):
+    def get_object_as_file(self, filename, parallelism=None,
+                           range_size=None):
         """Get the object contained in this OSPar and write this to
-           the file called 'filename'"""
-        objdata = self.get_object()
+           the file called 'filename'. Large objects are downloaded
+           as 'parallelism' concurrent ranged requests, each of
+           'range_size' bytes, which are written directly to the file"""
+        if self._par is None:
+            from Acquire.Client import PARError
+            raise PARError("You cannot read data from an empty OSPar")
 
-        with open(filename, "wb") as FILE:
-            FILE.write(objdata)
+        url = self._url
+
+        if _is_local(url):
+            _read_local_to_file(url, filename)
+        else:
+            _read_remote_to_file(url, filename, parallelism=parallelism,
+                                 range_size=range_size)
 
     def get_string_object(self):
         """Return the object behind this OSPar as a string (raises exception
@@ -993,8 +1420,8 @@ class ObjectReader:
            this OSPar. This raises an exception if there is no data
            or the OSPar has expired
         """
-        data = self.get_string_object()
-        return _json.loads(data)
+        from Acquire.ObjectStore import decode_document as _decode_document
+        return _decode_document(self.get_object())
 
 
 class ObjectWriter(ObjectReader):
@@ -1031,17 +1458,17 @@ class ObjectWriter(ObjectReader):
 
         url = self._url
 
-        if url.startswith("file://"):
+        if _is_local(url):
             return _write_local(url, data)
         else:
             return _write_remote(url, data)
 
     def set_object_from_file(self, filename):
         """Set the value of the object behind this OSPar to equal the contents
-           of the file located by 'filename'"""
+           of the file located by 'filename'. The file is streamed
+           to the object rather than being read into memory"""
         with open(filename, "rb") as FILE:
-            data = FILE.read()
-            self.set_object(data)
+            self.set_object(FILE)
 
     def set_string_object(self, string_data):
         """Set the value of the object behind this OSPar to the
@@ -3,6 +3,28 @@ __all__ = ["OSParRegistry"]
 
 _registry_key = "registry/pars"
 
+# The maximum number of expired PARs that are swept in a single call
+# to OSParRegistry.sweep
+_default_max_sweep = 1000
+
+
+def _expiry_bucket(expires):
+    """Internal function that returns the (hourly) time bucket of the
+       expiry index that holds PARs that expire at the passed datetime
+       string. The buckets sort in time order, so the expired PARs
+       can be found by listing only the elapsed buckets
+    """
+    return expires[0:13]
+
+
+def _expiry_key(expire_string, par_uid):
+    """Internal function that returns the key in the expiry index
+       for the PAR with passed UID that expires at 'expire_string'
+    """
+    return "%s/expire/%s/%s/%s" % (_registry_key,
+                                   _expiry_bucket(expire_string),
+                                   expire_string, par_uid)
+
 
 class OSParRegistry:
     """This is a OSPar registry that is used
@@ -68,7 +90,7 @@ class OSParRegistry:
         bucket = _get_service_account_bucket()
         _ObjectStore.set_object_from_json(bucket, key, data)
 
-        key = "%s/expire/%s/%s" % (_registry_key, expire_string, par.uid())
+        key = _expiry_key(expire_string, par.uid())
         _ObjectStore.set_object_from_json(bucket, key, par.uid())
 
     @staticmethod
@@ -168,7 +190,7 @@ class OSParRegistry:
 
         bucket = _get_service_account_bucket()
 
-        key = "%s/expire/%s/%s" % (_registry_key, expire_string, par.uid())
+        key = _expiry_key(expire_string, par.uid())
         try:
             _ObjectStore.delete_object(bucket=bucket, key=key)
         except:
@@ -188,3 +210,134 @@ class OSParRegistry:
         if "cleanup_function" in data:
             cleanup_function = _Function.from_data(data["cleanup_function"])
             cleanup_function(par=par)
+
+    @staticmethod
+    def sweep(before=None, max_pars=None, max_workers=None):
+        """Sweep the registry for PARs that expired before 'before'
+           (or now, if this is not passed). Only the elapsed buckets of
+           the expiry index are listed, and at most 'max_pars' expired
+           PARs are swept per call. The cleanup_function of each
+           expired PAR is called (using a pool of at most
+           'max_workers' threads) and the registration is then
+           removed. Registrations that cannot be loaded are kept, so
+           that they are swept again by a later call. As the PARs
+           have expired they can no longer be used, so there is
+           nothing to close in the object store. This is designed to
+           be called regularly, e.g. from a cron function of the
+           service. This returns a dictionary containing the number
+           of PARs swept, the errors (keyed by PAR UID) and whether
+           or not all expired PARs were swept. Nothing is swept if
+           this is not running as a service
+        """
+        from Acquire.Service import is_running_service as _is_running_service
+
+        if not _is_running_service():
+            return {"nswept": 0, "errors": {}, "finished": True}
+
+        from Acquire.Service import get_service_account_bucket \
+            as _get_service_account_bucket
+
+        from Acquire.ObjectStore import OSPar as _OSPar
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import ObjectStoreError as _ObjectStoreError
+        from Acquire.ObjectStore import Function as _Function
+        from Acquire.ObjectStore import run_in_pool as _run_in_pool
+        from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
+        from Acquire.ObjectStore import datetime_to_datetime \
+            as _datetime_to_datetime
+        from Acquire.ObjectStore import datetime_to_string \
+            as _datetime_to_string
+        from Acquire.ObjectStore import string_to_datetime \
+            as _string_to_datetime
+
+        if before is None:
+            before = _get_datetime_now()
+        else:
+            before = _datetime_to_datetime(before)
+
+        if max_pars is None:
+            max_pars = _default_max_sweep
+        else:
+            max_pars = int(max_pars)
+
+        last_bucket = _expiry_bucket(_datetime_to_string(before))
+
+        bucket = _get_service_account_bucket()
+
+        prefix = "%s/expire/" % _registry_key
+
+        expired = {}
+        finished = True
+
+        for name in _ObjectStore.iter_object_names(bucket=bucket,
+                                                   prefix=prefix,
+                                                   without_prefix=True):
+            parts = name.split("/")
+
+            if len(parts) == 3:
+                (_, expire_string, par_uid) = parts
+            elif len(parts) == 2:
+                # PARs registered before the index was bucketed
+                (expire_string, par_uid) = parts
+            else:
+                continue
+
+            if _expiry_bucket(expire_string) > last_bucket:
+                # the remaining buckets have not yet elapsed
+                break
+
+            if _string_to_datetime(expire_string) > before:
+                continue
+
+            if len(expired) >= max_pars:
+                finished = False
+                break
+
+            key = "%s/uid/%s/%s" % (_registry_key, par_uid, expire_string)
+            expired[key] = (prefix + name, par_uid)
+
+        def _load(key):
+            try:
+                return _ObjectStore.get_object_from_json(bucket=bucket,
+                                                         key=key)
+            except _ObjectStoreError:
+                # this PAR has already been closed
+                return None
+
+        (records, errors) = _run_in_pool(_load, expired.keys(),
+                                         max_workers)
+
+        # remove the registrations before cleaning up, as is done
+        # when the PAR is closed. Registrations that could not be
+        # loaded are kept, so that they are swept again later
+        keys = list(records.keys())
+        keys += [expired[key][0] for key in records.keys()]
+
+        (_, delete_errors) = _ObjectStore.delete_objects(
+                                        bucket=bucket, keys=keys,
+                                        max_workers=max_workers)
+        errors.update(delete_errors)
+
+        def _cleanup(key):
+            data = records[key]
+            cleanup_function = _Function.from_data(data["cleanup_function"])
+            cleanup_function(par=_OSPar.from_data(data["par"]))
+
+        cleanups = [key for (key, data) in records.items()
+                    if data is not None and "cleanup_function" in data]
+
+        (_, cleanup_errors) = _run_in_pool(_cleanup, cleanups, max_workers)
+        errors.update(cleanup_errors)
+
+        par_errors = {}
+
+        for (key, error) in errors.items():
+            if key in expired:
+                par_uid = expired[key][1]
+            else:
+                par_uid = key.split("/")[-1]
+
+            par_errors[par_uid] = str(error)
+
+        return {"nswept": len(records), "errors": par_errors,
+                "finished": finished}
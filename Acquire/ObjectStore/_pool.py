@@ -0,0 +1,60 @@
+__all__ = ["run_in_pool"]
+
+# The default maximum number of threads used to perform concurrent
+# object store operations. Most of the time is spent waiting for
+# the network, so this can be larger than the number of cores
+_default_max_workers = 8
+
+
+def run_in_pool(function, items, max_workers=None):
+    """Call 'function(item)' for every item in 'items', using a bounded
+       pool of at most 'max_workers' threads. This returns a pair of
+       dictionaries; the first maps each item to the value returned
+       by 'function', while the second maps each item that failed
+       to the exception that was raised. The items must therefore be
+       hashable (they are normally object store keys)
+
+       Args:
+            function (function): Function to call for each item
+            items (list): Items to pass to the function
+            max_workers (int, default=None): Maximum number of threads
+       Returns:
+            tuple (dict, dict): Results and errors, keyed by item
+    """
+    results = {}
+    errors = {}
+
+    items = list(items)
+
+    if max_workers is None:
+        max_workers = _default_max_workers
+    else:
+        max_workers = int(max_workers)
+
+    max_workers = min(max_workers, len(items))
+
+    if max_workers <= 1:
+        # no need to pay the cost of starting threads
+        for item in items:
+            try:
+                results[item] = function(item)
+            except Exception as e:
+                errors[item] = e
+
+        return (results, errors)
+
+    from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+
+    with _ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+
+        for item in items:
+            futures[item] = pool.submit(function, item)
+
+        for item, future in futures.items():
+            try:
+                results[item] = future.result()
+            except Exception as e:
+                errors[item] = e
+
+    return (results, errors)
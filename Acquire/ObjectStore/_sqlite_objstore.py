@@ -0,0 +1,812 @@
+import os as _os
+import datetime as _datetime
+import threading as _threading
+import uuid as _uuid
+
+__all__ = ["SQLite_ObjectStore"]
+
+# Each thread uses its own connection to each database, as sqlite
+# connections cannot be shared between threads
+_connections = _threading.local()
+
+# The size of the chunks read when streaming an object
+_chunk_size = 1024 * 1024
+
+# The number of names read from the index per listing query
+_default_page_size = 1000
+
+# Objects are kept in a normal (rowid) table so that their data can
+# be streamed using incremental blob I/O. The unique index on
+# (bucket, key) is a B-tree, so prefix listing is a range scan
+_schema = ["CREATE TABLE IF NOT EXISTS buckets ("
+           "name TEXT PRIMARY KEY NOT NULL)",
+           "CREATE TABLE IF NOT EXISTS objects ("
+           "bucket TEXT NOT NULL, "
+           "key TEXT NOT NULL, "
+           "data BLOB NOT NULL, "
+           "size INTEGER NOT NULL, "
+           "md5 TEXT NOT NULL, "
+           "etag TEXT NOT NULL)",
+           "CREATE UNIQUE INDEX IF NOT EXISTS objects_by_key "
+           "ON objects (bucket, key)"]
+
+
+def _connect(database):
+    """Internal function that returns this thread's connection to the
+       passed sqlite database, creating the connection (and the
+       schema) if needed. The database uses write-ahead logging so
+       that readers are never blocked by a writer
+    """
+    try:
+        connections = _connections.value
+    except AttributeError:
+        connections = {}
+        _connections.value = connections
+
+    try:
+        return connections[database]
+    except KeyError:
+        pass
+
+    import sqlite3 as _sqlite3
+
+    # autocommit mode - transactions are begun explicitly
+    conn = _sqlite3.connect(database, timeout=30, isolation_level=None,
+                            check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    for statement in _schema:
+        conn.execute(statement)
+
+    connections[database] = conn
+
+    return conn
+
+
+def _clean_key(key):
+    """This function cleans and returns a key so that it is suitable
+       for use both as a key and a directory/file path
+       e.g. it removes double-slashes
+
+       Args:
+            key (str): Key to clean
+       Returns:
+            str: Cleaned key
+
+    """
+    return _os.path.normpath(key)
+
+
+def _prefix_end(prefix):
+    """Internal function that returns the smallest string that is
+       greater than all strings that start with 'prefix'. This is
+       used to turn a prefix into a range scan of the index
+    """
+    return prefix[0:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _make_bucket(database, bucket_name):
+    """Internal function that returns the bucket called 'bucket_name'
+       in the passed database
+    """
+    return {"database": database, "bucket_name": bucket_name}
+
+
+def _no_object(key):
+    """Internal function that returns the error raised when there
+       is no object at 'key'
+    """
+    from Acquire.ObjectStore import ObjectStoreError
+    return ObjectStoreError("No object at key '%s'" % key)
+
+
+def _insert_stream(conn, bucket, key, stream, part_size, etag):
+    """Internal function that streams the data from the passed file-like
+       'stream' into a new object at 'key'. The data is first spooled
+       to a temporary file (to find its size) and is then written using
+       incremental blob I/O, so is never fully held in memory. This
+       must be called within a transaction. Returns the size and MD5
+       checksum of the object
+    """
+    import tempfile as _tempfile
+    from hashlib import md5 as _md5
+
+    md5 = _md5()
+    size = 0
+
+    with _tempfile.SpooledTemporaryFile(max_size=part_size) as spool:
+        for data in iter(lambda: stream.read(part_size), b""):
+            spool.write(data)
+            md5.update(data)
+            size += len(data)
+
+        spool.seek(0)
+        md5sum = md5.hexdigest()
+
+        conn.execute("DELETE FROM objects WHERE bucket=? AND key=?",
+                     (bucket["bucket_name"], key))
+
+        if not hasattr(conn, "blobopen"):
+            # incremental blob I/O needs python 3.11
+            conn.execute(
+                "INSERT INTO objects (bucket, key, data, size, md5, etag) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (bucket["bucket_name"], key, spool.read(), size, md5sum,
+                 etag))
+        else:
+            cursor = conn.execute(
+                "INSERT INTO objects (bucket, key, data, size, md5, etag) "
+                "VALUES (?, ?, zeroblob(?), ?, ?, ?)",
+                (bucket["bucket_name"], key, size, size, md5sum, etag))
+
+            if size > 0:
+                with conn.blobopen("objects", "data",
+                                   cursor.lastrowid) as blob:
+                    for data in iter(lambda: spool.read(part_size), b""):
+                        blob.write(data)
+
+    return (size, md5sum)
+
+
+def _split_par_url(url):
+    """Internal function that splits a PAR url of the form
+       "sqlite://<database>#<bucket_name>/<key>" into its
+       bucket and key (which is None for a bucket url)
+    """
+    (database, path) = url[len("sqlite://"):].split("#", 1)
+
+    parts = path.split("/", 1)
+
+    if len(parts) == 1 or len(parts[1]) == 0:
+        key = None
+    else:
+        key = parts[1]
+
+    return (_make_bucket(database, parts[0]), key)
+
+
+def _read_par_url(url):
+    """Internal function used by the OSPar readers to read the object
+       behind the passed sqlite PAR url
+    """
+    (bucket, key) = _split_par_url(url)
+    return SQLite_ObjectStore.get_object(bucket, key)
+
+
+def _write_par_url(url, data):
+    """Internal function used by the OSPar writers to write 'data'
+       (bytes or an open binary file) to the object behind the passed
+       sqlite PAR url
+    """
+    (bucket, key) = _split_par_url(url)
+
+    if hasattr(data, "read"):
+        SQLite_ObjectStore.set_object_from_stream(bucket, key, data)
+    else:
+        SQLite_ObjectStore.set_object(bucket, key, data)
+
+
+def _list_par_url(url):
+    """Internal function used by the OSPar readers to list the names
+       of all objects below the passed sqlite PAR url
+    """
+    (bucket, key) = _split_par_url(url)
+
+    if key is None:
+        prefix = None
+    else:
+        prefix = "%s/" % key
+
+    return SQLite_ObjectStore.get_all_object_names(bucket, prefix=prefix,
+                                                   without_prefix=True)
+
+
+def _get_driver_details_from_par(par):
+    from Acquire.ObjectStore import datetime_to_string \
+        as _datetime_to_string
+    import copy as _copy
+
+    details = _copy.copy(par._driver_details)
+
+    if details is None:
+        return {}
+    else:
+        # fix any non-string/number objects
+        details["created_datetime"] = _datetime_to_string(
+                                        details["created_datetime"])
+
+    return details
+
+
+def _get_driver_details_from_data(data):
+    from Acquire.ObjectStore import string_to_datetime \
+        as _string_to_datetime
+    import copy as _copy
+
+    details = _copy.copy(data)
+
+    if "created_datetime" in details:
+        details["created_datetime"] = _string_to_datetime(
+                                            details["created_datetime"])
+
+    return details
+
+
+class SQLite_ObjectStore:
+    """This is an object store that keeps all of the objects in a
+       single, local sqlite database. The keys are held in a sorted
+       B-tree index, so listing a prefix is a range scan, conditional
+       writes are transactional, and (using write-ahead logging)
+       any number of readers can run alongside a writer. This is
+       intended for development, CI and single-node deployments.
+
+       A bucket is a dictionary holding the filename of the
+       "database" and the "bucket_name"
+    """
+    @staticmethod
+    def create_bucket(bucket, bucket_name):
+        """Create and return a new bucket in the object store called
+           'bucket_name'. This will raise an
+           ObjectStoreError if this bucket already exists
+        """
+        bucket_name = str(bucket_name)
+        conn = _connect(bucket["database"])
+
+        cursor = conn.execute(
+                    "INSERT OR IGNORE INTO buckets (name) VALUES (?)",
+                    (bucket_name,))
+
+        if cursor.rowcount != 1:
+            from Acquire.ObjectStore import ObjectStoreError
+            raise ObjectStoreError(
+                "CANNOT CREATE NEW BUCKET '%s': EXISTS!" % bucket_name)
+
+        return _make_bucket(bucket["database"], bucket_name)
+
+    @staticmethod
+    def get_bucket(bucket, bucket_name, create_if_needed=True):
+        """Find and return a new bucket in the object store called
+           'bucket_name'. If 'create_if_needed' is True
+           then the bucket will be created if it doesn't exist. Otherwise,
+           if the bucket does not exist then an exception will be raised.
+        """
+        bucket_name = str(bucket_name)
+        conn = _connect(bucket["database"])
+
+        if create_if_needed:
+            conn.execute("INSERT OR IGNORE INTO buckets (name) VALUES (?)",
+                         (bucket_name,))
+        else:
+            row = conn.execute("SELECT 1 FROM buckets WHERE name=?",
+                               (bucket_name,)).fetchone()
+
+            if row is None:
+                from Acquire.ObjectStore import ObjectStoreError
+                raise ObjectStoreError(
+                    "There is no bucket available called '%s'"
+                    % (bucket_name))
+
+        return _make_bucket(bucket["database"], bucket_name)
+
+    @staticmethod
+    def get_bucket_name(bucket):
+        """Return the name of the passed bucket"""
+        return bucket["bucket_name"]
+
+    @staticmethod
+    def is_bucket_empty(bucket):
+        """Return whether or not the passed bucket is empty"""
+        conn = _connect(bucket["database"])
+
+        row = conn.execute("SELECT 1 FROM objects WHERE bucket=? LIMIT 1",
+                           (bucket["bucket_name"],)).fetchone()
+
+        return row is None
+
+    @staticmethod
+    def delete_bucket(bucket, force=False):
+        """Delete the passed bucket. This should be used with caution.
+           Normally you can only delete a bucket if it is empty. If
+           'force' is True then it will remove all objects/pars from
+           the bucket first, and then delete the bucket. This
+           can cause a LOSS OF DATA!
+        """
+        is_empty = SQLite_ObjectStore.is_bucket_empty(bucket=bucket)
+
+        if not is_empty:
+            if force:
+                SQLite_ObjectStore.delete_all_objects(bucket=bucket)
+            else:
+                raise PermissionError(
+                    "You cannot delete the bucket %s as it is not empty" %
+                    SQLite_ObjectStore.get_bucket_name(bucket=bucket))
+
+        conn = _connect(bucket["database"])
+        conn.execute("DELETE FROM buckets WHERE name=?",
+                     (bucket["bucket_name"],))
+
+    @staticmethod
+    def create_par(bucket, encrypt_key, key=None, readable=True,
+                   writeable=False, duration=3600, cleanup_function=None):
+        """Create a pre-authenticated request for the passed bucket and
+           key (if key is None then the request is for the entire bucket).
+           This will return a PAR object that will contain a URL that can
+           be used to access the object/bucket. If writeable is true, then
+           the URL will also allow the object/bucket to be written to.
+           PARs are time-limited. Set the lifetime in seconds by passing
+           in 'duration' (by default this is one hour). Note that you must
+           pass in a public key that will be used to encrypt this PAR. This is
+           necessary as the PAR grants access to anyone who can decrypt
+           the URL
+        """
+        from Acquire.Crypto import PublicKey as _PublicKey
+
+        if not isinstance(encrypt_key, _PublicKey):
+            from Acquire.Client import PARError
+            raise PARError(
+                "You must supply a valid PublicKey to encrypt the "
+                "returned PAR")
+
+        if key is not None:
+            key = _clean_key(key)
+
+            try:
+                SQLite_ObjectStore.get_size_and_checksum(bucket, key)
+            except Exception:
+                from Acquire.Client import PARError
+                raise PARError(
+                    "The object '%s' in bucket '%s' does not exist!" %
+                    (key, bucket["bucket_name"]))
+
+        url = "sqlite://%s#%s" % (bucket["database"], bucket["bucket_name"])
+
+        if key:
+            url = "%s/%s" % (url, key)
+
+        # get the time this PAR was created
+        from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
+        created_datetime = _get_datetime_now()
+
+        # get the UTC datetime when this PAR should expire
+        expires_datetime = created_datetime + \
+            _datetime.timedelta(seconds=duration)
+
+        # mimic limitations of OCI - cannot have a bucket PAR with
+        # read permissions!
+        if (key is None) and readable:
+            from Acquire.Client import PARError
+            raise PARError(
+                "You cannot create a Bucket PAR that has read permissions "
+                "due to a limitation in the underlying platform")
+
+        from Acquire.ObjectStore import OSPar as _OSPar
+        from Acquire.ObjectStore import OSParRegistry as _OSParRegistry
+
+        url_checksum = _OSPar.checksum(url)
+
+        driver_details = {"driver": "sqlite_objstore",
+                          "bucket": bucket,
+                          "created_datetime": created_datetime}
+
+        par = _OSPar(url=url, key=key, encrypt_key=encrypt_key,
+                     expires_datetime=expires_datetime,
+                     is_readable=readable, is_writeable=writeable,
+                     driver_details=driver_details)
+
+        _OSParRegistry.register(par=par, url_checksum=url_checksum,
+                                details_function=_get_driver_details_from_par,
+                                cleanup_function=cleanup_function)
+
+        return par
+
+    @staticmethod
+    def close_par(par=None, par_uid=None, url_checksum=None):
+        """Close the passed PAR, which provides access to data in the
+           passed bucket
+        """
+        from Acquire.ObjectStore import OSParRegistry as _OSParRegistry
+
+        if par is None:
+            par = _OSParRegistry.get(
+                        par_uid=par_uid,
+                        url_checksum=url_checksum,
+                        details_function=_get_driver_details_from_data)
+
+        from Acquire.ObjectStore import OSPar as _OSPar
+        if not isinstance(par, _OSPar):
+            raise TypeError("The PAR must be of type OSPar")
+
+        if par.driver() != "sqlite_objstore":
+            raise ValueError("Cannot delete a PAR that was not created "
+                             "by the sqlite object store")
+
+        # close the PAR - this will trigger any close_function(s)
+        _OSParRegistry.close(par=par)
+
+    @staticmethod
+    def get_object(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket"""
+        key = _clean_key(key)
+        conn = _connect(bucket["database"])
+
+        row = conn.execute("SELECT data FROM objects WHERE bucket=? AND key=?",
+                           (bucket["bucket_name"], key)).fetchone()
+
+        if row is None:
+            raise _no_object(key)
+
+        return bytes(row[0])
+
+    @staticmethod
+    def open_object(bucket, key):
+        """Return a read-only, file-like stream over the binary data
+           contained in the key 'key' in the passed bucket. The data
+           is read using incremental blob I/O, so large objects are
+           streamed in bounded memory
+        """
+        from Acquire.ObjectStore import ObjectStream as _ObjectStream
+
+        key = _clean_key(key)
+        conn = _connect(bucket["database"])
+
+        if not hasattr(conn, "blobopen"):
+            # incremental blob I/O needs python 3.11
+            return _ObjectStream([SQLite_ObjectStore.get_object(bucket, key)])
+
+        row = conn.execute("SELECT rowid FROM objects "
+                           "WHERE bucket=? AND key=?",
+                           (bucket["bucket_name"], key)).fetchone()
+
+        if row is None:
+            raise _no_object(key)
+
+        try:
+            blob = conn.blobopen("objects", "data", row[0], readonly=True)
+        except Exception:
+            # the object has just been replaced or deleted
+            raise _no_object(key)
+
+        return _ObjectStream(iter(lambda: blob.read(_chunk_size), b""),
+                             close_function=blob.close)
+
+    @staticmethod
+    def get_objects(bucket, keys, max_workers=None):
+        """Return the binary data contained in each of the passed 'keys'
+           in the passed bucket. This returns a pair of dictionaries,
+           holding the data of the keys that were read and the errors
+           of the keys that could not be read. Local reads are fast,
+           so the objects are read one at a time on this thread
+        """
+        objects = {}
+        errors = {}
+
+        for key in keys:
+            try:
+                objects[key] = SQLite_ObjectStore.get_object(bucket, key)
+            except Exception as e:
+                errors[key] = e
+
+        return (objects, errors)
+
+    @staticmethod
+    def take_object(bucket, key):
+        """Take (delete) the object from the object store, returning
+           the object
+        """
+        key = _clean_key(key)
+        conn = _connect(bucket["database"])
+
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            row = conn.execute("SELECT data FROM objects "
+                               "WHERE bucket=? AND key=?",
+                               (bucket["bucket_name"], key)).fetchone()
+
+            if row is not None:
+                conn.execute("DELETE FROM objects WHERE bucket=? AND key=?",
+                             (bucket["bucket_name"], key))
+
+            conn.execute("COMMIT")
+        except:
+            conn.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            raise _no_object(key)
+
+        return bytes(row[0])
+
+    @staticmethod
+    def iter_object_names(bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket,
+           in lexicographical order. The names are read from the index
+           'page_size' at a time, each page being a range scan that
+           starts after the last name of the previous page, so
+           iteration can be stopped early and the read transaction
+           is not held open while the caller is iterating
+        """
+        if prefix is None:
+            prefix = ""
+
+        if page_size is None:
+            page_size = _default_page_size
+
+        prefix_len = 0
+
+        if without_prefix:
+            prefix_len = len(prefix)
+
+        sql = "SELECT key FROM objects WHERE bucket=?"
+        args = [bucket["bucket_name"]]
+
+        if len(prefix) > 0:
+            sql += " AND key >= ? AND key < ?"
+            args += [prefix, _prefix_end(prefix)]
+
+        sql += " AND key > ? ORDER BY key LIMIT ?"
+
+        if start_after is None:
+            start_after = ""
+
+        conn = _connect(bucket["database"])
+
+        while True:
+            rows = conn.execute(sql, args + [start_after,
+                                             page_size]).fetchall()
+
+            for (name,) in rows:
+                start_after = name
+
+                if without_prefix:
+                    name = name[prefix_len:]
+                    while name.startswith("/"):
+                        name = name[1:]
+
+                if len(name) > 0:
+                    yield name
+
+            if len(rows) < page_size:
+                return
+
+    @staticmethod
+    def list_prefixes(bucket, prefix=None, delimiter="/"):
+        """Return the sorted list of the common prefixes of the keys in
+           the passed bucket that start with 'prefix'. This seeks
+           through the index from one common prefix to the next, so
+           costs one index lookup per prefix, however many objects
+           there are below each prefix
+        """
+        if prefix is None:
+            prefix = ""
+
+        if len(prefix) > 0:
+            end = _prefix_end(prefix)
+        else:
+            end = chr(0x10FFFF)
+
+        conn = _connect(bucket["database"])
+
+        # this sorts after every key that starts with a common prefix
+        last_char = chr(0x10FFFF)
+
+        prefixes = []
+        start_after = prefix
+
+        while True:
+            row = conn.execute("SELECT key FROM objects WHERE bucket=? "
+                               "AND key > ? AND key < ? "
+                               "ORDER BY key LIMIT 1",
+                               (bucket["bucket_name"], start_after,
+                                end)).fetchone()
+
+            if row is None:
+                return prefixes
+
+            name = row[0]
+            i = name.find(delimiter, len(prefix))
+
+            if i == -1:
+                start_after = name
+            else:
+                common = name[0:i + len(delimiter)]
+                prefixes.append(common)
+                start_after = common + last_char
+
+    @staticmethod
+    def get_all_object_names(bucket, prefix=None, without_prefix=False):
+        """Returns the names of all objects in the passed bucket"""
+        return list(SQLite_ObjectStore.iter_object_names(
+                                bucket=bucket, prefix=prefix,
+                                without_prefix=without_prefix))
+
+    @staticmethod
+    def set_object(bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data'"""
+        from hashlib import md5 as _md5
+
+        if data is None:
+            data = b""
+
+        key = _clean_key(key)
+        conn = _connect(bucket["database"])
+
+        conn.execute("INSERT OR REPLACE INTO objects "
+                     "(bucket, key, data, size, md5, etag) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     (bucket["bucket_name"], key, data, len(data),
+                      _md5(data).hexdigest(), _uuid.uuid4().hex))
+
+    @staticmethod
+    def set_object_from_stream(bucket, key, stream, part_size=None,
+                               max_workers=None):
+        """Set the value of 'key' in 'bucket' to the binary data read
+           from the passed file-like 'stream'. The object is replaced
+           in a single transaction once all of the data has been read.
+           This returns the size and MD5 checksum of the object
+        """
+        if part_size is None:
+            part_size = _chunk_size
+
+        key = _clean_key(key)
+        conn = _connect(bucket["database"])
+
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            result = _insert_stream(conn, bucket, key, stream, part_size,
+                                    _uuid.uuid4().hex)
+            conn.execute("COMMIT")
+        except:
+            conn.execute("ROLLBACK")
+            raise
+
+        return result
+
+    @staticmethod
+    def get_object_with_etag(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with its etag (a unique version
+           identifier that is changed on every write)
+        """
+        key = _clean_key(key)
+        conn = _connect(bucket["database"])
+
+        row = conn.execute("SELECT data, etag FROM objects "
+                           "WHERE bucket=? AND key=?",
+                           (bucket["bucket_name"], key)).fetchone()
+
+        if row is None:
+            raise _no_object(key)
+
+        return (bytes(row[0]), row[1])
+
+    @staticmethod
+    def set_object_if_absent(bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data' if there
+           is no object at this key. Returns the etag of the new object,
+           or None if the object was not set
+        """
+        from hashlib import md5 as _md5
+
+        if data is None:
+            data = b""
+
+        key = _clean_key(key)
+        etag = _uuid.uuid4().hex
+        conn = _connect(bucket["database"])
+
+        cursor = conn.execute("INSERT OR IGNORE INTO objects "
+                              "(bucket, key, data, size, md5, etag) "
+                              "VALUES (?, ?, ?, ?, ?, ?)",
+                              (bucket["bucket_name"], key, data, len(data),
+                               _md5(data).hexdigest(), etag))
+
+        if cursor.rowcount == 1:
+            return etag
+        else:
+            return None
+
+    @staticmethod
+    def set_object_if_match(bucket, key, data, etag):
+        """Set the value of 'key' in 'bucket' to binary 'data' if the
+           object at this key still has the passed etag. Returns the
+           etag of the new object, or None if the object was not set
+        """
+        from hashlib import md5 as _md5
+
+        if data is None:
+            data = b""
+
+        key = _clean_key(key)
+        new_etag = _uuid.uuid4().hex
+        conn = _connect(bucket["database"])
+
+        cursor = conn.execute("UPDATE objects "
+                              "SET data=?, size=?, md5=?, etag=? "
+                              "WHERE bucket=? AND key=? AND etag=?",
+                              (data, len(data), _md5(data).hexdigest(),
+                               new_etag, bucket["bucket_name"], key, etag))
+
+        if cursor.rowcount == 1:
+            return new_etag
+        else:
+            return None
+
+    @staticmethod
+    def delete_all_objects(bucket, prefix=None):
+        """Deletes all objects (that start with 'prefix')"""
+        SQLite_ObjectStore.delete_prefix(bucket, prefix)
+
+    @staticmethod
+    def delete_object(bucket, key):
+        """Removes the object at 'key'"""
+        key = _clean_key(key)
+        conn = _connect(bucket["database"])
+
+        conn.execute("DELETE FROM objects WHERE bucket=? AND key=?",
+                     (bucket["bucket_name"], key))
+
+    @staticmethod
+    def delete_objects(bucket, keys, max_workers=None):
+        """Remove the objects at all of the passed 'keys' in a single
+           transaction. This returns the number of objects deleted and
+           the errors, keyed by key (there are none, as either all or
+           none of the objects are deleted)
+        """
+        conn = _connect(bucket["database"])
+        start = conn.total_changes
+
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            conn.executemany("DELETE FROM objects WHERE bucket=? AND key=?",
+                             [(bucket["bucket_name"], _clean_key(key))
+                              for key in keys])
+        except:
+            conn.execute("ROLLBACK")
+            raise
+
+        conn.execute("COMMIT")
+
+        return (conn.total_changes - start, {})
+
+    @staticmethod
+    def delete_prefix(bucket, prefix, max_workers=None):
+        """Remove all objects whose keys start with 'prefix' using a
+           single range delete on the index. This returns the number
+           of objects deleted and the errors, keyed by key
+        """
+        conn = _connect(bucket["database"])
+
+        if prefix:
+            cursor = conn.execute("DELETE FROM objects WHERE bucket=? "
+                                  "AND key >= ? AND key < ?",
+                                  (bucket["bucket_name"], prefix,
+                                   _prefix_end(prefix)))
+        else:
+            cursor = conn.execute("DELETE FROM objects WHERE bucket=?",
+                                  (bucket["bucket_name"],))
+
+        return (cursor.rowcount, {})
+
+    @staticmethod
+    def get_size_and_checksum(bucket, key):
+        """Return the object size (in bytes) and checksum of the
+           object in the passed bucket at the specified key. These
+           are stored alongside the object, so the data is not read
+        """
+        key = _clean_key(key)
+        conn = _connect(bucket["database"])
+
+        row = conn.execute("SELECT size, md5 FROM objects "
+                           "WHERE bucket=? AND key=?",
+                           (bucket["bucket_name"], key)).fetchone()
+
+        if row is None:
+            raise _no_object(key)
+
+        return (row[0], row[1])
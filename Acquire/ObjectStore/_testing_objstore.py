@@ -4,12 +4,27 @@ import shutil as _shutil
 import datetime as _datetime
 import uuid as _uuid
 import json as _json
-import glob as _glob
 import threading
 import uuid as _uuid
+import contextlib as _contextlib
+
+try:
+    import fcntl as _fcntl
+except ImportError:
+    # file locks are not available (e.g. on Windows), so objects are
+    # only locked between threads in this process
+    _fcntl = None
 
 _rlock = threading.RLock()
 
+# The number of times each bucket lock file is held by this process,
+# keyed by the name of the lock file. This is only read or changed
+# while '_rlock' is held
+_held_locks = {}
+
+# The size of the chunks read when streaming an object
+_chunk_size = 1024 * 1024
+
 __all__ = ["Testing_ObjectStore"]
 
 
@@ -44,6 +59,196 @@ def _get_driver_details_from_data(data):
     return details
 
 
+def _write_tmpfile(filename, data):
+    """Internal function that writes 'data' to a new temporary file
+       next to 'filename', returning the name of the temporary file
+    """
+    tmpname = "%s.%s.tmp" % (filename, _uuid.uuid4())
+
+    _os.makedirs(_os.path.dirname(filename), exist_ok=True)
+
+    with open(tmpname, "wb") as FILE:
+        if data is not None:
+            FILE.write(data)
+
+    return tmpname
+
+
+@_contextlib.contextmanager
+def _lock_bucket(bucket):
+    """Internal context manager that holds '_rlock' together with an
+       exclusive lock on the lock file of the passed bucket. This
+       makes changes to objects atomic between processes (e.g.
+       several services sharing the same testing object store) as
+       well as between threads. The lock is re-entrant within the
+       thread that holds it
+    """
+    lockfile = "%s._lock" % _os.path.normpath(bucket)
+
+    with _rlock:
+        if _fcntl is None or lockfile in _held_locks:
+            _held_locks[lockfile] = _held_locks.get(lockfile, 0) + 1
+
+            try:
+                yield
+            finally:
+                _held_locks[lockfile] -= 1
+
+                if _held_locks[lockfile] == 0:
+                    del _held_locks[lockfile]
+
+            return
+
+        with open(lockfile, "a") as FILE:
+            _fcntl.flock(FILE, _fcntl.LOCK_EX)
+            _held_locks[lockfile] = 1
+
+            try:
+                yield
+            finally:
+                del _held_locks[lockfile]
+                _fcntl.flock(FILE, _fcntl.LOCK_UN)
+
+
+def _checksum_filename(filename):
+    """Internal function that returns the name of the sidecar file that
+       holds the checksum of the object data in 'filename'
+    """
+    return "%s._md5" % filename[0:-6]
+
+
+def _write_checksum(filename, md5):
+    """Internal function that writes the sidecar file that records the
+       size, inode, modification time and MD5 checksum of the object
+       data that has just been written to 'filename', together with
+       a new etag for this write. This plays the role of the object
+       metadata in a cloud object store. The etag identifies the
+       write rather than the data, so it is never reused, even if
+       the same data is written again. This returns the etag
+    """
+    etag = _uuid.uuid4().hex
+
+    try:
+        stat = _os.stat(filename)
+        checksum = {"size": stat.st_size, "inode": stat.st_ino,
+                    "mtime": stat.st_mtime_ns, "md5": md5, "etag": etag}
+
+        sidecar = _checksum_filename(filename)
+        tmpname = "%s.%s.tmp" % (sidecar, _uuid.uuid4())
+
+        with open(tmpname, "w") as FILE:
+            FILE.write(_json.dumps(checksum))
+
+        _os.replace(tmpname, sidecar)
+    except Exception:
+        # the checksum (and a new etag) will be recalculated when
+        # it is next needed
+        pass
+
+    return etag
+
+
+def _remove_checksum(filename):
+    """Internal function that removes the sidecar checksum file for
+       the object data in 'filename'
+    """
+    try:
+        _os.remove(_checksum_filename(filename))
+    except OSError:
+        pass
+
+
+def _read_metadata(filename):
+    """Internal function that returns the size, MD5 checksum and etag
+       of the object data in 'filename'. These are read from the
+       sidecar file if this matches the size, inode and modification
+       time of the data.
+       Otherwise (e.g. the data was written directly via a PAR) the
+       checksum is calculated by streaming the data, and the sidecar
+       is rewritten with a new etag
+    """
+    stat = _os.stat(filename)
+
+    try:
+        with open(_checksum_filename(filename), "r") as FILE:
+            checksum = _json.loads(FILE.read())
+
+        if checksum["size"] == stat.st_size and \
+                checksum["inode"] == stat.st_ino and \
+                checksum["mtime"] == stat.st_mtime_ns and \
+                "etag" in checksum:
+            return (checksum["size"], checksum["md5"], checksum["etag"])
+    except Exception:
+        pass
+
+    from Acquire.Access import get_filesize_and_checksum \
+        as _get_filesize_and_checksum
+
+    (size, md5) = _get_filesize_and_checksum(filename)
+
+    if size == stat.st_size:
+        etag = _write_checksum(filename, md5)
+    else:
+        # the data is still being written
+        etag = None
+
+    return (size, md5, etag)
+
+
+def _read_checksum(filename):
+    """Internal function that returns the size and MD5 checksum of the
+       object data in 'filename'
+    """
+    (size, md5, _) = _read_metadata(filename)
+    return (size, md5)
+
+
+def _iter_keys(bucket, root, prefix, start_after=None):
+    """Internal generator that walks the directory 'root' in the passed
+       bucket, yielding the keys of all of the objects that start with
+       'prefix' (and come after 'start_after') in lexicographical order.
+       Directories are sorted as if they ended with '/', so that their
+       keys are returned in the same order as a cloud object store
+    """
+    if len(root) > 0:
+        path = "%s/%s" % (bucket, root)
+    else:
+        path = bucket
+
+    try:
+        entries = list(_os.scandir(path))
+    except OSError:
+        return
+
+    keys = []
+
+    for entry in entries:
+        if len(root) > 0:
+            key = "%s/%s" % (root, entry.name)
+        else:
+            key = entry.name
+
+        if entry.is_dir():
+            dirkey = "%s/" % key
+            if dirkey.startswith(prefix) or prefix.startswith(dirkey):
+                keys.append((dirkey, key))
+        elif key.endswith("._data"):
+            key = key[0:-6]
+            if key.startswith(prefix):
+                keys.append((key, None))
+
+    keys.sort()
+
+    for (key, subdir) in keys:
+        if subdir is None:
+            if start_after is None or key > start_after:
+                yield key
+        elif start_after is None or key > start_after or \
+                start_after.startswith(key):
+            for subkey in _iter_keys(bucket, subdir, prefix, start_after):
+                yield subkey
+
+
 class Testing_ObjectStore:
     """This is a dummy object store that writes objects to
        the standard posix filesystem when running tests
@@ -224,7 +429,7 @@ class Testing_ObjectStore:
         """Return the binary data contained in the key 'key' in the
            passed bucket"""
 
-        with _rlock:
+        with _lock_bucket(bucket):
             filepath = "%s/%s._data" % (bucket, key)
             if _os.path.exists(filepath):
                 return open(filepath, "rb").read()
@@ -232,72 +437,112 @@ class Testing_ObjectStore:
                 from Acquire.ObjectStore import ObjectStoreError
                 raise ObjectStoreError("No object at key '%s'" % key)
 
+    @staticmethod
+    def open_object(bucket, key):
+        """Return a read-only, file-like stream over the binary data
+           contained in the key 'key' in the passed bucket
+        """
+        from Acquire.ObjectStore import ObjectStream as _ObjectStream
+
+        with _lock_bucket(bucket):
+            filepath = "%s/%s._data" % (bucket, key)
+
+            try:
+                FILE = open(filepath, "rb")
+            except:
+                from Acquire.ObjectStore import ObjectStoreError
+                raise ObjectStoreError("No object at key '%s'" % key)
+
+        return _ObjectStream(iter(lambda: FILE.read(_chunk_size), b""),
+                             close_function=FILE.close)
+
+    @staticmethod
+    def get_objects(bucket, keys, max_workers=None):
+        """Return the binary data contained in each of the passed 'keys'
+           in the passed bucket. This returns a pair of dictionaries,
+           holding the data of the keys that were read and the errors
+           of the keys that could not be read
+        """
+        from Acquire.ObjectStore import run_in_pool as _run_in_pool
+
+        return _run_in_pool(
+                    lambda key: Testing_ObjectStore.get_object(bucket, key),
+                    keys, max_workers=max_workers)
+
     @staticmethod
     def take_object(bucket, key):
         """Take (delete) the object from the object store, returning
            the object
         """
-        with _rlock:
+        with _lock_bucket(bucket):
             filepath = "%s/%s._data" % (bucket, key)
             if _os.path.exists(filepath):
                 data = open(filepath, "rb").read()
                 _os.remove(filepath)
+                _remove_checksum(filepath)
                 return data
             else:
                 from Acquire.ObjectStore import ObjectStoreError
                 raise ObjectStoreError("No object at key '%s'" % key)
 
     @staticmethod
-    def get_all_object_names(bucket, prefix=None, without_prefix=False):
-        """Returns the names of all objects in the passed bucket"""
-
-        root = bucket
-
-        if prefix is not None:
-            root = "%s/%s" % (bucket, prefix)
+    def iter_object_names(bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket,
+           in lexicographical order. The directories are walked lazily,
+           so iteration can be stopped early. The 'page_size' is
+           accepted for compatibility with the cloud backends
+        """
+        if prefix is None:
+            prefix = ""
 
-        root_len = len(bucket) + 1
+        prefix_len = 0
 
         if without_prefix:
             prefix_len = len(prefix)
 
-        subdir_names = _glob.glob("%s*" % root)
-
-        object_names = []
+        # only walk the directory that contains the prefix
+        root = "/".join(prefix.split("/")[0:-1])
 
-        while True:
-            names = subdir_names
-            subdir_names = []
+        for name in _iter_keys(bucket, root, prefix, start_after):
+            while name.endswith("/"):
+                name = name[0:-1]
 
-            for name in names:
-                if name.endswith("._data"):
-                    # remove the  ._data at the end
-                    name = name[root_len:-6]
-                    while name.endswith("/"):
-                        name = name[0:-1]
+            if without_prefix:
+                name = name[prefix_len:]
+                while name.startswith("/"):
+                    name = name[1:]
 
-                    if without_prefix:
-                        name = name[prefix_len:]
-                        while name.startswith("/"):
-                            name = name[1:]
+            if len(name) > 0:
+                yield name
 
-                    if len(name) > 0:
-                        object_names.append(name)
-                elif _os.path.isdir(name):
-                    subdir_names += _glob.glob("%s/*" % name)
+    @staticmethod
+    def list_prefixes(bucket, prefix=None, delimiter="/"):
+        """Return the sorted list of the common prefixes of the keys in
+           the passed bucket that start with 'prefix'. The directories
+           are walked lazily from one common prefix to the next, so
+           only the directories at the next level are read
+        """
+        from Acquire.ObjectStore._objstore import _seek_common_prefixes
 
-            if len(subdir_names) == 0:
-                break
+        return _seek_common_prefixes(Testing_ObjectStore.iter_object_names,
+                                     bucket, prefix, delimiter)
 
-        return object_names
+    @staticmethod
+    def get_all_object_names(bucket, prefix=None, without_prefix=False):
+        """Returns the names of all objects in the passed bucket"""
+        return list(Testing_ObjectStore.iter_object_names(
+                                bucket=bucket, prefix=prefix,
+                                without_prefix=without_prefix))
 
     @staticmethod
     def set_object(bucket, key, data):
         """Set the value of 'key' in 'bucket' to binary 'data'"""
+        from hashlib import md5 as _md5
 
         filename = "%s/%s._data" % (bucket, key)
 
-        with _rlock:
+        with _lock_bucket(bucket):
             try:
                 with open(filename, 'wb') as FILE:
                     if data is not None:
@@ -311,6 +556,130 @@ class Testing_ObjectStore:
                         FILE.write(data)
                     FILE.flush()
 
+            _write_checksum(filename, _md5(data or b"").hexdigest())
+
+    @staticmethod
+    def set_object_from_stream(bucket, key, stream, part_size=None,
+                               max_workers=None):
+        """Set the value of 'key' in 'bucket' to the binary data read
+           from the passed file-like 'stream'. The data is streamed to
+           a temporary file which is only moved into place once all
+           of the data has been written. This returns the size and
+           MD5 checksum of the object
+        """
+        from hashlib import md5 as _md5
+
+        if part_size is None:
+            part_size = _chunk_size
+
+        filename = "%s/%s._data" % (bucket, key)
+        tmpname = "%s.%s.tmp" % (filename, _uuid.uuid4())
+
+        _os.makedirs(_os.path.dirname(filename), exist_ok=True)
+
+        md5 = _md5()
+        size = 0
+
+        try:
+            with open(tmpname, "wb") as FILE:
+                for data in iter(lambda: stream.read(part_size), b""):
+                    FILE.write(data)
+                    md5.update(data)
+                    size += len(data)
+
+            with _lock_bucket(bucket):
+                _os.replace(tmpname, filename)
+                _write_checksum(filename, md5.hexdigest())
+        except:
+            try:
+                _os.remove(tmpname)
+            except:
+                pass
+            raise
+
+        return (size, md5.hexdigest())
+
+    @staticmethod
+    def get_object_with_etag(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with its etag. The etag identifies
+           the write that created this version of the object
+        """
+        filename = "%s/%s._data" % (bucket, key)
+
+        with _lock_bucket(bucket):
+            try:
+                (_, _, etag) = _read_metadata(filename)
+
+                with open(filename, "rb") as FILE:
+                    data = FILE.read()
+            except OSError:
+                from Acquire.ObjectStore import ObjectStoreError
+                raise ObjectStoreError("No object at key '%s'" % key)
+
+        return (data, etag)
+
+    @staticmethod
+    def set_object_if_absent(bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data' if there
+           is no object at this key. The data is written to a temporary
+           file which is then hard-linked into place. Linking fails if
+           the target already exists, so this is atomic (like O_EXCL)
+           even between processes. Returns the etag of the new object,
+           or None if the object was not set
+        """
+        from hashlib import md5 as _md5
+
+        filename = "%s/%s._data" % (bucket, key)
+        tmpname = _write_tmpfile(filename, data)
+
+        try:
+            with _lock_bucket(bucket):
+                _os.link(tmpname, filename)
+                return _write_checksum(filename,
+                                       _md5(data or b"").hexdigest())
+        except FileExistsError:
+            return None
+        finally:
+            _os.remove(tmpname)
+
+    @staticmethod
+    def set_object_if_match(bucket, key, data, etag):
+        """Set the value of 'key' in 'bucket' to binary 'data' if the
+           object at this key still has the passed etag. The etag is
+           compared, and the new data renamed into place, while
+           holding the lock on the bucket, so this is atomic even
+           between processes. Returns the etag of the new object, or
+           None if the object was not set
+        """
+        from hashlib import md5 as _md5
+
+        if etag is None:
+            return None
+
+        filename = "%s/%s._data" % (bucket, key)
+        tmpname = _write_tmpfile(filename, data)
+
+        try:
+            with _lock_bucket(bucket):
+                try:
+                    (_, _, current) = _read_metadata(filename)
+                except FileNotFoundError:
+                    return None
+
+                if current != etag:
+                    return None
+
+                _os.replace(tmpname, filename)
+
+                return _write_checksum(filename,
+                                       _md5(data or b"").hexdigest())
+        finally:
+            try:
+                _os.remove(tmpname)
+            except FileNotFoundError:
+                pass
+
     @staticmethod
     def delete_all_objects(bucket, prefix=None):
         """Deletes all objects..."""
@@ -322,23 +691,88 @@ class Testing_ObjectStore:
     @staticmethod
     def delete_object(bucket, key):
         """Removes the object at 'key'"""
-        try:
-            _os.remove("%s/%s._data" % (bucket, key))
-        except:
-            pass
+        filename = "%s/%s._data" % (bucket, key)
+
+        with _lock_bucket(bucket):
+            try:
+                _os.remove(filename)
+            except:
+                pass
+
+            _remove_checksum(filename)
+
+    @staticmethod
+    def delete_objects(bucket, keys, max_workers=None):
+        """Remove the objects at all of the passed 'keys'. This returns
+           the number of objects deleted and the errors, keyed by key
+        """
+        ndeleted = 0
+        errors = {}
+
+        for key in keys:
+            filename = "%s/%s._data" % (bucket, key)
+
+            with _lock_bucket(bucket):
+                try:
+                    _os.remove(filename)
+                    ndeleted += 1
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    errors[key] = e
+                    continue
+
+                _remove_checksum(filename)
+
+        return (ndeleted, errors)
+
+    @staticmethod
+    def delete_prefix(bucket, prefix, max_workers=None):
+        """Remove all objects whose keys start with 'prefix'. If the
+           prefix is a whole directory then this is removed in one go.
+           This returns the number of objects deleted and the errors,
+           keyed by key
+        """
+        if prefix is None:
+            prefix = ""
+
+        if prefix == "" or prefix.endswith("/"):
+            ndeleted = len(Testing_ObjectStore.get_all_object_names(
+                                                    bucket, prefix))
+
+            if prefix != "":
+                _shutil.rmtree("%s/%s" % (bucket, prefix),
+                               ignore_errors=True)
+            elif _os.path.isdir(bucket):
+                # keep the bucket itself
+                for name in _os.listdir(bucket):
+                    path = _os.path.join(bucket, name)
+
+                    if _os.path.isdir(path):
+                        _shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        _os.remove(path)
+
+            return (ndeleted, {})
+
+        from Acquire.ObjectStore._objstore import _delete_prefix_in_batches
+
+        return _delete_prefix_in_batches(
+                            Testing_ObjectStore.iter_object_names,
+                            Testing_ObjectStore.delete_objects,
+                            bucket, prefix, max_workers)
 
     @staticmethod
     def get_size_and_checksum(bucket, key):
         """Return the object size (in bytes) and checksum of the
-           object in the passed bucket at the specified key
+           object in the passed bucket at the specified key. These
+           are read from the checksum written with the object, so
+           the data is only read if this is missing or out of date
         """
         filepath = "%s/%s._data" % (bucket, key)
 
-        if not _os.path.exists(filepath):
+        try:
+            return _read_checksum(filepath)
+        except FileNotFoundError:
             from Acquire.ObjectStore import ObjectStoreError
             raise ObjectStoreError("No object at key '%s'" % key)
-
-        from Acquire.Access import get_filesize_and_checksum \
-            as _get_filesize_and_checksum
-
-        return _get_filesize_and_checksum(filepath)
@@ -14,6 +14,7 @@ from ._service import *
 from ._profile import *
 from ._errors import *
 from ._cache_management import *
+from ._client_pool import *
 from ._trust_service import *
 
 try:
@@ -0,0 +1,138 @@
+import os as _os
+import threading as _threading
+
+__all__ = ["get_client_pool_stats", "clear_client_pool"]
+
+# The maximum number of keep-alive connections held open to the object
+# store by each pooled client. This should be at least the number of
+# threads used for concurrent object store requests
+_default_pool_maxsize = 32
+
+# The process-wide pool of object store clients, keyed by the backend,
+# credentials and region. Each entry holds the client, plus the bucket
+# handles that have been connected using this client
+_client_pool = {}
+_pool_lock = _threading.Lock()
+_pool_stats = {"client_hits": 0, "client_misses": 0,
+               "bucket_hits": 0, "bucket_misses": 0}
+
+
+def _get_pool_maxsize():
+    """Internal function that returns the number of keep-alive
+       connections to hold open for each client
+    """
+    try:
+        return int(_os.getenv("OBJSTORE_POOL_MAXSIZE",
+                              _default_pool_maxsize))
+    except Exception:
+        return _default_pool_maxsize
+
+
+def _tune_session(session, pool_maxsize=None):
+    """Internal function that mounts connection pools of the passed size
+       on the passed requests session, so that the client keeps open
+       enough keep-alive connections for concurrent requests. This
+       returns whether or not the session was tuned
+    """
+    if pool_maxsize is None:
+        pool_maxsize = _get_pool_maxsize()
+
+    try:
+        from requests.adapters import HTTPAdapter as _HTTPAdapter
+
+        for prefix in ["https://", "http://"]:
+            session.mount(prefix,
+                          _HTTPAdapter(pool_connections=pool_maxsize,
+                                       pool_maxsize=pool_maxsize))
+        return True
+    except Exception:
+        return False
+
+
+def _get_pooled_client(key, create_client):
+    """Internal function that returns the client in the pool for the
+       passed key. This is a tuple of the backend name, the region and
+       then the values that identify the credentials. If there isn't
+       one then 'create_client' is called to create the client,
+       which is added to the pool
+    """
+    with _pool_lock:
+        entry = _client_pool.get(key)
+
+        if entry is not None:
+            _pool_stats["client_hits"] += 1
+            entry["uses"] += 1
+            return entry["client"]
+
+        _pool_stats["client_misses"] += 1
+
+    # create the client outside the lock, as this is slow
+    client = create_client()
+
+    with _pool_lock:
+        entry = _client_pool.setdefault(key, {"client": client,
+                                              "buckets": {}, "uses": 0})
+        entry["uses"] += 1
+        return entry["client"]
+
+
+def _get_pooled_bucket(key, bucket_key, create_bucket):
+    """Internal function that returns a copy of the bucket handle for
+       'bucket_key' that was connected using the pooled client for
+       'key'. If there isn't one then 'create_bucket' is called to
+       connect to the bucket, and the handle is added to the pool
+    """
+    with _pool_lock:
+        entry = _client_pool.get(key)
+
+        if entry is not None and bucket_key in entry["buckets"]:
+            _pool_stats["bucket_hits"] += 1
+            return dict(entry["buckets"][bucket_key])
+
+        _pool_stats["bucket_misses"] += 1
+
+    bucket = create_bucket()
+
+    with _pool_lock:
+        entry = _client_pool.get(key)
+
+        if entry is not None:
+            entry["buckets"][bucket_key] = dict(bucket)
+
+    return bucket
+
+
+def get_client_pool_stats():
+    """Return the statistics of the process-wide pool of object store
+       clients, namely the number of hits and misses when looking up
+       clients and bucket handles, the number of pooled clients and
+       buckets, and the backend, region, number of uses and number of
+       buckets of each pooled client (in "pool")
+
+       Returns:
+            dict: Pool statistics
+    """
+    with _pool_lock:
+        stats = dict(_pool_stats)
+        stats["clients"] = len(_client_pool)
+        stats["buckets"] = sum(len(entry["buckets"])
+                               for entry in _client_pool.values())
+        stats["pool"] = [{"backend": key[0], "region": key[1],
+                          "uses": entry["uses"],
+                          "buckets": len(entry["buckets"])}
+                         for (key, entry) in _client_pool.items()]
+
+    return stats
+
+
+def clear_client_pool():
+    """Remove all clients from the pool. Note that this is NOT called
+       by 'clear_service_cache', as the clients (and their open
+       connections) remain valid when the service cache is cleared.
+       This is only needed if the credentials are revoked
+    """
+    with _pool_lock:
+        _client_pool.clear()
+
+        for key in _pool_stats.keys():
+            _pool_stats[key] = 0
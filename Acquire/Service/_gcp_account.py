@@ -85,28 +85,47 @@ class GCPAccount:
                 "'pip install google-cloud-storage' so that you can "
                 "connect to the Google Cloud Platform")
 
+        from ._client_pool import _get_pooled_client, _get_pooled_bucket, \
+            _tune_session
+
         login = GCPAccount.get_login(login_details)
-        bucket = {}
-        client = None
+        credentials = login["credentials"]
 
-        creds = _service_account.Credentials.from_service_account_info(
-                                                    login["credentials"])
+        key = ("gcp", login["project"], credentials.get("client_email"),
+               credentials.get("private_key_id"))
 
-        client = _storage.Client(credentials=creds,
-                                 project=login["project"])
+        def _create_client():
+            creds = _service_account.Credentials.from_service_account_info(
+                                                            credentials)
 
-        try:
-            b = client.get_bucket(bucket_name)
-        except Exception as e:
-            from Acquire.Service import ServiceAccountError
-            raise ServiceAccountError(
-                "Cannot connect to GCP - invalid credentials for bucket %s" %
-                bucket_name, e)
-
-        bucket["client"] = client
-        bucket["credentials"] = creds
-        bucket["bucket"] = b
-        bucket["bucket_name"] = bucket_name
-        bucket["unique_suffix"] = login["unique_suffix"]
-
-        return bucket
+            client = _storage.Client(credentials=creds,
+                                     project=login["project"])
+
+            try:
+                _tune_session(client._http)
+            except Exception:
+                pass
+
+            return (client, creds)
+
+        (client, creds) = _get_pooled_client(key, _create_client)
+
+        def _connect():
+            try:
+                b = client.get_bucket(bucket_name)
+            except Exception as e:
+                from Acquire.Service import ServiceAccountError
+                raise ServiceAccountError(
+                    "Cannot connect to GCP - invalid credentials for "
+                    "bucket %s" % bucket_name, e)
+
+            bucket = {}
+            bucket["client"] = client
+            bucket["credentials"] = creds
+            bucket["bucket"] = b
+            bucket["bucket_name"] = bucket_name
+            bucket["unique_suffix"] = login["unique_suffix"]
+
+            return bucket
+
+        return _get_pooled_bucket(key, bucket_name, _connect)
@@ -79,8 +79,20 @@ def get_service_account_bucket(testing_dir=None):
         password = None
 
         # we must be in testing mode...
-        from Acquire.ObjectStore import use_testing_object_store_backend as \
-            _use_testing_object_store_backend
+        if _os.getenv("TESTING_OBJSTORE") == "sqlite":
+            # use the (faster) sqlite object store for testing
+            def _use_testing_object_store_backend(testing_dir):
+                from Acquire.ObjectStore import \
+                    use_sqlite_object_store_backend as \
+                    _use_sqlite_object_store_backend
+
+                _os.makedirs(testing_dir, exist_ok=True)
+                return _use_sqlite_object_store_backend(
+                                testing_dir, bucket_name="testing_objstore")
+        else:
+            from Acquire.ObjectStore import \
+                use_testing_object_store_backend as \
+                _use_testing_object_store_backend
 
         # see if this is running in testing mode...
         global _current_testing_objstore
@@ -80,6 +80,47 @@ class OCIAccount:
 
         return "_".join(bucket_name.split())
 
+    @staticmethod
+    def _get_client(login_details):
+        """Return the OCI object storage client for the passed
+           'login_details'. This is taken from the process-wide client
+           pool, so that the client (and its keep-alive connections)
+           are reused by all warm invocations of the function
+        """
+        try:
+            from oci.object_storage import ObjectStorageClient as \
+                _ObjectStorageClient
+        except:
+            raise ImportError(
+                "Cannot import OCI. Please install OCI, e.g. via "
+                "'pip install oci' so that you can connect to the "
+                "Oracle Cloud Infrastructure")
+
+        from ._client_pool import _get_pooled_client, _tune_session
+
+        OCIAccount._assert_valid_login_dict(login_details)
+
+        key = ("oci", login_details["region"], login_details["tenancy"],
+               login_details["user"], login_details["fingerprint"])
+
+        def _create_client():
+            # copy as get_login moves the key into a file
+            login = OCIAccount.get_login(dict(login_details))
+
+            try:
+                client = _ObjectStorageClient(login)
+            finally:
+                _os.remove(_os.path.abspath(login["key_file"]))
+
+            try:
+                _tune_session(client.base_client.session)
+            except Exception:
+                pass
+
+            return client
+
+        return (key, _get_pooled_client(key, _create_client))
+
     @staticmethod
     def create_and_connect_to_bucket(login_details, compartment,
                                      bucket_name=None):
@@ -89,10 +130,7 @@ class OCIAccount:
            created bucket. If the bucket already exists this will return
            a handle to the existing bucket
         """
-
         try:
-            from oci.object_storage import ObjectStorageClient as \
-                _ObjectStorageClient
             from oci.object_storage.models import CreateBucketDetails as \
                 _CreateBucketDetails
         except:
@@ -101,18 +139,17 @@ class OCIAccount:
                 "'pip install oci' so that you can connect to the "
                 "Oracle Cloud Infrastructure")
 
-        login = OCIAccount.get_login(login_details)
-        bucket = {}
-        client = None
+        from ._client_pool import _get_pooled_bucket
 
-        try:
-            client = _ObjectStorageClient(login)
+        (key, client) = OCIAccount._get_client(login_details)
 
+        def _connect():
+            bucket = {}
             bucket["client"] = client
             bucket["compartment_id"] = compartment
 
             # save the region as this is needed for some services
-            bucket["region"] = login["region"]
+            bucket["region"] = login_details["region"]
 
             namespace = client.get_namespace().data
             bucket["namespace"] = namespace
@@ -123,9 +160,8 @@ class OCIAccount:
                 request.compartment_id = compartment
                 request.name = OCIAccount._sanitise_bucket_name(bucket_name)
 
-                bucket["bucket"] = client.create_bucket(
-                                            client.get_namespace().data,
-                                            request).data
+                bucket["bucket"] = client.create_bucket(namespace,
+                                                        request).data
             except Exception as e1:
                 # couldn't create the bucket - likely because it already
                 # exists - try to connect to the existing bucket
@@ -137,13 +173,11 @@ class OCIAccount:
                     raise AccountError(
                         "Cannot access the bucket '%s' : %s (originally %s)" %
                         (bucket_name, str(e), str(e1)))
-        except:
-            _os.remove(_os.path.abspath(login["key_file"]))
-            raise
 
-        _os.remove(_os.path.abspath(login["key_file"]))
+            return bucket
 
-        return bucket
+        return _get_pooled_bucket(key, ("create", compartment, bucket_name),
+                                  _connect)
 
     @staticmethod
     def connect_to_bucket(login_details, compartment, bucket_name):
@@ -151,21 +185,12 @@ class OCIAccount:
            using the passed 'login_details', returning a handle to the
            bucket associated with 'bucket
         '"""
+        from ._client_pool import _get_pooled_bucket
 
-        try:
-            from oci.object_storage import ObjectStorageClient as \
-                _ObjectStorageClient
-        except:
-            raise ImportError(
-                "Cannot import OCI. Please install OCI, e.g. via "
-                "'pip install oci' so that you can connect to the "
-                "Oracle Cloud Infrastructure")
+        (key, client) = OCIAccount._get_client(login_details)
 
-        login = OCIAccount.get_login(login_details)
-        bucket = {}
-
-        try:
-            client = _ObjectStorageClient(login)
+        def _connect():
+            bucket = {}
             bucket["client"] = client
             bucket["compartment_id"] = compartment
 
@@ -174,10 +199,8 @@ class OCIAccount:
 
             bucket["bucket"] = client.get_bucket(namespace, bucket_name).data
             bucket["bucket_name"] = bucket_name
-        except:
-            _os.remove(_os.path.abspath(login["key_file"]))
-            raise
 
-        _os.remove(_os.path.abspath(login["key_file"]))
+            return bucket
 
-        return bucket
+        return _get_pooled_bucket(key, ("connect", compartment, bucket_name),
+                                  _connect)
@@ -1,10 +1,35 @@
 
 import os as _os
 
+
+def _start_request_stats():
+    """Start summarising the object store requests made while
+       handling this service request
+    """
+    from Acquire.ObjectStore._instrumentedobjstore import \
+        _start_request_stats
+    _start_request_stats()
+
+
+def _attach_request_stats(results):
+    """Attach the summary of the object store requests made while
+       handling this service request to 'results'. This is only
+       available if the object store is instrumented
+       (see 'use_instrumented_object_store')
+    """
+    from Acquire.ObjectStore._instrumentedobjstore import \
+        _end_request_stats
+    summary = _end_request_stats()
+
+    if summary is not None and isinstance(results, dict):
+        results["objstore_stats"] = summary
+
+
 if _os.getenv("PROFILE") == "1":
     profiling_code = True
 
     def start_profile():
+        _start_request_stats()
         import cProfile as _cProfile
         pr = _cProfile.Profile()
         pr.enable()
@@ -20,14 +45,17 @@ if _os.getenv("PROFILE") == "1":
             data = FILE.read()
         _os.unlink(t)
         results["profile_data"] = _bytes_to_string(data)
+        _attach_request_stats(results)
 
 else:
     profiling_code = False
 
     def start_profile():
+        _start_request_stats()
         return None
 
     def end_profile(profiler, results):
+        _attach_request_stats(results)
         return results
 
 __all__ = ["start_profile", "end_profile"]
@@ -14,6 +14,7 @@ from ._errors import *
 from ._userdrives import *
 from ._filehandle import *
 from ._fileinfo import *
+from ._blobstore import *
 from ._driveinfo import *
 from ._filemeta import *
 from ._parregistry import *
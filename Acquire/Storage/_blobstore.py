@@ -0,0 +1,444 @@
+__all__ = ["BlobStore"]
+
+_blob_root = "storage/blob"
+
+_blobinfo_root = "storage/blob_info"
+
+_blobpending_root = "storage/blob_pending"
+
+# The number of times to retry updating the reference count of a blob
+# before giving up
+_max_retries = 50
+
+# The time (in seconds) to wait before retrying to add a reference to
+# a blob that is in the process of being deleted
+_retry_delay = 0.05
+
+
+def _is_valid_hash(blob_hash):
+    """Internal function that returns whether or not the passed hash
+       is a valid (hex-encoded) SHA256 hash
+    """
+    if not isinstance(blob_hash, str) or len(blob_hash) != 64:
+        return False
+
+    try:
+        int(blob_hash, 16)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_valid_scope(scope):
+    """Internal function that returns whether or not the passed
+       scope (the UID of the drive that owns the blob) can be used
+       as part of a key
+    """
+    return isinstance(scope, str) and len(scope) > 0 and \
+        "/" not in scope and scope not in [".", ".."]
+
+
+def _scoped_key(root, blob_hash, scope):
+    """Internal function that returns the key below 'root' for the
+       passed blob in the passed scope. Blobs without a scope were
+       created before blobs were scoped to their drive
+    """
+    if scope is None:
+        return "%s/%s" % (root, blob_hash)
+    else:
+        return "%s/%s/%s" % (root, scope, blob_hash)
+
+
+def _info_key(blob_hash, scope=None):
+    """Internal function that returns the key of the record that
+       holds the reference count and metadata of the passed blob
+    """
+    return _scoped_key(_blobinfo_root, blob_hash, scope)
+
+
+def _get_sha256(bucket, key):
+    """Internal function that returns the hex-encoded SHA256 hash of
+       the object at 'key', which is streamed from the object store
+    """
+    from hashlib import sha256 as _sha256
+    from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+    sha256 = _sha256()
+
+    with _ObjectStore.open_object(bucket, key) as stream:
+        for chunk in stream.chunks():
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def _update_info(bucket, blob_hash, update, scope=None):
+    """Internal function that atomically updates the record of the
+       passed blob. The function 'update' is passed the current record
+       (or None if there isn't one) and returns the new record. The
+       record is written using a conditional write, so the update is
+       re-applied if the record was changed by someone else. This
+       returns the new record
+    """
+    from Acquire.ObjectStore import ObjectStore as _ObjectStore
+    from Acquire.ObjectStore import ObjectStoreError as _ObjectStoreError
+    from Acquire.ObjectStore import encode_document as _encode_document
+    from Acquire.ObjectStore import decode_document as _decode_document
+
+    key = _info_key(blob_hash, scope)
+
+    for _ in range(0, _max_retries):
+        try:
+            (data, etag) = _ObjectStore.get_object_with_etag(bucket, key)
+            info = _decode_document(data)
+        except _ObjectStoreError:
+            info = None
+
+        new_info = update(info)
+
+        if new_info is None:
+            # there is nothing to update
+            return info
+
+        data = _encode_document(new_info)
+
+        if info is None:
+            new_etag = _ObjectStore.set_object_if_absent(bucket, key, data)
+        else:
+            new_etag = _ObjectStore.set_object_if_match(bucket, key,
+                                                        data, etag)
+
+        if new_etag is not None:
+            return new_info
+
+    raise _ObjectStoreError(
+        "Unable to update the record of the blob '%s' as it is "
+        "being changed too frequently" % blob_hash)
+
+
+class BlobStore:
+    """This class manages the content-addressed store of the data of
+       all of the (unchunked) files in the storage service. Each
+       blob is keyed by the SHA256 hash of its data within the
+       scope of the drive that holds it, and carries a reference
+       count of the number of file versions that point to it. This
+       means that identical data is only ever uploaded and stored
+       once per drive - uploading a file whose data is already held
+       is a metadata-only operation. Blobs are never shared between
+       drives, so knowing the hash of some data does not give access
+       to the data held by anyone else
+    """
+    @staticmethod
+    def is_valid_hash(blob_hash):
+        """Return whether or not 'blob_hash' is a valid blob hash,
+           i.e. a hex-encoded SHA256 hash
+
+           Args:
+                blob_hash (str): Hash to check
+           Returns:
+                bool: True if the hash is valid, else False
+        """
+        return _is_valid_hash(blob_hash)
+
+    @staticmethod
+    def _assert_valid(blob_hash, scope):
+        """Internal function that raises a FileValidationError if
+           the passed hash or scope is not valid
+        """
+        if not _is_valid_hash(blob_hash):
+            from Acquire.Storage import FileValidationError
+            raise FileValidationError(
+                "The blob hash '%s' is not a valid SHA256 hash" % blob_hash)
+
+        if scope is not None and not _is_valid_scope(scope):
+            from Acquire.Storage import FileValidationError
+            raise FileValidationError(
+                "The blob scope '%s' is not valid" % scope)
+
+    @staticmethod
+    def get_key(blob_hash, scope=None):
+        """Return the key of the data of the passed blob in the
+           file bucket
+
+           Args:
+                blob_hash (str): SHA256 hash of the blob
+                scope (str, default=None): UID of the drive that
+                holds the blob
+           Returns:
+                str: Key of the blob data
+        """
+        BlobStore._assert_valid(blob_hash, scope)
+        return _scoped_key(_blob_root, blob_hash, scope)
+
+    @staticmethod
+    def get_pending_key(blob_hash, upload_uid, scope=None):
+        """Return the key to which the data of the passed blob should
+           be uploaded by the upload with UID 'upload_uid'. Each upload
+           writes to its own key, and the data is only moved to the
+           blob once it has been validated (see 'promote')
+
+           Args:
+                blob_hash (str): SHA256 hash of the blob
+                upload_uid (str): UID of the upload
+                scope (str, default=None): UID of the drive that
+                holds the blob
+           Returns:
+                str: Key to upload the data to
+        """
+        BlobStore._assert_valid(blob_hash, scope)
+
+        if not _is_valid_scope(upload_uid):
+            from Acquire.Storage import FileValidationError
+            raise FileValidationError(
+                "The upload UID '%s' is not valid" % upload_uid)
+
+        return "%s/%s" % (_scoped_key(_blobpending_root, blob_hash, scope),
+                          upload_uid)
+
+    @staticmethod
+    def get_info(bucket, blob_hash, scope=None):
+        """Return the record of the passed blob, or None if there is
+           no such blob. The record holds the number of references to
+           the blob ('refs'), the size and MD5 checksum of its data,
+           and whether or not all of the data has been uploaded
+           ('complete')
+
+           Args:
+                bucket (object): File bucket containing the blob
+                blob_hash (str): SHA256 hash of the blob
+                scope (str, default=None): UID of the drive that
+                holds the blob
+           Returns:
+                dict: Record of the blob, or None
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        BlobStore._assert_valid(blob_hash, scope)
+
+        try:
+            return _ObjectStore.get_object_from_json(
+                                    bucket, _info_key(blob_hash, scope))
+        except Exception:
+            return None
+
+    @staticmethod
+    def add_reference(bucket, blob_hash, filesize, checksum, scope=None):
+        """Add a reference to the passed blob from a new file version
+           whose data has the passed size and MD5 checksum. This
+           creates the record of the blob if it doesn't exist. This
+           returns whether or not the blob data is already held
+           (and so doesn't need to be uploaded again). The size and
+           checksum promised by the first upload are kept until the
+           blob is deleted, so a FileValidationError is raised if
+           the blob is held (or is being uploaded) with a different
+           size or checksum
+
+           Args:
+                bucket (object): File bucket containing the blob
+                blob_hash (str): SHA256 hash of the blob
+                filesize (int): Size of the data in bytes
+                checksum (str): MD5 checksum of the data
+                scope (str, default=None): UID of the drive that
+                holds the blob
+           Returns:
+                bool: True if the blob data is already held, else False
+        """
+        import time as _time
+
+        BlobStore._assert_valid(blob_hash, scope)
+
+        def _add(info):
+            if info is None or info["refs"] == 0:
+                if info is not None and info.get("deleting"):
+                    return None
+
+                return {"refs": 1, "filesize": filesize,
+                        "checksum": checksum, "complete": False}
+
+            if info["filesize"] != filesize or info["checksum"] != checksum:
+                from Acquire.Storage import FileValidationError
+                raise FileValidationError(
+                    "The data of the blob '%s' does not match the "
+                    "promised size and checksum. size: %s versus %s, "
+                    "checksum: %s versus %s" %
+                    (blob_hash, info["filesize"], filesize,
+                     info["checksum"], checksum))
+
+            info = dict(info)
+            info["refs"] += 1
+            return info
+
+        for _ in range(0, _max_retries):
+            info = _update_info(bucket, blob_hash, _add, scope)
+
+            if info.get("deleting"):
+                # wait for the blob to be deleted before it is
+                # re-created
+                _time.sleep(_retry_delay)
+                continue
+
+            return info["complete"]
+
+        from Acquire.ObjectStore import ObjectStoreError
+        raise ObjectStoreError(
+            "Unable to add a reference to the blob '%s' as it is "
+            "still being deleted" % blob_hash)
+
+    @staticmethod
+    def set_complete(bucket, blob_hash, filesize, checksum, scope=None):
+        """Record that all of the data of the passed blob has been
+           uploaded and validated as having the passed size and MD5
+           checksum, so that it can be shared by subsequent uploads.
+           Nothing is recorded if these are not the size and checksum
+           that were promised for the blob
+
+           Args:
+                bucket (object): File bucket containing the blob
+                blob_hash (str): SHA256 hash of the blob
+                filesize (int): Validated size of the data in bytes
+                checksum (str): Validated MD5 checksum of the data
+                scope (str, default=None): UID of the drive that
+                holds the blob
+           Returns:
+                None
+        """
+        BlobStore._assert_valid(blob_hash, scope)
+
+        def _complete(info):
+            if info is None or info["complete"] or info["refs"] == 0:
+                return None
+            elif info["filesize"] != filesize or \
+                    info["checksum"] != checksum:
+                return None
+
+            info = dict(info)
+            info["complete"] = True
+            return info
+
+        _update_info(bucket, blob_hash, _complete, scope)
+
+    @staticmethod
+    def promote(bucket, blob_hash, pending_key, scope=None):
+        """Validate the data that has been uploaded to 'pending_key'
+           (see 'get_pending_key') and, if it is the data promised
+           for the blob, move it to the blob and record the blob as
+           complete. The SHA256 hash of the uploaded data is checked,
+           so that data can never be stored under the hash of some
+           other data. The pending upload is always removed. This
+           returns whether or not the blob is now complete
+
+           Args:
+                bucket (object): File bucket containing the blob
+                blob_hash (str): SHA256 hash of the blob
+                pending_key (str): Key to which the data was uploaded
+                scope (str, default=None): UID of the drive that
+                holds the blob
+           Returns:
+                bool: True if the blob is complete, else False
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        key = BlobStore.get_key(blob_hash, scope)
+        is_pending = (pending_key != key)
+
+        if is_pending and not pending_key.startswith(
+                "%s/" % _scoped_key(_blobpending_root, blob_hash, scope)):
+            from Acquire.Storage import FileValidationError
+            raise FileValidationError(
+                "The key '%s' is not a pending upload of the blob '%s'" %
+                (pending_key, blob_hash))
+
+        try:
+            info = BlobStore.get_info(bucket, blob_hash, scope)
+
+            if info is None or info["refs"] == 0:
+                # there is nothing that needs this data any more
+                return False
+            elif info["complete"]:
+                # another upload has already provided the data
+                return True
+
+            (filesize, checksum) = _ObjectStore.get_size_and_checksum(
+                                                        bucket, pending_key)
+
+            if filesize != info["filesize"] or \
+                    checksum != info["checksum"] or \
+                    _get_sha256(bucket, pending_key) != blob_hash:
+                from Acquire.Storage import FileValidationError
+                raise FileValidationError(
+                    "The data uploaded for the blob '%s' does not match "
+                    "its hash, size or checksum" % blob_hash)
+
+            if is_pending:
+                with _ObjectStore.open_object(bucket, pending_key) as stream:
+                    _ObjectStore.set_object_from_stream(bucket, key, stream)
+
+            BlobStore.set_complete(bucket, blob_hash, filesize,
+                                   checksum, scope)
+        finally:
+            if is_pending:
+                try:
+                    _ObjectStore.delete_object(bucket, pending_key)
+                except Exception:
+                    pass
+
+        info = BlobStore.get_info(bucket, blob_hash, scope)
+        return info is not None and info["complete"]
+
+    @staticmethod
+    def remove_reference(bucket, blob_hash, scope=None):
+        """Remove a reference to the passed blob. The blob data is
+           deleted once there are no references left. This returns
+           the number of remaining references
+
+           Args:
+                bucket (object): File bucket containing the blob
+                blob_hash (str): SHA256 hash of the blob
+                scope (str, default=None): UID of the drive that
+                holds the blob
+           Returns:
+                int: Number of remaining references
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        key = BlobStore.get_key(blob_hash, scope)
+
+        def _remove(info):
+            if info is None or info["refs"] == 0:
+                return None
+
+            info = dict(info)
+            info["refs"] -= 1
+
+            if info["refs"] == 0:
+                # stop new references being added while the data
+                # is deleted
+                info["complete"] = False
+                info["deleting"] = True
+
+            return info
+
+        info = _update_info(bucket, blob_hash, _remove, scope)
+
+        if info is None:
+            return 0
+        elif info["refs"] > 0:
+            return info["refs"]
+
+        if info.get("deleting"):
+            try:
+                _ObjectStore.delete_object(bucket, key)
+            except Exception:
+                pass
+
+            def _deleted(info):
+                if info is None or not info.get("deleting"):
+                    return None
+
+                info = dict(info)
+                del info["deleting"]
+                return info
+
+            _update_info(bucket, blob_hash, _deleted, scope)
+
+        return 0
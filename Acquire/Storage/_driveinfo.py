@@ -9,10 +9,15 @@ _uploader_root = "storage/uploader"
 _downloader_root = "storage/downloader"
 
 
-def _validate_file_upload(par, file_bucket, file_key, objsize, checksum):
+def _validate_file_upload(par, file_bucket, file_key, objsize, checksum,
+                          blob_hash=None, blob_scope=None):
     """Call this function to signify that the file associated with
        this PAR has been uploaded. This will check that the
-       objsize and checksum match with what was promised
+       objsize and checksum match with what was promised. If the
+       file is a blob in the BlobStore then 'file_key' is the pending
+       upload of the blob, which is promoted to the blob (and so
+       shared by later uploads) once its SHA256 hash has also
+       been validated
     """
     from Acquire.ObjectStore import ObjectStore as _ObjectStore
     from Acquire.Service import get_service_account_bucket \
@@ -41,9 +46,28 @@ def _validate_file_upload(par, file_bucket, file_key, objsize, checksum):
             (real_objsize, objsize,
              real_checksum, checksum))
 
+    if blob_hash is not None:
+        from Acquire.Storage import BlobStore as _BlobStore
+        _BlobStore.promote(file_bucket, blob_hash, pending_key=file_key,
+                           scope=blob_scope)
+
     # SHOULD HERE RECEIPT THE STORAGE TRANSACTION
 
 
+def _set_object_from_data(file_bucket, file_key, filedata):
+    """Write the passed file data to 'file_key' in 'file_bucket'. The
+       data is streamed to the object store, so large files are
+       uploaded in parts (e.g. as a multipart upload). This returns
+       the size and MD5 checksum of the written object
+    """
+    from io import BytesIO as _BytesIO
+    from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+    return _ObjectStore.set_object_from_stream(bucket=file_bucket,
+                                               key=file_key,
+                                               stream=_BytesIO(filedata))
+
+
 class DriveInfo:
     """This class provides a service-side handle to the information
        about a particular cloud drive
@@ -481,7 +505,10 @@ class DriveInfo:
            be used to upload the data. The PAR will be encrypted
            using 'encrypt_key'. Remember to close the PAR once the
            file has been uploaded, so that it can be validated
-           as correct
+           as correct. If the filehandle carries the hash of the
+           file data, and this data is already held in the BlobStore,
+           then no data is written and no PAR is returned, as the
+           new version can share the existing data
         """
         from Acquire.Storage import FileHandle as _FileHandle
         from Acquire.Storage import FileInfo as _FileInfo
@@ -497,6 +524,17 @@ class DriveInfo:
             if not isinstance(encrypt_key, _PublicKey):
                 raise TypeError("The encryption key must be of type PublicKey")
 
+        blob_hash = filehandle.content_hash()
+
+        if blob_hash is not None:
+            from Acquire.Storage import BlobStore as _BlobStore
+
+            if not _BlobStore.is_valid_hash(blob_hash):
+                from Acquire.Storage import FileValidationError
+                raise FileValidationError(
+                    "The content hash '%s' of the file is not a valid "
+                    "SHA256 hash" % blob_hash)
+
         (drive_acl, identifiers) = self._resolve_acl(
                         authorisation=authorisation,
                         resource="upload %s" % filehandle.fingerprint(),
@@ -533,9 +571,44 @@ class DriveInfo:
             # directly
             filedata = filehandle.local_filedata()
 
-        _ObjectStore.set_object(bucket=file_bucket,
-                                key=file_key,
-                                data=filedata)
+        if blob_hash is None:
+            if filedata is None:
+                _ObjectStore.set_object(bucket=file_bucket,
+                                        key=file_key,
+                                        data=None)
+            else:
+                _set_object_from_data(file_bucket, file_key, filedata)
+        elif _BlobStore.add_reference(bucket=file_bucket,
+                                      blob_hash=blob_hash,
+                                      filesize=fileinfo.filesize(),
+                                      checksum=fileinfo.checksum(),
+                                      scope=self._drive_uid):
+            # we already hold this data - just save the new version
+            fileinfo.save()
+            return (fileinfo.get_filemeta(), None)
+        elif filedata is not None:
+            from hashlib import sha256 as _sha256
+
+            if _sha256(filedata).hexdigest() != blob_hash:
+                from Acquire.Storage import FileValidationError
+                raise FileValidationError(
+                    "The file data does not match its content hash")
+
+            (filesize, checksum) = _set_object_from_data(file_bucket,
+                                                         file_key, filedata)
+            _BlobStore.set_complete(file_bucket, blob_hash,
+                                    filesize, checksum,
+                                    scope=self._drive_uid)
+        else:
+            # the data is uploaded to a pending key that is unique to
+            # this upload, and is only moved to the blob once it has
+            # been validated
+            from Acquire.ObjectStore import create_uid as _create_uid
+            file_key = _BlobStore.get_pending_key(
+                            blob_hash, upload_uid=_create_uid(),
+                            scope=self._drive_uid)
+            _ObjectStore.set_object(bucket=file_bucket, key=file_key,
+                                    data=b"")
 
         if filedata is None:
             # the file is too large to include in the filehandle so
@@ -546,7 +619,9 @@ class DriveInfo:
                           file_bucket=self._get_file_bucketname(),
                           file_key=file_key,
                           objsize=fileinfo.filesize(),
-                          checksum=fileinfo.checksum())
+                          checksum=fileinfo.checksum(),
+                          blob_hash=blob_hash,
+                          blob_scope=self._drive_uid)
 
             ospar = _ObjectStore.create_par(bucket=file_bucket,
                                             encrypt_key=encrypt_key,
@@ -803,10 +878,14 @@ class DriveInfo:
             # return to the user
             from Acquire.Storage import FileInfo as _FileInfo
 
+            # fetch the metadata concurrently - any file that cannot be
+            # read is skipped, as it was before
+            (datas, _errors) = _ObjectStore.get_objects_from_json(
+                                                    metadata_bucket, names)
+
             for name in names:
                 try:
-                    data = _ObjectStore.get_object_from_json(metadata_bucket,
-                                                             name)
+                    data = datas[name]
                     fileinfo = _FileInfo.from_data(data,
                                                    identifiers=identifiers,
                                                    upstream=drive_acl)
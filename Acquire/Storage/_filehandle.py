@@ -32,6 +32,31 @@ def _should_compress(filename, filesize):
     return True
 
 
+def _get_content_hash(filename=None, data=None):
+    """Return the SHA256 hash of the passed data, or of the contents
+    of the file called 'filename'. This is the strong hash that is
+    used to address the file data in the storage service
+
+    Args:
+         filename (str, default=None): File to hash
+         data (bytes, default=None): Data to hash
+    Returns:
+         str: Hex-encoded SHA256 hash
+    """
+    from hashlib import sha256 as _sha256
+
+    sha256 = _sha256()
+
+    if data is not None:
+        sha256.update(data)
+    else:
+        with open(filename, "rb") as FILE:
+            for chunk in iter(lambda: FILE.read(1048576), b""):
+                sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
 def _bz2compress(inputfile, outputfile=None):
     """Compress 'inputfile', writing the output to 'outputfile'
     If 'outputfile' is None, then this will create a new filename
@@ -83,6 +108,7 @@ class FileHandle:
         self._compressed_filename = None
         self._drive_uid = drive_uid
         self._aclrules = None
+        self._content_hash = None
 
         if filename is not None:
             if local_cutoff is None:
@@ -135,6 +161,13 @@ class FileHandle:
             self._filesize = filesize
             self._checksum = cksum
 
+            # the strong hash of the data as it will be stored, so that
+            # the service can tell if it already holds this data
+            if self._local_filedata is not None:
+                self._content_hash = _get_content_hash(data=self._local_filedata)
+            else:
+                self._content_hash = _get_content_hash(filename=self.local_filename())
+
             if remote_filename is None:
                 self._filename = _os.path.split(filename)[1]
             else:
@@ -278,6 +311,19 @@ class FileHandle:
         else:
             return self._checksum
 
+    def content_hash(self):
+        """Return the SHA256 hash of the data of this file as it
+        will be stored (i.e. after any compression). This is None
+        if the hash is not known
+
+        Returns:
+             str: SHA256 hash of the stored data
+        """
+        if self.is_null():
+            return None
+        else:
+            return self._content_hash
+
     def fingerprint(self):
         """Return a fingerprint for this file
 
@@ -312,6 +358,9 @@ class FileHandle:
 
             data["drive_uid"] = self.drive_uid()
 
+            if self._content_hash is not None:
+                data["content_hash"] = self._content_hash
+
             if self._local_filedata is not None:
                 from Acquire.ObjectStore import bytes_to_string as _bytes_to_string
 
@@ -349,6 +398,9 @@ class FileHandle:
             if "compression" in data:
                 f._compression = data["compression"]
 
+            if "content_hash" in data:
+                f._content_hash = data["content_hash"]
+
             if "aclrules" in data:
                 from Acquire.Storage import ACLRules as _ACLRules
 
@@ -10,13 +10,20 @@ _file_root = "storage/file"
 class VersionInfo:
     """This class holds specific info about a version of a file"""
 
-    def __init__(self, filesize=None, checksum=None, aclrules=None, is_chunked=False, compression=None, identifiers=None):
+    def __init__(
+        self, filesize=None, checksum=None, aclrules=None, is_chunked=False, compression=None, identifiers=None, blob_hash=None,
+        blob_scope=None
+    ):
         """Construct the version of the file that has the passed
         size and checksum, was uploaded by the specified user,
         and that has the specified aclrules, and whether or not
         this file is stored and transmitted in a compressed
-        state
+        state. If 'blob_hash' is passed then the data of this
+        version is stored in the content-addressed BlobStore,
+        in the scope 'blob_scope' (the UID of the drive)
         """
+        self._blob_hash = None
+        self._blob_scope = None
         if is_chunked:
             from Acquire.ObjectStore import create_uid as _create_uid
             from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
@@ -79,6 +86,10 @@ class VersionInfo:
             self._compression = compression
             self._aclrules = aclrules
             self._nchunks = None
+            self._blob_hash = blob_hash
+
+            if blob_hash is not None:
+                self._blob_scope = blob_scope
 
         else:
             self._filesize = None
@@ -215,14 +226,39 @@ class VersionInfo:
         else:
             return self._user_guid
 
+    def blob_hash(self):
+        """Return the SHA256 hash of the blob that holds the data
+        of this version, or None if the data is not held in
+        the BlobStore
+        """
+        if self.is_null():
+            return None
+        else:
+            return self._blob_hash
+
+    def blob_scope(self):
+        """Return the scope (the UID of the drive) of the blob that
+        holds the data of this version, or None if the data is not
+        held in the BlobStore, or is held in an unscoped blob
+        """
+        if self.is_null():
+            return None
+        else:
+            return self._blob_scope
+
     def _file_key(self):
         """Return the key for this actual file for this version
         in the object store. If this is a chunked file, then
         the data will be stored in objects as a sub-key of this
-        key
+        key. If the data is held in the BlobStore then this
+        is the key of the blob
         """
         if self.is_null():
             return None
+        elif self._blob_hash is not None:
+            from Acquire.Storage import BlobStore as _BlobStore
+
+            return _BlobStore.get_key(self._blob_hash, self._blob_scope)
         else:
             return "%s/%s" % (_file_root, self._file_uid)
 
@@ -257,6 +293,12 @@ class VersionInfo:
             if self._compression is not None:
                 data["compression"] = self._compression
 
+            if self._blob_hash is not None:
+                data["blob_hash"] = self._blob_hash
+
+                if self._blob_scope is not None:
+                    data["blob_scope"] = self._blob_scope
+
         return data
 
     @staticmethod
@@ -295,6 +337,10 @@ class VersionInfo:
             else:
                 v._nchunks = None
 
+            if "blob_hash" in data:
+                v._blob_hash = data["blob_hash"]
+                v._blob_scope = data.get("blob_scope")
+
         return v
 
 
@@ -382,6 +428,8 @@ class FileInfo:
                 identifiers=identifiers,
                 compression=filehandle.compression_type(),
                 aclrules=filehandle.aclrules(),
+                blob_hash=filehandle.content_hash(),
+                blob_scope=drive_uid,
             )
 
             self._latest_version = version
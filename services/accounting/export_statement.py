@@ -0,0 +1,97 @@
+
+import tempfile
+
+from Acquire.Service import get_service_account_bucket
+
+from Acquire.Accounting import Accounts
+
+from Acquire.Identity import Authorisation
+
+from Acquire.ObjectStore import OSPar, string_to_datetime
+
+
+class AccountError(Exception):
+    pass
+
+
+def run(args):
+    """This function is called to export the statement of the
+       transactions in an account to a file. The statement is written
+       as CSV or JSON Lines to the object behind the passed (writeable)
+       OSPar, e.g. the OSPar used to upload a file to a drive. The
+       statement is streamed to the OSPar, so even very large
+       statements are exported in constant memory
+
+       Args:
+            args (dict): data for the statement export, including
+            the account_name, authorisation, the OSPar ('par') and
+            the passphrase used to encrypt it ('secret'), and
+            optionally the start_datetime, end_datetime, format
+            ("csv" or "jsonl") and include_line_items
+
+        Returns:
+            dict: contains the number of transactions exported
+    """
+    try:
+        account_name = str(args["account_name"])
+    except:
+        account_name = None
+
+    try:
+        authorisation = Authorisation.from_data(args["authorisation"])
+    except:
+        authorisation = None
+
+    if account_name is None:
+        raise AccountError("You must supply the account_name")
+
+    if authorisation is None:
+        raise AccountError("You must supply a valid authorisation")
+
+    try:
+        secret = args["secret"]
+    except:
+        secret = None
+
+    par = OSPar.from_data(args["par"], passphrase=secret)
+
+    if par.is_null() or par.is_bucket() or not par.is_writeable():
+        raise AccountError("You must supply a writeable OSPar for the "
+                           "file to which the statement will be exported")
+
+    start_datetime = None
+    end_datetime = None
+
+    if args.get("start_datetime") is not None:
+        start_datetime = string_to_datetime(args["start_datetime"])
+
+    if args.get("end_datetime") is not None:
+        end_datetime = string_to_datetime(args["end_datetime"])
+
+    statement_format = str(args.get("format", "csv"))
+    include_line_items = bool(args.get("include_line_items", False))
+
+    # load the account
+    bucket = get_service_account_bucket()
+    accounts = Accounts(user_guid=authorisation.user_guid())
+    account = accounts.get_account(account_name, bucket=bucket)
+
+    # validate the authorisation for this account
+    authorisation.verify(resource="export_statement %s" % account.uid())
+
+    writer = par.write()
+
+    # the statement is spooled to a temporary file, from where it is
+    # streamed to the OSPar
+    with tempfile.TemporaryFile() as FILE:
+        ntransactions = account.write_statement(
+                            FILE, start_datetime=start_datetime,
+                            end_datetime=end_datetime,
+                            format=statement_format,
+                            include_line_items=include_line_items,
+                            bucket=bucket)
+
+        FILE.seek(0)
+        writer.set_object(FILE)
+
+    return {"ntransactions": ntransactions}
@@ -1,5 +1,6 @@
 import asyncio
 import fdk
+import functools
 import json
 import sys
 import os
@@ -72,7 +73,26 @@ def _route_function(ctx, function, args, additional_function=None):
         raise MissingFunctionError(f"Unable to match call to {function} to known functions")
 
 
-def _handle(ctx=None, function=None, additional_function=None, args=None):
+def _run_coroutine(coroutine, loop=None):
+    """Internal function that runs the passed coroutine (returned by a
+    service function that uses, e.g., AsyncObjectStore) to completion.
+    If 'loop' is passed then the coroutine is run on this (already
+    running) event loop, otherwise it is run on a new event loop
+
+    Args:
+        coroutine: coroutine to run
+        loop (optional): running event loop of the async handler
+
+    Returns:
+        the result of the coroutine
+    """
+    if loop is None:
+        return asyncio.run(coroutine)
+    else:
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+
+def _handle(ctx=None, function=None, additional_function=None, args=None, loop=None):
     """This function routes calls to sub-functions, thereby allowing
        a single identity function to stay hot for longer. If you want
        to add additional functions then add them via the
@@ -99,6 +119,9 @@ def _handle(ctx=None, function=None, additional_function=None, args=None):
 
     result = _route_function(ctx=ctx, function=function, args=args, additional_function=additional_function)
 
+    if asyncio.iscoroutine(result):
+        result = _run_coroutine(result, loop=loop)
+
     end_profile(pr, result)
 
     return result
@@ -116,7 +139,7 @@ def _base_handler(additional_function=None, ctx=None, data=None, loop=None):
      additional_function (function): function to be routed
      ctx: currently unused
      data: to be passed as arguments to other functions
-     loop: currently unused
+     loop: running event loop on which to run coroutine functions
 
      Returns:
          dict: JSON serialisable dict
@@ -146,7 +169,7 @@ def _base_handler(additional_function=None, ctx=None, data=None, loop=None):
 
     if result is None:
         try:
-            result = _handle(ctx=ctx, function=function, additional_function=additional_function, args=args)
+            result = _handle(ctx=ctx, function=function, additional_function=additional_function, args=args, loop=loop)
         except Exception as e:
             result = e
 
@@ -164,7 +187,11 @@ def _base_handler(additional_function=None, ctx=None, data=None, loop=None):
 
 def create_async_handler(additional_function=None):
     """Function that creates the async handler functions for all standard
-    functions, plus the passed additional_function
+    functions, plus the passed additional_function. The handler runs
+    in a worker thread, so that the event loop is not blocked, while
+    service functions that are coroutines (e.g. that use
+    AsyncObjectStore) are run on the event loop, so that their
+    object-store requests overlap
 
     Args:
         additional_function (optional): other function for which to
@@ -176,7 +203,12 @@ def create_async_handler(additional_function=None):
     """
 
     async def async_handler(ctx, data=None, loop=None):
-        return _base_handler(additional_function=additional_function, ctx=ctx, data=data, loop=loop)
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(
+            None,
+            functools.partial(_base_handler, additional_function=additional_function, ctx=ctx, data=data, loop=loop),
+        )
 
     return async_handler
 
@@ -0,0 +1,19 @@
+from Acquire.ObjectStore import OSParRegistry
+
+
+def run(args):
+    """Call this function to sweep the registry for expired OSPars,
+       calling their cleanup functions and removing their
+       registrations. This should be called regularly, e.g. by a
+       cron trigger, so that the registry does not grow without limit
+    """
+    max_pars = None
+
+    if args is not None and "max_pars" in args:
+        max_pars = int(args["max_pars"])
+
+    result = OSParRegistry.sweep(max_pars=max_pars)
+
+    return {"nswept": result["nswept"],
+            "nerrors": len(result["errors"]),
+            "finished": result["finished"]}
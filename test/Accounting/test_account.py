@@ -345,3 +345,188 @@ def test_pending_transactions(random_transaction):
     assert(starting_balance2.balance() + value == ending_balance2.balance())
     assert(starting_balance2.liability() == ending_balance2.liability())
     assert(starting_balance1.receivable() == ending_balance1.receivable())
+
+
+def test_running_balance(account1, account2, bucket, monkeypatch):
+    from Acquire.ObjectStore import ObjectStore
+
+    push_is_running_service()
+
+    try:
+        transaction = Transaction(create_decimal(12.5), "running balance")
+        authorisation = Authorisation(resource=transaction.fingerprint(),
+                                      testing_key=testing_key,
+                                      testing_user_guid=account1.group_name())
+
+        Ledger.perform(transaction=transaction, debit_account=account1,
+                       credit_account=account2, authorisation=authorisation,
+                       is_provisional=False, bucket=bucket)
+
+        for account in [account1, account2]:
+            result = account.reconcile_balance(bucket=bucket)
+            assert(result["is_consistent"])
+            assert(result["running_balance"] == account.balance())
+            assert(result["version"] == result["ntransactions"])
+            assert(result["version"] > 0)
+
+            # the running balance matches the balance calculated
+            # from the hourly balances
+            assert(account.balance() ==
+                   account.balance(now=get_datetime_now()))
+
+        # corrupt the running balance, and then repair it
+        expected = account1.balance()
+        key = account1._running_balance_key()
+        ObjectStore.set_object_from_json(
+                bucket, key, {"balance": Balance(balance=5).to_data(),
+                              "version": 1})
+
+        assert(account1.balance() == Balance(balance=5))
+        assert(not account1.reconcile_balance(bucket=bucket)["is_consistent"])
+
+        assert(account1.repair_balance(bucket=bucket) == expected)
+        assert(account1.reconcile_balance(bucket=bucket)["is_consistent"])
+
+        # a missing running balance is rebuilt from the transactions
+        ObjectStore.delete_object(bucket, key)
+        assert(account1.balance() == expected)
+        assert(account1.reconcile_balance(bucket=bucket)["is_consistent"])
+
+        # reading the running balance does not list any objects
+        def _no_listing(*args, **kwargs):
+            raise AssertionError("The balance should not list objects")
+
+        with monkeypatch.context() as m:
+            m.setattr(ObjectStore, "iter_object_names",
+                      staticmethod(_no_listing))
+            m.setattr(ObjectStore, "get_all_object_names",
+                      staticmethod(_no_listing))
+            assert(account1.balance() == expected)
+
+        # a pending transaction that is in the log when the running
+        # balance is rebuilt is only counted once
+        item_key = account1._get_ledger_keys(bucket)[-1]
+        account1._add_pending(item_key, bucket=bucket)
+        assert(account1.repair_balance(bucket=bucket) == expected)
+        assert(ObjectStore.get_object_from_json(
+                                    bucket, key)["pending"] == [])
+
+        account1._apply_to_running_balance(item_key, bucket=bucket)
+        account1._apply_to_running_balance(item_key, bucket=bucket)
+        assert(account1.balance() == expected)
+        assert(account1.reconcile_balance(bucket=bucket)["is_consistent"])
+
+        # a transaction that was logged but not applied (e.g. because of
+        # a crash) is replayed once its recording is assumed to have failed,
+        # while one that was never logged is dropped
+        line_item = ObjectStore.get_object_from_json(bucket, item_key)
+        ObjectStore.delete_object(bucket, item_key)
+        account1.repair_balance(bucket=bucket)
+        account1._add_pending(item_key, bucket=bucket)
+        ObjectStore.set_object_from_json(bucket, item_key, line_item)
+
+        parts = item_key.split("/")
+        parts[-2] = "missing"
+        missing_key = "/".join(parts)
+        account1._add_pending(missing_key, bucket=bucket)
+
+        assert(account1.balance() != expected)
+        assert(not account1.reconcile_balance(bucket=bucket)["is_consistent"])
+
+        import Acquire.Accounting._account as _account
+        monkeypatch.setattr(_account, "_pending_replay_seconds", -1)
+
+        assert(account1.balance() == expected)
+        assert(account1.balance() == expected)
+        assert(ObjectStore.get_object_from_json(
+                                    bucket, key)["pending"] == [])
+        assert(account1.reconcile_balance(bucket=bucket)["is_consistent"])
+    finally:
+        pop_is_running_service()
+
+
+def test_statement(bucket):
+    import csv
+    import io
+    import json
+
+    push_is_running_service()
+
+    try:
+        accounts = Accounts(user_guid=account1_user)
+        debit_account = Account(name="Statement Account",
+                                description="Account for statements",
+                                group_name=accounts.name(), bucket=bucket)
+        debit_account.set_overdraft_limit(account1_overdraft_limit)
+
+        credit_account = Account(name="Statement Credit Account",
+                                 description="Account for statements",
+                                 group_name=accounts.name(), bucket=bucket)
+
+        values = [create_decimal(i + 0.5) for i in range(0, 5)]
+
+        for value in values:
+            transaction = Transaction(value, "statement")
+            authorisation = Authorisation(
+                                resource=transaction.fingerprint(),
+                                testing_key=testing_key,
+                                testing_user_guid=accounts.name())
+
+            Ledger.perform(transaction=transaction,
+                           debit_account=debit_account,
+                           credit_account=credit_account,
+                           authorisation=authorisation,
+                           is_provisional=False, bucket=bucket)
+
+        pages = list(debit_account.iter_statement(page_size=2,
+                                                  bucket=bucket))
+
+        assert([len(entries) for (entries, _) in pages] == [2, 2, 1])
+        assert(pages[-1][1] is None)
+
+        transactions = [t for (entries, _) in pages for (t, _) in entries]
+        assert([t.value() for t in transactions] == values)
+        assert(all(t.is_debit() for t in transactions))
+
+        # resume from the token of the first page
+        resumed = list(debit_account.iter_statement(
+                            page_token=pages[0][1], page_size=2,
+                            bucket=bucket))
+        assert([t for (entries, _) in resumed
+                for (t, _) in entries] == transactions[2:])
+
+        # restrict to a time range (start < transaction <= end)
+        start = transactions[0].datetime()
+        end = transactions[3].datetime()
+        ranged = list(debit_account.iter_statement(
+                        start_datetime=start, end_datetime=end,
+                        include_line_items=True, bucket=bucket))
+        assert(len(ranged) == 1)
+        assert([t for (t, _) in ranged[0][0]] == transactions[1:4])
+        assert(all(l.uid().endswith("/%s" % t.uid())
+                   for (t, l) in ranged[0][0]))
+
+        assert(list(credit_account.iter_statement(
+            start_datetime=get_datetime_now(), bucket=bucket)) == [([], None)])
+
+        FILE = io.BytesIO()
+        assert(debit_account.write_statement(
+            FILE, include_line_items=True, bucket=bucket) == 5)
+        rows = list(csv.DictReader(io.StringIO(FILE.getvalue().decode())))
+        assert([create_decimal(row["value"]) for row in rows] == values)
+        assert(rows[0]["code"] == "DR")
+        assert(rows[0]["user_guid"] == accounts.name())
+        assert(rows[0]["receipted_value"] == "")
+
+        FILE = io.BytesIO()
+        assert(credit_account.write_statement(
+            FILE, format="jsonl", bucket=bucket) == 5)
+        lines = FILE.getvalue().decode().splitlines()
+        entries = [json.loads(line) for line in lines]
+        assert([entry["code"] for entry in entries] == ["CR"] * 5)
+        assert("line_item_uid" not in entries[0])
+
+        with pytest.raises(ValueError):
+            debit_account.write_statement(io.BytesIO(), format="xml")
+    finally:
+        pop_is_running_service()
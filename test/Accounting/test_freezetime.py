@@ -321,3 +321,173 @@ def test_parallel_transaction(account1, account2, bucket):
 
     assert account1.balance() == start1 + total1
     assert account2.balance() == start2 + total2
+
+
+def test_balance_rollups(bucket):
+    if not have_freezetime:
+        return
+
+    from Acquire.ObjectStore import ObjectStore
+
+    zero = create_decimal(0)
+    start = get_datetime_now() - datetime.timedelta(days=90)
+    start = start.replace(hour=12, minute=30, second=0, microsecond=0)
+
+    push_is_running_service()
+
+    try:
+        with freeze_time(start) as frozen_datetime:
+            accounts1 = Accounts(user_guid="rollup1@local")
+            accounts2 = Accounts(user_guid="rollup2@local")
+            account1 = Account(name="Rollup Account", description="Debits", group_name=accounts1.name())
+            account2 = Account(name="Rollup Account", description="Credits", group_name=accounts2.name())
+            account1.set_overdraft_limit(account1_overdraft_limit)
+
+            credits = []
+
+            for i in range(0, 40):
+                frozen_datetime.move_to(start + datetime.timedelta(days=2 * i, hours=i % 5))
+
+                transaction = Transaction(value=create_decimal(i + 1), description="Rollup %d" % i)
+                auth = Authorisation(
+                    resource=transaction.fingerprint(), testing_key=testing_key, testing_user_guid=account1.group_name()
+                )
+
+                Ledger.perform(
+                    transaction=transaction,
+                    debit_account=account1,
+                    credit_account=account2,
+                    authorisation=auth,
+                    is_provisional=False,
+                    bucket=bucket,
+                )
+
+                credits.append((get_datetime_now(), transaction.value()))
+
+        # query the historical balances in time order
+        queries = [
+            start + datetime.timedelta(days=10, hours=3),
+            start + datetime.timedelta(days=45, minutes=10),
+            start + datetime.timedelta(days=79, hours=23),
+            get_datetime_now(),
+        ]
+
+        for query in queries:
+            expected = sum([value for (time, value) in credits if time <= query], zero)
+
+            assert account2.balance(now=query) == Balance(balance=expected)
+
+        assert account2.balance() == Balance(balance=sum([value for (_, value) in credits], zero))
+
+        # the closed days and months have been rolled up
+        assert len(ObjectStore.get_all_object_names(bucket, account2._daily_key())) > 0
+        assert len(ObjectStore.get_all_object_names(bucket, account2._monthly_key())) > 0
+
+        # and the rollups give the same totals as the transactions
+        month = start.replace(day=1, hour=0, minute=30) + datetime.timedelta(days=32)
+        month = month.replace(day=1, minute=0)
+        next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+        expected = sum([value for (time, value) in credits if month < time <= next_month], zero)
+
+        assert account2._get_total_between(month, next_month) == Balance(balance=expected)
+        assert account1._get_total_between(month, next_month) == Balance(balance=-expected)
+    finally:
+        pop_is_running_service()
+
+
+def test_rollup_listing_failure(bucket, monkeypatch):
+    from Acquire.ObjectStore import ObjectStore, ObjectStoreError
+
+    push_is_running_service()
+
+    try:
+        accounts = Accounts(user_guid="rollup3@local")
+        account = Account(name="Rollup Account", description="Failures", group_name=accounts.name())
+
+        day = get_datetime_now().replace(hour=0, minute=0, second=0, microsecond=0) - datetime.timedelta(days=10)
+
+        def _fail(*args, **kwargs):
+            raise ObjectStoreError("Listing failed")
+
+        with monkeypatch.context() as m:
+            m.setattr(ObjectStore, "get_all_object_names", staticmethod(_fail))
+
+            with pytest.raises(ObjectStoreError):
+                account._get_daily_total(day)
+
+        # a rollup is never saved from a failed listing
+        assert ObjectStore.get_all_object_names(bucket, account._daily_key()) == []
+        assert account._get_daily_total(day) == Balance()
+        assert len(ObjectStore.get_all_object_names(bucket, account._daily_key())) == 1
+    finally:
+        pop_is_running_service()
+
+
+def test_rollup_midnight_boundaries(bucket):
+    from Acquire.Accounting import Money
+    from Acquire.Accounting._account import _sum_transactions
+    from Acquire.ObjectStore import ObjectStore, create_uid
+
+    push_is_running_service()
+
+    try:
+        accounts = Accounts(user_guid="rollup4@local")
+        account = Account(name="Rollup Account", description="Midnights", group_name=accounts.name())
+
+        now = get_datetime_now()
+        month = (now - datetime.timedelta(days=150)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+        last_month = (next_month + datetime.timedelta(days=32)).replace(day=1)
+        day = datetime.timedelta(days=1)
+
+        # transactions at exactly midnight, including the first transaction
+        # and the first midnights of months, and during the day
+        times = [
+            month,
+            month + day,
+            month + day + datetime.timedelta(hours=3),
+            month + 5 * day + datetime.timedelta(hours=12),
+            next_month,
+            next_month + 2 * day,
+            next_month + 10 * day + datetime.timedelta(hours=6),
+            last_month,
+            last_month + day + datetime.timedelta(minutes=1),
+        ]
+
+        keys = []
+
+        for (i, time) in enumerate(times):
+            key = "%s/%s/CR%s" % (account._transactions_key(), create_uid(include_date=time), Money(i + 1).encode())
+            ObjectStore.set_object_from_json(bucket, key, {})
+            keys.append((time, key))
+
+        boundaries = [
+            month - day,
+            month,
+            month + day,
+            month + day + datetime.timedelta(hours=1),
+            next_month - day,
+            next_month,
+            next_month + 2 * day,
+            last_month,
+            last_month + day,
+            now,
+        ]
+
+        # the second pass uses the daily and monthly rollups that
+        # were saved by the first
+        for _ in range(0, 2):
+            for start in boundaries:
+                for end in boundaries:
+                    if start >= end:
+                        continue
+
+                    expected = _sum_transactions([key for (time, key) in keys if start < time <= end])
+
+                    assert account._get_total_between(start, end) == expected
+
+        assert len(ObjectStore.get_all_object_names(bucket, account._daily_key())) > 0
+        assert len(ObjectStore.get_all_object_names(bucket, account._monthly_key())) > 0
+    finally:
+        pop_is_running_service()
@@ -95,3 +95,132 @@ def test_split(random_large_value):
     total = Transaction.round(total)
 
     assert(total == Transaction.round(value))
+
+
+def test_sum_many():
+    from Acquire.Accounting import Balance, TransactionInfo, TransactionCode
+    from Acquire.ObjectStore import datetime_to_string, get_datetime_now
+    import datetime
+
+    now = get_datetime_now().replace(microsecond=0)
+    codes = list(TransactionCode)
+    keys = []
+
+    for i in range(0, 1000):
+        code = random.choice(codes)
+        value = create_decimal(1000000.0 * random.random())
+
+        if code in (TransactionCode.SENT_RECEIPT,
+                    TransactionCode.RECEIVED_RECEIPT):
+            encoded = TransactionInfo.encode(
+                        code, value, create_decimal(float(value) / 2))
+        else:
+            encoded = TransactionInfo.encode(code, value)
+
+        # include times without microseconds, and rescinded liabilities
+        datetime_key = datetime_to_string(
+                            now + datetime.timedelta(microseconds=i % 3))
+        key = "accounting/accounts/uid/txns/%s/%08d/%s" % \
+            (datetime_key, i, encoded)
+
+        if code is TransactionCode.CURRENT_LIABILITY and i % 2:
+            key = "accounting/%s" % TransactionInfo.from_key(key).rescind() \
+                                                                 .to_key()
+
+        keys.append(key)
+
+    expected = Balance()
+
+    for key in keys:
+        expected = expected + TransactionInfo.from_key(key)
+
+    assert(Balance.sum_many(keys) == expected)
+    assert(Balance.sum_many(
+            [TransactionInfo.from_key(key) for key in keys]) == expected)
+    assert(Balance.sum_many([]) == Balance())
+
+    parsed = TransactionInfo.parse_keys(keys)
+    assert(sum([len(values) for (values, _) in parsed.values()]) == 1000)
+
+    for (values, receipted_values) in parsed.values():
+        assert(len(values) == len(receipted_values))
+
+    with pytest.raises(ValueError):
+        TransactionInfo.parse_keys(["accounting/not_a_transaction"])
+
+
+def test_money():
+    from Acquire.Accounting import Money, Balance, TransactionInfo, \
+        TransactionCode, AccountError
+    from decimal import Decimal
+
+    values = [0.0000005, 1.0000005, 2.5e-7, 999999.9999995, 0.1 + 0.2]
+
+    for i in range(0, 1000):
+        values.append((random.random() - 0.5) *
+                      10**random.randint(0, 12))
+
+    for value in values:
+        d = create_decimal(value)
+
+        for v in [value, d, str(d), "%013.6f" % d]:
+            m = Money(v)
+            assert(m == d)
+            assert(m.to_decimal() == d)
+            assert(Money.decode(m.encode()) == m)
+            assert(hash(m) == hash(d))
+
+        if d != 0:
+            assert(str(Money(d)) == str(d))
+
+            if abs(d) < 1000000:
+                assert(Money(d).encode() == "%013.6f" % d)
+
+    # large values with more than 15 significant digits are rounded
+    # in exactly the same way as create_decimal
+    large = ["9646063623.217969", "9999999999.999999", "-999999999.999999",
+             "1000000000.000001"]
+
+    for i in range(0, 1000):
+        large.append("%d.%06d" % (random.randint(-10**11, 10**14),
+                                  random.randint(0, 999999)))
+
+    for value in large:
+        assert(Money(value).to_decimal() == create_decimal(value))
+        assert(Money(Decimal(value)).to_decimal() == create_decimal(value))
+        assert(Money(float(value)).to_decimal() ==
+               create_decimal(float(value)))
+
+    assert(Money(Decimal("1.0000005")) == create_decimal(Decimal("1.0000005")))
+    assert(Money(5) + Decimal("0.5") == Decimal("5.5"))
+    assert(Decimal("0.5") + Money(5) == Money("5.5"))
+    assert(Money(1) - 2 < 0)
+    assert(Money(-1) != Decimal("-1.0000001"))
+    assert(Money() == 0)
+
+    with pytest.raises(AccountError):
+        Money(10**15)
+
+    with pytest.raises(AccountError):
+        Money(-10**12)
+
+    # the public API still returns Decimals, and balances are exact
+    balance = Balance(balance=Decimal("0.1"), liability="0.2")
+    assert(type(balance.balance()) is Decimal)
+    assert(balance.available() == Decimal("-0.1"))
+    assert(balance.is_overdrawn())
+    assert(not balance.is_overdrawn(overdraft_limit=Decimal("0.1")))
+
+    assert(balance - Balance(balance=1) == Balance(balance=Decimal("-0.9"),
+                                                   liability="0.2"))
+    assert(balance - 1 == Balance(balance=Decimal("-0.9"), liability="0.2"))
+    assert(Balance.from_data(balance.to_data()) == balance)
+
+    t = TransactionInfo("2018-01-01T00:00:00.000000/uid/RR000100.005000"
+                        "T000090.000000")
+    assert(t.value() == Decimal("90"))
+    assert(t.original_value() == Decimal("100.005"))
+    assert(type(t.receipted_value()) is Decimal)
+    assert(TransactionInfo.encode(TransactionCode.DEBIT, Money("4.2341"))
+           == TransactionInfo.encode(TransactionCode.DEBIT,
+                                     Decimal("4.234100")))
@@ -0,0 +1,115 @@
+import asyncio
+import pytest
+import sys
+import time
+
+from Acquire.ObjectStore import AsyncObjectStore, ObjectStore, \
+    ObjectStoreError
+from Acquire.ObjectStore._memory_objstore import Memory_ObjectStore
+from Acquire.Service import get_service_account_bucket, \
+    push_is_running_service, pop_is_running_service
+
+
+@pytest.fixture(scope="session")
+def bucket(tmpdir_factory):
+    d = tmpdir_factory.mktemp("async_objstore")
+    push_is_running_service()
+    bucket = get_service_account_bucket(str(d))
+    pop_is_running_service()
+    return bucket
+
+
+def test_async_objstore(bucket):
+    bucket = ObjectStore.get_bucket(bucket, "async_objstore")
+
+    async def _run():
+        await asyncio.gather(*[AsyncObjectStore.set_object_from_json(
+                                        bucket, "async/%d" % i, {"i": i})
+                               for i in range(0, 10)])
+
+        names = await AsyncObjectStore.get_all_object_names(bucket, "async/")
+        assert(sorted(names) == ["async/%d" % i for i in range(0, 10)])
+        assert(await AsyncObjectStore.list_prefixes(bucket) == ["async/"])
+
+        (objects, errors) = await AsyncObjectStore.get_many_from_json(
+                                        bucket, names + ["async/missing"],
+                                        max_concurrency=4)
+
+        assert(len(objects) == 10)
+        assert(objects["async/3"] == {"i": 3})
+        assert(list(errors.keys()) == ["async/missing"])
+
+        assert(await AsyncObjectStore.get_string_object(
+                                        bucket, "async/1") == '{"i": 1}')
+
+        await AsyncObjectStore.delete_object(bucket, "async/0")
+        assert(await AsyncObjectStore.delete_objects(
+                                        bucket, ["async/1", "async/2"]) ==
+               (2, {}))
+        assert(await AsyncObjectStore.delete_prefix(bucket, "async/") ==
+               (7, {}))
+
+        with pytest.raises(ObjectStoreError):
+            await AsyncObjectStore.get_object(bucket, "async/3")
+
+    asyncio.run(_run())
+
+
+def test_async_objstore_native(monkeypatch):
+    # the memory backend is async-capable, so its requests are awaited
+    # on the event loop rather than run in the shared executor
+    store = Memory_ObjectStore(latency=0.1)
+    bucket = store.get_bucket(None, "test")
+    monkeypatch.setattr(sys.modules[ObjectStore.__module__],
+                        "_objstore_backend", store)
+
+    def _no_executor():
+        raise AssertionError("The executor should not be used")
+
+    monkeypatch.setattr(sys.modules[AsyncObjectStore.__module__],
+                        "_get_executor", _no_executor)
+
+    keys = ["key/%d" % i for i in range(0, 50)]
+
+    async def _run():
+        await asyncio.gather(*[AsyncObjectStore.set_object(bucket, key, b"x")
+                               for key in keys])
+        return await AsyncObjectStore.get_many(bucket, keys,
+                                               max_concurrency=50)
+
+    start = time.monotonic()
+    (objects, errors) = asyncio.run(_run())
+    elapsed = time.monotonic() - start
+
+    assert(len(objects) == 50)
+    assert(len(errors) == 0)
+
+    # 100 requests of 0.1 s each must overlap
+    assert(elapsed < 2.0)
+    assert(store.get_stats()["requests"]["get_object"] == 50)
+
+
+def test_async_handler_coroutines():
+    from admin.handler import _handle
+
+    async def _function():
+        await asyncio.sleep(0)
+        return {"status": 0}
+
+    def _additional_function(ctx, data):
+        return _function()
+
+    # coroutine service functions are run to completion...
+    assert(_handle(function="no_such_function", args={},
+                   additional_function=_additional_function) ==
+           {"status": 0})
+
+    # ...or on the running event loop of the async handler
+    async def _run():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: _handle(function="no_such_function", args={},
+                                  additional_function=_additional_function,
+                                  loop=loop))
+
+    assert(asyncio.run(_run()) == {"status": 0})
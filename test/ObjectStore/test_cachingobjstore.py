@@ -0,0 +1,107 @@
+import pytest
+import time
+
+from Acquire.ObjectStore import CachingObjectStore, ObjectStoreError
+from Acquire.ObjectStore._testing_objstore import Testing_ObjectStore
+
+
+@pytest.fixture
+def bucket(tmpdir):
+    return str(tmpdir)
+
+
+def test_caching_objstore(bucket):
+    cache = CachingObjectStore(Testing_ObjectStore,
+                               ttls={"short/": 0.2},
+                               immutable_prefixes=["accounts/*/txns/"])
+
+    Testing_ObjectStore.set_object(bucket, "accounts/a/txns/1", b"one")
+    Testing_ObjectStore.set_object(bucket, "short/1", b"short")
+    Testing_ObjectStore.set_object(bucket, "mutable/1", b"mutable")
+
+    assert(cache.get_object(bucket, "accounts/a/txns/1") == b"one")
+    assert(cache.get_object(bucket, "short/1") == b"short")
+    assert(cache.get_object(bucket, "mutable/1") == b"mutable")
+
+    stats = cache.get_cache_stats()
+    assert(stats["misses"] == 2)
+    assert(stats["hits"] == 0)
+    assert(stats["objects"] == 2)
+    assert(stats["bytes"] == len(b"one") + len(b"short"))
+
+    # writes that bypass the cache are not seen until the data expires
+    Testing_ObjectStore.set_object(bucket, "accounts/a/txns/1", b"changed")
+    Testing_ObjectStore.set_object(bucket, "short/1", b"changed")
+    Testing_ObjectStore.set_object(bucket, "mutable/1", b"changed")
+
+    assert(cache.get_object(bucket, "accounts/a/txns/1") == b"one")
+    assert(cache.get_object(bucket, "short/1") == b"short")
+    assert(cache.get_object(bucket, "mutable/1") == b"changed")
+
+    time.sleep(0.3)
+
+    assert(cache.get_object(bucket, "short/1") == b"changed")
+    assert(cache.get_object(bucket, "accounts/a/txns/1") == b"one")
+
+    stats = cache.get_cache_stats()
+    assert(stats["hits"] == 3)
+    assert(stats["misses"] == 3)
+
+    # writes through the cache invalidate the cached data
+    cache.set_object(bucket, "accounts/a/txns/1", b"new")
+    assert(cache.get_object(bucket, "accounts/a/txns/1") == b"new")
+
+    (objects, errors) = cache.get_objects(
+                            bucket, ["accounts/a/txns/1", "mutable/1",
+                                     "accounts/a/txns/missing"])
+
+    assert(objects == {"accounts/a/txns/1": b"new",
+                       "mutable/1": b"changed"})
+    assert(list(errors.keys()) == ["accounts/a/txns/missing"])
+
+    with cache.open_object(bucket, "accounts/a/txns/1") as stream:
+        assert(stream.read() == b"new")
+
+    cache.delete_object(bucket, "accounts/a/txns/1")
+
+    with pytest.raises(ObjectStoreError):
+        cache.get_object(bucket, "accounts/a/txns/1")
+
+    # other functions are passed through to the backend
+    assert(cache.get_all_object_names(bucket) == ["mutable/1", "short/1"])
+
+    cache.delete_all_objects(bucket, prefix="short")
+    assert(cache.get_cache_stats()["objects"] == 0)
+
+
+def test_caching_objstore_lru(bucket):
+    cache = CachingObjectStore(Testing_ObjectStore, max_bytes=400,
+                               default_ttl=60)
+
+    for i in range(0, 5):
+        Testing_ObjectStore.set_object(bucket, "lru/%d" % i, b"x" * 100)
+
+    for i in range(0, 4):
+        cache.get_object(bucket, "lru/%d" % i)
+
+    # touch the oldest object so that the second oldest is evicted
+    cache.get_object(bucket, "lru/0")
+    cache.get_object(bucket, "lru/4")
+
+    stats = cache.get_cache_stats()
+    assert(stats["evictions"] == 1)
+    assert(stats["bytes"] == 400)
+
+    cache.get_object(bucket, "lru/0")
+    assert(cache.get_cache_stats()["hits"] == 2)
+
+    cache.get_object(bucket, "lru/1")
+    assert(cache.get_cache_stats()["hits"] == 2)
+
+    # objects larger than a quarter of the cache are never cached
+    Testing_ObjectStore.set_object(bucket, "lru/big", b"x" * 101)
+    assert(cache.get_object(bucket, "lru/big") == b"x" * 101)
+
+    stats = cache.get_cache_stats()
+    assert(stats["objects"] == 4)
+    assert(stats["bytes"] == 400)
@@ -0,0 +1,110 @@
+import pytest
+import sys
+
+from Acquire.ObjectStore import ObjectStore, ObjectStoreError, \
+    encode_document, decode_document, set_document_codec, get_document_codec, \
+    migrate_documents
+from Acquire.ObjectStore._memory_objstore import Memory_ObjectStore
+
+
+@pytest.fixture
+def codec():
+    original = get_document_codec()
+    yield
+    set_document_codec(original)
+
+
+def test_document_codec(codec):
+    document = {"name": "test", "values": [1, 2.5, None, True],
+                "nested": {"a": "b" * 300}}
+
+    for name in ["json", "msgpack"]:
+        data = encode_document(document, codec=name)
+        assert(isinstance(data, bytes))
+        assert(decode_document(data) == document)
+
+    assert(encode_document(document, codec="json").startswith(b"{"))
+    assert(len(encode_document(document, codec="msgpack")) <
+           len(encode_document(document, codec="json")))
+
+    # existing json documents can still be read
+    assert(decode_document(b'{"a": 1}') == {"a": 1})
+    assert(decode_document('[1, 2]') == [1, 2])
+
+    # documents that msgpack cannot encode fall back to json
+    big = {"value": 2**100}
+    data = encode_document(big, codec="msgpack")
+    assert(data.startswith(b"{"))
+    assert(decode_document(data) == big)
+
+    set_document_codec("msgpack")
+    assert(get_document_codec() == "msgpack")
+    assert(decode_document(encode_document(document)) == document)
+
+    with pytest.raises(ObjectStoreError):
+        set_document_codec("pickle")
+
+    try:
+        import zstandard
+        set_document_codec("msgpack+zstd")
+        data = encode_document(document)
+        assert(len(data) < len(encode_document(document, codec="msgpack")))
+        assert(decode_document(data) == document)
+    except ImportError:
+        with pytest.raises(ImportError):
+            set_document_codec("msgpack+zstd")
+
+    with pytest.raises(ObjectStoreError):
+        decode_document(b"\x89ACQ\x07\x01")
+
+
+def test_migrate_documents(codec, monkeypatch):
+    store = Memory_ObjectStore()
+    bucket = store.get_bucket(None, "test")
+    monkeypatch.setattr(sys.modules[ObjectStore.__module__],
+                        "_objstore_backend", store)
+
+    for i in range(0, 5):
+        ObjectStore.set_object_from_json(bucket, "docs/%d" % i,
+                                         {"i": i, "name": "doc %d" % i})
+
+    ObjectStore.set_string_object(bucket, "docs/string", "12345")
+    ObjectStore.set_object(bucket, "docs/binary", b"\x00\x01\x02")
+
+    # the whole bucket cannot be migrated by accident
+    for prefix in [None, ""]:
+        with pytest.raises(ObjectStoreError):
+            migrate_documents(bucket, prefix, codec="msgpack")
+
+    assert(ObjectStore.get_object(bucket, "docs/0").startswith(b"{"))
+
+    result = migrate_documents(bucket, "docs/", codec="msgpack",
+                               dry_run=True)
+    assert(result["converted"] == 5)
+    assert(result["skipped"] == 2)
+    assert(result["bytes_after"] < result["bytes_before"])
+    assert(ObjectStore.get_object(bucket, "docs/0").startswith(b"{"))
+
+    result = migrate_documents(bucket, "docs/", codec="msgpack")
+    assert(result["converted"] == 5)
+    assert(result["errors"] == 0)
+    assert(ObjectStore.get_object(bucket,
+                                  "docs/0").startswith(b"\x89ACQ"))
+    assert(ObjectStore.get_string_object(bucket,
+                                         "docs/string") == "12345")
+
+    assert(ObjectStore.get_object_from_json(bucket, "docs/3") ==
+           {"i": 3, "name": "doc 3"})
+    assert(ObjectStore.get_all_objects_from_json(bucket, "docs/")[
+                "docs/4"] == {"i": 4, "name": "doc 4"})
+
+    # migrating again does nothing
+    assert(migrate_documents(bucket, "docs/",
+                             codec="msgpack")["converted"] == 0)
+
+    # and the documents can be migrated back to json
+    result = migrate_documents(bucket, "docs/", codec="json")
+    assert(result["converted"] == 5)
+    assert(ObjectStore.get_object(bucket, "docs/1").startswith(b"{"))
+    assert(ObjectStore.take_object_from_json(bucket, "docs/1") ==
+           {"i": 1, "name": "doc 1"})
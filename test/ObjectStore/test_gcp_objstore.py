@@ -77,3 +77,44 @@ def test_get_bucket(gcp_bucket, exist, create):
     result['client'] == client_mock
     result['bucket'].location == 'europe-west2'
     result['bucket'].name == gcp_bucket
+
+
+def test_delete_objects():
+    '''
+    Test that delete_objects cleans the keys, and still counts the
+    objects that were deleted by a batch that then failed
+    '''
+    existing = {"a/b", "a/c", "a/d"}
+    deleted = []
+
+    class _NotFound(Exception):
+        code = 404
+
+    def _blob(key):
+        blob = MagicMock()
+
+        def _delete():
+            if key not in existing:
+                raise _NotFound(key)
+            existing.remove(key)
+            deleted.append(key)
+
+        blob.delete.side_effect = _delete
+        return blob
+
+    def _exit(*args):
+        if "a/missing" not in deleted:
+            raise _NotFound("a/missing")
+
+    bucket_mock = MagicMock()
+    bucket_mock.blob.side_effect = _blob
+    client_mock = MagicMock()
+    client_mock.batch.return_value.__exit__.side_effect = _exit
+    bucket_dict = {'bucket': bucket_mock, 'client': client_mock}
+
+    (ndeleted, errors) = GCP_ObjectStore.delete_objects(
+                            bucket_dict, ["a//b", "a/./c", "a/missing", "a/d"])
+
+    assert(sorted(deleted) == ["a/b", "a/c", "a/d"])
+    assert(ndeleted == 4)
+    assert(errors == {})
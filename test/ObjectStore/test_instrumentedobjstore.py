@@ -0,0 +1,66 @@
+import pytest
+
+from Acquire.ObjectStore import InstrumentedObjectStore, ObjectStoreError
+from Acquire.ObjectStore._memory_objstore import Memory_ObjectStore
+from Acquire.Service import start_profile, end_profile
+
+
+def test_instrumented_objstore():
+    store = InstrumentedObjectStore(Memory_ObjectStore())
+    bucket = store.get_bucket(None, "test")
+
+    store.set_object(bucket, "mutexes/abc", b"lock")
+    store.set_object(bucket, "accounting/accounts/1/txn", b"12345")
+    store.set_object(bucket, "misc/1", b"")
+    assert(store.get_object(bucket, "accounting/accounts/1/txn") ==
+           b"12345")
+    assert(store.get_all_object_names(bucket, "accounting/") ==
+           ["accounting/accounts/1/txn"])
+
+    with pytest.raises(ObjectStoreError):
+        store.get_object(bucket, "mutexes/missing")
+
+    stats = store.get_stats()
+    operations = stats["operations"]
+    families = stats["families"]
+
+    assert(operations["set_object"]["count"] == 3)
+    assert(operations["set_object"]["bytes_in"] == 9)
+    assert(operations["get_object"]["count"] == 2)
+    assert(operations["get_object"]["errors"] == 1)
+    assert(operations["get_object"]["bytes_out"] == 5)
+    assert(operations["get_bucket"]["count"] == 1)
+    assert(sum(operations["get_object"]["histogram"]) == 2)
+    assert(len(operations["get_object"]["histogram"]) ==
+           len(stats["histogram_buckets"]) + 1)
+
+    assert(families["mutexes/"]["count"] == 2)
+    assert(families["accounting/"]["count"] == 3)
+    assert(families["misc/"]["count"] == 1)
+
+    assert(store.get_stats(reset=True)["operations"] == operations)
+    assert(store.get_stats()["operations"] == {})
+
+    # a summary of the requests for each service request is attached
+    # to the response and passed to the exporters
+    exported = []
+    store.add_exporter(exported.append)
+
+    pr = start_profile()
+    store.list_prefixes(bucket, "accounting/")
+    store.get_object(bucket, "mutexes/abc")
+    result = {"status": 0}
+    end_profile(pr, result)
+
+    summary = result["objstore_stats"]
+    assert(summary["count"] == 2)
+    assert(summary["bytes_out"] == 4)
+    assert(summary["operations"] == {"list_prefixes": 1, "get_object": 1})
+    assert(summary["families"] == {"accounting/": 1, "mutexes/": 1})
+    assert(exported == [summary])
+
+    # nothing is attached if no requests were made
+    pr = start_profile()
+    result = {"status": 0}
+    end_profile(pr, result)
+    assert("objstore_stats" not in result)
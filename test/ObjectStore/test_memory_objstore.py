@@ -0,0 +1,110 @@
+import io
+import pytest
+
+from Acquire.ObjectStore import ObjectStoreError
+from Acquire.ObjectStore._memory_objstore import Memory_ObjectStore
+
+
+def test_memory_objstore():
+    store = Memory_ObjectStore()
+    bucket = store.get_bucket(None, "test")
+
+    for key in ["c/d", "b", "a/b", "a/a", "ab", "a/c/d"]:
+        store.set_object(bucket, key, key.encode("utf-8"))
+
+    assert(store.get_all_object_names(bucket) ==
+           ["a/a", "a/b", "a/c/d", "ab", "b", "c/d"])
+    assert(store.get_all_object_names(bucket, "a/", without_prefix=True) ==
+           ["a", "b", "c/d"])
+    assert(list(store.iter_object_names(bucket, "a", start_after="a/b",
+                                        page_size=1)) == ["a/c/d", "ab"])
+    assert(store.list_prefixes(bucket) == ["a/", "c/"])
+    assert(store.list_prefixes(bucket, "a/") == ["a/c/"])
+
+    assert(store.take_object(bucket, "a/b") == b"a/b")
+
+    with pytest.raises(ObjectStoreError):
+        store.get_object(bucket, "a/b")
+
+    (objects, errors) = store.get_objects(bucket, ["b", "ab", "missing"])
+    assert(objects == {"b": b"b", "ab": b"ab"})
+    assert(list(errors.keys()) == ["missing"])
+
+    assert(store.open_object(bucket, "c/d").read() == b"c/d")
+    assert(store.set_object_from_stream(bucket, "stream",
+                                        io.BytesIO(b"x" * 10),
+                                        part_size=3) ==
+           store.get_size_and_checksum(bucket, "stream"))
+    assert(store.get_object(bucket, "stream") == b"x" * 10)
+
+    etag = store.set_object_if_absent(bucket, "cas", b"first")
+    assert(etag is not None)
+    assert(store.set_object_if_absent(bucket, "cas", b"second") is None)
+    assert(store.get_object_with_etag(bucket, "cas") == (b"first", etag))
+    assert(store.set_object_if_match(bucket, "cas", b"second", "x") is None)
+    assert(store.set_object_if_match(bucket, "cas", b"second", etag)
+           is not None)
+
+    assert(store.delete_objects(bucket, ["b", "missing"]) == (1, {}))
+    assert(store.delete_prefix(bucket, "a/") == (2, {}))
+    assert(store.get_all_object_names(bucket) ==
+           ["ab", "c/d", "cas", "stream"])
+
+    # each store has its own objects
+    assert(Memory_ObjectStore().get_all_object_names(
+                        Memory_ObjectStore().get_bucket(None, "test")) == [])
+
+    with pytest.raises(PermissionError):
+        store.delete_bucket(bucket)
+
+    store.delete_bucket(bucket, force=True)
+
+    with pytest.raises(ObjectStoreError):
+        store.get_bucket(None, "test", create_if_needed=False)
+
+
+def test_memory_objstore_simulation():
+    store = Memory_ObjectStore(latency={"get_object": 0.5, "default": 0.0},
+                               bandwidth=1000, realtime=False)
+    bucket = store.get_bucket(None, "test")
+
+    store.set_object(bucket, "key", b"x" * 1000)
+    store.get_object(bucket, "key")
+
+    stats = store.get_stats()
+    assert(stats["requests"]["set_object"] == 1)
+    assert(stats["requests"]["get_object"] == 1)
+    assert(stats["bytes_in"] == 1000)
+    assert(stats["bytes_out"] == 1000)
+    assert(abs(stats["simulated_seconds"] - 2.5) < 1e-6)
+
+    # errors are injected at the requested rate, reproducibly
+    def _count_failures(seed):
+        store = Memory_ObjectStore(throttle_rate={"get_object": 0.2},
+                                   error_rate={"get_object": 0.1},
+                                   seed=seed)
+        bucket = store.get_bucket(None, "test")
+        store.set_object(bucket, "key", b"data")
+        failures = []
+
+        for _ in range(0, 1000):
+            try:
+                store.get_object(bucket, "key")
+            except ObjectStoreError as e:
+                failures.append(e.status)
+
+        return failures
+
+    failures = _count_failures(seed=42)
+    assert(failures == _count_failures(seed=42))
+    assert(100 < failures.count(429) < 300)
+    assert(0 < failures.count(500) < 200)
+
+    latency = Memory_ObjectStore.lognormal(0.05)
+    store = Memory_ObjectStore(latency=latency, seed=1, realtime=False)
+    bucket = store.get_bucket(None, "test")
+
+    for _ in range(0, 100):
+        store.set_object(bucket, "key", b"")
+
+    assert(2.0 < store.get_stats()["simulated_seconds"] < 10.0)
@@ -1,5 +1,4 @@
-
-from Acquire.ObjectStore import Mutex, MutexTimeoutError
+from Acquire.ObjectStore import Mutex, MutexTimeoutError, ObjectStore
 from Acquire.Service import get_service_account_bucket, \
     push_is_running_service, pop_is_running_service
 
@@ -17,11 +16,12 @@ def bucket(tmpdir_factory):
     return bucket
 
 
-def test_mutex(bucket):
+@pytest.mark.parametrize("impl", ["poll", "cas"])
+def test_mutex(bucket, impl):
     push_is_running_service()
 
     try:
-        m = Mutex("ObjectStore.test_mutex")
+        m = Mutex("ObjectStore.test_mutex_%s" % impl, impl=impl)
 
         assert(m.is_locked())
         m.unlock()
@@ -35,7 +35,7 @@ def test_mutex(bucket):
         m.unlock()
         assert(not m.is_locked())
 
-        m2 = Mutex("ObjectStore.test_mutex")
+        m2 = Mutex("ObjectStore.test_mutex_%s" % impl, impl=impl)
         assert(m2.is_locked())
 
         with pytest.raises(MutexTimeoutError):
@@ -86,4 +86,68 @@ def test_mutex(bucket):
         pop_is_running_service()
         raise
 
-    pop_is_running_service()
\ No newline at end of file
+    pop_is_running_service()
+
+
+def test_cas_mutex(bucket):
+    import threading
+
+    with pytest.raises(ValueError):
+        Mutex("ObjectStore.test_cas_mutex", bucket=bucket, impl="unknown")
+
+    m = Mutex("ObjectStore.test_cas_mutex", bucket=bucket, impl="cas")
+    token = m.fencing_token()
+    assert(token is not None)
+    m.unlock()
+    assert(m.fencing_token() is None)
+
+    # the fencing token increases every time the mutex is taken
+    m.lock()
+    assert(m.fencing_token() == token + 1)
+    m.unlock()
+
+    # only one thread at a time can hold the mutex - failures are
+    # recorded and checked here, as asserts in the threads are lost
+    held = []
+    tokens = []
+    violations = []
+
+    def _hold():
+        m = Mutex("ObjectStore.test_cas_mutex", bucket=bucket, impl="cas")
+        held.append(1)
+        if len(held) != 1:
+            violations.append(len(held))
+        tokens.append(m.fencing_token())
+        time.sleep(0.01)
+        held.pop()
+        m.unlock()
+
+    threads = [threading.Thread(target=_hold) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert(violations == [])
+    assert(sorted(tokens) == list(range(token + 2, token + 7)))
+
+    # the lease is renewed in the background while the mutex is held
+    m = Mutex("ObjectStore.test_cas_mutex", bucket=bucket, impl="cas",
+              lease_time=0.3, auto_renew=True)
+    time.sleep(0.5)
+    assert(not m.expired())
+
+    with pytest.raises(MutexTimeoutError):
+        Mutex("ObjectStore.test_cas_mutex", bucket=bucket, impl="cas",
+              timeout=0.2)
+
+    m.unlock()
+    assert(not m.is_locked())
+
+    # a corrupted lockstring is treated as an expired lease
+    for holder in [b"not a lockstring", b"secret{}x{}never", b"\xff\xfe"]:
+        ObjectStore.set_object(bucket, m._key, holder)
+        m = Mutex("ObjectStore.test_cas_mutex", bucket=bucket, impl="cas",
+                  timeout=1)
+        assert(m.is_locked())
+        m.unlock()
@@ -95,3 +95,375 @@ def test_objstore(bucket):
     test_value2 = ObjectStore.get_string_object(new_bucket2, test_key)
 
     assert(test_value == test_value2)
+
+
+def test_get_objects(bucket):
+    bucket = ObjectStore.get_bucket(bucket, "get_objects")
+
+    keys = ["multi/%03d" % i for i in range(0, 50)]
+
+    for key in keys:
+        ObjectStore.set_object_from_json(bucket, key, {"key": key})
+
+    (objects, errors) = ObjectStore.get_objects(bucket,
+                                                keys + ["multi/missing"],
+                                                max_workers=4)
+
+    assert(len(objects) == len(keys))
+    assert(list(errors.keys()) == ["multi/missing"])
+    assert(isinstance(errors["multi/missing"], ObjectStoreError))
+
+    for key in keys:
+        assert(objects[key] == ('{"key": "%s"}' % key).encode("utf-8"))
+
+    ObjectStore.set_string_object(bucket, "multi/not_json", "{{{")
+
+    (objects, errors) = ObjectStore.get_objects_from_json(
+                                    bucket, keys + ["multi/not_json"])
+
+    assert(len(objects) == len(keys))
+    assert(list(errors.keys()) == ["multi/not_json"])
+    assert(objects[keys[10]] == {"key": keys[10]})
+
+    objects = ObjectStore.get_all_objects_from_json(bucket, "multi")
+    assert(len(objects) == len(keys))
+
+    objects = ObjectStore.get_all_strings(bucket, "multi")
+    assert(len(objects) == len(keys) + 1)
+
+
+def test_iter_object_names(bucket):
+    import itertools
+
+    bucket = ObjectStore.get_bucket(bucket, "iter_object_names")
+
+    keys = ["list/a", "list/a.b", "list/a/b", "list/a/c/d", "list/a0",
+            "list/b/1", "list/b/2", "listing", "other"]
+
+    for key in reversed(keys):
+        ObjectStore.set_string_object(bucket, key, key)
+
+    names = list(ObjectStore.iter_object_names(bucket))
+    assert(names == keys)
+
+    names = list(ObjectStore.iter_object_names(bucket, "list/"))
+    assert(names == keys[0:7])
+
+    names = list(ObjectStore.iter_object_names(bucket, "list/a",
+                                               without_prefix=True))
+    assert(names == [".b", "b", "c/d", "0"])
+
+    names = list(ObjectStore.iter_object_names(bucket, "list",
+                                               start_after="list/a/b"))
+    assert(names == keys[3:8])
+
+    names = list(ObjectStore.iter_object_names(bucket,
+                                               start_after="list/a0"))
+    assert(names == keys[5:])
+
+    names = list(itertools.islice(
+                    ObjectStore.iter_object_names(bucket, "list"), 2))
+    assert(names == keys[0:2])
+
+    assert(ObjectStore.get_all_object_names(bucket, "list/b") ==
+           ["list/b/1", "list/b/2"])
+
+
+def test_open_object(bucket, tmpdir):
+    from Acquire.ObjectStore import ObjectStream
+
+    bucket = ObjectStore.get_bucket(bucket, "open_object")
+
+    data = bytes(range(0, 256)) * 10000
+
+    ObjectStore.set_object(bucket, "large", data)
+
+    with ObjectStore.open_object(bucket, "large") as stream:
+        assert(isinstance(stream, ObjectStream))
+        assert(stream.read(10) == data[0:10])
+        assert(b"".join(stream.chunks()) == data[10:])
+        assert(stream.read(10) == b"")
+
+    assert(stream.closed)
+
+    with ObjectStore.open_object(bucket, "large") as stream:
+        assert(stream.read() == data)
+
+    filename = str(tmpdir.join("large"))
+    ObjectStore.get_object_as_file(bucket, "large", filename)
+
+    with open(filename, "rb") as FILE:
+        assert(FILE.read() == data)
+
+    with pytest.raises(ObjectStoreError):
+        ObjectStore.open_object(bucket, "missing")
+
+
+def test_object_stream():
+    from Acquire.ObjectStore import ObjectStream
+
+    closed = []
+
+    stream = ObjectStream([b"abc", b"", bytearray(b"defg"), b"h"],
+                          close_function=lambda: closed.append(True))
+
+    buffer = bytearray(5)
+    assert(stream.readinto(buffer) == 3)
+    assert(buffer[0:3] == b"abc")
+    assert(stream.read(2) == b"de")
+    assert([bytes(c) for c in stream.chunks()] == [b"fg", b"h"])
+    assert(stream.read() == b"")
+
+    stream.close()
+    assert(closed == [True])
+
+    with pytest.raises(ValueError):
+        stream.read(1)
+
+
+def test_set_object_from_stream(bucket, tmpdir):
+    import hashlib
+    import io
+
+    bucket = ObjectStore.get_bucket(bucket, "set_object_from_stream")
+
+    data = bytes(range(0, 256)) * 5000
+    checksum = hashlib.md5(data).hexdigest()
+
+    result = ObjectStore.set_object_from_stream(bucket, "stream/data",
+                                                io.BytesIO(data),
+                                                part_size=4096)
+
+    assert(result == (len(data), checksum))
+    assert(ObjectStore.get_object(bucket, "stream/data") == data)
+    assert(ObjectStore.get_size_and_checksum(bucket, "stream/data") ==
+           (len(data), checksum))
+
+    filename = str(tmpdir.join("stream_file"))
+
+    with open(filename, "wb") as FILE:
+        FILE.write(data[0:1000])
+
+    result = ObjectStore.set_object_from_file(bucket, "stream/data",
+                                              filename)
+
+    assert(result == (1000, hashlib.md5(data[0:1000]).hexdigest()))
+    assert(ObjectStore.get_object(bucket, "stream/data") == data[0:1000])
+
+    # no temporary files should be left behind
+    assert(ObjectStore.get_all_object_names(bucket) == ["stream/data"])
+
+
+def test_size_and_checksum(bucket, monkeypatch):
+    import hashlib
+
+    bucket = ObjectStore.get_bucket(bucket, "size_and_checksum")
+
+    data = b"some data" * 100
+    ObjectStore.set_object(bucket, "checksum/data", data)
+
+    # the checksum is written with the object, so it is not recalculated
+    from Acquire import Access
+
+    def _no_hashing(filename):
+        raise AssertionError("The data should not be re-read")
+
+    monkeypatch.setattr(Access, "get_filesize_and_checksum", _no_hashing)
+
+    assert(ObjectStore.get_size_and_checksum(bucket, "checksum/data") ==
+           (len(data), hashlib.md5(data).hexdigest()))
+
+    etag = ObjectStore.set_object_if_absent(bucket, "checksum/new", b"1")
+    assert(ObjectStore.set_object_if_match(bucket, "checksum/new", b"22",
+                                           etag) is not None)
+    assert(ObjectStore.get_size_and_checksum(bucket, "checksum/new") ==
+           (2, hashlib.md5(b"22").hexdigest()))
+
+    monkeypatch.undo()
+
+    assert(ObjectStore.get_all_object_names(bucket, "checksum/") ==
+           ["checksum/data", "checksum/new"])
+
+    if not isinstance(bucket, str):
+        # only the filesystem backend stores checksums in files
+        ObjectStore.delete_objects(bucket, ["checksum/data", "checksum/new"])
+        assert(ObjectStore.get_all_object_names(bucket, "checksum/") == [])
+        return
+
+    # the checksum is recalculated if the data changes behind the
+    # back of the object store
+    import os
+    os.remove(os.path.join(bucket, "checksum/data._md5"))
+    assert(ObjectStore.get_size_and_checksum(bucket, "checksum/data") ==
+           (len(data), hashlib.md5(data).hexdigest()))
+
+    with open(os.path.join(bucket, "checksum/data._data"), "wb") as FILE:
+        FILE.write(b"changed")
+
+    assert(ObjectStore.get_size_and_checksum(bucket, "checksum/data") ==
+           (7, hashlib.md5(b"changed").hexdigest()))
+
+    # the checksums are not listed as objects, and are removed with them
+    assert(ObjectStore.get_all_object_names(bucket, "checksum/") ==
+           ["checksum/data", "checksum/new"])
+    ObjectStore.delete_objects(bucket, ["checksum/data", "checksum/new"])
+    assert(os.listdir(os.path.join(bucket, "checksum")) == [])
+
+    with pytest.raises(ObjectStoreError):
+        ObjectStore.get_size_and_checksum(bucket, "checksum/data")
+
+
+def test_conditional_writes(bucket):
+    import threading
+
+    bucket = ObjectStore.get_bucket(bucket, "conditional_writes")
+
+    assert(ObjectStore.set_object_if_absent(bucket, "cas/a", b"first"))
+    assert(ObjectStore.set_object_if_absent(bucket, "cas/a",
+                                            b"second") is None)
+    assert(ObjectStore.get_object(bucket, "cas/a") == b"first")
+
+    (data, etag) = ObjectStore.get_object_with_etag(bucket, "cas/a")
+    assert(data == b"first")
+
+    new_etag = ObjectStore.set_object_if_match(bucket, "cas/a", b"second",
+                                               etag)
+    assert(new_etag is not None)
+    assert(ObjectStore.get_object_with_etag(bucket, "cas/a") ==
+           (b"second", new_etag))
+    assert(not ObjectStore.set_object_if_match(bucket, "cas/a", b"third",
+                                               etag))
+    assert(ObjectStore.get_object(bucket, "cas/a") == b"second")
+
+    assert(not ObjectStore.set_object_if_match(bucket, "cas/missing",
+                                               b"data", etag))
+
+    # the etag identifies the write, so is not reused if the same
+    # data is written again
+    old_etag = new_etag
+    new_etag = ObjectStore.set_object_if_match(bucket, "cas/a", b"first",
+                                               new_etag)
+    new_etag = ObjectStore.set_object_if_match(bucket, "cas/a", b"second",
+                                               new_etag)
+    assert(new_etag is not None and new_etag != old_etag)
+    assert(not ObjectStore.set_object_if_match(bucket, "cas/a", b"third",
+                                               old_etag))
+    assert(ObjectStore.get_object(bucket, "cas/a") == b"second")
+
+    with pytest.raises(ObjectStoreError):
+        ObjectStore.get_object_with_etag(bucket, "cas/missing")
+
+    # only one of many concurrent writers can create the object
+    results = []
+
+    def _set(i):
+        results.append(ObjectStore.set_object_if_absent(
+                                    bucket, "cas/race", str(i).encode()))
+
+    threads = [threading.Thread(target=_set, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert(len([r for r in results if r is not None]) == 1)
+
+    assert(ObjectStore.set_ins_string_object(bucket, "cas/ins", "a") == "a")
+    assert(ObjectStore.set_ins_string_object(bucket, "cas/ins", "b") == "a")
+
+    assert(ObjectStore.set_ins_object_from_json(bucket, "cas/json",
+                                                {"a": 1}) == {"a": 1})
+    assert(ObjectStore.set_ins_object_from_json(bucket, "cas/json",
+                                                {"b": 2}) == {"a": 1})
+
+    # no temporary files should be left behind
+    assert(ObjectStore.get_all_object_names(bucket) ==
+           ["cas/a", "cas/ins", "cas/json", "cas/race"])
+
+
+def _increment_counter(bucket, key, count):
+    """Increment the counter at 'key' 'count' times using
+       compare-and-swap
+    """
+    for _ in range(0, count):
+        while True:
+            (data, etag) = ObjectStore.get_object_with_etag(bucket, key)
+            value = str(int(data) + 1).encode()
+
+            if ObjectStore.set_object_if_match(bucket, key, value, etag):
+                break
+
+
+def test_conditional_writes_between_processes(bucket):
+    import multiprocessing
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("Cannot fork processes on this platform")
+
+    bucket = ObjectStore.get_bucket(bucket, "conditional_processes")
+    ObjectStore.set_object(bucket, "counter", b"0")
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_increment_counter,
+                                 args=(bucket, "counter", 25))
+                 for _ in range(0, 4)]
+
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert(all(process.exitcode == 0 for process in processes))
+
+    # no increments are lost, even though the writers do not share
+    # any in-process locks
+    assert(ObjectStore.get_object(bucket, "counter") == b"100")
+
+
+def test_list_prefixes(bucket):
+    bucket = ObjectStore.get_bucket(bucket, "list_prefixes")
+
+    for key in ["a/b/c", "a/b/d", "a/e", "a/f/g/h", "ab/c", "b",
+                "balance/2019-01-02T03", "balance/2019-02-01T00",
+                "balance/2020-01-01T00"]:
+        ObjectStore.set_string_object(bucket, key, key)
+
+    assert(ObjectStore.list_prefixes(bucket) == ["a/", "ab/", "balance/"])
+    assert(ObjectStore.list_prefixes(bucket, "a/") == ["a/b/", "a/f/"])
+    assert(ObjectStore.list_prefixes(bucket, "a") == ["a/", "ab/"])
+    assert(ObjectStore.list_prefixes(bucket, "a/b/") == [])
+    assert(ObjectStore.list_prefixes(bucket, "missing/") == [])
+
+    assert(ObjectStore.list_prefixes(bucket, "balance/", delimiter="-") ==
+           ["balance/2019-", "balance/2020-"])
+    assert(ObjectStore.list_prefixes(bucket, "balance/2019-",
+                                     delimiter="-") ==
+           ["balance/2019-01-", "balance/2019-02-"])
+
+
+def test_bulk_delete(bucket):
+    bucket = ObjectStore.get_bucket(bucket, "bulk_delete")
+
+    keys = ["a/b/c", "a/b/d", "a/e", "ab/c", "b", "c/1", "c/2", "d/1"]
+
+    for key in keys:
+        ObjectStore.set_string_object(bucket, key, key)
+
+    assert(ObjectStore.delete_objects(bucket, ["b", "a/e", "missing"]) ==
+           (2, {}))
+    assert(ObjectStore.get_all_object_names(bucket) ==
+           ["a/b/c", "a/b/d", "ab/c", "c/1", "c/2", "d/1"])
+
+    # only the keys that start with the prefix are deleted
+    assert(ObjectStore.delete_prefix(bucket, "a/") == (2, {}))
+    assert(ObjectStore.get_all_object_names(bucket) ==
+           ["ab/c", "c/1", "c/2", "d/1"])
+
+    assert(ObjectStore.delete_prefix(bucket, "c/1") == (1, {}))
+    assert(ObjectStore.delete_prefix(bucket, "missing/") == (0, {}))
+
+    ObjectStore.clear_all_except(bucket, ["ab/", "d"])
+    assert(ObjectStore.get_all_object_names(bucket) == ["ab/c", "d/1"])
+
+    assert(ObjectStore.delete_prefix(bucket, None) == (2, {}))
+    assert(ObjectStore.get_all_object_names(bucket) == [])
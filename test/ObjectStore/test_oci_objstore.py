@@ -0,0 +1,348 @@
+
+import pytest
+
+from types import SimpleNamespace
+
+from Acquire.ObjectStore import ObjectStoreError
+from Acquire.ObjectStore._oci_objstore import OCI_ObjectStore
+
+
+class _MockClient:
+    """Mock OCI client that returns the passed names in pages"""
+    def __init__(self, names):
+        self._names = sorted(names)
+        self.calls = []
+
+    def list_objects(self, namespace, bucket_name, prefix=None, limit=1000,
+                     start=None, start_after=None):
+        self.calls.append({"prefix": prefix, "start": start,
+                           "start_after": start_after})
+
+        names = [n for n in self._names
+                 if (prefix is None or n.startswith(prefix)) and
+                 (start is None or n >= start) and
+                 (start_after is None or n > start_after)]
+
+        page = names[0:limit]
+
+        if len(names) > limit:
+            next_start_with = names[limit]
+        else:
+            next_start_with = None
+
+        objects = [SimpleNamespace(name=n) for n in page]
+
+        return SimpleNamespace(data=SimpleNamespace(
+                                    objects=objects,
+                                    next_start_with=next_start_with))
+
+
+def test_oci_iter_object_names():
+    names = ["accounts/%05d" % i for i in range(0, 2500)] + ["other"]
+    client = _MockClient(names)
+    bucket = {"client": client, "namespace": "ns", "bucket_name": "test"}
+
+    result = OCI_ObjectStore.get_all_object_names(bucket, "accounts")
+
+    # all of the pages must be followed
+    assert(result == names[0:2500])
+    assert(len(client.calls) == 3)
+
+    result = OCI_ObjectStore.get_all_object_names(bucket, "accounts/",
+                                                  without_prefix=True)
+    assert(result == ["%05d" % i for i in range(0, 2500)])
+
+    client.calls = []
+    it = OCI_ObjectStore.iter_object_names(bucket, "accounts",
+                                           start_after="accounts/00010",
+                                           page_size=5)
+
+    assert(next(it) == "accounts/00011")
+    assert(len(client.calls) == 1)
+    assert(client.calls[0]["start_after"] == "accounts/00010")
+
+    result = [next(it) for _ in range(0, 6)]
+    assert(result[-1] == "accounts/00017")
+    assert(len(client.calls) == 2)
+    assert(client.calls[1]["start"] == "accounts/00016")
+
+
+class _MockRaw:
+    def __init__(self, data):
+        self._data = data
+
+    def stream(self, chunk_size, decode_content=True):
+        for i in range(0, len(self._data), chunk_size):
+            yield self._data[i:i+chunk_size]
+
+
+class _MockObjectClient:
+    """Mock OCI client that serves objects from a dictionary"""
+    def __init__(self, objects):
+        self._objects = objects
+        self.closed = 0
+
+    def get_object(self, namespace, bucket_name, key):
+        if key not in self._objects:
+            raise KeyError(key)
+
+        mock = self
+
+        class _Data:
+            raw = _MockRaw(self._objects[key])
+
+            def close(self):
+                mock.closed += 1
+
+        return SimpleNamespace(data=_Data())
+
+
+def test_oci_get_chunked_object():
+
+    parts = [bytes([i]) * (1024 * 1024 + i) for i in range(1, 4)]
+    objects = {"whole": b"x" * 10,
+               "chunked/1": parts[0],
+               "chunked/2": parts[1],
+               "chunked/3": parts[2]}
+
+    client = _MockObjectClient(objects)
+    bucket = {"client": client, "namespace": "ns", "bucket_name": "test"}
+
+    assert(OCI_ObjectStore.get_object(bucket, "whole") == b"x" * 10)
+    assert(OCI_ObjectStore.get_object(bucket, "chunked") == b"".join(parts))
+
+    with OCI_ObjectStore.open_object(bucket, "chunked") as stream:
+        assert(stream.read(5) == parts[0][0:5])
+        data = stream.read()
+
+    assert(data == b"".join(parts)[5:])
+    assert(client.closed == 3)
+
+    with pytest.raises(ObjectStoreError):
+        OCI_ObjectStore.open_object(bucket, "missing")
+
+
+class _MockMultipartClient:
+    """Mock OCI client that supports multipart uploads, failing the
+       first attempt to upload part 2
+    """
+    def __init__(self):
+        self.parts = {}
+        self.objects = {}
+        self.failed = set()
+
+    def put_object(self, namespace, bucket_name, key, data):
+        self.objects[key] = data.read()
+
+    def create_multipart_upload(self, namespace, bucket_name, request):
+        return SimpleNamespace(data=SimpleNamespace(upload_id="upload"))
+
+    def upload_part(self, namespace, bucket_name, key, upload_id, part_num,
+                    data, content_md5=None):
+        import base64
+        import hashlib
+
+        data = data.read()
+        assert(content_md5 == base64.b64encode(
+                                hashlib.md5(data).digest()).decode("utf-8"))
+
+        if part_num == 2 and part_num not in self.failed:
+            self.failed.add(part_num)
+            raise IOError("Transient failure")
+
+        self.parts[part_num] = data
+        return SimpleNamespace(headers={"etag": "etag-%d" % part_num})
+
+    def commit_multipart_upload(self, namespace, bucket_name, key,
+                                upload_id, request):
+        etags = [(p.part_num, p.etag) for p in request.parts_to_commit]
+        assert(etags == [(i, "etag-%d" % i)
+                         for i in range(1, len(self.parts) + 1)])
+
+        self.objects[key] = b"".join(self.parts[i]
+                                     for i in range(1, len(self.parts) + 1))
+
+
+def test_oci_multipart_upload(monkeypatch):
+    import hashlib
+    import io
+    import sys
+    import types
+
+    models = types.ModuleType("oci.object_storage.models")
+
+    for name in ["CreateMultipartUploadDetails",
+                 "CommitMultipartUploadDetails",
+                 "CommitMultipartUploadPartDetails"]:
+        setattr(models, name, type(name, (SimpleNamespace,), {}))
+
+    monkeypatch.setitem(sys.modules, "oci.object_storage.models", models)
+    monkeypatch.setattr(
+        "Acquire.ObjectStore._oci_objstore._retry.__defaults__", (3, 0))
+
+    client = _MockMultipartClient()
+    bucket = {"client": client, "namespace": "ns", "bucket_name": "test"}
+
+    part_size = 10 * 1024 * 1024
+    data = b"".join(bytes([i]) * part_size for i in range(0, 3)) + b"end"
+
+    result = OCI_ObjectStore.set_object_from_stream(bucket, "big",
+                                                    io.BytesIO(data),
+                                                    part_size=part_size,
+                                                    max_workers=2)
+
+    assert(result == (len(data), hashlib.md5(data).hexdigest()))
+    assert(client.objects["big"] == data)
+    assert(len(client.parts) == 4)
+
+    result = OCI_ObjectStore.set_object_from_stream(bucket, "small",
+                                                    io.BytesIO(b"small"))
+    assert(result == (5, hashlib.md5(b"small").hexdigest()))
+    assert(client.objects["small"] == b"small")
+
+
+class _MockServiceError(Exception):
+    def __init__(self, status):
+        super().__init__("status %d" % status)
+        self.status = status
+
+
+class _MockConditionalClient:
+    """Mock OCI client that supports the if-match and if-none-match
+       preconditions on put_object, using a version counter as etag
+    """
+    def __init__(self):
+        self.objects = {}
+        self.version = 0
+
+    def get_object(self, namespace, bucket_name, key):
+        if key not in self.objects:
+            raise _MockServiceError(404)
+
+        (data, etag) = self.objects[key]
+        return SimpleNamespace(data=SimpleNamespace(raw=_MockRaw(data)),
+                               headers={"etag": etag})
+
+    def put_object(self, namespace, bucket_name, key, data,
+                   if_match=None, if_none_match=None):
+        if if_none_match == "*" and key in self.objects:
+            raise _MockServiceError(412)
+
+        if if_match is not None:
+            if key not in self.objects:
+                raise _MockServiceError(404)
+            elif self.objects[key][1] != if_match:
+                raise _MockServiceError(412)
+
+        self.version += 1
+        self.objects[key] = (data.read(), "etag-%d" % self.version)
+
+        return SimpleNamespace(headers={"etag": "etag-%d" % self.version})
+
+
+def test_oci_conditional_writes():
+    client = _MockConditionalClient()
+    bucket = {"client": client, "namespace": "ns", "bucket_name": "test"}
+
+    assert(OCI_ObjectStore.set_object_if_absent(bucket, "a", b"first") ==
+           "etag-1")
+    assert(not OCI_ObjectStore.set_object_if_absent(bucket, "a", b"second"))
+
+    (data, etag) = OCI_ObjectStore.get_object_with_etag(bucket, "a")
+    assert(data == b"first")
+    assert(etag == "etag-1")
+
+    assert(OCI_ObjectStore.set_object_if_match(bucket, "a", b"second", etag))
+    assert(not OCI_ObjectStore.set_object_if_match(bucket, "a", b"third",
+                                                   etag))
+    assert(not OCI_ObjectStore.set_object_if_match(bucket, "b", b"data",
+                                                   etag))
+
+    assert(OCI_ObjectStore.get_object_with_etag(bucket, "a") ==
+           (b"second", "etag-2"))
+
+    with pytest.raises(ObjectStoreError):
+        OCI_ObjectStore.get_object_with_etag(bucket, "b")
+
+
+class _MockDeleteClient(_MockClient):
+    """Mock OCI client that supports delete_object"""
+    def __init__(self, names):
+        super().__init__(names)
+        self.deleted = []
+
+    def delete_object(self, namespace, bucket_name, key):
+        if key == "fail":
+            raise _MockServiceError(500)
+        elif key not in self._names:
+            raise _MockServiceError(404)
+
+        self._names.remove(key)
+        self.deleted.append(key)
+
+
+def test_oci_delete_prefix():
+    names = ["uploads/%04d" % i for i in range(0, 1500)] + ["other", "fail"]
+    client = _MockDeleteClient(names)
+    bucket = {"client": client, "namespace": "ns", "bucket_name": "test"}
+
+    # only the objects under the prefix are deleted
+    assert(OCI_ObjectStore.delete_prefix(bucket, "uploads/") == (1500, {}))
+    assert(client._names == ["fail", "other"])
+
+    (ndeleted, errors) = OCI_ObjectStore.delete_objects(
+                                    bucket, ["other", "missing", "fail"])
+    assert(ndeleted == 1)
+    assert(list(errors.keys()) == ["fail"])
+
+    client = _MockDeleteClient(["a/1", "a/2", "b/1"])
+    bucket["client"] = client
+    OCI_ObjectStore.delete_all_objects(bucket, prefix="a/")
+    assert(client._names == ["b/1"])
+
+
+class _MockHeadClient(_MockObjectClient):
+    """Mock OCI client that returns the object metadata from HEAD"""
+    def __init__(self, objects, headers):
+        super().__init__(objects)
+        self._headers = headers
+        self.downloads = 0
+
+    def head_object(self, namespace, bucket_name, key):
+        if key not in self._headers:
+            raise KeyError(key)
+
+        return SimpleNamespace(headers=self._headers[key])
+
+    def get_object(self, namespace, bucket_name, key):
+        self.downloads += 1
+        return super().get_object(namespace, bucket_name, key)
+
+
+def test_oci_get_size_and_checksum():
+    import base64
+    import hashlib
+
+    data = b"x" * 1000
+    md5 = hashlib.md5(data)
+
+    client = _MockHeadClient(
+        {"multipart": data},
+        {"simple": {"Content-Length": "1000",
+                    "Content-MD5": base64.b64encode(md5.digest())},
+         "multipart": {"Content-Length": "1000",
+                       "opc-multipart-md5": "abc-2"}})
+    bucket = {"client": client, "namespace": "ns", "bucket_name": "test"}
+
+    # the checksum is read from the metadata...
+    assert(OCI_ObjectStore.get_size_and_checksum(bucket, "simple") ==
+           (1000, md5.hexdigest()))
+    assert(client.downloads == 0)
+
+    # ...unless this is a multipart object, which must be streamed
+    assert(OCI_ObjectStore.get_size_and_checksum(bucket, "multipart") ==
+           (1000, md5.hexdigest()))
+    assert(client.downloads == 1)
+
+    with pytest.raises(ObjectStoreError):
+        OCI_ObjectStore.get_size_and_checksum(bucket, "missing")
@@ -1,6 +1,7 @@
 
 import pytest
 import datetime
+import sys
 import uuid
 
 from Acquire.ObjectStore import ObjectStore, ObjectStoreError, OSPar
@@ -87,6 +88,16 @@ def test_par(bucket):
 
     assert(ObjectStore.get_string_object(bucket, key) == value)
 
+    # files are streamed through the PAR
+    with open(__file__, "rb") as FILE:
+        filedata = FILE.read()
+
+    par.write(privkey).set_object_from_file(__file__)
+
+    assert(ObjectStore.get_object(bucket, key) == filedata)
+
+    par.write(privkey).set_string_object(value)
+
     par = ObjectStore.create_par(bucket, readable=False,
                                  writeable=True, duration=120,
                                  encrypt_key=pubkey)
@@ -110,3 +121,310 @@ def test_par(bucket):
         value = par.read(privkey).get_string_object()
 
         assert(keyvals[key] == value)
+
+
+class _MockRangeRequests:
+    """Mock of the requests module that serves an object using
+       HEAD and ranged GET requests, failing some requests once
+    """
+    def __init__(self, data, accept_ranges=True):
+        import threading
+        self._data = data
+        self._accept_ranges = accept_ranges
+        self._lock = threading.Lock()
+        self.ranges = []
+        self.failed = set()
+
+    def head(self, url):
+        from types import SimpleNamespace
+        headers = {"Content-Length": str(len(self._data))}
+
+        if self._accept_ranges:
+            headers["Accept-Ranges"] = "bytes"
+
+        return SimpleNamespace(status_code=200, headers=headers)
+
+    def get(self, url, headers=None, stream=False):
+        from types import SimpleNamespace
+
+        if headers is None or "Range" not in headers:
+            data = self._data
+            return SimpleNamespace(
+                status_code=200, content=data,
+                iter_content=lambda chunk_size: [data[i:i+chunk_size]
+                                                 for i in range(0, len(data),
+                                                                chunk_size)])
+
+        (start, end) = headers["Range"][6:].split("-")
+        (start, end) = (int(start), int(end))
+
+        with self._lock:
+            self.ranges.append(start)
+
+            # fail the first request for every third range
+            if (start // 1000) % 3 == 0 and start not in self.failed:
+                self.failed.add(start)
+                return SimpleNamespace(status_code=503, content=b"")
+
+        return SimpleNamespace(status_code=206,
+                               content=self._data[start:end+1])
+
+
+def test_ranged_download(tmpdir, monkeypatch):
+    from Acquire import Stubs
+    from Acquire.ObjectStore import ObjectReader
+
+    data = bytes(range(0, 256)) * 40 + b"end"
+    requests = _MockRangeRequests(data)
+    monkeypatch.setattr(Stubs, "requests", requests)
+
+    reader = ObjectReader()
+    reader._par = True
+    reader._url = "https://objectstorage.example.com/p/secret/o/data"
+
+    filename = str(tmpdir.join("ranged"))
+    reader.get_object_as_file(filename, parallelism=4, range_size=1000)
+
+    with open(filename, "rb") as FILE:
+        assert(FILE.read() == data)
+
+    # every range was downloaded, and the failed ranges were retried
+    assert(sorted(set(requests.ranges)) == list(range(0, len(data), 1000)))
+    assert(len(requests.ranges) == 11 + len(requests.failed))
+    assert(len(requests.failed) == 4)
+
+    # servers that don't support ranges are read in a single request
+    requests = _MockRangeRequests(data, accept_ranges=False)
+    monkeypatch.setattr(Stubs, "requests", requests)
+
+    filename = str(tmpdir.join("single"))
+    reader.get_object_as_file(filename, parallelism=4, range_size=1000)
+
+    with open(filename, "rb") as FILE:
+        assert(FILE.read() == data)
+
+    assert(requests.ranges == [])
+
+
+def _cleanup_par(par, bucket, name):
+    ObjectStore.set_string_object(bucket, "cleaned/%s" % name, par.uid())
+
+
+def test_sweep_expired_pars(tmpdir, monkeypatch):
+    from Acquire.ObjectStore import OSParRegistry, Function, \
+        get_datetime_now
+    from Acquire.Service import push_testing_objstore, \
+        pop_testing_objstore, clear_login_cache, is_running_service
+
+    monkeypatch.setattr(sys.modules[ObjectStore.__module__],
+                        "_objstore_backend",
+                        sys.modules[ObjectStore.__module__]._objstore_backend)
+
+    push_is_running_service()
+    push_testing_objstore(str(tmpdir))
+    clear_login_cache()
+
+    try:
+        bucket = get_service_account_bucket()
+        pubkey = get_private_key().public_key()
+
+        pars = {}
+
+        for (name, duration) in [("a", 60), ("b", 120), ("c", 7200),
+                                 ("d", 90000)]:
+            ObjectStore.set_string_object(bucket, name, name)
+            f = Function(_cleanup_par, bucket=bucket, name=name)
+            pars[name] = ObjectStore.create_par(bucket, key=name,
+                                                duration=duration,
+                                                encrypt_key=pubkey,
+                                                cleanup_function=f)
+
+        # 'b' has already been closed by its client
+        ObjectStore.close_par(par=pars["b"])
+        assert(ObjectStore.get_string_object(bucket,
+                                             "cleaned/b") == pars["b"].uid())
+        ObjectStore.delete_object(bucket, "cleaned/b")
+
+        expire_keys = ObjectStore.get_all_object_names(
+                                    bucket, "registry/pars/expire/")
+        assert(len(expire_keys) == 3)
+
+        # the index is bucketed by the hour of expiry
+        for key in expire_keys:
+            (hour, expires, uid) = key.split("/")[-3:]
+            assert(expires.startswith(hour))
+
+        # nothing has expired yet
+        result = OSParRegistry.sweep()
+        assert(result["nswept"] == 0)
+        assert(result["finished"])
+
+        now = get_datetime_now()
+        result = OSParRegistry.sweep(before=now + datetime.timedelta(
+                                                            hours=3),
+                                     max_pars=1)
+        assert(result["nswept"] == 1)
+        assert(not result["finished"])
+        assert(ObjectStore.get_string_object(bucket,
+                                             "cleaned/a") == pars["a"].uid())
+
+        # a registration that fails to load is kept, so that it is
+        # swept again later
+        get_object_from_json = ObjectStore.get_object_from_json
+
+        def _fail_to_load(bucket, key):
+            if key.startswith("registry/pars/uid/"):
+                raise RuntimeError("Failed to load %s" % key)
+
+            return get_object_from_json(bucket, key)
+
+        with monkeypatch.context() as m:
+            m.setattr(ObjectStore, "get_object_from_json",
+                      staticmethod(_fail_to_load))
+            result = OSParRegistry.sweep(before=now + datetime.timedelta(
+                                                                hours=3))
+
+        assert(result["nswept"] == 0)
+        assert(list(result["errors"].keys()) == [pars["c"].uid()])
+        assert(len(ObjectStore.get_all_object_names(
+                                    bucket, "registry/pars/expire/")) == 2)
+
+        result = OSParRegistry.sweep(before=now + datetime.timedelta(
+                                                            hours=3))
+        assert(result["nswept"] == 1)
+        assert(result["finished"])
+        assert(len(result["errors"]) == 0)
+
+        cleaned = ObjectStore.get_all_object_names(bucket, "cleaned",
+                                              without_prefix=True)
+        assert(sorted(cleaned) == ["a", "c"])
+
+        # only the registration of the unexpired PAR remains
+        names = ObjectStore.get_all_object_names(bucket, "registry/pars")
+        assert(len(names) == 2)
+        for name in names:
+            assert(pars["d"].uid() in name)
+
+        # closing a swept PAR does nothing
+        ObjectStore.close_par(par=pars["a"])
+    finally:
+        pop_testing_objstore()
+        clear_login_cache()
+        pop_is_running_service()
+
+    # nothing is swept if this is not running as a service
+    if not is_running_service():
+        assert(OSParRegistry.sweep() == {"nswept": 0, "errors": {},
+                                         "finished": True})
+
+
+class _MockBucketRequests:
+    """Mock of the requests module that serves a bucket using GET and
+       PUT requests, failing the first request for some objects
+    """
+    def __init__(self):
+        import threading
+        self.objects = {}
+        self.sessions = 0
+        self.failed = set()
+        self._lock = threading.Lock()
+
+    def Session(self):
+        self.sessions += 1
+        return self
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def _fail(self, url):
+        with self._lock:
+            if url.endswith("3") and url not in self.failed:
+                self.failed.add(url)
+                return True
+
+        return False
+
+    def get(self, url):
+        from types import SimpleNamespace
+
+        if self._fail(url):
+            return SimpleNamespace(status_code=503, content=b"")
+        elif url not in self.objects:
+            return SimpleNamespace(status_code=404, content=b"")
+
+        return SimpleNamespace(status_code=200, content=self.objects[url])
+
+    def put(self, url, data):
+        from types import SimpleNamespace
+
+        if self._fail(url):
+            return SimpleNamespace(status_code=503, content=b"")
+
+        self.objects[url] = data
+        return SimpleNamespace(status_code=200, content=b"")
+
+
+def test_bucket_bulk_operations(tmpdir, monkeypatch):
+    from Acquire.ObjectStore import BucketReader, BucketWriter
+    from Acquire.Client import PARReadError
+    from Acquire import Stubs
+
+    objects = dict(("dir/%d" % i, ("data %d" % i).encode("utf-8"))
+                   for i in range(0, 20))
+    objects["other"] = b"other"
+
+    progress = []
+
+    def _progress(ndone, ntotal):
+        progress.append((ndone, ntotal))
+
+    # first through the local object store
+    bucket = str(tmpdir)
+
+    writer = BucketWriter()
+    writer._par = True
+    writer._url = "file://%s" % bucket
+
+    writer.set_objects(objects, parallelism=4, progress=_progress)
+    assert(sorted(progress) == [(i, 21) for i in range(1, 22)])
+
+    reader = BucketReader()
+    reader._par = True
+    reader._url = "file://%s" % bucket
+
+    assert(reader.get_all_objects() == objects)
+    assert(reader.get_all_objects("dir", parallelism=4) ==
+           dict((key[4:], data) for (key, data) in objects.items()
+                if key.startswith("dir/")))
+    assert(reader.get_all_strings("dir/")["7"] == "data 7")
+
+    # then through a remote bucket, where some requests fail once
+    requests = _MockBucketRequests()
+    monkeypatch.setattr(Stubs, "requests", requests)
+
+    url = "https://objectstorage.example.com/p/secret/b/bucket/o/"
+
+    writer = BucketWriter()
+    writer._par = True
+    writer._url = url
+
+    writer.set_objects(objects, parallelism=4)
+
+    assert(requests.sessions == 1)
+    assert(len(requests.failed) == 2)
+    assert(requests.objects == dict(("%s%s" % (url, key), data)
+                                    for (key, data) in objects.items()))
+
+    reader = BucketReader()
+    reader._par = True
+    reader._url = url
+
+    progress = []
+    keys = ["dir/%d" % i for i in range(0, 20)]
+    assert(reader.get_objects(keys, parallelism=4, progress=_progress) ==
+           dict((key, objects[key]) for key in keys))
+    assert(len(progress) == 20)
+    assert(requests.sessions == 2)
+
+    with pytest.raises(PARReadError):
+        reader.get_objects(["dir/1", "missing"])
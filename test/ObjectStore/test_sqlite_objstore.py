@@ -0,0 +1,147 @@
+import pytest
+
+from Acquire.ObjectStore import ObjectStoreError
+from Acquire.ObjectStore._sqlite_objstore import SQLite_ObjectStore, \
+    _make_bucket, _read_par_url, _write_par_url, _list_par_url
+
+
+@pytest.fixture
+def bucket(tmpdir):
+    root = _make_bucket(str(tmpdir.join("objstore.sqlite")), "root")
+    return SQLite_ObjectStore.get_bucket(root, "test")
+
+
+def test_sqlite_objstore(bucket):
+    for key in ["c/d", "b", "a/b", "a/a", "ab", "a/c/d"]:
+        SQLite_ObjectStore.set_object(bucket, key, key.encode("utf-8"))
+
+    assert(SQLite_ObjectStore.get_all_object_names(bucket) ==
+           ["a/a", "a/b", "a/c/d", "ab", "b", "c/d"])
+    assert(SQLite_ObjectStore.get_all_object_names(bucket, "a/") ==
+           ["a/a", "a/b", "a/c/d"])
+    assert(SQLite_ObjectStore.get_all_object_names(
+                        bucket, "a/", without_prefix=True) ==
+           ["a", "b", "c/d"])
+    assert(list(SQLite_ObjectStore.iter_object_names(
+                        bucket, "a", start_after="a/b")) == ["a/c/d", "ab"])
+    assert(list(SQLite_ObjectStore.iter_object_names(
+                        bucket, "a", start_after="a/a",
+                        page_size=1)) == ["a/b", "a/c/d", "ab"])
+
+    # the names are read a page at a time, so objects added after
+    # the current page are seen
+    names = SQLite_ObjectStore.iter_object_names(bucket, page_size=2)
+    assert([next(names), next(names)] == ["a/a", "a/b"])
+    SQLite_ObjectStore.set_object(bucket, "a/d", b"a/d")
+    assert(list(names) == ["a/c/d", "a/d", "ab", "b", "c/d"])
+    SQLite_ObjectStore.delete_object(bucket, "a/d")
+
+    assert(SQLite_ObjectStore.list_prefixes(bucket) == ["a/", "c/"])
+    assert(SQLite_ObjectStore.list_prefixes(bucket, "a/") == ["a/c/"])
+    assert(SQLite_ObjectStore.list_prefixes(bucket, "a") == ["a/"])
+    assert(SQLite_ObjectStore.list_prefixes(bucket, "a/", "b") == ["a/b"])
+
+    assert(SQLite_ObjectStore.get_object(bucket, "a//b") == b"a/b")
+    assert(SQLite_ObjectStore.take_object(bucket, "a/b") == b"a/b")
+
+    with pytest.raises(ObjectStoreError):
+        SQLite_ObjectStore.get_object(bucket, "a/b")
+
+    # buckets in the same database are independent
+    other = SQLite_ObjectStore.create_bucket(bucket, "other")
+    assert(SQLite_ObjectStore.is_bucket_empty(other))
+
+    with pytest.raises(ObjectStoreError):
+        SQLite_ObjectStore.create_bucket(bucket, "other")
+
+    SQLite_ObjectStore.delete_all_objects(bucket, prefix="a/")
+    assert(SQLite_ObjectStore.get_all_object_names(bucket) ==
+           ["ab", "b", "c/d"])
+
+    SQLite_ObjectStore.set_object(bucket, "c/e", b"c/e")
+    assert(SQLite_ObjectStore.delete_objects(bucket, ["ab", "missing"]) ==
+           (1, {}))
+    assert(SQLite_ObjectStore.delete_prefix(bucket, "c/") == (2, {}))
+    assert(SQLite_ObjectStore.get_all_object_names(bucket) == ["b"])
+
+    with pytest.raises(PermissionError):
+        SQLite_ObjectStore.delete_bucket(bucket)
+
+    SQLite_ObjectStore.delete_bucket(bucket, force=True)
+
+    with pytest.raises(ObjectStoreError):
+        SQLite_ObjectStore.get_bucket(bucket, "test", create_if_needed=False)
+
+
+def test_sqlite_objstore_conditional_writes(bucket):
+    etag = SQLite_ObjectStore.set_object_if_absent(bucket, "cas", b"first")
+    assert(etag is not None)
+    assert(SQLite_ObjectStore.set_object_if_absent(bucket, "cas",
+                                                   b"second") is None)
+    assert(SQLite_ObjectStore.get_object_with_etag(bucket, "cas") ==
+           (b"first", etag))
+
+    new_etag = SQLite_ObjectStore.set_object_if_match(bucket, "cas",
+                                                      b"first", etag)
+
+    # etags identify the version, not the content
+    assert(new_etag is not None and new_etag != etag)
+    assert(SQLite_ObjectStore.set_object_if_match(bucket, "cas",
+                                                  b"third", etag) is None)
+    assert(SQLite_ObjectStore.set_object_if_match(bucket, "missing",
+                                                  b"third", etag) is None)
+
+
+def test_sqlite_objstore_streams(bucket):
+    import hashlib
+    import io
+    import threading
+
+    data = bytes(range(0, 256)) * 5000
+
+    result = SQLite_ObjectStore.set_object_from_stream(
+                            bucket, "stream", io.BytesIO(data),
+                            part_size=4096)
+
+    assert(result == (len(data), hashlib.md5(data).hexdigest()))
+    assert(SQLite_ObjectStore.get_size_and_checksum(bucket, "stream") ==
+           result)
+
+    with SQLite_ObjectStore.open_object(bucket, "stream") as stream:
+        assert(stream.read(10) == data[0:10])
+        assert(stream.read() == data[10:])
+
+    # readers on other threads are not blocked by a writer
+    errors = []
+
+    def _read():
+        try:
+            for _ in range(0, 10):
+                assert(SQLite_ObjectStore.get_object(bucket, "stream") ==
+                       data)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_read) for _ in range(0, 4)]
+
+    for thread in threads:
+        thread.start()
+
+    for i in range(0, 10):
+        SQLite_ObjectStore.set_object(bucket, "other", b"%d" % i)
+
+    for thread in threads:
+        thread.join()
+
+    assert(errors == [])
+
+
+def test_sqlite_objstore_par_urls(bucket):
+    url = "sqlite://%s#%s" % (bucket["database"], bucket["bucket_name"])
+
+    _write_par_url("%s/par/a" % url, b"a")
+    _write_par_url("%s/par/b/c" % url, b"c")
+
+    assert(_read_par_url("%s/par/a" % url) == b"a")
+    assert(_list_par_url("%s/par" % url) == ["a", "b/c"])
+    assert(_list_par_url(url) == ["par/a", "par/b/c"])
@@ -0,0 +1,57 @@
+import requests
+
+from Acquire.Service import clear_service_cache, clear_client_pool, \
+    get_client_pool_stats
+from Acquire.Service._client_pool import _get_pooled_client, \
+    _get_pooled_bucket, _tune_session
+
+
+def test_client_pool():
+    clear_client_pool()
+
+    created = []
+
+    def _create_client():
+        created.append(object())
+        return created[-1]
+
+    key = ("oci", "uk-london-1", "tenancy", "user", "fingerprint")
+
+    client = _get_pooled_client(key, _create_client)
+    assert(_get_pooled_client(key, _create_client) is client)
+
+    bucket = _get_pooled_bucket(key, "bucket",
+                                lambda: {"client": client, "name": "b"})
+    bucket["name"] = "changed"
+
+    # the pooled handle is not changed by the caller
+    assert(_get_pooled_bucket(key, "bucket", None) ==
+           {"client": client, "name": "b"})
+
+    # the pool survives clearing the service cache
+    clear_service_cache()
+    assert(_get_pooled_client(key, _create_client) is client)
+    assert(len(created) == 1)
+
+    other = ("oci", "us-ashburn-1", "tenancy", "user", "fingerprint")
+    assert(_get_pooled_client(other, _create_client) is not client)
+
+    stats = get_client_pool_stats()
+    assert(stats["client_hits"] == 2)
+    assert(stats["client_misses"] == 2)
+    assert(stats["bucket_hits"] == 1)
+    assert(stats["bucket_misses"] == 1)
+    assert(stats["clients"] == 2)
+    assert(stats["buckets"] == 1)
+    assert({"backend": "oci", "region": "uk-london-1", "uses": 3,
+            "buckets": 1} in stats["pool"])
+
+    clear_client_pool()
+    assert(get_client_pool_stats()["clients"] == 0)
+
+
+def test_tune_session():
+    session = requests.Session()
+    assert(_tune_session(session, pool_maxsize=17))
+    assert(session.get_adapter("https://example.com")._pool_maxsize == 17)
+    assert(not _tune_session(None))
@@ -0,0 +1,130 @@
+import hashlib
+import pytest
+
+from Acquire.ObjectStore import ObjectStore
+from Acquire.Service import get_service_account_bucket, \
+    push_is_running_service, pop_is_running_service
+from Acquire.Storage import BlobStore, FileValidationError
+
+
+@pytest.fixture(scope="module")
+def bucket(tmpdir_factory):
+    d = tmpdir_factory.mktemp("blobstore")
+    push_is_running_service()
+    bucket = get_service_account_bucket(str(d))
+    pop_is_running_service()
+    return bucket
+
+
+def test_blobstore(bucket):
+    data = b"some file data"
+    blob_hash = hashlib.sha256(data).hexdigest()
+    checksum = hashlib.md5(data).hexdigest()
+
+    with pytest.raises(FileValidationError):
+        BlobStore.get_key("../../etc/passwd")
+
+    assert(not BlobStore.is_valid_hash("abc"))
+    assert(BlobStore.is_valid_hash(blob_hash))
+    assert(BlobStore.get_info(bucket, blob_hash) is None)
+
+    # the first reference must upload the data
+    assert(not BlobStore.add_reference(bucket, blob_hash,
+                                       len(data), checksum))
+
+    key = BlobStore.get_key(blob_hash)
+    ObjectStore.set_object(bucket, key, data)
+
+    # the blob is only complete once validated with the promised data
+    BlobStore.set_complete(bucket, blob_hash, len(data), "wrong")
+    assert(not BlobStore.get_info(bucket, blob_hash)["complete"])
+    BlobStore.set_complete(bucket, blob_hash, len(data), checksum)
+
+    # subsequent references share the data
+    assert(BlobStore.add_reference(bucket, blob_hash, len(data), checksum))
+    assert(BlobStore.get_info(bucket, blob_hash)["refs"] == 2)
+
+    with pytest.raises(FileValidationError):
+        BlobStore.add_reference(bucket, blob_hash, len(data), "wrong")
+
+    assert(BlobStore.remove_reference(bucket, blob_hash) == 1)
+    assert(ObjectStore.get_object(bucket, key) == data)
+
+    # the data is deleted with the last reference
+    assert(BlobStore.remove_reference(bucket, blob_hash) == 0)
+    assert(BlobStore.get_info(bucket, blob_hash)["refs"] == 0)
+    assert(BlobStore.get_info(bucket, blob_hash)["complete"] is False)
+    assert(ObjectStore.get_all_object_names(bucket, "storage/blob/") == [])
+
+    # and must be uploaded again
+    assert(not BlobStore.add_reference(bucket, blob_hash,
+                                       len(data), checksum))
+
+
+def test_blobstore_uploads(bucket):
+    data = b"some other file data"
+    blob_hash = hashlib.sha256(data).hexdigest()
+    checksum = hashlib.md5(data).hexdigest()
+
+    # blobs are scoped to their drive, so are not shared between drives
+    assert(not BlobStore.add_reference(bucket, blob_hash, len(data),
+                                       checksum, scope="drive1"))
+    assert(BlobStore.get_key(blob_hash, scope="drive1") !=
+           BlobStore.get_key(blob_hash, scope="drive2"))
+    assert(BlobStore.get_info(bucket, blob_hash, scope="drive2") is None)
+
+    with pytest.raises(FileValidationError):
+        BlobStore.get_key(blob_hash, scope="../drive1")
+
+    # the first promise is kept while the blob is being uploaded
+    with pytest.raises(FileValidationError):
+        BlobStore.add_reference(bucket, blob_hash, len(data) + 1,
+                                checksum, scope="drive1")
+
+    assert(not BlobStore.add_reference(bucket, blob_hash, len(data),
+                                       checksum, scope="drive1"))
+    assert(BlobStore.get_info(bucket, blob_hash,
+                              scope="drive1")["refs"] == 2)
+
+    # each upload has its own pending key
+    pending1 = BlobStore.get_pending_key(blob_hash, "upload1",
+                                         scope="drive1")
+    pending2 = BlobStore.get_pending_key(blob_hash, "upload2",
+                                         scope="drive1")
+    assert(pending1 != pending2)
+
+    ObjectStore.set_object(bucket, pending1, data)
+    ObjectStore.set_object(bucket, pending2, data)
+
+    assert(BlobStore.promote(bucket, blob_hash, pending1, scope="drive1"))
+    assert(BlobStore.get_info(bucket, blob_hash, scope="drive1")["complete"])
+    assert(ObjectStore.get_object(
+                bucket, BlobStore.get_key(blob_hash, scope="drive1")) == data)
+
+    # the second upload is not needed, and is removed
+    assert(BlobStore.promote(bucket, blob_hash, pending2, scope="drive1"))
+    assert(ObjectStore.get_all_object_names(
+                bucket, "storage/blob_pending/") == [])
+
+    # data that matches the promised size and checksum, but not the
+    # hash, is never stored under the hash
+    other = b"x" * len(data)
+    other_hash = hashlib.sha256(b"the real data").hexdigest()
+    assert(not BlobStore.add_reference(bucket, other_hash, len(other),
+                                       hashlib.md5(other).hexdigest(),
+                                       scope="drive1"))
+
+    pending = BlobStore.get_pending_key(other_hash, "upload3",
+                                        scope="drive1")
+    ObjectStore.set_object(bucket, pending, other)
+
+    with pytest.raises(FileValidationError):
+        BlobStore.promote(bucket, other_hash, pending, scope="drive1")
+
+    assert(not BlobStore.get_info(bucket, other_hash,
+                                  scope="drive1")["complete"])
+    assert(ObjectStore.get_all_object_names(
+                bucket, "storage/blob_pending/") == [])
+
+    with pytest.raises(FileValidationError):
+        BlobStore.promote(bucket, other_hash, pending1, scope="drive1")
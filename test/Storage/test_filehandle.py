@@ -21,3 +21,5 @@ def test_filehandle():
     assert(f1.local_filedata() == f2.local_filedata())
     assert(f1.fingerprint() == f2.fingerprint())
     assert(f1.drive_uid() == f2.drive_uid())
+    assert(f1.content_hash() == f2.content_hash())
+    assert(len(f1.content_hash()) == 64)
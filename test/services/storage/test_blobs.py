@@ -0,0 +1,73 @@
+import pytest
+
+from Acquire.Client import Drive, StorageCreds
+from Acquire.ObjectStore import OSPar
+
+
+def _count_blobs():
+    from Acquire.ObjectStore import ObjectStore
+    from Acquire.Service import push_testing_objstore, \
+        pop_testing_objstore, push_is_running_service, \
+        pop_is_running_service, get_service_account_bucket
+    from services.fixtures.mocked_services import _get_services
+
+    push_testing_objstore(_get_services()["storage"])
+    push_is_running_service()
+
+    try:
+        bucket = ObjectStore.get_bucket(bucket=get_service_account_bucket(),
+                                        bucket_name="user_files",
+                                        create_if_needed=True)
+
+        return len(ObjectStore.get_all_object_names(bucket,
+                                                    prefix="storage/blob/"))
+    finally:
+        pop_is_running_service()
+        pop_testing_objstore()
+
+
+def test_blob_dedup(authenticated_user, tmpdir, monkeypatch):
+    creds = StorageCreds(user=authenticated_user, service_url="storage")
+    drive = Drive(name="test blobs", creds=creds, autocreate=True)
+
+    filename = str(tmpdir.join("data.bin"))
+
+    with open(filename, "wb") as FILE:
+        FILE.write(bytes(range(0, 256)) * 4000)
+
+    nblobs = _count_blobs()
+
+    filemeta1 = drive.upload(filename=filename, uploaded_name="one.bin",
+                             force_par=True)
+    assert(_count_blobs() == nblobs + 1)
+
+    # the service already holds this data, so the second upload
+    # must not transfer it again
+    def _no_write(*args, **kwargs):
+        raise AssertionError("The data should not be uploaded again")
+
+    monkeypatch.setattr(OSPar, "write", _no_write)
+
+    filemeta2 = drive.upload(filename=filename, uploaded_name="two.bin",
+                             force_par=True)
+    assert(_count_blobs() == nblobs + 1)
+
+    monkeypatch.undo()
+
+    assert(filemeta1.checksum() == filemeta2.checksum())
+    assert(filemeta1.uid() != filemeta2.uid())
+
+    with open(filename, "rb") as FILE:
+        data = FILE.read()
+
+    for name in ["one.bin", "two.bin"]:
+        downloaded = drive.download(filename=name, directory=str(tmpdir))
+
+        with open(downloaded, "rb") as FILE:
+            assert(FILE.read() == data)
+
+    # small files are stored in the same way
+    filemeta3 = drive.upload(filename=__file__, uploaded_name="a.py")
+    filemeta4 = drive.upload(filename=__file__, uploaded_name="b.py")
+    assert(_count_blobs() == nblobs + 2)
+    assert(filemeta3.checksum() == filemeta4.checksum())